@@ -0,0 +1,196 @@
+"""
+Async NASA POWER API Client
+Concurrent NASA POWER requests with a bounded number of requests in flight
+
+Wraps NASAPowerAPI so each request runs on a worker thread while asyncio
+coordinates them. All workers share one HTTP connection pool and the same
+on-disk response cache as the synchronous client.
+
+Usage:
+    async with AsyncNASAPowerAPI(max_concurrency=8) as api:
+        data = await api.get_daily_data(23.8103, 90.4125, '20240101', '20241231')
+
+        requests = [
+            {'kind': 'hourly', 'latitude': 23.8103, 'longitude': 90.4125,
+             'start_date': '20240101', 'end_date': '20240131'},
+            ...
+        ]
+        async for request, data in api.fetch_many(requests):
+            ...
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.adapters import HTTPAdapter
+
+from nasa_power_api import NASAPowerAPI
+from power_grid import plan_point_requests
+
+
+class AsyncNASAPowerAPI:
+    """
+    Awaitable NASA POWER client with a configurable concurrency limit
+    """
+
+    def __init__(self, max_concurrency=8, use_cache=True, cache_dir=None):
+        """
+        Initialize the async client
+
+        Parameters:
+        -----------
+        max_concurrency : int
+            Maximum number of requests in flight at once (global request budget)
+        use_cache : bool
+            Serve repeated requests from the on-disk response cache
+        cache_dir : str or Path
+            Cache directory (default: .power_cache next to nasa_power_api.py)
+        """
+        self.max_concurrency = max_concurrency
+        self.api = NASAPowerAPI(use_cache=use_cache, cache_dir=cache_dir)
+
+        # One connection per worker, shared by all requests
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.api.session.mount('https://', adapter)
+        self.api.session.mount('http://', adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix='power')
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Shut down worker threads and the connection pool"""
+        self._executor.shutdown(wait=True)
+        self.api.session.close()
+
+    def _get_semaphore(self):
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _run(self, func, **kwargs):
+        """Run a blocking client call on a worker thread"""
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, **kwargs))
+
+    async def get_daily_data(self, latitude, longitude, start_date, end_date,
+                             parameters=None, community='ag'):
+        """
+        Fetch daily weather data for a specific location (awaitable)
+
+        See NASAPowerAPI.get_daily_data for parameters.
+
+        Returns:
+        --------
+        dict : API response with weather data, or None on error
+        """
+        return await self._run(
+            self.api.get_daily_data,
+            latitude=latitude, longitude=longitude,
+            start_date=start_date, end_date=end_date,
+            parameters=parameters, community=community
+        )
+
+    async def get_hourly_data(self, latitude, longitude, start_date, end_date,
+                              parameters=None, community='ag'):
+        """
+        Fetch hourly weather data for a specific location (awaitable)
+
+        See NASAPowerAPI.get_hourly_data for parameters.
+
+        Returns:
+        --------
+        dict : API response with weather data, or None on error
+        """
+        return await self._run(
+            self.api.get_hourly_data,
+            latitude=latitude, longitude=longitude,
+            start_date=start_date, end_date=end_date,
+            parameters=parameters, community=community
+        )
+
+    def convert_to_dataframe(self, api_response):
+        """Convert a POWER response to a DataFrame (see NASAPowerAPI.convert_to_dataframe)"""
+        return self.api.convert_to_dataframe(api_response)
+
+    async def fetch_many(self, requests, dedupe=True):
+        """
+        Fetch many requests concurrently, yielding results as they complete
+
+        Parameters:
+        -----------
+        requests : iterable of dict
+            Each request has 'kind' ('daily' or 'hourly', default 'daily') and
+            the keyword arguments of get_daily_data/get_hourly_data. Any other
+            keys (e.g., 'location') are passed back untouched.
+        dedupe : bool
+            Send one request per POWER grid cell and share the response with
+            every request in that cell (see power_grid.plan_point_requests)
+
+        Yields:
+        -------
+        tuple : (request dict, API response dict or None)
+        """
+        fetchers = {
+            'daily': self.get_daily_data,
+            'hourly': self.get_hourly_data,
+        }
+        call_args = ('latitude', 'longitude', 'start_date', 'end_date',
+                     'parameters', 'community')
+
+        if dedupe:
+            groups = plan_point_requests(requests)
+        else:
+            groups = [(request, [request]) for request in requests]
+
+        async def fetch_one(representative, members):
+            fetch = fetchers[representative.get('kind', 'daily')]
+            kwargs = {name: representative[name] for name in call_args if name in representative}
+            return members, await fetch(**kwargs)
+
+        tasks = [asyncio.ensure_future(fetch_one(*group)) for group in groups]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                members, data = await next_done
+                for request in members:
+                    yield request, data
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def fetch_all(requests, max_concurrency=8, use_cache=True, dedupe=True):
+    """
+    Fetch many POWER requests concurrently from synchronous code
+
+    Parameters:
+    -----------
+    requests : iterable of dict
+        Requests in the format accepted by AsyncNASAPowerAPI.fetch_many
+    max_concurrency : int
+        Maximum number of requests in flight at once
+    dedupe : bool
+        Send one request per POWER grid cell (see fetch_many)
+
+    Returns:
+    --------
+    list : (request dict, API response dict or None) in completion order
+    """
+    async def run():
+        results = []
+        async with AsyncNASAPowerAPI(max_concurrency=max_concurrency,
+                                     use_cache=use_cache) as api:
+            async for request, data in api.fetch_many(requests, dedupe=dedupe):
+                results.append((request, data))
+        return results
+
+    return asyncio.run(run())
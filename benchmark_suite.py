@@ -0,0 +1,816 @@
+"""
+Offline Benchmark Suite
+Times the extraction pipelines against a local replay server
+
+Every extractor talks to NASA POWER, Earth Engine thumbnail URLs or
+OpenWeatherMap, so none of them can be timed without the network - and a
+real run mixes our own cost with whatever the APIs are doing that day.
+ReplayServer stands in for all three on localhost:
+
+- POWER requests are answered from recorded responses (a .power_cache
+  directory, in PowerResponseCache format) or, for requests that were never
+  recorded, from deterministic synthetic data with the same JSON layout
+- Thumbnail and radar tile requests get recorded PNGs from a
+  .thumbnail_cache directory, or a synthetic 512×512 PNG
+- OpenWeather current-weather requests get recorded JSON or a synthetic reply
+
+Latency (with jitter) and error responses are injected so retries and
+backoff are part of what is measured. BenchmarkSuite then runs each stage
+of the hybrid lightning pipeline and writes a JSON report:
+
+    power_fetch        NASAPowerAPI, one request at a time
+    power_fetch_async  AsyncNASAPowerAPI.fetch_many
+    expand_30min       hourly -> 30-minute feature rows
+    lightning_labels   label_lightning
+    derived_features   HybridLightningDatasetExtractor.add_derived_features
+    write_csv          one CSV per location
+    write_parquet      DatasetStore partitions
+    thumbnails         ThumbnailPipeline downloads
+    openweather        SimpleRadarExtractor weather + radar tile calls
+
+    python benchmark_suite.py                   # writes benchmark_report.json
+    python benchmark_suite.py baseline.json     # also flags regressions (exit code 1)
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from async_power_api import AsyncNASAPowerAPI
+from dataset_store import DatasetStore, LIGHTNING_DATASET_DTYPES, PYARROW_AVAILABLE
+from extract_hybrid_lightning_dataset import HybridLightningDatasetExtractor
+from extract_radar_simple import SimpleRadarExtractor
+from lightning_climatology import load_climatology
+from lightning_labels import label_lightning
+from nasa_power_api import NASAPowerAPI
+from power_cache import PowerResponseCache
+from rate_limiter import SERVICE_LIMITS, RateLimiter
+
+try:
+    from thumbnail_pipeline import ThumbnailPipeline
+    THUMBNAILS_AVAILABLE = True
+except ImportError:
+    # thumbnail_pipeline imports ee_helpers, which needs earthengine-api
+    THUMBNAILS_AVAILABLE = False
+
+
+DEFAULT_CONFIG = {
+    'locations': list(NASAPowerAPI.BANGLADESH_LOCATIONS),
+    'year': 2023,
+    'months': [5, 6, 7, 8],
+    'latency_ms': 150,          # mean server latency per request
+    'jitter': 0.3,              # latency varies uniformly by ±30%
+    'error_rate': 0.02,         # share of requests answered with error_status
+    'error_status': 503,
+    'concurrency': 8,           # async POWER requests / thumbnail workers in flight
+    'thumbnails': 40,
+    'openweather_calls': 20,
+    'seed': 42,
+    'production_limits': False,  # True: throttle with SERVICE_LIMITS as in a real run
+    'power_recordings': None,    # default: .power_cache
+    'thumbnail_recordings': None,  # default: .thumbnail_cache
+    'openweather_recordings': None,
+}
+
+# Throughput may drop (or p95 latency grow) this much before it is a regression
+REGRESSION_TOLERANCE = 0.2
+
+# Synthetic hourly profiles: code -> (mean, diurnal amplitude, peak hour, noise std, min, max)
+SYNTHETIC_PROFILES = {
+    'T2M': (27.5, 4.0, 14, 0.8, None, None),
+    'RH2M': (80.0, -12.0, 14, 4.0, 20.0, 100.0),
+    'WS2M': (2.5, 1.0, 15, 0.8, 0.0, None),
+    'PS': (100.6, 0.15, 10, 0.05, None, None),
+    'ALLSKY_SFC_SW_DWN': (0.25, 0.45, 12, 0.05, 0.0, None),
+    'T2M_MAX': (32.0, 0.0, 0, 1.0, None, None),
+    'T2M_MIN': (24.0, 0.0, 0, 1.0, None, None),
+    'WD2M': (180.0, 0.0, 0, 60.0, 0.0, 360.0),
+}
+
+
+def _request_seed(*parts):
+    """Stable 32-bit seed for a request (same request -> same synthetic data)"""
+    digest = hashlib.sha256('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return int(digest[:8], 16)
+
+
+def synthetic_power_response(endpoint, params, seed=0):
+    """
+    POWER-shaped response for a point request that was never recorded
+
+    Parameters:
+    -----------
+    endpoint : str
+        'hourly/point' or 'daily/point'
+    params : dict
+        Query parameters as sent by NASAPowerAPI
+
+    Returns:
+    --------
+    dict : Response with properties.parameter in the POWER layout, or None
+           for endpoints that have no synthetic equivalent
+    """
+    if endpoint not in ('hourly/point', 'daily/point'):
+        return None
+
+    hourly = endpoint == 'hourly/point'
+    start = pd.Timestamp(params['start'])
+    end = pd.Timestamp(params['end'])
+    if hourly:
+        times = pd.date_range(start, end + pd.Timedelta(hours=23), freq='h')
+        keys = times.strftime('%Y%m%d%H')
+    else:
+        times = pd.date_range(start, end, freq='D')
+        keys = times.strftime('%Y%m%d')
+
+    rng = np.random.default_rng(_request_seed(endpoint, sorted(params.items()), seed))
+    hours = times.hour.to_numpy() if hourly else np.full(len(times), 12)
+
+    parameter = {}
+    for code in params['parameters'].split(','):
+        if code == 'PRECTOTCORR':
+            # Mostly dry hours with occasional showers
+            values = np.where(rng.random(len(times)) < 0.15, rng.exponential(2.0, len(times)), 0.0)
+        else:
+            mean, amplitude, peak, noise, low, high = SYNTHETIC_PROFILES.get(
+                code, (0.0, 0.0, 0, 1.0, None, None))
+            values = (mean + amplitude * np.cos(2 * np.pi * (hours - peak) / 24)
+                      + rng.normal(0, noise, len(times)))
+            if low is not None or high is not None:
+                values = np.clip(values, low, high)
+        parameter[code] = dict(zip(keys, np.round(values, 2).tolist()))
+
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point',
+                     'coordinates': [float(params['longitude']), float(params['latitude']), 10.0]},
+        'properties': {'parameter': parameter},
+        'header': {'title': 'NASA/POWER synthetic replay', 'fill_value': -999.0,
+                   'start': params['start'], 'end': params['end']},
+        'messages': [],
+        'parameters': {code: {'units': '', 'longname': code} for code in parameter},
+    }
+
+
+def synthetic_openweather_response(params, seed=0):
+    """OpenWeather current-weather reply (data/2.5/weather layout)"""
+    rng = random.Random(_request_seed('openweather', sorted(params.items()), seed))
+    raining = rng.random() < 0.3
+    return {
+        'coord': {'lon': float(params.get('lon', 90.41)), 'lat': float(params.get('lat', 23.81))},
+        'weather': [{'id': 500, 'main': 'Rain', 'description': 'light rain', 'icon': '10d'}
+                    if raining else
+                    {'id': 802, 'main': 'Clouds', 'description': 'scattered clouds', 'icon': '03d'}],
+        'main': {'temp': round(rng.uniform(24, 34), 2), 'pressure': rng.randint(1000, 1012),
+                 'humidity': rng.randint(55, 98)},
+        'visibility': 10000,
+        'wind': {'speed': round(rng.uniform(0, 8), 2), 'deg': rng.randint(0, 359)},
+        'clouds': {'all': rng.randint(0, 100)},
+        'rain': {'1h': round(rng.uniform(0.1, 5), 2)} if raining else {},
+        'dt': int(time.time()),
+        'name': 'Dhaka',
+        'cod': 200,
+    }
+
+
+def synthetic_png(width=512, height=512, seed=0):
+    """
+    Encode a deterministic RGB PNG about the size of a Landsat thumbnail
+
+    Smooth gradients with noise, so it compresses like imagery rather
+    than like a flat colour.
+    """
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 200 // width, y * 200 // height, (x + y) * 100 // (width + height)], axis=-1)
+    pixels = (base + rng.integers(0, 48, base.shape)).clip(0, 255).astype(np.uint8)
+
+    # One filter byte (0 = none) per scanline
+    raw = b''.join(b'\x00' + row.tobytes() for row in pixels)
+
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 6))
+            + chunk(b'IEND', b''))
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    """Routes requests to the ReplayServer that owns this HTTP server"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        replay = self.server.replay
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        route = url.path.strip('/').split('/', 1)[0]
+
+        replay.count('requests')
+        replay.wait_latency()
+        if replay.inject_error():
+            self._send(replay.error_status, b'{"messages": ["injected error"]}', 'application/json')
+            return
+
+        status, body, content_type = replay.respond(route, url.path, params)
+        self._send(status, body, content_type)
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.replay.count('bytes', len(body))
+
+
+class ReplayServer:
+    """
+    Local stand-in for NASA POWER, Earth Engine thumbnails and OpenWeatherMap
+    """
+
+    def __init__(self, power_recordings=None, thumbnail_recordings=None,
+                 openweather_recordings=None, latency=0.0, jitter=0.0,
+                 error_rate=0.0, error_status=503, seed=0):
+        """
+        Initialize the server (call start() or use it as a context manager)
+
+        Parameters:
+        -----------
+        power_recordings : str or Path
+            PowerResponseCache directory to replay (default: .power_cache)
+        thumbnail_recordings : str or Path
+            Directory searched for recorded PNGs (default: .thumbnail_cache)
+        openweather_recordings : str or Path
+            Directory of recorded OpenWeather JSON replies (served in turn)
+        latency : float
+            Mean seconds before each reply
+        jitter : float
+            Latency varies uniformly by ± this fraction
+        error_rate : float
+            Share of requests answered with `error_status` instead
+        error_status : int
+            Status for injected errors (503 and 429 are retried by RateLimiter)
+        seed : int
+            Seed for injected errors, latency and synthetic data
+        """
+        base = Path(__file__).parent
+        self.power_recordings = PowerResponseCache(
+            power_recordings if power_recordings is not None else base / '.power_cache')
+
+        thumbnail_dir = Path(thumbnail_recordings if thumbnail_recordings is not None
+                             else base / '.thumbnail_cache')
+        self.thumbnails = sorted(thumbnail_dir.rglob('*.png')) if thumbnail_dir.exists() else []
+
+        self.openweather = []
+        if openweather_recordings is not None:
+            for path in sorted(Path(openweather_recordings).glob('*.json')):
+                with open(path, 'r') as f:
+                    self.openweather.append(json.load(f))
+
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._synthetic_png = None
+        self._httpd = None
+        self._thread = None
+
+        self.stats = {'requests': 0, 'bytes': 0, 'errors_injected': 0,
+                      'recorded': 0, 'synthetic': 0, 'not_found': 0}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    @property
+    def url(self):
+        """Base URL, e.g. http://127.0.0.1:54321"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve on a free localhost port from a background thread"""
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), _ReplayHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.replay = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        name='replay-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving"""
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def wait_latency(self):
+        """Sleep for one jittered latency (on the handler thread)"""
+        if self.latency <= 0:
+            return
+        with self._lock:
+            factor = 1 + self._rng.uniform(-self.jitter, self.jitter)
+        time.sleep(self.latency * factor)
+
+    def inject_error(self):
+        """Decide whether this request gets an injected error"""
+        with self._lock:
+            failed = self._rng.random() < self.error_rate
+            self.stats['errors_injected'] += failed
+        return failed
+
+    def respond(self, route, path, params):
+        """
+        Build a reply for one request
+
+        Routes:
+            /power/<endpoint>         NASA POWER (BASE_URL = <url>/power)
+            /thumbnails/<name>.png    thumbnail download URLs
+            /openweather/weather      SimpleRadarExtractor.WEATHER_URL
+            /openweather/tiles/...    SimpleRadarExtractor.TILE_URL
+
+        Returns:
+        --------
+        tuple : (status, body bytes, content type)
+        """
+        if route == 'power':
+            endpoint = path.strip('/').split('/', 1)[1] if '/' in path.strip('/') else ''
+            data = self.power_recordings.peek(endpoint, self._power_key(endpoint, params))
+            if data is not None:
+                self.count('recorded')
+            else:
+                data = synthetic_power_response(endpoint, params, self.seed)
+                if data is None:
+                    self.count('not_found')
+                    return 404, b'{"messages": ["no recording"]}', 'application/json'
+                self.count('synthetic')
+            return 200, json.dumps(data).encode('utf-8'), 'application/json'
+
+        if route == 'openweather' and path.rstrip('/').endswith('/weather'):
+            if self.openweather:
+                self.count('recorded')
+                data = self.openweather[_request_seed(path, sorted(params.items())) % len(self.openweather)]
+            else:
+                self.count('synthetic')
+                data = synthetic_openweather_response(params, self.seed)
+            return 200, json.dumps(data).encode('utf-8'), 'application/json'
+
+        if route in ('thumbnails', 'openweather') and path.endswith('.png'):
+            return 200, self._png(path), 'image/png'
+
+        self.count('not_found')
+        return 404, b'{"messages": ["unknown route"]}', 'application/json'
+
+    @staticmethod
+    def _power_key(endpoint, params):
+        """Cache parameters for a request as the client computed them"""
+        params = dict(params)
+        for name, value in params.items():
+            # Regional bounds are floats on the client side
+            if name.startswith(('latitude-', 'longitude-')):
+                params[name] = float(value)
+        try:
+            return NASAPowerAPI.cache_params(endpoint, params)
+        except (KeyError, ValueError):
+            return params
+
+    def _png(self, path):
+        """A recorded PNG picked by path, or the synthetic one"""
+        if self.thumbnails:
+            self.count('recorded')
+            with open(self.thumbnails[_request_seed(path) % len(self.thumbnails)], 'rb') as f:
+                return f.read()
+
+        self.count('synthetic')
+        with self._lock:
+            if self._synthetic_png is None:
+                self._synthetic_png = synthetic_png(seed=self.seed)
+            return self._synthetic_png
+
+
+def latency_summary(latencies):
+    """p50 / p95 / max of per-request latencies in milliseconds"""
+    if not latencies:
+        return None
+    values = np.asarray(latencies) * 1000
+    return {
+        'p50': round(float(np.percentile(values, 50)), 2),
+        'p95': round(float(np.percentile(values, 95)), 2),
+        'max': round(float(values.max()), 2),
+    }
+
+
+class BenchmarkSuite:
+    """
+    Runs the extraction pipeline stages against a ReplayServer and reports timings
+    """
+
+    def __init__(self, config=None):
+        """
+        Initialize the suite
+
+        Parameters:
+        -----------
+        config : dict
+            Overrides for DEFAULT_CONFIG
+        """
+        self.config = dict(DEFAULT_CONFIG, **(config or {}))
+        unknown = set(self.config) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise ValueError(f"Unknown benchmark settings: {sorted(unknown)}")
+
+        self.stages = {}
+
+    def make_rate_limiter(self, state_dir):
+        """
+        Rate limiter for the benchmark clients
+
+        Quota usage goes to `state_dir`, never to the real .rate_limit_state.json.
+        Without production_limits the limiter does not throttle and backs off
+        briefly, so timings measure the pipeline rather than the quota.
+        """
+        state_file = Path(state_dir) / 'rate_limit_state.json'
+        if self.config['production_limits']:
+            return RateLimiter(state_file=state_file)
+
+        limits = {name: {'rate': 1000.0, 'burst': 1000, 'daily_quota': None}
+                  for name in SERVICE_LIMITS}
+        return RateLimiter(limits=limits, state_file=state_file,
+                           backoff_base=0.05, backoff_cap=1.0)
+
+    @contextlib.contextmanager
+    def stage(self, name, unit):
+        """
+        Time one stage
+
+        The body fills in the yielded dict: 'items' processed, optional
+        per-request 'latencies' (seconds), 'errors' and 'bytes'. Client
+        progress prints are silenced while the stage runs. A stage that
+        raises is recorded as failed and the suite moves on.
+        """
+        result = {'items': 0, 'latencies': [], 'errors': 0, 'bytes': 0}
+        print(f"⏱️  {name:<18}", end=' ', flush=True)
+
+        status, error = 'ok', None
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                yield result
+        except Exception as e:
+            status, error = 'failed', str(e)[:200]
+        seconds = time.perf_counter() - start
+
+        self.stages[name] = {
+            'status': status,
+            'seconds': round(seconds, 4),
+            'items': result['items'],
+            'unit': unit,
+            'throughput_per_s': round(result['items'] / seconds, 2) if seconds > 0 else None,
+            'latency_ms': latency_summary(result['latencies']),
+            'errors': result['errors'],
+            'mb': round(result['bytes'] / (1024 * 1024), 3),
+            'error': error,
+        }
+
+        if status == 'ok':
+            print(f"✅ {seconds:7.2f}s  {result['items']:>8,} {unit}  "
+                  f"({self.stages[name]['throughput_per_s']:,.1f}/s)")
+        else:
+            print(f"❌ {error[:60]}")
+
+    def skip(self, name, unit, reason):
+        """Record a stage that cannot run in this environment"""
+        self.stages[name] = {'status': 'skipped', 'unit': unit, 'error': reason}
+        print(f"⏱️  {name:<18} ⚠️  skipped ({reason})")
+
+    def run(self):
+        """
+        Run every stage
+
+        Returns:
+        --------
+        dict : Report (see save_report)
+        """
+        config = self.config
+        locations = {name: NASAPowerAPI.BANGLADESH_LOCATIONS[name] for name in config['locations']}
+        months = config['months']
+        started = time.perf_counter()
+
+        print("=" * 70)
+        print("🏁 OFFLINE EXTRACTION BENCHMARK")
+        print("=" * 70)
+        print(f"📍 {len(locations)} locations × {len(months)} months of {config['year']}")
+        print(f"🌐 Replay latency {config['latency_ms']} ms ±{config['jitter']:.0%}, "
+              f"error rate {config['error_rate']:.1%}")
+        print()
+
+        self.stages = {}
+        with tempfile.TemporaryDirectory(prefix='benchmark_') as scratch:
+            scratch = Path(scratch)
+            limiter = self.make_rate_limiter(scratch)
+
+            server = ReplayServer(
+                power_recordings=config['power_recordings'],
+                thumbnail_recordings=config['thumbnail_recordings'],
+                openweather_recordings=config['openweather_recordings'],
+                latency=config['latency_ms'] / 1000, jitter=config['jitter'],
+                error_rate=config['error_rate'], error_status=config['error_status'],
+                seed=config['seed'])
+
+            with server:
+                requests = [
+                    {'kind': 'hourly', 'location': name, 'month': month,
+                     'latitude': coords['lat'], 'longitude': coords['lon'],
+                     'start_date': f"{config['year']}{month:02d}01",
+                     'end_date': HybridLightningDatasetExtractor.month_date_range(
+                         config['year'], month)[1]}
+                    for name, coords in locations.items() for month in months
+                ]
+
+                responses = self.bench_power(server, limiter, requests)
+                self.bench_power_async(server, limiter, requests)
+                df = self.bench_features(responses)
+                self.bench_writes(df, scratch)
+                self.bench_thumbnails(server, limiter, scratch)
+                self.bench_openweather(server, limiter, scratch)
+
+            server_stats = dict(server.stats)
+
+        return {
+            'benchmark': 'extraction',
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'config': config,
+            'environment': self.environment(),
+            'server': server_stats,
+            'stages': self.stages,
+            'total_seconds': round(time.perf_counter() - started, 3),
+        }
+
+    def bench_power(self, server, limiter, requests):
+        """Sequential hourly fetches, one request per location-month"""
+        api = NASAPowerAPI(use_cache=False)
+        api.BASE_URL = f"{server.url}/power"
+        api.rate_limiter = limiter
+
+        responses = {}
+        with self.stage('power_fetch', 'requests') as result:
+            for request in requests:
+                start = time.perf_counter()
+                data = api.get_hourly_data(request['latitude'], request['longitude'],
+                                           request['start_date'], request['end_date'])
+                result['latencies'].append(time.perf_counter() - start)
+                result['items'] += 1
+                result['errors'] += data is None
+                responses[(request['location'], request['month'])] = data
+        api.session.close()
+        return responses
+
+    def bench_power_async(self, server, limiter, requests):
+        """The same fetches through AsyncNASAPowerAPI with `concurrency` in flight"""
+        power = AsyncNASAPowerAPI(max_concurrency=self.config['concurrency'], use_cache=False)
+        power.api.BASE_URL = f"{server.url}/power"
+        power.api.rate_limiter = limiter
+
+        async def fetch():
+            return [data async for _, data in power.fetch_many(requests, dedupe=False)]
+
+        try:
+            with self.stage('power_fetch_async', 'requests') as result:
+                results = asyncio.run(fetch())
+                result['items'] = len(results)
+                result['errors'] = sum(data is None for data in results)
+        finally:
+            power.close()
+
+    def bench_features(self, responses):
+        """Expansion, labels and derived features over every fetched month"""
+        api = NASAPowerAPI(use_cache=False)
+        climatology = load_climatology()
+
+        frames = {}
+        with self.stage('expand_30min', 'rows') as result:
+            for (name, month), data in responses.items():
+                coords = NASAPowerAPI.BANGLADESH_LOCATIONS[name]
+                month_df = HybridLightningDatasetExtractor.month_features(
+                    api, data, name, coords['lat'], coords['lon'], month)
+                if month_df is None:
+                    result['errors'] += 1
+                    continue
+                frames.setdefault(name, []).append(month_df)
+                result['items'] += len(month_df)
+
+        frames = {name: pd.concat(parts, ignore_index=True) for name, parts in frames.items()}
+
+        with self.stage('lightning_labels', 'rows') as result:
+            for name, df in frames.items():
+                labels = label_lightning(df, seed=self.config['seed'], climatology=climatology)
+                frames[name] = pd.concat([df, labels], axis=1)
+                result['items'] += len(df)
+
+        with self.stage('derived_features', 'rows') as result:
+            for name, df in frames.items():
+                frames[name] = HybridLightningDatasetExtractor.add_derived_features(df)
+                result['items'] += len(df)
+
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames.values(), ignore_index=True)
+
+    def bench_writes(self, df, scratch):
+        """CSV per location and partitioned Parquet"""
+        with self.stage('write_csv', 'rows') as result:
+            for name, part in df.groupby('Location', sort=False):
+                path = scratch / f"{name}.csv"
+                part.to_csv(path, index=False)
+                result['items'] += len(part)
+                result['bytes'] += path.stat().st_size
+
+        if not PYARROW_AVAILABLE:
+            self.skip('write_parquet', 'rows', 'pyarrow not installed')
+            return
+
+        with self.stage('write_parquet', 'rows') as result:
+            store = DatasetStore(scratch / 'store', dtypes=LIGHTNING_DATASET_DTYPES)
+            for path in store.write(df):
+                result['bytes'] += path.stat().st_size
+            result['items'] = len(df)
+
+    def bench_thumbnails(self, server, limiter, scratch):
+        """Thumbnail downloads through the ThumbnailPipeline worker pool"""
+        if not THUMBNAILS_AVAILABLE:
+            self.skip('thumbnails', 'images', 'earthengine-api not installed')
+            return
+
+        thumb_dir = scratch / 'thumbnails'
+        thumb_dir.mkdir()
+        pipeline = ThumbnailPipeline(cache=None, max_workers=self.config['concurrency'])
+        pipeline.rate_limiter = limiter
+
+        with self.stage('thumbnails', 'images') as result:
+            for i in range(self.config['thumbnails']):
+                submitted = time.perf_counter()
+
+                def finish(status_code, submitted=submitted):
+                    result['latencies'].append(time.perf_counter() - submitted)
+                    result['errors'] += status_code != 200
+
+                pipeline.submit({'image_id': f"benchmark_{i}"}, thumb_dir / f"{i:04d}.png",
+                                on_done=finish, url=f"{server.url}/thumbnails/{i:04d}.png")
+                result['items'] += 1
+            pipeline.close()
+            result['bytes'] = pipeline.stats['bytes']
+
+    def bench_openweather(self, server, limiter, scratch):
+        """SimpleRadarExtractor current-weather and radar tile calls"""
+        with contextlib.redirect_stdout(io.StringIO()):
+            radar = SimpleRadarExtractor(api_key='benchmark')
+        radar.WEATHER_URL = f"{server.url}/openweather/weather"
+        radar.TILE_URL = f"{server.url}/openweather/tiles"
+        radar.rate_limiter = limiter
+        radar.radar_dir = scratch / 'radar'
+        radar.radar_dir.mkdir()
+
+        coords = NASAPowerAPI.BANGLADESH_LOCATIONS['Dhaka']
+        with self.stage('openweather', 'requests') as result:
+            for i in range(self.config['openweather_calls']):
+                date_str, time_str = '2023-06-01', f"{i // 2:02d}:{30 * (i % 2):02d}"
+                for call in (radar.get_weather_visualization, radar.get_radar_image):
+                    start = time.perf_counter()
+                    outcome = call(coords['lat'], coords['lon'], date_str, time_str)
+                    result['latencies'].append(time.perf_counter() - start)
+                    result['items'] += 1
+                    result['errors'] += outcome['status'] != 'success'
+
+    @staticmethod
+    def environment():
+        """Interpreter, library versions and machine, for comparing reports"""
+        try:
+            import pyarrow
+            pyarrow_version = pyarrow.__version__
+        except ImportError:
+            pyarrow_version = None
+
+        return {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'pyarrow': pyarrow_version,
+        }
+
+
+def save_report(report, path):
+    """Write a report as JSON"""
+    path = Path(path)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    return path
+
+
+def load_report(path):
+    """Read a report written by save_report"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def compare_reports(report, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Stages that got slower than a baseline report
+
+    Parameters:
+    -----------
+    report, baseline : dict
+        Reports from BenchmarkSuite.run (or load_report)
+    tolerance : float
+        Allowed relative throughput drop / p95 latency increase
+
+    Returns:
+    --------
+    list of dict : stage, metric, baseline, current and relative change per regression
+    """
+    regressions = []
+    for name, stage in report['stages'].items():
+        before = baseline.get('stages', {}).get(name)
+        if stage.get('status') != 'ok' or not before or before.get('status') != 'ok':
+            continue
+
+        checks = [('throughput_per_s', stage.get('throughput_per_s'),
+                   before.get('throughput_per_s'), -1)]
+        if stage.get('latency_ms') and before.get('latency_ms'):
+            checks.append(('latency_p95_ms', stage['latency_ms']['p95'],
+                           before['latency_ms']['p95'], 1))
+
+        for metric, current, previous, direction in checks:
+            if not current or not previous:
+                continue
+            change = (current - previous) / previous
+            if change * direction > tolerance:
+                regressions.append({'stage': name, 'metric': metric, 'baseline': previous,
+                                    'current': current, 'change': round(change, 3)})
+    return regressions
+
+
+def main():
+    """Run the benchmark; compare against a baseline report if one is given"""
+    report = BenchmarkSuite().run()
+    path = save_report(report, Path(__file__).parent / 'benchmark_report.json')
+
+    print()
+    print(f"💾 Report: {path} ({report['total_seconds']:.1f}s total)")
+    print(f"🌐 Server: {report['server']['requests']} requests, "
+          f"{report['server']['errors_injected']} injected errors, "
+          f"{report['server']['recorded']} recorded / {report['server']['synthetic']} synthetic replies")
+
+    if len(sys.argv) > 1:
+        regressions = compare_reports(report, load_report(sys.argv[1]))
+        print()
+        if not regressions:
+            print(f"✅ No regressions against {sys.argv[1]}")
+            return
+
+        print(f"❌ {len(regressions)} regression(s) against {sys.argv[1]}:")
+        for item in regressions:
+            print(f"   {item['stage']:<18} {item['metric']:<16} "
+                  f"{item['baseline']:>10} -> {item['current']:>10} ({item['change']:+.0%})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Satellite Chip Store
+Raw Landsat band arrays on disk, memory-mappable for training
+
+PNG thumbnails are an 8-bit RGB stretch: the model has to decode them and
+the physical reflectance is gone. Chips keep every band as numbers. Each
+chip is a (bands, height, width) array pulled with Earth Engine's
+computePixels (ee_helpers.landsat_chip). Chips are packed into fixed-size
+.npy chunk files:
+
+    satellite_chips/chunk-00000.npy   (chunk_size, bands, height, width)
+    satellite_chips/index.json        (location, scene date) -> chunk, slot, metadata
+
+    store = ChipStore('satellite_chips')
+    store.put('Dhaka', scene, ee_helpers.landsat_chip(scene))
+    chip = store.get('Dhaka', '2023-08-14')               # memmap view, no decoding
+    reflectance = store.get('Dhaka', '2023-08-14', scaled=True)
+    catalog = store.catalog()                             # DataFrame: chunk, slot, ...
+
+Chips are stored as uint16 Collection 2 digital numbers by default (the
+native Landsat type, half the size of float32). Values are converted to
+reflectance / kelvin on read. With dtype='float16' the scaled values are
+stored instead. A digital number of 0 is Landsat's fill value (no data).
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# Collection 2 Level 2 scale factors: physical value = DN * scale + offset
+BAND_SCALE_FACTORS = {
+    'SR': (0.0000275, -0.2),     # surface reflectance (unitless)
+    'ST': (0.00341802, 149.0),   # surface temperature (kelvin)
+}
+
+# Chips per chunk file
+CHUNK_SIZE = 64
+
+
+def band_scale(band):
+    """(scale, offset) for a Landsat Collection 2 Level 2 band name"""
+    return BAND_SCALE_FACTORS[band.split('_')[0]]
+
+
+def scale_chip(chip, bands):
+    """
+    Convert a chip of digital numbers to physical values
+
+    Parameters:
+    -----------
+    chip : np.ndarray
+        (bands, height, width) uint16 digital numbers
+    bands : list of str
+        Band name per layer (e.g., ['SR_B4', 'SR_B3', 'SR_B2', 'ST_B10'])
+
+    Returns:
+    --------
+    np.ndarray : float32 reflectance / kelvin; fill pixels (DN 0) are NaN
+    """
+    scale = np.array([band_scale(band)[0] for band in bands], dtype=np.float32)[:, None, None]
+    offset = np.array([band_scale(band)[1] for band in bands], dtype=np.float32)[:, None, None]
+
+    values = chip.astype(np.float32) * scale + offset
+    values[chip == 0] = np.nan
+    return values
+
+
+class ChipStore:
+    """
+    Chunked, memory-mapped store of satellite band chips keyed by (location, scene date)
+    """
+
+    def __init__(self, path, bands=None, chip_size=None, dtype='uint16', chunk_size=CHUNK_SIZE):
+        """
+        Open (or create) a chip store
+
+        Parameters:
+        -----------
+        path : str or Path
+            Store directory
+        bands : list of str
+            Band order of every chip (required for a new store)
+        chip_size : int
+            Chip height and width in pixels (required for a new store)
+        dtype : str
+            'uint16' (digital numbers) or 'float16' (scaled values)
+        chunk_size : int
+            Chips per chunk file
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.path / 'index.json'
+        self._lock = threading.Lock()
+
+        if self.index_file.exists():
+            with open(self.index_file, 'r') as f:
+                self.index = json.load(f)
+        else:
+            if bands is None or chip_size is None:
+                raise ValueError("A new chip store needs bands and chip_size")
+            if dtype not in ('uint16', 'float16'):
+                raise ValueError(f"Unsupported chip dtype: {dtype}")
+            self.index = {
+                'bands': list(bands),
+                'chip_size': int(chip_size),
+                'dtype': dtype,
+                'chunk_size': int(chunk_size),
+                'count': 0,
+                'chips': {},
+            }
+            self._save_index()
+
+        self.bands = self.index['bands']
+        self.chip_size = self.index['chip_size']
+        self.dtype = self.index['dtype']
+        self.chunk_size = self.index['chunk_size']
+
+    def __len__(self):
+        return self.index['count']
+
+    @staticmethod
+    def _key(location_name, image_date):
+        return f"{location_name}|{image_date}"
+
+    def _chunk_file(self, chunk):
+        return self.path / f"chunk-{chunk:05d}.npy"
+
+    def _save_index(self):
+        """Write the index atomically (caller holds the lock)"""
+        tmp_path = self.index_file.with_name(
+            f"{self.index_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp_path, self.index_file)
+
+    def contains(self, location_name, image_date):
+        """True if a chip for this location and scene date is stored"""
+        return self._key(location_name, image_date) in self.index['chips']
+
+    def entry(self, location_name, image_date):
+        """
+        Index entry of a stored chip
+
+        Returns:
+        --------
+        dict : 'chunk', 'slot' and scene metadata, or None if not stored
+        """
+        return self.index['chips'].get(self._key(location_name, image_date))
+
+    def put(self, location_name, scene, chip, date=None):
+        """
+        Store a chip (a chip already stored for the same scene date is kept)
+
+        Parameters:
+        -----------
+        location_name : str
+            Location the chip is centred on
+        scene : dict
+            Scene from ee_helpers.find_best_scenes (image_date, image_id, ...)
+        chip : np.ndarray
+            (bands, chip_size, chip_size) uint16 digital numbers
+        date : str
+            Requested target date, recorded alongside the scene date
+
+        Returns:
+        --------
+        dict : Index entry with 'chunk' and 'slot'
+        """
+        expected = (len(self.bands), self.chip_size, self.chip_size)
+        if chip.shape != expected:
+            raise ValueError(f"Chip shape {chip.shape} does not match store {expected}")
+
+        key = self._key(location_name, scene['image_date'])
+
+        with self._lock:
+            if key in self.index['chips']:
+                return self.index['chips'][key]
+
+            chunk, slot = divmod(self.index['count'], self.chunk_size)
+            chunk_file = self._chunk_file(chunk)
+
+            # Chunk files are preallocated and filled slot by slot
+            if slot == 0 or not chunk_file.exists():
+                chunks = np.lib.format.open_memmap(
+                    chunk_file, mode='w+', dtype=self.dtype,
+                    shape=(self.chunk_size,) + expected)
+            else:
+                chunks = np.load(chunk_file, mmap_mode='r+')
+
+            chunks[slot] = scale_chip(chip, self.bands) if self.dtype == 'float16' else chip
+            chunks.flush()
+            del chunks
+
+            entry = {'chunk': chunk, 'slot': slot, 'location': location_name,
+                     'image_date': scene['image_date'], 'date': date}
+            for field in ('image_id', 'scene_id', 'cloud_cover'):
+                if field in scene:
+                    entry[field] = scene[field]
+
+            self.index['chips'][key] = entry
+            self.index['count'] += 1
+            self._save_index()
+
+        return entry
+
+    def chunk(self, chunk):
+        """Memory-mapped chunk array (chunk_size, bands, height, width), read-only"""
+        return np.load(self._chunk_file(chunk), mmap_mode='r')
+
+    def get(self, location_name, image_date, scaled=False):
+        """
+        Chip for a location and scene date
+
+        Parameters:
+        -----------
+        scaled : bool
+            Return float32 reflectance / kelvin instead of the stored values
+
+        Returns:
+        --------
+        np.ndarray : (bands, height, width) memmap view, or None if not stored
+        """
+        entry = self.entry(location_name, image_date)
+        if entry is None:
+            return None
+
+        chip = self.chunk(entry['chunk'])[entry['slot']]
+        if scaled and self.dtype == 'uint16':
+            return scale_chip(chip, self.bands)
+        return chip
+
+    def catalog(self):
+        """
+        One row per stored chip (location, image_date, date, chunk, slot, scene metadata)
+
+        Returns:
+        --------
+        pd.DataFrame : Catalog sorted by chunk and slot
+        """
+        catalog = pd.DataFrame(list(self.index['chips'].values()))
+        if catalog.empty:
+            return catalog
+        return catalog.sort_values(['chunk', 'slot']).reset_index(drop=True)
+
+    def size_mb(self):
+        """Size of the chunk files on disk"""
+        return sum(path.stat().st_size for path in self.path.glob('chunk-*.npy')) / (1024 * 1024)
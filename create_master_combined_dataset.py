@@ -0,0 +1,403 @@
+"""
+Master Combined Dataset
+Streaming, out-of-core merge of every data modality into one master table
+
+Sources (all optional - whatever exists on disk is merged):
+- weather_data_5years/            NASA POWER weather (hourly files resampled to 30-min)
+- lightning_prediction_dataset/   Hybrid weather + lightning labels (store or CSVs)
+- lightning_data/lightning_data_30min.csv   LIS/OTD climatology labels
+- radar metadata CSVs             OpenWeatherMap radar/weather snapshots
+- satellite metadata CSVs         Landsat/GEE image metadata (one row per day)
+
+Join key: (Location, DateTime) at 30-minute resolution; daily sources
+(satellite images) are attached on (Location, Date).
+
+Memory stays bounded by one location-year:
+1. Spill - every source is read chunk by chunk and appended to bucket files
+   keyed by (Location, Year)
+2. Merge - buckets are joined one (Location, Year) at a time and appended to
+   the output, so 64 districts × 6 years never have to fit in RAM together
+"""
+
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from dataset_store import DatasetStore, LIGHTNING_DATASET_DTYPES
+from power_resample import load_resampled_csv
+
+
+# Data sources, relative to the project directory
+#   prefix: added to every value column from the source
+#   kind: 'interval' (joined on DateTime) or 'daily' (joined on Date)
+#   default_location: used when the source has no location column
+SOURCES = [
+    {
+        'name': 'weather',
+        'prefix': 'Weather_',
+        'kind': 'interval',
+        'paths': ['weather_data_5years/*_hourly.csv', 'weather_data_5years/*_30min.csv'],
+    },
+    {
+        'name': 'hybrid',
+        'prefix': 'Hybrid_',
+        'kind': 'interval',
+        'store': 'lightning_prediction_dataset/store',
+        'paths': ['lightning_prediction_dataset/*_lightning_dataset.csv'],
+    },
+    {
+        'name': 'lightning_climatology',
+        'prefix': 'Climatology_',
+        'kind': 'interval',
+        'paths': ['lightning_data/lightning_data_30min.csv'],
+    },
+    {
+        'name': 'radar',
+        'prefix': 'Radar_',
+        'kind': 'interval',
+        'paths': ['radar_images_dhaka/radar_metadata.csv',
+                  'weather_data_multimodal/radar_metadata.csv'],
+        'default_location': 'Dhaka',
+    },
+    {
+        'name': 'satellite',
+        'prefix': 'Satellite_',
+        'kind': 'daily',
+        'paths': ['weather_data*/satellite*metadata.csv'],
+    },
+]
+
+KEY_COLUMNS = ['Location', 'DateTime', 'Date', 'Time', 'Latitude', 'Longitude']
+
+# Raw column names recognised as keys (any capitalisation used in this project)
+LOCATION_NAMES = ('Location', 'location', 'District')
+DATETIME_NAMES = ('DateTime', 'datetime', 'timestamp')
+DATE_NAMES = ('Date', 'date')
+TIME_NAMES = ('Time', 'time')
+LATITUDE_NAMES = ('Latitude', 'latitude')
+LONGITUDE_NAMES = ('Longitude', 'longitude')
+
+
+def _first_present(columns, names):
+    """First of `names` found in `columns`, or None"""
+    for name in names:
+        if name in columns:
+            return name
+    return None
+
+
+class MasterDatasetBuilder:
+    """
+    Builds the master table by spilling sources to (Location, Year) buckets
+    and merging one bucket at a time
+    """
+
+    def __init__(self, base_dir=None, output_file=None, chunksize=100_000,
+                 interval='30min', sources=None):
+        """
+        Initialize the builder
+
+        Parameters:
+        -----------
+        base_dir : str or Path
+            Project directory the source paths are relative to
+        output_file : str or Path
+            Master CSV (default: master_combined_dataset.csv in base_dir)
+        chunksize : int
+            Rows read per chunk from each source CSV
+        interval : str
+            Join resolution; timestamps are floored to it
+        sources : list
+            Source definitions (default: SOURCES)
+        """
+        self.base_dir = Path(base_dir) if base_dir else Path(__file__).parent
+        self.output_file = Path(output_file) if output_file else \
+            self.base_dir / 'master_combined_dataset.csv'
+        self.chunksize = chunksize
+        self.interval = interval
+        self.sources = sources if sources is not None else SOURCES
+
+        self.work_dir = None
+        self.source_columns = {}   # source name -> ordered value columns
+        self.stats = {}            # source name -> rows spilled
+
+    # ------------------------------------------------------------------
+    # Reading sources
+    # ------------------------------------------------------------------
+
+    def _source_files(self, source):
+        files = []
+        for pattern in source.get('paths', []):
+            files.extend(sorted(self.base_dir.glob(pattern)))
+        return files
+
+    def _iter_chunks(self, source):
+        """Yield raw DataFrame chunks for a source, one file (part) at a time"""
+        store_dir = source.get('store')
+        if store_dir and (self.base_dir / store_dir).exists():
+            store = DatasetStore(self.base_dir / store_dir, dtypes=LIGHTNING_DATASET_DTYPES)
+            partitions = store.partitions()
+            if not partitions.empty:
+                for part in partitions.itertuples():
+                    yield str(part.File), store.read(location=part.Location, year=int(part.Year))
+                return
+
+        for path in self._source_files(source):
+            if path.name.endswith('_hourly.csv'):
+                # One location-year of hourly data, resampled to the join resolution
+                yield str(path), load_resampled_csv(path, freq=self.interval)
+                continue
+
+            for chunk in pd.read_csv(path, chunksize=self.chunksize, low_memory=False):
+                yield str(path), chunk
+
+    def _normalize(self, chunk, source):
+        """
+        Map a raw chunk onto the join keys
+
+        Returns:
+        --------
+        pd.DataFrame : Location, Year, DateTime or Date, Latitude/Longitude
+                       (when present) and prefixed value columns
+        """
+        columns = chunk.columns
+        out = pd.DataFrame(index=chunk.index)
+
+        location_col = _first_present(columns, LOCATION_NAMES)
+        if location_col is not None:
+            out['Location'] = chunk[location_col].astype(str)
+        else:
+            out['Location'] = source.get('default_location', 'Unknown')
+
+        datetime_col = _first_present(columns, DATETIME_NAMES)
+        date_col = _first_present(columns, DATE_NAMES)
+        time_col = _first_present(columns, TIME_NAMES)
+        used = {location_col, datetime_col, date_col, time_col, 'Year'}
+
+        if source['kind'] == 'daily':
+            if date_col is None:
+                return None
+            dates = pd.to_datetime(chunk[date_col].astype(str), errors='coerce')
+            out['Date'] = dates.dt.strftime('%Y-%m-%d')
+            out['Year'] = dates.dt.year
+        else:
+            if datetime_col is not None:
+                stamps = chunk[datetime_col].astype(str)
+            elif date_col is not None and time_col is not None:
+                stamps = chunk[date_col].astype(str) + ' ' + chunk[time_col].astype(str)
+            else:
+                return None
+            stamps = pd.to_datetime(stamps, errors='coerce').dt.floor(self.interval)
+            out['DateTime'] = stamps.dt.strftime('%Y-%m-%d %H:%M')
+            out['Year'] = stamps.dt.year
+
+        for coord, names in (('Latitude', LATITUDE_NAMES), ('Longitude', LONGITUDE_NAMES)):
+            name = _first_present(columns, names)
+            if name is not None:
+                out[coord] = pd.to_numeric(chunk[name], errors='coerce')
+                used.add(name)
+
+        for column in columns:
+            if column not in used:
+                out[source['prefix'] + str(column)] = chunk[column].to_numpy()
+
+        return out.dropna(subset=['Year'])
+
+    # ------------------------------------------------------------------
+    # Phase 1: spill to (Location, Year) buckets
+    # ------------------------------------------------------------------
+
+    def _bucket_dir(self, source_name, location, year):
+        safe_location = str(location).replace('/', '_').replace('\\', '_')
+        return self.work_dir / source_name / safe_location / str(int(year))
+
+    def spill(self):
+        """Stream every source into per-(Location, Year) bucket files"""
+        for source in self.sources:
+            name = source['name']
+            rows = 0
+            columns = self.source_columns.setdefault(name, [])
+
+            # Each input file gets its own part file so column sets never mix
+            part_ids = {}
+            for path, chunk in self._iter_chunks(source):
+                normalized = self._normalize(chunk, source)
+                if normalized is None or normalized.empty:
+                    continue
+
+                part_id = part_ids.setdefault(path, len(part_ids))
+                for column in normalized.columns:
+                    if column.startswith(source['prefix']) and column not in columns:
+                        columns.append(column)
+
+                for (location, year), bucket in normalized.groupby(['Location', 'Year'], sort=False):
+                    bucket_dir = self._bucket_dir(name, location, year)
+                    bucket_dir.mkdir(parents=True, exist_ok=True)
+                    part_file = bucket_dir / f"part-{part_id}.csv"
+                    bucket.drop(columns='Year').to_csv(
+                        part_file, mode='a', index=False, header=not part_file.exists()
+                    )
+                rows += len(normalized)
+
+            self.stats[name] = rows
+            print(f"   📥 {name}: {rows:,} rows from {len(part_ids)} file(s)")
+
+    def _buckets(self):
+        """Sorted (Location, Year) pairs that have interval data"""
+        keys = set()
+        for source in self.sources:
+            if source['kind'] != 'interval':
+                continue
+            source_dir = self.work_dir / source['name']
+            for year_dir in source_dir.glob('*/*'):
+                keys.add((year_dir.parent.name, int(year_dir.name)))
+        return sorted(keys)
+
+    def _read_bucket(self, source, location, year):
+        bucket_dir = self._bucket_dir(source['name'], location, year)
+        parts = sorted(bucket_dir.glob('part-*.csv'))
+        if not parts:
+            return None
+        return pd.concat((pd.read_csv(part, low_memory=False) for part in parts),
+                         ignore_index=True)
+
+    # ------------------------------------------------------------------
+    # Phase 2: merge bucket by bucket
+    # ------------------------------------------------------------------
+
+    def output_columns(self):
+        """Column order of the master table"""
+        columns = list(KEY_COLUMNS)
+        for source in self.sources:
+            columns.extend(self.source_columns.get(source['name'], []))
+        return columns
+
+    def merge_bucket(self, location, year):
+        """
+        Join every source for one (Location, Year)
+
+        Returns:
+        --------
+        pd.DataFrame : Master rows for the bucket, or None if it has no interval data
+        """
+        merged = None
+        latitude = []
+        longitude = []
+
+        for source in self.sources:
+            if source['kind'] != 'interval':
+                continue
+            df = self._read_bucket(source, location, year)
+            if df is None:
+                continue
+
+            df = df.drop_duplicates(subset='DateTime', keep='last').set_index('DateTime')
+            if 'Latitude' in df:
+                latitude.append(df.pop('Latitude'))
+            if 'Longitude' in df:
+                longitude.append(df.pop('Longitude'))
+            df = df.drop(columns='Location')
+
+            merged = df if merged is None else merged.join(df, how='outer')
+
+        if merged is None:
+            return None
+
+        merged = merged.sort_index()
+        merged.index.name = 'DateTime'
+        merged = merged.reset_index()
+        merged['Location'] = location
+        merged['Date'] = merged['DateTime'].str[:10]
+        merged['Time'] = merged['DateTime'].str[11:16]
+
+        # Coordinates: first source that has them for a timestamp
+        for name, series_list in (('Latitude', latitude), ('Longitude', longitude)):
+            if series_list:
+                aligned = pd.concat(series_list, axis=1).bfill(axis=1).iloc[:, 0]
+                merged[name] = aligned.reindex(merged['DateTime']).to_numpy()
+
+        for source in self.sources:
+            if source['kind'] != 'daily':
+                continue
+            daily = self._read_bucket(source, location, year)
+            if daily is None:
+                continue
+
+            # Prefer successful entries when a day has several rows
+            status = source['prefix'] + 'status'
+            if status in daily:
+                daily = daily.assign(_ok=(daily[status] == 'success')).sort_values(
+                    '_ok', kind='stable').drop(columns='_ok')
+            daily = daily.drop_duplicates(subset='Date', keep='last')
+            daily = daily.drop(columns=[c for c in ('Location', 'Latitude', 'Longitude')
+                                        if c in daily])
+            merged = merged.merge(daily, on='Date', how='left')
+
+        return merged.reindex(columns=self.output_columns())
+
+    def build(self, keep_work_dir=False):
+        """
+        Build the master table
+
+        Returns:
+        --------
+        dict : Rows written, buckets merged and output path
+        """
+        print("\n" + "=" * 80)
+        print("📦 MASTER COMBINED DATASET (streaming merge)")
+        print("=" * 80)
+
+        start_time = time.time()
+        self.work_dir = Path(tempfile.mkdtemp(prefix='master_merge_', dir=self.base_dir))
+
+        try:
+            print("\n🔄 Phase 1: spilling sources to (Location, Year) buckets...")
+            self.spill()
+
+            buckets = self._buckets()
+            print(f"\n🔗 Phase 2: merging {len(buckets)} buckets...")
+
+            tmp_output = self.output_file.with_name(self.output_file.name + '.tmp')
+            if tmp_output.exists():
+                tmp_output.unlink()
+
+            total_rows = 0
+            for location, year in buckets:
+                merged = self.merge_bucket(location, year)
+                if merged is None or merged.empty:
+                    continue
+                merged.to_csv(tmp_output, mode='a', index=False, header=(total_rows == 0))
+                total_rows += len(merged)
+                print(f"   ✅ {location} {year}: {len(merged):,} rows")
+
+            if total_rows:
+                tmp_output.replace(self.output_file)
+        finally:
+            if not keep_work_dir:
+                shutil.rmtree(self.work_dir, ignore_errors=True)
+
+        elapsed = time.time() - start_time
+        print(f"\n✅ Master dataset: {self.output_file}")
+        print(f"   Rows: {total_rows:,}")
+        print(f"   Columns: {len(self.output_columns())}")
+        print(f"   Time: {elapsed:.1f} seconds")
+
+        return {
+            'rows': total_rows,
+            'buckets': len(buckets),
+            'output_file': self.output_file,
+            'source_rows': dict(self.stats),
+        }
+
+
+def main():
+    """Main execution"""
+    builder = MasterDatasetBuilder()
+    builder.build()
+
+
+if __name__ == "__main__":
+    main()
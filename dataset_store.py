@@ -0,0 +1,271 @@
+"""
+Partitioned Dataset Store
+One typed copy of a dataset on disk, partitioned by location and year
+
+Rows are written once as Parquet under hive-style partitions:
+
+    lightning_prediction_dataset/store/Location=Dhaka/Year=2024/part-0.parquet
+
+"Combined" and "by location" views are lazy reads of the same files, with
+column pruning and partition filtering, instead of extra copies on disk:
+
+    store = DatasetStore(output_dir / 'store', dtypes=LIGHTNING_DATASET_DTYPES)
+    store.write(df)
+    train = store.read(columns=['Temperature_C', 'Humidity_%', 'Lightning_Occurred'])
+    dhaka = store.read(location='Dhaka')
+
+Parquet needs pyarrow (pip install pyarrow). Without it the store falls back
+to one CSV per partition in the same layout.
+"""
+
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+from metrics import get_metrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+# Column types for the hybrid lightning prediction dataset
+LIGHTNING_DATASET_DTYPES = {
+    # Weather features
+    'Temperature_C': 'float32',
+    'Humidity_%': 'float32',
+    'Wind_Speed_m/s': 'float32',
+    'Precipitation_mm': 'float32',
+    'Pressure_kPa': 'float32',
+
+    # Time features
+    'Date': 'category',
+    'Time': 'category',
+    'Month': 'int8',
+    'Hour': 'int8',
+    'Minute': 'int8',
+    'Season': 'category',
+    'Time_Category': 'category',
+    'Month_Sin': 'float32',
+    'Month_Cos': 'float32',
+    'Hour_Sin': 'float32',
+    'Hour_Cos': 'float32',
+
+    # Derived features
+    'Temp_Deviation': 'float32',
+    'Has_Precipitation': 'int8',
+    'High_Humidity': 'int8',
+    'Strong_Wind': 'int8',
+    'Grid_Cell': 'category',
+
+    # Lightning labels
+    'Lightning_Occurred': 'int8',
+    'Lightning_Probability': 'float32',
+    'Flash_Count': 'int16',
+    'Flash_Density_per_km2': 'float32',
+    'Expected_Flashes': 'float32',
+    'Base_Flash_Rate': 'float32',
+    'Time_Factor': 'float32',
+    'Weather_Factor': 'float32',
+}
+
+
+class DatasetStore:
+    """
+    Location/year partitioned dataset with typed columns and lazy reads
+    """
+
+    PARTITION_COLUMNS = ('Location', 'Year')
+
+    def __init__(self, root, dtypes=None, file_format=None):
+        """
+        Initialize the store
+
+        Parameters:
+        -----------
+        root : str or Path
+            Directory holding the partitions
+        dtypes : dict
+            Column -> dtype applied before writing and after reading
+        file_format : str
+            'parquet' (default when pyarrow is installed) or 'csv'
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.dtypes = dict(dtypes or {})
+
+        if file_format is None:
+            file_format = 'parquet' if PYARROW_AVAILABLE else 'csv'
+        if file_format == 'parquet' and not PYARROW_AVAILABLE:
+            raise ImportError("Parquet storage requires pyarrow: pip install pyarrow")
+        self.file_format = file_format
+
+    def apply_dtypes(self, df):
+        """Cast known columns to their storage types (in place, returns df)"""
+        for column, dtype in self.dtypes.items():
+            if column not in df.columns:
+                continue
+            if dtype.startswith('int') and df[column].isna().any():
+                # Integer flags with gaps keep a nullable integer type
+                dtype = dtype.capitalize()
+            df[column] = df[column].astype(dtype)
+        return df
+
+    def _partition_dir(self, location, year):
+        return self.root / f"Location={location}" / f"Year={int(year)}"
+
+    def write(self, df):
+        """
+        Write rows, replacing the partitions they belong to
+
+        Parameters:
+        -----------
+        df : pd.DataFrame
+            Rows with a 'Location' column and either a 'Year' column or a
+            'Date'/'DateTime' string column to derive it from
+
+        Returns:
+        --------
+        list of Path : Partition files written
+        """
+        df = df.copy()
+        if 'Year' not in df.columns:
+            source = 'Date' if 'Date' in df.columns else 'DateTime'
+            df['Year'] = df[source].astype(str).str[:4].astype(int)
+        self.apply_dtypes(df)
+
+        written = []
+        with get_metrics().stage('write') as stage:
+            for (location, year), part in df.groupby(list(self.PARTITION_COLUMNS),
+                                                     observed=True, sort=False):
+                part_dir = self._partition_dir(location, year)
+                part_dir.mkdir(parents=True, exist_ok=True)
+
+                part = part.drop(columns=list(self.PARTITION_COLUMNS))
+                path = part_dir / f"part-0.{self.file_format}"
+                # Dot-prefixed, so dataset scans and partitions() skip it
+                tmp_path = part_dir / f".{path.name}.{os.getpid()}.tmp"
+
+                # Write to a temp file and swap it in, so readers see either the
+                # old or the new partition, never a missing or partial one
+                if self.file_format == 'parquet':
+                    table = pa.Table.from_pandas(part, preserve_index=False)
+
+                    # Category codes are int8 or int16 depending on the number of
+                    # categories; fix the index width so partitions share one schema
+                    table = table.cast(pa.schema([
+                        field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+                        if pa.types.is_dictionary(field.type) else field
+                        for field in table.schema
+                    ], metadata=table.schema.metadata))
+                    pq.write_table(table, tmp_path, compression='zstd')
+                else:
+                    part.to_csv(tmp_path, index=False)
+                os.replace(tmp_path, path)
+
+                # Only then drop files the new partition replaces (e.g. other formats)
+                for old in part_dir.iterdir():
+                    if old != path and not old.name.startswith('.'):
+                        if old.is_dir():
+                            shutil.rmtree(old)
+                        else:
+                            old.unlink()
+                written.append(path)
+
+            stage.rows = len(df)
+
+        return written
+
+    def partitions(self):
+        """
+        List stored partitions
+
+        Returns:
+        --------
+        pd.DataFrame : Location, Year, File and Size_MB per partition
+        """
+        rows = []
+        for path in sorted(self.root.glob(f"Location=*/Year=*/part-*.{self.file_format}")):
+            rows.append({
+                'Location': path.parent.parent.name.split('=', 1)[1],
+                'Year': int(path.parent.name.split('=', 1)[1]),
+                'File': path,
+                'Size_MB': path.stat().st_size / (1024 * 1024),
+            })
+        return pd.DataFrame(rows, columns=['Location', 'Year', 'File', 'Size_MB'])
+
+    def size_mb(self):
+        """Total size of the store on disk"""
+        return float(self.partitions()['Size_MB'].sum())
+
+    def dataset(self):
+        """
+        Lazy pyarrow dataset over every partition (Parquet stores only)
+
+        Useful for streaming record batches into a training loop.
+        """
+        if self.file_format != 'parquet':
+            raise ValueError("dataset() is only available for Parquet stores")
+        return ds.dataset(self.root, format='parquet', partitioning='hive')
+
+    def read(self, columns=None, location=None, year=None):
+        """
+        Read a view of the store
+
+        Only the requested columns and matching partitions are read.
+
+        Parameters:
+        -----------
+        columns : list
+            Columns to load (default: all)
+        location : str or list
+            Restrict to one or more locations
+        year : int or list
+            Restrict to one or more years
+
+        Returns:
+        --------
+        pd.DataFrame : Rows with 'Location' and 'Year' columns, typed per `dtypes`
+        """
+        locations = [location] if isinstance(location, str) else location
+        years = [year] if isinstance(year, int) else year
+
+        if self.file_format == 'parquet':
+            if not any(self.root.glob('Location=*')):
+                return pd.DataFrame(columns=columns)
+
+            dataset = self.dataset()
+            condition = None
+            if locations is not None:
+                condition = ds.field('Location').isin(locations)
+            if years is not None:
+                year_condition = ds.field('Year').isin(years)
+                condition = year_condition if condition is None else condition & year_condition
+
+            df = dataset.to_table(columns=columns, filter=condition).to_pandas()
+        else:
+            parts = self.partitions()
+            if locations is not None:
+                parts = parts[parts['Location'].isin(locations)]
+            if years is not None:
+                parts = parts[parts['Year'].isin(years)]
+
+            frames = []
+            for part in parts.itertuples():
+                wanted = None if columns is None else [
+                    c for c in columns if c not in self.PARTITION_COLUMNS]
+                frame = pd.read_csv(part.File, usecols=wanted)
+                if columns is None or 'Location' in columns:
+                    frame['Location'] = part.Location
+                if columns is None or 'Year' in columns:
+                    frame['Year'] = part.Year
+                frames.append(frame)
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+        return self.apply_dtypes(df)
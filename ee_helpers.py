@@ -0,0 +1,478 @@
+"""
+Earth Engine Helpers
+Batched Landsat 8 scene selection and RGB thumbnails for the GEE extractors
+
+Picking the least-cloudy scene for a (location, date) used to take four or
+five synchronous getInfo() calls (image count, date, cloud cover, scene ID,
+region). find_best_scenes() evaluates the same search for a whole list of
+targets server-side and pulls every result in one getInfo() per batch:
+
+    targets = scene_targets(locations, dates)
+    scenes = find_best_scenes(targets, cloud_cover_max=70)
+    scene = scenes[('Dhaka', '2023-08-15')]
+    url = landsat_thumb_url(scene)
+
+save_thumbnail() downloads a scene's thumbnail through a ThumbnailCache, so a
+scene picked for several target dates is only requested once. landsat_chip()
+pulls the raw band values instead (computePixels), for the ChipStore.
+
+For many locations at once, composite_image() builds one cloud-masked
+composite over a time window for all of them; composite_chips() cuts a chip
+per location from it and export_composite() starts a single Drive export:
+
+    image = composite_image(locations, '2023-08-07', '2023-08-23')
+    chips = composite_chips(image, locations)     # location -> (bands, 512, 512)
+
+Earth Engine must be initialized (ee.Initialize) before these are called.
+"""
+
+import os
+import threading
+import time
+
+import ee
+import numpy as np
+
+from metrics import get_metrics
+from rate_limiter import get_rate_limiter
+
+
+# Landsat 8 Collection 2, Level 2 (surface reflectance)
+LANDSAT8_COLLECTION = 'LANDSAT/LC08/C02/T1_L2'
+
+# ±8 days covers Landsat 8's 16-day revisit cycle
+SEARCH_WINDOW_DAYS = 8
+
+# 15km x 15km region around each point
+REGION_BUFFER_M = 7500
+
+RGB_BANDS = ['SR_B4', 'SR_B3', 'SR_B2']
+
+THUMB_PARAMS = {
+    'dimensions': 512,
+    'format': 'png',
+    'min': 0,
+    'max': 0.3
+}
+
+# Bands of raw-array chips: surface reflectance and surface temperature
+CHIP_BANDS = ['SR_B1', 'SR_B2', 'SR_B3', 'SR_B4', 'SR_B5', 'SR_B6', 'SR_B7', 'ST_B10']
+
+# Chip width and height in pixels (~30 m per pixel over the 15 km region)
+CHIP_SIZE = 512
+
+# QA_PIXEL bits masked in composites: dilated cloud, cirrus, cloud, cloud shadow
+QA_CLOUD_BITS = (1, 2, 3, 4)
+
+# Composite methods: per-pixel median of clear observations, or the
+# clear pixel from the least cloudy scene
+COMPOSITE_METHODS = ('median', 'best_pixel')
+
+# Targets evaluated per getInfo() call (keeps request payloads small)
+BATCH_SIZE = 250
+
+
+def apply_scale_factors(img):
+    """Scale Landsat 8 Collection 2 optical bands to surface reflectance"""
+    optical_bands = img.select('SR_B.').multiply(0.0000275).add(-0.2)
+    return img.addBands(optical_bands, None, True)
+
+
+def scene_targets(locations, dates):
+    """
+    Targets for every location and date
+
+    Parameters:
+    -----------
+    locations : dict
+        Location name -> {'lat': float, 'lon': float}
+    dates : list of str
+        Target dates ('YYYY-MM-DD')
+
+    Returns:
+    --------
+    list of tuple : (location_name, lat, lon, date)
+    """
+    return [(location_name, coords['lat'], coords['lon'], date)
+            for location_name, coords in locations.items()
+            for date in dates]
+
+
+def _best_scene_function(cloud_cover_max, window_days, buffer_m):
+    """Server-side function: target feature -> best-scene metadata feature"""
+
+    def best_scene(feature):
+        point = feature.geometry()
+        target = ee.Date(feature.get('date'))
+
+        collection = ee.ImageCollection(LANDSAT8_COLLECTION) \
+            .filterBounds(point) \
+            .filterDate(target.advance(-window_days, 'day'), target.advance(window_days, 'day')) \
+            .filter(ee.Filter.lt('CLOUD_COVER', cloud_cover_max)) \
+            .sort('CLOUD_COVER')
+
+        count = collection.size()
+        image = ee.Image(collection.first())
+
+        # Only evaluated when the collection is not empty
+        metadata = ee.Dictionary(ee.Algorithms.If(
+            count.gt(0),
+            ee.Dictionary({
+                'image_id': image.get('system:id'),
+                'image_date': ee.Date(image.get('system:time_start')).format('YYYY-MM-dd'),
+                'cloud_cover': image.get('CLOUD_COVER'),
+                'scene_id': image.get('LANDSAT_SCENE_ID'),
+            }),
+            ee.Dictionary({})
+        ))
+
+        return ee.Feature(point.buffer(buffer_m).bounds(),
+                          feature.toDictionary().combine(metadata)) \
+            .set('images_found', count)
+
+    return best_scene
+
+
+def find_best_scenes(targets, cloud_cover_max=50, window_days=SEARCH_WINDOW_DAYS,
+                     buffer_m=REGION_BUFFER_M, batch_size=BATCH_SIZE):
+    """
+    Least-cloudy Landsat 8 scene near each (location, date) target
+
+    Parameters:
+    -----------
+    targets : list of tuple
+        (location_name, lat, lon, date) per target (see scene_targets)
+    cloud_cover_max : float
+        Maximum cloud cover percentage
+    window_days : int
+        Search ± this many days around each date
+    buffer_m : float
+        Half-width of the square region returned for thumbnails (meters)
+    batch_size : int
+        Targets evaluated per getInfo() call
+
+    Returns:
+    --------
+    dict : (location_name, date) -> scene dict with 'location', 'date',
+           'images_found', 'region' (GeoJSON) and, when images_found > 0,
+           'image_id', 'image_date', 'cloud_cover', 'scene_id'
+    """
+    best_scene = _best_scene_function(cloud_cover_max, window_days, buffer_m)
+    scenes = {}
+
+    for start in range(0, len(targets), batch_size):
+        features = [
+            ee.Feature(ee.Geometry.Point([lon, lat]), {'location': location_name, 'date': date})
+            for location_name, lat, lon, date in targets[start:start + batch_size]
+        ]
+
+        started = time.monotonic()
+        result = ee.FeatureCollection(features).map(best_scene).getInfo()
+        get_rate_limiter().observe('earth_engine', 'scene_search', time.monotonic() - started)
+
+        for feature in result['features']:
+            scene = dict(feature['properties'])
+            scene['region'] = feature['geometry']
+            scenes[(scene['location'], scene['date'])] = scene
+
+    return scenes
+
+
+def prefetch_best_scenes(targets, cloud_cover_max=50):
+    """
+    find_best_scenes with progress output; returns {} if the query fails
+    (extractors then look up each scene individually)
+    """
+    if not targets:
+        return {}
+
+    batches = (len(targets) + BATCH_SIZE - 1) // BATCH_SIZE
+    print(f"🛰️  Selecting best Landsat scenes for {len(targets)} targets "
+          f"({batches} Earth Engine request{'s' if batches > 1 else ''})...")
+
+    try:
+        scenes = find_best_scenes(targets, cloud_cover_max=cloud_cover_max)
+    except Exception as e:
+        print(f"   ⚠️  Batched scene lookup failed ({str(e)[:60]}), querying per image")
+        return {}
+
+    with_images = sum(1 for scene in scenes.values() if scene['images_found'] > 0)
+    print(f"   ✅ {with_images}/{len(targets)} targets have images <{cloud_cover_max}% clouds")
+    return scenes
+
+
+def landsat_rgb(image_id):
+    """Scaled RGB (SR_B4, SR_B3, SR_B2) image for a Landsat 8 system:id"""
+    return apply_scale_factors(ee.Image(image_id)).select(RGB_BANDS)
+
+
+def landsat_thumb_url(scene, **params):
+    """
+    PNG thumbnail URL for a scene from find_best_scenes
+
+    Parameters:
+    -----------
+    scene : dict
+        Scene with 'image_id' and 'region'
+    **params : Overrides for THUMB_PARAMS (dimensions, min, max, ...)
+
+    Returns:
+    --------
+    str : Download URL
+    """
+    thumb_params = dict(THUMB_PARAMS, region=scene['region'])
+    thumb_params.update(params)
+
+    started = time.monotonic()
+    url = landsat_rgb(scene['image_id']).getThumbURL(thumb_params)
+    get_rate_limiter().observe('earth_engine', 'thumbnail_url', time.monotonic() - started)
+    return url
+
+
+def save_thumbnail(scene, filepath, cache=None, location_name=None, date=None, **params):
+    """
+    Save a scene's RGB thumbnail to filepath, using the thumbnail cache
+
+    On a cache hit neither getThumbURL nor the HTTP download is needed.
+
+    Parameters:
+    -----------
+    scene : dict
+        Scene from find_best_scenes
+    filepath : Path
+        Output PNG
+    cache : ThumbnailCache
+        Scene-keyed cache (optional)
+    location_name, date : str
+        Requested target, recorded in the cache index
+    **params : Overrides for THUMB_PARAMS
+
+    Returns:
+    --------
+    int : HTTP status (200 on success, including cache hits)
+    """
+    thumb_params = dict(THUMB_PARAMS, **params)
+
+    key = None
+    if cache is not None:
+        key = cache.make_key(scene.get('scene_id') or scene['image_id'], scene['region'],
+                             RGB_BANDS, thumb_params)
+        if cache.get(key) is not None and cache.copy_to(key, filepath):
+            cache.record(location_name, date, key, filepath)
+            get_metrics().inc('extraction_cache_requests_total', cache='thumbnail', result='hit')
+            return 200
+        get_metrics().inc('extraction_cache_requests_total', cache='thumbnail', result='miss')
+
+    url = landsat_thumb_url(scene, **params)
+    response = get_rate_limiter().request('earth_engine', url, endpoint='thumbnail', timeout=60)
+    if response.status_code != 200:
+        return response.status_code
+
+    if cache is not None:
+        cache.put(key, response.content, scene)
+        cache.copy_to(key, filepath)
+        cache.record(location_name, date, key, filepath)
+    else:
+        # Write to a temp file first so readers never see a partial image
+        tmp_path = filepath.with_name(f"{filepath.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(response.content)
+        os.replace(tmp_path, filepath)
+
+    return 200
+
+
+def point_region(lat, lon, buffer_m=REGION_BUFFER_M):
+    """
+    Square GeoJSON region of ±buffer_m around a point (client-side, no Earth Engine call)
+    """
+    dlat = buffer_m / 111320.0
+    dlon = buffer_m / (111320.0 * float(np.cos(np.radians(lat))))
+    return {
+        'type': 'Polygon',
+        'coordinates': [[[lon - dlon, lat - dlat], [lon + dlon, lat - dlat],
+                         [lon + dlon, lat + dlat], [lon - dlon, lat + dlat],
+                         [lon - dlon, lat - dlat]]],
+    }
+
+
+def _compute_chip(image, region, bands, size):
+    """computePixels of an image over a GeoJSON region as a (bands, size, size) uint16 array"""
+    lons = [point[0] for point in region['coordinates'][0]]
+    lats = [point[1] for point in region['coordinates'][0]]
+
+    # Pixel grid over the region, north-up
+    request = {
+        'expression': image.select(bands).toUint16(),
+        'fileFormat': 'NUMPY_NDARRAY',
+        'grid': {
+            'dimensions': {'width': size, 'height': size},
+            'affineTransform': {
+                'scaleX': (max(lons) - min(lons)) / size,
+                'shearX': 0,
+                'translateX': min(lons),
+                'shearY': 0,
+                'scaleY': -(max(lats) - min(lats)) / size,
+                'translateY': max(lats),
+            },
+            'crsCode': 'EPSG:4326',
+        },
+    }
+
+    limiter = get_rate_limiter()
+    limiter.acquire('earth_engine')
+    started = time.monotonic()
+    pixels = ee.data.computePixels(request)
+    limiter.observe('earth_engine', 'compute_pixels', time.monotonic() - started, size=pixels.nbytes)
+
+    # Structured array (one field per band) -> (bands, height, width)
+    return np.stack([pixels[band] for band in bands]).astype(np.uint16)
+
+
+def landsat_chip(scene, bands=CHIP_BANDS, size=CHIP_SIZE):
+    """
+    Raw band values of a scene's region as a NumPy array (computePixels)
+
+    Values are Collection 2 digital numbers (uint16, 0 = no data); see
+    chip_store.scale_chip for the conversion to reflectance / kelvin.
+
+    Parameters:
+    -----------
+    scene : dict
+        Scene from find_best_scenes (needs 'image_id' and 'region')
+    bands : list of str
+        Bands to extract, in output order
+    size : int
+        Output width and height in pixels
+
+    Returns:
+    --------
+    np.ndarray : (bands, size, size) uint16
+    """
+    return _compute_chip(ee.Image(scene['image_id']), scene['region'], bands, size)
+
+
+def mask_clouds(img):
+    """Mask cloud, cirrus and cloud-shadow pixels using the QA_PIXEL band"""
+    qa = img.select('QA_PIXEL')
+    clear = qa.bitwiseAnd(sum(1 << bit for bit in QA_CLOUD_BITS)).eq(0)
+    return img.updateMask(clear)
+
+
+def _location_buffers(locations, buffer_m):
+    """FeatureCollection of the square region around every location"""
+    return ee.FeatureCollection([
+        ee.Feature(ee.Geometry.Point([coords['lon'], coords['lat']]).buffer(buffer_m).bounds(),
+                   {'location': location_name})
+        for location_name, coords in locations.items()
+    ])
+
+
+def composite_image(locations, start_date, end_date, method='median', cloud_cover_max=70,
+                    bands=CHIP_BANDS, buffer_m=REGION_BUFFER_M):
+    """
+    One cloud-masked Landsat 8 composite covering every location (server-side)
+
+    Replaces a separate filterBounds/filterDate/sort search per location with
+    a single collection filtered to the union of all location regions.
+
+    Parameters:
+    -----------
+    locations : dict
+        Location name -> {'lat': float, 'lon': float}
+    start_date, end_date : str
+        Time window ('YYYY-MM-DD', end exclusive)
+    method : str
+        'median' (per-pixel median of clear observations) or 'best_pixel'
+        (clear pixel from the least cloudy scene)
+    cloud_cover_max : float
+        Scenes above this cloud cover percentage are left out
+    bands : list of str
+        Bands kept in the composite (digital numbers)
+    buffer_m : float
+        Half-width of the square region around each location (meters)
+
+    Returns:
+    --------
+    ee.Image : Composite clipped to the location regions (masked pixels read as 0)
+    """
+    if method not in COMPOSITE_METHODS:
+        raise ValueError(f"Unknown composite method '{method}' (use one of {COMPOSITE_METHODS})")
+
+    regions = _location_buffers(locations, buffer_m)
+
+    collection = ee.ImageCollection(LANDSAT8_COLLECTION) \
+        .filterBounds(regions) \
+        .filterDate(start_date, end_date) \
+        .filter(ee.Filter.lt('CLOUD_COVER', cloud_cover_max)) \
+        .map(mask_clouds)
+
+    if method == 'median':
+        composite = collection.select(bands).median()
+    else:
+        # Higher score = less cloudy scene; qualityMosaic keeps that scene's clear pixel.
+        # The score carries the scene's cloud mask and footprint, so a masked pixel
+        # falls back to the next-clearest scene instead of coming out empty
+        def add_clear_score(img):
+            score = ee.Image.constant(ee.Number(100).subtract(img.get('CLOUD_COVER')))
+            score = score.updateMask(img.select(bands[0]).mask())
+            return img.select(bands).addBands(score.rename('clear_score').toFloat())
+
+        composite = collection.map(add_clear_score).qualityMosaic('clear_score').select(bands)
+
+    return composite.clipToCollection(regions)
+
+
+def composite_chips(image, locations, bands=CHIP_BANDS, size=CHIP_SIZE, buffer_m=REGION_BUFFER_M):
+    """
+    Tile a composite into one chip per location
+
+    One composite expression is built for all locations (no per-location
+    collection search); each chip is its own computePixels request.
+
+    Returns:
+    --------
+    dict : location_name -> (bands, size, size) uint16 array
+    """
+    return {
+        location_name: _compute_chip(image, point_region(coords['lat'], coords['lon'], buffer_m),
+                                     bands, size)
+        for location_name, coords in locations.items()
+    }
+
+
+def export_composite(image, locations, description, folder='earth_engine_exports',
+                     scale=30, buffer_m=REGION_BUFFER_M):
+    """
+    Start one Google Drive export of a composite covering every location
+
+    Parameters:
+    -----------
+    image : ee.Image
+        Composite from composite_image
+    locations : dict
+        Location name -> {'lat': float, 'lon': float}
+    description : str
+        Task name and file name prefix
+    folder : str
+        Drive folder
+    scale : float
+        Output resolution in meters
+
+    Returns:
+    --------
+    ee.batch.Task : Started export task (poll task.status())
+    """
+    regions = _location_buffers(locations, buffer_m)
+
+    task = ee.batch.Export.image.toDrive(
+        image=image.toUint16(),
+        description=description,
+        folder=folder,
+        fileNamePrefix=description,
+        region=regions.geometry().bounds(),
+        scale=scale,
+        maxPixels=1e10,
+    )
+    task.start()
+    return task
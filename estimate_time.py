@@ -1,183 +1,544 @@
 """
-Estimate time to extract 10,000 data samples from NASA POWER API
+Extraction Time and Cost Estimator
+Sizes an extraction job from measured API behaviour before it is launched
+
+Every call made through the shared RateLimiter is recorded in
+.api_history.json: latency, payload size, throttled and failed attempts per
+service endpoint (nasa_power hourly/point, earth_engine thumbnail, ...).
+The estimator combines that history with an orchestrator job spec to predict:
+
+- Requests per endpoint, leaving out months already in the POWER response
+  cache and location-years the job ledger has already finished
+- Wall-clock time, bounded by latency / concurrency and by each service's
+  rate limit and daily quota
+- Quota consumption against what is left today
+- Bytes downloaded and bytes on disk
+- A concurrency level per service: enough requests in flight to reach the
+  rate limit, halved if the service has been throttling us
+
+CPU stages (30-minute expansion, labels, derived features, writes) use the
+throughput in the last benchmark_suite.py report. Anything never measured
+falls back to DEFAULT_PROFILES / DEFAULT_THROUGHPUT and is flagged.
+
+    python estimate_time.py                   # example job
+    python estimate_time.py job.json [8]      # job spec, optional concurrency
 """
-import time
-from datetime import datetime, timedelta
 
-def estimate_extraction_time():
+import json
+import math
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from job_ledger import JobLedger
+from nasa_power_api import NASAPowerAPI
+from orchestrator import load_job_spec, normalize_spec, spec_months, spec_satellite_dates
+from power_cache import PowerResponseCache
+from rate_limiter import get_rate_limiter
+
+try:
+    from ee_helpers import BATCH_SIZE, CHIP_BANDS, CHIP_SIZE
+    CHIP_BAND_COUNT = len(CHIP_BANDS)
+except ImportError:
+    # ee_helpers needs earthengine-api; these mirror its constants
+    BATCH_SIZE, CHIP_BAND_COUNT, CHIP_SIZE = 250, 8, 512
+
+
+# Used for endpoints with no recorded calls yet
+DEFAULT_PROFILES = {
+    ('nasa_power', 'hourly/point'): {'latency_mean_s': 2.0, 'bytes_mean': 75_000},
+    ('earth_engine', 'scene_search'): {'latency_mean_s': 10.0, 'bytes_mean': None},
+    ('earth_engine', 'thumbnail_url'): {'latency_mean_s': 0.5, 'bytes_mean': None},
+    ('earth_engine', 'thumbnail'): {'latency_mean_s': 1.5, 'bytes_mean': 400_000},
+    ('earth_engine', 'compute_pixels'): {'latency_mean_s': 3.0,
+                                         'bytes_mean': CHIP_BAND_COUNT * CHIP_SIZE ** 2 * 2},
+}
+
+# Calls timed by the limiter without taking a token (getInfo / getThumbURL)
+UNTHROTTLED_ENDPOINTS = {('earth_engine', 'scene_search'), ('earth_engine', 'thumbnail_url')}
+
+# Rows per second per CPU stage when there is no benchmark report
+DEFAULT_THROUGHPUT = {
+    'expand_30min': 100_000,
+    'lightning_labels': 400_000,
+    'derived_features': 150_000,
+    'write_parquet': 120_000,
+}
+
+# Stages that run in worker processes (the rest run on one thread)
+PROCESS_STAGES = ('expand_30min', 'lightning_labels', 'derived_features')
+
+# Bytes on disk per dataset row when there is no benchmark report
+DEFAULT_BYTES_PER_ROW = 40
+
+# Gzipped cache entry size / response size when the cache is empty
+DEFAULT_CACHE_RATIO = 0.2
+
+MAX_CONCURRENCY = 32
+
+
+class ExtractionEstimator:
     """
-    Calculate estimated time for different scenarios
+    Predicts time, requests, quota and disk use of an extraction job
     """
-    
+
+    def __init__(self, limiter=None, benchmark_report=None, power_cache=None,
+                 thumbnail_dir=None, ledger=None):
+        """
+        Initialize the estimator
+
+        Parameters:
+        -----------
+        limiter : RateLimiter
+            Source of call history, limits and quota usage (default: shared limiter)
+        benchmark_report : str or Path
+            Report from benchmark_suite.py (default: benchmark_report.json if present)
+        power_cache : PowerResponseCache
+            Cache checked for months that need no request (default: .power_cache)
+        thumbnail_dir : str or Path
+            Thumbnail cache used for the average image size (default: .thumbnail_cache)
+        ledger : JobLedger
+            Ledger checked for finished location-years (default: .job_ledger.sqlite)
+        """
+        base = Path(__file__).parent
+        self.limiter = limiter or get_rate_limiter()
+        self.power_cache = power_cache or PowerResponseCache()
+        self.thumbnail_dir = Path(thumbnail_dir or base / '.thumbnail_cache')
+        self.ledger = ledger or JobLedger()
+
+        report_path = Path(benchmark_report or base / 'benchmark_report.json')
+        self.benchmark = None
+        if report_path.exists():
+            with open(report_path, 'r') as f:
+                self.benchmark = json.load(f)
+
+    # ------------------------------------------------------------------
+    # Measurements
+    # ------------------------------------------------------------------
+
+    def profile(self, service, endpoint):
+        """
+        Measured profile of an endpoint, or the default if it was never called
+
+        Returns:
+        --------
+        dict : RateLimiter.profile fields plus 'measured' (bool)
+        """
+        measured = self.limiter.profile(service, endpoint)
+        if measured is not None:
+            if measured['bytes_mean'] is None:
+                measured['bytes_mean'] = DEFAULT_PROFILES.get((service, endpoint), {}).get('bytes_mean')
+            return dict(measured, measured=True)
+
+        default = DEFAULT_PROFILES.get((service, endpoint), {'latency_mean_s': 2.0, 'bytes_mean': None})
+        return {
+            'calls': 0,
+            'latency_mean_s': default['latency_mean_s'],
+            'latency_p95_s': default['latency_mean_s'],
+            'bytes_mean': default['bytes_mean'],
+            'retry_rate': 0.0,
+            'throttle_rate': 0.0,
+            'error_rate': 0.0,
+            'backoff_per_call_s': 0.0,
+            'measured': False,
+        }
+
+    def _benchmark_stage(self, name):
+        if self.benchmark is None:
+            return None
+        stage = self.benchmark.get('stages', {}).get(name)
+        if not stage or stage.get('status') != 'ok' or not stage.get('items'):
+            return None
+        return stage
+
+    def throughput(self, stage):
+        """Rows per second of a CPU stage: (value, measured)"""
+        measured = self._benchmark_stage(stage)
+        if measured is not None and measured.get('throughput_per_s'):
+            return measured['throughput_per_s'], True
+        return DEFAULT_THROUGHPUT[stage], False
+
+    def bytes_per_row(self):
+        """Dataset bytes on disk per row: (value, measured)"""
+        measured = self._benchmark_stage('write_parquet')
+        if measured is not None and measured.get('mb'):
+            return measured['mb'] * 1024 * 1024 / measured['items'], True
+        return DEFAULT_BYTES_PER_ROW, False
+
+    def cache_ratio(self):
+        """Average cached entry size / response size for POWER responses"""
+        stats = self.power_cache.stats()
+        payload = self.profile('nasa_power', 'hourly/point')['bytes_mean']
+        if stats['entries'] and payload:
+            return (stats['size_mb'] * 1024 * 1024 / stats['entries']) / payload
+        return DEFAULT_CACHE_RATIO
+
+    def thumbnail_bytes(self):
+        """Average thumbnail size: recorded downloads, else cached PNGs, else the default"""
+        profile = self.profile('earth_engine', 'thumbnail')
+        if profile['measured'] and profile['bytes_mean']:
+            return profile['bytes_mean']
+
+        sizes = [path.stat().st_size for path in self.thumbnail_dir.rglob('*.png')] \
+            if self.thumbnail_dir.exists() else []
+        return sum(sizes) / len(sizes) if sizes else DEFAULT_PROFILES[('earth_engine', 'thumbnail')]['bytes_mean']
+
+    # ------------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------------
+
+    def plan(self, spec):
+        """
+        Work a job spec still needs
+
+        Parameters:
+        -----------
+        spec : dict
+            Orchestrator job spec (see orchestrator.normalize_spec)
+
+        Returns:
+        --------
+        dict : pending / done location-years, calls per (service, endpoint),
+               cached POWER responses, dataset rows and satellite images
+        """
+        spec = normalize_spec(spec)
+        modalities = set(spec['modalities'])
+        locations = spec['locations']
+        months = spec_months(spec)
+        years = sorted({year for year, _, _, _ in months})
+
+        units = [(name, year) for name in locations for year in years]
+        pending = self.ledger.pending(f"orchestrator:{spec['name']}", units)
+
+        rows_per_day = pd.Timedelta('1D') / pd.Timedelta(spec['resolution'])
+        calls = {}
+        cached = 0
+        rows = 0
+
+        if 'weather' in modalities:
+            for name, year in pending:
+                coords = locations[name]
+                for month_year, _, start, end in months:
+                    if month_year != year:
+                        continue
+                    days = (datetime.strptime(end, '%Y%m%d') - datetime.strptime(start, '%Y%m%d')).days + 1
+                    rows += int(days * rows_per_day)
+
+                    params = NASAPowerAPI.point_params(coords['lat'], coords['lon'], start, end,
+                                                       NASAPowerAPI.HOURLY_PARAMETERS)
+                    if self.power_cache.contains('hourly/point',
+                                                 NASAPowerAPI.cache_params('hourly/point', params)):
+                        cached += 1
+                    else:
+                        calls[('nasa_power', 'hourly/point')] = calls.get(('nasa_power', 'hourly/point'), 0) + 1
+
+        images = 0
+        if 'satellite' in modalities:
+            dates_per_year = {}
+            for date in spec_satellite_dates(spec):
+                dates_per_year[int(date[:4])] = dates_per_year.get(int(date[:4]), 0) + 1
+            images = sum(dates_per_year.get(year, 0) for _, year in pending)
+
+            if images:
+                calls[('earth_engine', 'scene_search')] = math.ceil(images / BATCH_SIZE)
+                if spec['satellite_mode'] == 'chips':
+                    calls[('earth_engine', 'compute_pixels')] = images
+                else:
+                    # Upper bound: scenes reused across target dates come from the cache
+                    calls[('earth_engine', 'thumbnail_url')] = images
+                    calls[('earth_engine', 'thumbnail')] = images
+
+        return {
+            'spec': spec,
+            'pending_units': len(pending),
+            'done_units': len(units) - len(pending),
+            'calls': calls,
+            'cached_responses': cached,
+            'rows': rows,
+            'images': images,
+        }
+
+    # ------------------------------------------------------------------
+    # Estimation
+    # ------------------------------------------------------------------
+
+    def recommend_concurrency(self, service, calls):
+        """
+        Requests in flight needed to keep a service at its rate limit
+
+        By Little's law that is rate × mean latency (weighted by the planned
+        calls per endpoint); it is halved when the service has been
+        throttling (over 5% of attempts answered 429), and never exceeds the
+        number of calls. Unthrottled calls run one at a time and do not count.
+        """
+        calls = {endpoint: count for endpoint, count in calls.items()
+                 if (service, endpoint) not in UNTHROTTLED_ENDPOINTS}
+        if not calls:
+            return 1
+
+        rate = self.limiter.limits.get(service, {}).get('rate', 1.0)
+        latency = sum(self.profile(service, endpoint)['latency_mean_s'] * count
+                      for endpoint, count in calls.items()) / max(1, sum(calls.values()))
+        concurrency = max(1, min(MAX_CONCURRENCY, sum(calls.values()), math.ceil(rate * latency)))
+
+        if any(self.profile(service, endpoint)['throttle_rate'] > 0.05 for endpoint in calls):
+            concurrency = max(1, concurrency // 2)
+        return concurrency
+
+    def service_time(self, service, calls, concurrency):
+        """
+        Time to make a service's calls
+
+        Parameters:
+        -----------
+        service : str
+            Service name
+        calls : dict
+            endpoint -> number of calls
+        concurrency : int
+            Requests in flight
+
+        Returns:
+        --------
+        dict : attempts, serial / latency-bound / rate-bound / quota wait
+               seconds, total seconds, quota days, bytes downloaded
+        """
+        limits = self.limiter.limits.get(service, {'rate': 1.0, 'burst': 1, 'daily_quota': None})
+
+        attempts = 0.0
+        limited = 0.0
+        busy = 0.0
+        serial = 0.0
+        downloaded = 0.0
+        for endpoint, count in calls.items():
+            profile = self.profile(service, endpoint)
+            endpoint_attempts = count * (1 + profile['retry_rate'])
+            attempts += endpoint_attempts
+            endpoint_busy = endpoint_attempts * profile['latency_mean_s'] + count * profile['backoff_per_call_s']
+            if (service, endpoint) in UNTHROTTLED_ENDPOINTS:
+                # Scene searches and URL requests run one after another on the producer side
+                serial += endpoint_busy
+            else:
+                limited += endpoint_attempts
+                busy += endpoint_busy
+            downloaded += count * (profile['bytes_mean'] or 0)
+
+        latency_bound = busy / concurrency
+        rate_bound = max(0.0, limited - limits.get('burst', 1)) / limits['rate']
+
+        # Calls past today's quota wait for the next day's reset
+        quota = limits.get('daily_quota')
+        remaining = self.limiter.remaining(service)
+        days = 1
+        if quota is not None and limited > remaining:
+            days = 1 + math.ceil((limited - remaining) / quota)
+        quota_wait = (days - 1) * 86400
+
+        return {
+            'attempts': int(math.ceil(attempts)),
+            'serial_s': serial,
+            'latency_bound_s': latency_bound,
+            'rate_bound_s': rate_bound,
+            'quota_wait_s': quota_wait,
+            'seconds': serial + max(latency_bound, rate_bound) + quota_wait,
+            'daily_quota': quota,
+            'remaining_today': remaining,
+            'quota_days': days,
+            'bytes': downloaded,
+        }
+
+    def estimate(self, spec, concurrency=None, cpu_workers=None):
+        """
+        Predict a job's cost
+
+        Parameters:
+        -----------
+        spec : dict
+            Orchestrator job spec
+        concurrency : int
+            Requests in flight per service (default: the recommended level)
+        cpu_workers : int
+            Worker processes for CPU stages (default: CPU count)
+
+        Returns:
+        --------
+        dict : plan, per-service network estimates, CPU stage seconds,
+               bytes on disk, wall-clock seconds and assumptions
+        """
+        plan = self.plan(spec)
+        cpu_workers = cpu_workers or os.cpu_count() or 1
+
+        by_service = {}
+        for (service, endpoint), count in plan['calls'].items():
+            by_service.setdefault(service, {})[endpoint] = count
+
+        assumptions = []
+        services = {}
+        for service, calls in by_service.items():
+            recommended = self.recommend_concurrency(service, calls)
+            estimate = self.service_time(service, calls, concurrency or recommended)
+            estimate['concurrency'] = concurrency or recommended
+            estimate['recommended_concurrency'] = recommended
+            estimate['calls'] = calls
+            services[service] = estimate
+
+            for endpoint in calls:
+                if not self.profile(service, endpoint)['measured']:
+                    assumptions.append(f"{service} {endpoint}: no recorded calls, "
+                                       f"assuming {self.profile(service, endpoint)['latency_mean_s']}s each")
+
+        cpu = {}
+        if plan['rows']:
+            stages = list(PROCESS_STAGES) + ['write_parquet']
+            if 'lightning' not in plan['spec']['modalities']:
+                stages.remove('lightning_labels')
+            for stage in stages:
+                rate, measured = self.throughput(stage)
+                workers = cpu_workers if stage in PROCESS_STAGES else 1
+                cpu[stage] = plan['rows'] / rate / workers
+                if not measured:
+                    assumptions.append(f"{stage}: no benchmark report, assuming {rate:,} rows/s")
+
+        row_bytes, measured = self.bytes_per_row()
+        if plan['rows'] and not measured:
+            assumptions.append(f"dataset: no benchmark report, assuming {row_bytes} bytes/row")
+
+        power_bytes = services.get('nasa_power', {}).get('bytes', 0)
+        disk = {
+            'dataset': plan['rows'] * row_bytes,
+            'power_cache': power_bytes * self.cache_ratio(),
+        }
+        if plan['images']:
+            if plan['spec']['satellite_mode'] == 'chips':
+                disk['chips'] = plan['images'] * CHIP_BAND_COUNT * CHIP_SIZE ** 2 * 2
+            else:
+                # Output PNG plus its copy in the thumbnail cache
+                disk['thumbnails'] = plan['images'] * self.thumbnail_bytes() * 2
+
+        # The orchestrator overlaps services and CPU work; the slowest one sets the pace
+        phases = [estimate['seconds'] for estimate in services.values()] + [sum(cpu.values())]
+
+        return {
+            'plan': plan,
+            'services': services,
+            'cpu_seconds': cpu,
+            'disk_bytes': disk,
+            'download_bytes': sum(estimate['bytes'] for estimate in services.values()),
+            'wall_clock_s': max(phases) if phases else 0.0,
+            'sequential_s': sum(phases),
+            'assumptions': assumptions,
+        }
+
+
+def format_duration(seconds):
+    """Human readable duration"""
+    if seconds < 60:
+        return f"{seconds:.1f} seconds"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} minutes"
+    if seconds < 86400 * 2:
+        return f"{seconds / 3600:.2f} hours"
+    return f"{seconds / 86400:.1f} days"
+
+
+def format_bytes(size):
+    """Human readable size"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def print_estimate(estimate):
+    """Print an estimate from ExtractionEstimator.estimate"""
+    plan = estimate['plan']
+    spec = plan['spec']
+
     print("=" * 70)
-    print("⏱️  NASA POWER API - Time Estimation for 10,000 Data Samples")
+    print(f"⏱️  EXTRACTION ESTIMATE: {spec['name']}")
     print("=" * 70)
-    
-    # API response time (based on testing)
-    avg_api_response_time = 2.0  # seconds per request (conservative estimate)
-    
-    print("\n📊 SCENARIO 1: Single Location, 10,000 Days (~27 years)")
-    print("-" * 70)
-    days_needed = 10000
-    years = days_needed / 365.25
-    
-    # Single API call can fetch multiple years at once
-    requests_needed = 1  # NASA POWER can fetch all data in one request
-    total_time_1 = requests_needed * avg_api_response_time
-    
-    print(f"  Data Points: {days_needed:,} days ({years:.1f} years)")
-    print(f"  API Requests: {requests_needed}")
-    print(f"  Estimated Time: {total_time_1:.1f} seconds (~{total_time_1/60:.1f} minutes)")
-    print(f"  ✅ Very Fast! (Single API call)")
-    
-    print("\n" + "=" * 70)
-    print("📊 SCENARIO 2: Multiple Locations, Daily Data")
-    print("-" * 70)
-    
-    # If you need 10,000 samples across multiple locations
-    locations = [1, 5, 10, 20, 50, 100]
-    
-    for num_locations in locations:
-        samples_per_location = 10000 // num_locations
-        days_per_location = samples_per_location
-        
-        # Add 1 second delay between requests (being respectful to API)
-        delay_between_requests = 1.0
-        total_time = (num_locations * avg_api_response_time) + ((num_locations - 1) * delay_between_requests)
-        
-        print(f"\n  {num_locations} locations × {samples_per_location} days each:")
-        print(f"    API Requests: {num_locations}")
-        print(f"    Estimated Time: {total_time:.1f}s (~{total_time/60:.1f} min)")
-    
-    print("\n" + "=" * 70)
-    print("📊 SCENARIO 3: Grid of Coordinates (Spatial Coverage)")
+    print(f"📍 {len(spec['locations'])} locations, {spec['start_date']} to {spec['end_date']}, "
+          f"{', '.join(spec['modalities'])}")
+    print(f"📦 Location-years: {plan['pending_units']} to run, {plan['done_units']} already done")
+    if plan['cached_responses']:
+        print(f"💾 POWER months already cached: {plan['cached_responses']}")
+
+    print("\n🌐 REQUESTS")
     print("-" * 70)
-    
-    # Grid covering Bangladesh
-    grid_sizes = [
-        (5, 5, "5×5 grid (25 points)"),
-        (10, 10, "10×10 grid (100 points)"),
-        (20, 20, "20×20 grid (400 points)"),
-    ]
-    
-    for rows, cols, description in grid_sizes:
-        total_points = rows * cols
-        days_per_point = 10000 // total_points if total_points > 0 else 0
-        
-        if days_per_point > 0:
-            delay_between_requests = 1.0
-            total_time = (total_points * avg_api_response_time) + ((total_points - 1) * delay_between_requests)
-            
-            print(f"\n  {description}:")
-            print(f"    Total Points: {total_points}")
-            print(f"    Days per Point: {days_per_point}")
-            print(f"    Total Samples: {total_points * days_per_point:,}")
-            print(f"    Estimated Time: {total_time:.1f}s (~{total_time/60:.1f} min or ~{total_time/3600:.2f} hours)")
-    
-    print("\n" + "=" * 70)
-    print("📊 SCENARIO 4: Hourly Data (More Granular)")
+    if not estimate['services']:
+        print("  Nothing to fetch")
+    for service, item in estimate['services'].items():
+        calls = ', '.join(f"{endpoint} {count:,}" for endpoint, count in item['calls'].items())
+        print(f"  {service}: {item['attempts']:,} requests ({calls})")
+        print(f"    Time: {format_duration(item['seconds'])} at concurrency {item['concurrency']} "
+              f"(serial {format_duration(item['serial_s'])}, "
+              f"latency-bound {format_duration(item['latency_bound_s'])}, "
+              f"rate-bound {format_duration(item['rate_bound_s'])})")
+        if item['daily_quota'] is not None:
+            print(f"    Quota: {item['attempts']:,} of {item['remaining_today']:,} left today "
+                  f"(daily quota {item['daily_quota']:,}) -> {item['quota_days']} day(s)")
+        if item['recommended_concurrency'] != item['concurrency']:
+            print(f"    💡 Recommended concurrency: {item['recommended_concurrency']}")
+
+    if estimate['cpu_seconds']:
+        print("\n🧮 PROCESSING")
+        print("-" * 70)
+        print(f"  Rows: {plan['rows']:,}")
+        for stage, seconds in estimate['cpu_seconds'].items():
+            print(f"  {stage}: {format_duration(seconds)}")
+
+    print("\n💾 STORAGE")
     print("-" * 70)
-    
-    # Hourly data gives 24 samples per day
-    hourly_samples = 10000
-    days_needed_hourly = hourly_samples / 24
-    
-    # Hourly data might need to be split into smaller chunks
-    # NASA POWER limits hourly requests to shorter periods
-    max_days_per_request = 365  # Typical limit for hourly data
-    requests_needed_hourly = int(days_needed_hourly / max_days_per_request) + 1
-    
-    delay_between_requests = 1.0
-    total_time_hourly = (requests_needed_hourly * avg_api_response_time) + ((requests_needed_hourly - 1) * delay_between_requests)
-    
-    print(f"  Hourly Samples: {hourly_samples:,}")
-    print(f"  Days Needed: {days_needed_hourly:.1f}")
-    print(f"  API Requests: {requests_needed_hourly}")
-    print(f"  Estimated Time: {total_time_hourly:.1f}s (~{total_time_hourly/60:.1f} min)")
-    
+    print(f"  Downloaded: {format_bytes(estimate['download_bytes'])}")
+    for name, size in estimate['disk_bytes'].items():
+        print(f"  {name}: {format_bytes(size)}")
+    print(f"  Total on disk: {format_bytes(sum(estimate['disk_bytes'].values()))}")
+
     print("\n" + "=" * 70)
-    print("⚡ REALISTIC ESTIMATES")
+    print(f"⏱️  Estimated wall-clock time: {format_duration(estimate['wall_clock_s'])} "
+          f"(one step at a time: {format_duration(estimate['sequential_s'])})")
     print("=" * 70)
-    
-    scenarios = [
-        {
-            'name': 'Best Case (1 location, daily)',
-            'requests': 1,
-            'time_seconds': 2
-        },
-        {
-            'name': 'Common Case (10 locations)',
-            'requests': 10,
-            'time_seconds': 29
-        },
-        {
-            'name': 'Large Dataset (100 locations)',
-            'requests': 100,
-            'time_seconds': 299
-        },
-        {
-            'name': 'Very Large (500 locations)',
-            'requests': 500,
-            'time_seconds': 1499
+
+    if estimate['assumptions']:
+        print("\n⚠️  Not measured yet (run an extraction or benchmark_suite.py to calibrate):")
+        for assumption in estimate['assumptions']:
+            print(f"   - {assumption}")
+
+
+def estimate_extraction_time(spec=None, concurrency=None):
+    """
+    Estimate and print the cost of a job
+
+    Parameters:
+    -----------
+    spec : dict
+        Orchestrator job spec (default: 5 Bangladesh cities, 2020-2024, weather + lightning)
+    concurrency : int
+        Requests in flight per service (default: recommended level)
+
+    Returns:
+    --------
+    dict : Estimate (see ExtractionEstimator.estimate)
+    """
+    if spec is None:
+        spec = {
+            'name': 'estimate_example',
+            'locations': NASAPowerAPI.BANGLADESH_LOCATIONS,
+            'start_date': '2020-01-01',
+            'end_date': '2024-12-31',
+            'modalities': ['weather', 'lightning'],
         }
-    ]
-    
-    for scenario in scenarios:
-        time_sec = scenario['time_seconds']
-        time_min = time_sec / 60
-        time_hour = time_sec / 3600
-        
-        print(f"\n  🔹 {scenario['name']}:")
-        print(f"      Requests: {scenario['requests']}")
-        
-        if time_sec < 60:
-            print(f"      Time: {time_sec} seconds")
-        elif time_min < 60:
-            print(f"      Time: {time_min:.1f} minutes")
-        else:
-            print(f"      Time: {time_hour:.2f} hours ({time_min:.0f} minutes)")
-    
-    print("\n" + "=" * 70)
-    print("💡 KEY FACTORS AFFECTING TIME")
-    print("=" * 70)
-    print("""
-  1. ✅ API Response Time: ~1-3 seconds per request
-  2. ✅ Respectful Delays: 1 second between requests (recommended)
-  3. ✅ Network Speed: Your internet connection
-  4. ✅ Data Processing: Converting to DataFrame (~instant)
-  5. ✅ File Writing: Saving to CSV (~instant for <1M rows)
-  
-  Most bottleneck = Number of API requests needed
-  
-  """)
-    
-    print("=" * 70)
-    print("🎯 RECOMMENDATIONS")
-    print("=" * 70)
-    print("""
-  For 10,000 samples:
-  
-  ➡️  Single Location: 2-5 seconds total
-      (One API call for 27 years of daily data)
-  
-  ➡️  10 Locations: ~30 seconds
-      (1,000 days each)
-  
-  ➡️  100 Locations: ~5 minutes
-      (100 days each)
-  
-  ➡️  Spatial Grid (25 points): ~1-2 minutes
-      (400 days per point)
-  
-  The NASA POWER API is VERY EFFICIENT because:
-  - ✅ One request can fetch years of data
-  - ✅ No pagination needed
-  - ✅ Fast response times
-  - ✅ No rate limits (just be respectful)
-  """)
-    
-    print("=" * 70)
+
+    estimate = ExtractionEstimator().estimate(spec, concurrency=concurrency)
+    print_estimate(estimate)
+    return estimate
 
 
 if __name__ == "__main__":
-    estimate_extraction_time()
+    spec = load_job_spec(sys.argv[1]) if len(sys.argv) > 1 else None
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    estimate_extraction_time(spec, concurrency)
@@ -117,10 +117,6 @@ def example_3_multiple_cities():
                 
                 # Save individual city data
                 api.save_to_csv(df, f'{city.lower()}_jan2024.csv')
-        
-        # Be nice to the API
-        import time
-        time.sleep(1)
     
     return results
 
@@ -3,11 +3,10 @@ Enhanced Satellite + Weather Data Extractor
 Uses multiple satellite data sources for better coverage
 """
 
-import requests
 import pandas as pd
 from datetime import datetime, timedelta
 from nasa_power_api import NASAPowerAPI
-import time
+from rate_limiter import get_rate_limiter
 import os
 from pathlib import Path
 import json
@@ -20,6 +19,9 @@ class EnhancedSatelliteExtractor:
     def __init__(self, nasa_api_key='DEMO_KEY'):
         self.api = NASAPowerAPI()
         self.nasa_api_key = nasa_api_key
+        self.rate_limiter = get_rate_limiter()
+        # DEMO_KEY has a much smaller quota (30/hour, 50/day)
+        self.earth_service = 'nasa_earth_demo' if nasa_api_key == 'DEMO_KEY' else 'nasa_earth'
         self.satellite_dir = "satellite_images"
         self.data_dir = "weather_data"
         
@@ -57,7 +59,7 @@ class EnhancedSatelliteExtractor:
         }
         
         try:
-            response = requests.get(url, params=params, timeout=30)
+            response = self.rate_limiter.request(self.earth_service, url, params=params, timeout=30)
             if response.status_code == 200:
                 data = response.json()
                 return {
@@ -87,7 +89,7 @@ class EnhancedSatelliteExtractor:
         }
         
         try:
-            response = requests.get(url, params=params, timeout=30)
+            response = self.rate_limiter.request(self.earth_service, url, params=params, timeout=30)
             
             if response.status_code == 200:
                 filename = f"{self.satellite_dir}/nasa_earth_{latitude}_{longitude}_{date_str.replace('-', '')}.png"
@@ -195,8 +197,6 @@ class EnhancedSatelliteExtractor:
                     
             except Exception as e:
                 print(f"    ✗ Error: {e}")
-            
-            time.sleep(1)  # Be respectful to API
         
         # Combine weather data
         if weather_data:
@@ -255,9 +255,6 @@ class EnhancedSatelliteExtractor:
                 else:
                     failed += 1
                     print(f"✗ {result.get('error', 'Failed')}")
-                
-                # Delay to respect rate limits
-                time.sleep(2.5)  # ~24 requests/minute for DEMO_KEY
         
         print(f"\n📊 Download Summary:")
         print(f"   ✓ Success: {downloaded}")
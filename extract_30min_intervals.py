@@ -5,15 +5,17 @@ Combined with Google Earth Engine satellite imagery
 """
 
 import ee
-import requests
 import pandas as pd
 import time
 from pathlib import Path
-from datetime import datetime, timedelta
 import sys
 
 try:
     from nasa_power_api import NASAPowerAPI
+    from ee_helpers import find_best_scenes, prefetch_best_scenes, save_thumbnail, scene_targets
+    from thumbnail_cache import ThumbnailCache
+    from record_builder import RecordBuilder
+    from progress_log import get_progress_log
 except ImportError:
     print("❌ Error: nasa_power_api.py not found")
     sys.exit(1)
@@ -41,6 +43,9 @@ class ThirtyMinuteExtractor:
         self.nasa_api = NASAPowerAPI()
         print("✅ NASA POWER API initialized")
         
+        # Levelled, buffered progress output (EXTRACTION_LOG_LEVEL=debug for per-date detail)
+        self.log = get_progress_log()
+        
         # Create directories
         self.base_dir = Path(__file__).parent
         self.image_dir = self.base_dir / 'satellite_images_30min'
@@ -48,8 +53,12 @@ class ThirtyMinuteExtractor:
         self.image_dir.mkdir(exist_ok=True)
         self.data_dir.mkdir(exist_ok=True)
         
+        # Scene-keyed thumbnail cache (neighbouring dates often share a scene)
+        self.thumbnail_cache = ThumbnailCache()
+        
         self.results = []
-        self.weather_data = []
+        # Weather rows accumulate column-wise (see record_builder.py)
+        self.weather_data = RecordBuilder()
     
     def get_hourly_weather_data(self, lat, lon, date, location_name):
         """
@@ -62,7 +71,7 @@ class ThirtyMinuteExtractor:
             location_name: Name of location
         
         Returns:
-            list: List of hourly weather records
+            pd.DataFrame: 30-minute weather rows (None if no data)
         """
         
         try:
@@ -78,82 +87,41 @@ class ThirtyMinuteExtractor:
             )
             
             if data and 'properties' in data and 'parameter' in data['properties']:
-                params = data['properties']['parameter']
-                
-                # Extract hourly data and create 30-minute intervals
-                weather_records = []
-                
-                # NASA POWER provides hourly data (24 hours per day)
-                for hour in range(24):
-                    # Hour key format: YYYYMMDDHH
-                    hour_key = f"{date_formatted}{hour:02d}"
-                    
-                    # Get values for this hour
-                    temp = params.get('T2M', {}).get(hour_key)
-                    rh = params.get('RH2M', {}).get(hour_key)
-                    ws = params.get('WS2M', {}).get(hour_key)
-                    precip = params.get('PRECTOTCORR', {}).get(hour_key)
-                    
-                    if temp is not None:  # Only add if we have data
-                        # Create record for :00 minutes
-                        time_00 = f"{hour:02d}:00"
-                        weather_records.append({
-                            'Date': date,
-                            'Time': time_00,
-                            'DateTime': f"{date} {time_00}",
-                            'Location': location_name,
-                            'Latitude': lat,
-                            'Longitude': lon,
-                            'Temperature_2m_C': temp,
-                            'Relative_Humidity_%': rh,
-                            'Wind_Speed_2m_m/s': ws,
-                            'Precipitation_mm': precip,
-                        })
-                        
-                        # Create record for :30 minutes (interpolated/repeated)
-                        # Note: NASA POWER provides hourly data, so :30 uses same values
-                        time_30 = f"{hour:02d}:30"
-                        weather_records.append({
-                            'Date': date,
-                            'Time': time_30,
-                            'DateTime': f"{date} {time_30}",
-                            'Location': location_name,
-                            'Latitude': lat,
-                            'Longitude': lon,
-                            'Temperature_2m_C': temp,
-                            'Relative_Humidity_%': rh,
-                            'Wind_Speed_2m_m/s': ws,
-                            'Precipitation_mm': precip,
-                        })
-                
-                if weather_records:
-                    print(f"   ✅ {location_name}: {len(weather_records)} records (30-min intervals)")
-                    return weather_records
+                # NASA POWER provides hourly data, so :00 and :30 use the same values
+                weather_df = self.nasa_api.hourly_location_frame(
+                    data, location_name, lat, lon,
+                    {
+                        'T2M': 'Temperature_2m_C',
+                        'RH2M': 'Relative_Humidity_%',
+                        'WS2M': 'Wind_Speed_2m_m/s',
+                        'PRECTOTCORR': 'Precipitation_mm',
+                    }
+                )
+                if weather_df is not None and len(weather_df):
+                    self.log.debug("   ✅ {location} {date}: {records} records (30-min intervals)",
+                                   location=location_name, date=date, records=len(weather_df))
+                    return weather_df
                 else:
-                    print(f"   ❌ {location_name}: No data available")
-                    return []
+                    self.log.warning("   ❌ {location} {date}: No data available",
+                                     location=location_name, date=date)
+                    return None
                     
         except Exception as e:
-            print(f"   ❌ {location_name}: Error - {e}")
-            return []
+            self.log.error("   ❌ {location} {date}: Error - {error}",
+                           location=location_name, date=date, error=e)
+            return None
     
-    def get_landsat8_image(self, lat, lon, date, location_name, cloud_cover_max=50):
+    def get_landsat8_image(self, lat, lon, date, location_name, cloud_cover_max=50, scene=None):
         """Get Landsat 8 image from Google Earth Engine"""
         
         try:
-            target_date = datetime.strptime(date, '%Y-%m-%d')
-            start_date = (target_date - timedelta(days=8)).strftime('%Y-%m-%d')
-            end_date = (target_date + timedelta(days=8)).strftime('%Y-%m-%d')
-            
-            point = ee.Geometry.Point([lon, lat])
+            # Best-scene metadata: prefetched in one batched query, or looked up here
+            if scene is None:
+                scene = find_best_scenes(
+                    [(location_name, lat, lon, date)], cloud_cover_max=cloud_cover_max
+                )[(location_name, date)]
             
-            collection = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2') \
-                .filterBounds(point) \
-                .filterDate(start_date, end_date) \
-                .filter(ee.Filter.lt('CLOUD_COVER', cloud_cover_max)) \
-                .sort('CLOUD_COVER')
-            
-            count = collection.size().getInfo()
+            count = scene['images_found']
             
             if count == 0:
                 return {
@@ -163,39 +131,21 @@ class ThirtyMinuteExtractor:
                     'location': location_name,
                 }
             
-            image = collection.first()
-            image_date = ee.Date(image.get('system:time_start')).format('YYYY-MM-dd').getInfo()
-            cloud_cover = image.get('CLOUD_COVER').getInfo()
-            
-            # Scale and get RGB
-            def apply_scale_factors(img):
-                optical_bands = img.select('SR_B.').multiply(0.0000275).add(-0.2)
-                return img.addBands(optical_bands, None, True)
-            
-            scaled_image = apply_scale_factors(image)
-            rgb = scaled_image.select(['SR_B4', 'SR_B3', 'SR_B2'])
-            region = point.buffer(7500).bounds()
+            image_date = scene['image_date']
+            cloud_cover = scene['cloud_cover']
             
-            url = rgb.getThumbURL({
-                'region': region.getInfo(),
-                'dimensions': 512,
-                'format': 'png',
-                'min': 0,
-                'max': 0.3
-            })
+            filename = f"{location_name}_{image_date}.png"
+            filepath = self.image_dir / filename
             
-            response = requests.get(url, timeout=60)
+            # Served from the scene thumbnail cache when this scene was already fetched
+            status_code = save_thumbnail(scene, filepath, self.thumbnail_cache, location_name, date)
             
-            if response.status_code == 200:
-                filename = f"{location_name}_{image_date}.png"
-                filepath = self.image_dir / filename
-                
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
-                
+            if status_code == 200:
                 file_size = filepath.stat().st_size / 1024
                 
-                print(f"   ✅ {location_name}: Satellite image ({cloud_cover:.1f}% clouds, {file_size:.1f} KB)")
+                self.log.debug("   ✅ {location} {date}: Satellite image ({cloud_cover:.1f}% clouds, {file_size:.1f} KB)",
+                               location=location_name, date=date, cloud_cover=cloud_cover,
+                               file_size=file_size)
                 
                 return {
                     'status': 'success',
@@ -207,14 +157,18 @@ class ThirtyMinuteExtractor:
                     'cloud_cover': cloud_cover,
                 }
             else:
+                self.log.warning("   ❌ {location} {date}: Satellite HTTP {status}",
+                                 location=location_name, date=date, status=status_code)
                 return {
                     'status': 'error',
-                    'error': f'HTTP {response.status_code}',
+                    'error': f'HTTP {status_code}',
                     'date': date,
                     'location': location_name
                 }
                 
         except Exception as e:
+            self.log.error("   ❌ {location} {date}: Satellite error - {error}",
+                           location=location_name, date=date, error=e)
             return {
                 'status': 'error',
                 'error': str(e),
@@ -248,36 +202,39 @@ class ThirtyMinuteExtractor:
         
         start_time = time.time()
         
+        # Best scene for every (location, date) in one batched Earth Engine query
+        scenes = prefetch_best_scenes(scene_targets(locations, dates), cloud_cover_max)
+        
         for idx, (location_name, coords) in enumerate(locations.items(), 1):
             print(f"\n[{idx}/{len(locations)}] 📍 {location_name} ({coords['lat']:.4f}°N, {coords['lon']:.4f}°E)")
             print("-" * 70)
             
-            for date in dates:
-                # Get satellite image (one per day)
-                print(f"🛰️  Satellite: {date}...")
-                image_result = self.get_landsat8_image(
-                    lat=coords['lat'],
-                    lon=coords['lon'],
-                    date=date,
-                    location_name=location_name,
-                    cloud_cover_max=cloud_cover_max
-                )
-                self.results.append(image_result)
-                
-                # Get 30-minute interval weather data (48 per day)
-                print(f"☁️  Weather (30-min): {date}...")
-                weather_records = self.get_hourly_weather_data(
-                    lat=coords['lat'],
-                    lon=coords['lon'],
-                    date=date,
-                    location_name=location_name
-                )
-                
-                if weather_records:
-                    self.weather_data.extend(weather_records)
-                
-                # Delay
-                time.sleep(2)
+            with self.log.progress(len(dates), location_name, unit='days') as progress:
+                for date in dates:
+                    # Get satellite image (one per day)
+                    image_result = self.get_landsat8_image(
+                        lat=coords['lat'],
+                        lon=coords['lon'],
+                        date=date,
+                        location_name=location_name,
+                        cloud_cover_max=cloud_cover_max,
+                        scene=scenes.get((location_name, date))
+                    )
+                    self.results.append(image_result)
+                    
+                    # Get 30-minute interval weather data (48 per day)
+                    weather_df = self.get_hourly_weather_data(
+                        lat=coords['lat'],
+                        lon=coords['lon'],
+                        date=date,
+                        location_name=location_name
+                    )
+                    
+                    if weather_df is not None:
+                        self.weather_data.extend(weather_df)
+                    
+                    progress.update(satellite=int(image_result['status'] == 'success'),
+                                    weather=len(weather_df) if weather_df is not None else 0)
             
             print()
         
@@ -298,7 +255,7 @@ class ThirtyMinuteExtractor:
         print(f"\n💾 Satellite metadata: {satellite_file}")
         
         # Save weather data
-        weather_df = pd.DataFrame(self.weather_data)
+        weather_df = self.weather_data.to_pandas()
         weather_file = self.data_dir / 'weather_data_30min_intervals.csv'
         weather_df.to_csv(weather_file, index=False)
         print(f"💾 Weather data: {weather_file}")
@@ -307,7 +264,7 @@ class ThirtyMinuteExtractor:
         """Print extraction summary"""
         
         satellite_df = pd.DataFrame(self.results)
-        weather_df = pd.DataFrame(self.weather_data)
+        weather_df = self.weather_data.to_pandas()
         
         # Satellite summary
         total_sat = len(satellite_df)
@@ -1,18 +1,23 @@
 """
 5-Year Historical Data Extraction (2019-2023)
-Extracts weather data at 30-minute intervals for multiple years
+Extracts hourly weather data for multiple years (30-minute views built on load)
 """
 
 import ee
-import requests
 import pandas as pd
 import time
 from pathlib import Path
-from datetime import datetime, timedelta
 import sys
 
 try:
     from nasa_power_api import NASAPowerAPI
+    from ee_helpers import find_best_scenes, prefetch_best_scenes, save_thumbnail, scene_targets
+    from thumbnail_cache import ThumbnailCache
+    from thumbnail_pipeline import ThumbnailPipeline
+    from power_resample import load_resampled_csv
+    from progress_log import get_progress_log
+    from job_ledger import JobLedger
+    from metrics import get_metrics
 except ImportError:
     print("❌ Error: nasa_power_api.py not found")
     sys.exit(1)
@@ -21,10 +26,19 @@ except ImportError:
 class FiveYearExtractor:
     """
     Extracts 5 years of historical weather data (2019-2023)
-    - NASA POWER API: Hourly weather data (converted to 30-min intervals)
+    - NASA POWER API: Hourly weather data (stored once, resampled to 30-min on load)
     - Google Earth Engine: Landsat 8 imagery (selected dates only)
     """
     
+    # POWER parameter -> output column (stored hourly, resampled on load)
+    WEATHER_COLUMNS = {
+        'T2M': 'Temperature_2m_C',
+        'RH2M': 'Relative_Humidity_%',
+        'WS2M': 'Wind_Speed_2m_m/s',
+        'PRECTOTCORR': 'Precipitation_mm',
+        'ALLSKY_SFC_SW_DWN': 'Solar_Radiation_kWh/m2',
+    }
+    
     def __init__(self):
         """Initialize the extractor"""
         
@@ -40,6 +54,9 @@ class FiveYearExtractor:
         self.nasa_api = NASAPowerAPI()
         print("✅ NASA POWER API initialized")
         
+        # Levelled, buffered progress output (EXTRACTION_LOG_LEVEL=debug for per-month detail)
+        self.log = get_progress_log()
+        
         # Create directories
         self.base_dir = Path(__file__).parent
         self.image_dir = self.base_dir / 'satellite_images_5years'
@@ -47,6 +64,15 @@ class FiveYearExtractor:
         self.image_dir.mkdir(exist_ok=True)
         self.data_dir.mkdir(exist_ok=True)
         
+        # Scene-keyed thumbnail cache (neighbouring dates often share a scene)
+        self.thumbnail_cache = ThumbnailCache()
+        
+        # Concurrent thumbnail downloads per extraction run
+        self.download_workers = 4
+        
+        # Finished units survive crashes; a restarted run skips them
+        self.ledger = JobLedger()
+        
         self.satellite_results = []
         self.extraction_log = []
     
@@ -61,98 +87,79 @@ class FiveYearExtractor:
             location_name: Name of location
         
         Returns:
-            pd.DataFrame: Weather data with 30-min intervals
+            pd.DataFrame: Hourly weather data (see load_weather for 30-min views)
         """
         
         try:
             # Get data for entire year in chunks (monthly)
-            all_records = []
+            monthly_frames = []
             
-            for month in range(1, 13):
-                # Determine days in month
-                if month in [1, 3, 5, 7, 8, 10, 12]:
-                    days = 31
-                elif month in [4, 6, 9, 11]:
-                    days = 30
-                else:  # February
-                    days = 29 if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0) else 28
-                
-                start_date = f"{year}{month:02d}01"
-                end_date = f"{year}{month:02d}{days}"
-                
-                print(f"      Month {month:02d}: {start_date} to {end_date}...", end=' ')
-                
-                try:
-                    # Get hourly data
-                    data = self.nasa_api.get_hourly_data(
-                        latitude=lat,
-                        longitude=lon,
-                        start_date=start_date,
-                        end_date=end_date
-                    )
+            with self.log.progress(12, f"{location_name} {year}", unit='months') as progress:
+                for month in range(1, 13):
+                    # Determine days in month
+                    if month in [1, 3, 5, 7, 8, 10, 12]:
+                        days = 31
+                    elif month in [4, 6, 9, 11]:
+                        days = 30
+                    else:  # February
+                        days = 29 if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0) else 28
                     
-                    if data and 'properties' in data and 'parameter' in data['properties']:
-                        params = data['properties']['parameter']
+                    start_date = f"{year}{month:02d}01"
+                    end_date = f"{year}{month:02d}{days}"
+                    
+                    try:
+                        # Get hourly data
+                        data = self.nasa_api.get_hourly_data(
+                            latitude=lat,
+                            longitude=lon,
+                            start_date=start_date,
+                            end_date=end_date
+                        )
                         
-                        # Process each day in the month
-                        for day in range(1, days + 1):
-                            date_str = f"{year}-{month:02d}-{day:02d}"
-                            date_formatted = f"{year}{month:02d}{day:02d}"
-                            
-                            # Process 24 hours
-                            for hour in range(24):
-                                hour_key = f"{date_formatted}{hour:02d}"
-                                
-                                # Get values
-                                temp = params.get('T2M', {}).get(hour_key)
-                                rh = params.get('RH2M', {}).get(hour_key)
-                                ws = params.get('WS2M', {}).get(hour_key)
-                                precip = params.get('PRECTOTCORR', {}).get(hour_key)
-                                solar = params.get('ALLSKY_SFC_SW_DWN', {}).get(hour_key)
-                                
-                                if temp is not None:
-                                    # Create records for :00 and :30
-                                    for minute in [0, 30]:
-                                        time_str = f"{hour:02d}:{minute:02d}"
-                                        all_records.append({
-                                            'Date': date_str,
-                                            'Time': time_str,
-                                            'DateTime': f"{date_str} {time_str}",
-                                            'Location': location_name,
-                                            'Latitude': lat,
-                                            'Longitude': lon,
-                                            'Temperature_2m_C': temp,
-                                            'Relative_Humidity_%': rh,
-                                            'Wind_Speed_2m_m/s': ws,
-                                            'Precipitation_mm': precip,
-                                            'Solar_Radiation_kWh/m2': solar,
-                                        })
+                        month_df = self.nasa_api.hourly_location_frame(
+                            data, location_name, lat, lon, self.WEATHER_COLUMNS, resample=None
+                        ) if data else None
                         
-                        print(f"✅ {len(all_records)} records")
+                        if month_df is not None and len(month_df):
+                            monthly_frames.append(month_df)
+                            self.log.debug("      Month {month:02d}: {start} to {end} ✅ {records} records",
+                                           month=month, start=start_date, end=end_date,
+                                           records=len(month_df))
+                            progress.update(records=len(month_df))
+                            
+                        else:
+                            # Failed requests come back as None; record the month so the
+                            # year is not marked done with it missing
+                            self.log.warning("      ❌ Month {month:02d}: No data", month=month)
+                            progress.update(errors=1)
+                            self.extraction_log.append({
+                                'Location': location_name,
+                                'Year': year,
+                                'Month': month,
+                                'Status': 'Failed',
+                                'Error': 'No data'
+                            })
                         
-                    else:
-                        print("❌ No data")
-                    
-                    # Small delay between months
-                    time.sleep(1)
-                    
-                except Exception as e:
-                    print(f"❌ Error: {e}")
-                    self.extraction_log.append({
-                        'Location': location_name,
-                        'Year': year,
-                        'Month': month,
-                        'Status': 'Error',
-                        'Error': str(e)
-                    })
+                    except Exception as e:
+                        self.log.error("      ❌ Month {month:02d}: {error}", month=month, error=e)
+                        progress.update(errors=1)
+                        self.extraction_log.append({
+                            'Location': location_name,
+                            'Year': year,
+                            'Month': month,
+                            'Status': 'Error',
+                            'Error': str(e)
+                        })
             
-            if all_records:
-                df = pd.DataFrame(all_records)
-                print(f"   ✅ {location_name} {year}: {len(df)} total records (30-min intervals)")
+            if monthly_frames:
+                df = pd.concat(monthly_frames, ignore_index=True)
+                print(f"   ✅ {location_name} {year}: {len(df)} total records (hourly)")
                 
                 # Save yearly file
-                yearly_file = self.data_dir / f"{location_name}_{year}_30min.csv"
-                df.to_csv(yearly_file, index=False)
+                yearly_file = self.data_dir / f"{location_name}_{year}_hourly.csv"
+                with get_metrics().stage('write') as stage:
+                    df.to_csv(yearly_file, index=False)
+                    stage.rows = len(df)
                 print(f"   💾 Saved: {yearly_file.name}")
                 
                 self.extraction_log.append({
@@ -186,23 +193,40 @@ class FiveYearExtractor:
             })
             return None
     
-    def get_landsat8_image(self, lat, lon, date, location_name, cloud_cover_max=50):
-        """Get Landsat 8 image from Google Earth Engine"""
+    def load_weather(self, location_name, year, freq='30min'):
+        """
+        Load a stored hourly file at the requested resolution
+        
+        Args:
+            location_name: Name of location
+            year: Year (e.g., 2019)
+            freq: Output frequency ('30min', '15min', or '1h' for native hourly)
+        
+        Returns:
+            pd.DataFrame: Weather data (temperature, humidity and wind interpolated,
+                          precipitation totals conserved, solar radiation following
+                          the sun's elevation)
+        """
+        yearly_file = self.data_dir / f"{location_name}_{year}_hourly.csv"
+        return load_resampled_csv(yearly_file, freq=freq)
+    
+    def get_landsat8_image(self, lat, lon, date, location_name, cloud_cover_max=50, scene=None,
+                           pipeline=None):
+        """
+        Get Landsat 8 image from Google Earth Engine
+        
+        With a ThumbnailPipeline the download runs in the background and the
+        returned 'pending' dict is filled in once it finishes.
+        """
         
         try:
-            target_date = datetime.strptime(date, '%Y-%m-%d')
-            start_date = (target_date - timedelta(days=8)).strftime('%Y-%m-%d')
-            end_date = (target_date + timedelta(days=8)).strftime('%Y-%m-%d')
+            # Best-scene metadata: prefetched in one batched query, or looked up here
+            if scene is None:
+                scene = find_best_scenes(
+                    [(location_name, lat, lon, date)], cloud_cover_max=cloud_cover_max
+                )[(location_name, date)]
             
-            point = ee.Geometry.Point([lon, lat])
-            
-            collection = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2') \
-                .filterBounds(point) \
-                .filterDate(start_date, end_date) \
-                .filter(ee.Filter.lt('CLOUD_COVER', cloud_cover_max)) \
-                .sort('CLOUD_COVER')
-            
-            count = collection.size().getInfo()
+            count = scene['images_found']
             
             if count == 0:
                 return {
@@ -212,56 +236,49 @@ class FiveYearExtractor:
                     'location': location_name,
                 }
             
-            image = collection.first()
-            image_date = ee.Date(image.get('system:time_start')).format('YYYY-MM-dd').getInfo()
-            cloud_cover = image.get('CLOUD_COVER').getInfo()
+            image_date = scene['image_date']
+            cloud_cover = scene['cloud_cover']
             
-            # Scale and get RGB
-            def apply_scale_factors(img):
-                optical_bands = img.select('SR_B.').multiply(0.0000275).add(-0.2)
-                return img.addBands(optical_bands, None, True)
+            filename = f"{location_name}_{image_date}.png"
+            filepath = self.image_dir / filename
+            
+            def finish(status_code):
+                if status_code == 200:
+                    file_size = filepath.stat().st_size / 1024
+                    
+                    self.log.debug("      ✅ {location} {date}: Image saved ({cloud_cover:.1f}% clouds)",
+                                   location=location_name, date=date, cloud_cover=cloud_cover)
+                    
+                    return {
+                        'status': 'success',
+                        'filename': filename,
+                        'file_size_kb': file_size,
+                        'date': date,
+                        'actual_image_date': image_date,
+                        'location': location_name,
+                        'cloud_cover': cloud_cover,
+                    }
+                else:
+                    return {
+                        'status': 'error',
+                        'error': f'HTTP {status_code}',
+                        'date': date,
+                        'location': location_name
+                    }
             
-            scaled_image = apply_scale_factors(image)
-            rgb = scaled_image.select(['SR_B4', 'SR_B3', 'SR_B2'])
-            region = point.buffer(7500).bounds()
+            if pipeline is None:
+                # Served from the scene thumbnail cache when this scene was already fetched
+                return finish(save_thumbnail(scene, filepath, self.thumbnail_cache, location_name, date))
             
-            url = rgb.getThumbURL({
-                'region': region.getInfo(),
-                'dimensions': 512,
-                'format': 'png',
-                'min': 0,
-                'max': 0.3
-            })
+            # Queued: the download overlaps with the next year's weather request
+            result = {'status': 'pending', 'date': date, 'location': location_name}
             
-            response = requests.get(url, timeout=60)
+            def on_done(status_code):
+                result.update(finish(status_code))
+                self.record_image(result)
             
-            if response.status_code == 200:
-                filename = f"{location_name}_{image_date}.png"
-                filepath = self.image_dir / filename
-                
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
-                
-                file_size = filepath.stat().st_size / 1024
-                
-                print(f"      ✅ {location_name} {date}: Image saved ({cloud_cover:.1f}% clouds)")
-                
-                return {
-                    'status': 'success',
-                    'filename': filename,
-                    'file_size_kb': file_size,
-                    'date': date,
-                    'actual_image_date': image_date,
-                    'location': location_name,
-                    'cloud_cover': cloud_cover,
-                }
-            else:
-                return {
-                    'status': 'error',
-                    'error': f'HTTP {response.status_code}',
-                    'date': date,
-                    'location': location_name
-                }
+            pipeline.submit(scene, filepath, location_name, date, on_done=on_done)
+            return result
                 
         except Exception as e:
             return {
@@ -271,6 +288,16 @@ class FiveYearExtractor:
                 'location': location_name
             }
     
+    def record_image(self, result):
+        """Record a finished satellite image in the job ledger"""
+        if result['status'] in ('success', 'no_data'):
+            output = self.image_dir / result['filename'] if result['status'] == 'success' else None
+            self.ledger.done('landsat_thumbnail', result['location'], result['date'],
+                             output=output, result=result)
+        else:
+            self.ledger.failed('landsat_thumbnail', result['location'], result['date'],
+                               result.get('error'))
+    
     def extract_5years_data(self, locations, years, sample_dates_per_year=4):
         """
         Extract 5 years of weather data + selected satellite images
@@ -279,11 +306,14 @@ class FiveYearExtractor:
             locations: Dict of location names and coordinates
             years: List of years [2019, 2020, 2021, 2022, 2023]
             sample_dates_per_year: Number of satellite images per year per location
+        
+        Each (location, year) of weather and each satellite image is recorded in
+        the job ledger as it finishes; a restarted run skips finished units.
         """
         
         print("=" * 70)
         print("📅 5-YEAR HISTORICAL DATA EXTRACTION (2019-2023)")
-        print("   Weather Data: NASA POWER API (30-min intervals)")
+        print("   Weather Data: NASA POWER API (hourly, 30-min views on load)")
         print("   Satellite Images: Google Earth Engine (Selected dates)")
         print("=" * 70)
         print(f"📍 Locations: {len(locations)}")
@@ -297,6 +327,29 @@ class FiveYearExtractor:
         start_time = time.time()
         total_records = 0
         
+        # Sample satellite dates per year, with the best scene for every
+        # (location, date) selected in one batched Earth Engine query
+        sample_dates = {}
+        for year in years:
+            # Quarterly samples
+            sample_dates[year] = [
+                f"{year}-01-15",  # January (dry)
+                f"{year}-04-15",  # April (transition)
+                f"{year}-07-15",  # July (monsoon)
+                f"{year}-10-15",  # October (transition)
+            ][:sample_dates_per_year]
+        
+        # Images finished by an earlier (interrupted) run are not searched again
+        targets = [
+            target for target in
+            scene_targets(locations, [date for dates in sample_dates.values() for date in dates])
+            if not self.ledger.is_done('landsat_thumbnail', target[0], target[3])
+        ]
+        scenes = prefetch_best_scenes(targets, cloud_cover_max=70)
+        
+        # Thumbnails download on worker threads while the loop continues
+        pipeline = ThumbnailPipeline(self.thumbnail_cache, max_workers=self.download_workers)
+        
         for idx, (location_name, coords) in enumerate(locations.items(), 1):
             print(f"\n{'='*70}")
             print(f"[{idx}/{len(locations)}] 📍 {location_name} ({coords['lat']:.4f}°N, {coords['lon']:.4f}°E)")
@@ -305,40 +358,69 @@ class FiveYearExtractor:
             for year in years:
                 print(f"   📅 Year {year}:")
                 
-                # Get weather data for entire year
-                weather_df = self.get_hourly_weather_batch(
-                    lat=coords['lat'],
-                    lon=coords['lon'],
-                    year=year,
-                    location_name=location_name
-                )
-                
-                if weather_df is not None:
-                    total_records += len(weather_df)
-                
-                # Get sample satellite images (quarterly)
-                # Dry season months for better cloud-free images
-                sample_dates = [
-                    f"{year}-01-15",  # January (dry)
-                    f"{year}-04-15",  # April (transition)
-                    f"{year}-07-15",  # July (monsoon)
-                    f"{year}-10-15",  # October (transition)
-                ][:sample_dates_per_year]
+                if self.ledger.is_done('power_hourly', location_name, year):
+                    entry = self.ledger.get('power_hourly', location_name, year)
+                    total_records += entry['records'] or 0
+                    print(f"      ⏭️  Already extracted: {Path(entry['output']).name} "
+                          f"({entry['records'] or 0:,} records)")
+                else:
+                    # Get weather data for entire year
+                    self.ledger.start('power_hourly', location_name, year)
+                    log_start = len(self.extraction_log)
+                    weather_df = self.get_hourly_weather_batch(
+                        lat=coords['lat'],
+                        lon=coords['lon'],
+                        year=year,
+                        location_name=location_name
+                    )
+                    
+                    # Months that errored (e.g. quota reached) are retried on the next run
+                    month_errors = [log for log in self.extraction_log[log_start:] if 'Month' in log]
+                    
+                    if weather_df is not None:
+                        total_records += len(weather_df)
+                    
+                    if weather_df is not None and not month_errors:
+                        self.ledger.done('power_hourly', location_name, year,
+                                         output=self.data_dir / f"{location_name}_{year}_hourly.csv",
+                                         records=len(weather_df))
+                    else:
+                        error = month_errors[-1]['Error'] if month_errors else 'No data'
+                        self.ledger.failed('power_hourly', location_name, year, error)
                 
                 print(f"\n   🛰️  Satellite Images (sampled):")
-                for date in sample_dates:
+                for date in sample_dates[year]:
+                    if self.ledger.is_done('landsat_thumbnail', location_name, date):
+                        self.log.debug("      ⏭️  {date}: already extracted", date=date)
+                        self.satellite_results.append(
+                            self.ledger.get('landsat_thumbnail', location_name, date)['result'])
+                        continue
+                    
+                    self.ledger.start('landsat_thumbnail', location_name, date)
                     result = self.get_landsat8_image(
                         lat=coords['lat'],
                         lon=coords['lon'],
                         date=date,
                         location_name=location_name,
-                        cloud_cover_max=70
+                        cloud_cover_max=70,
+                        scene=scenes.get((location_name, date)),
+                        pipeline=pipeline
                     )
+                    if result['status'] != 'pending':
+                        self.record_image(result)
                     self.satellite_results.append(result)
-                    time.sleep(2)
                 
                 print()
         
+        # Wait for queued thumbnail downloads before saving metadata
+        print("⏳ Finishing thumbnail downloads...")
+        pipeline.close()
+        print(f"   ✅ Thumbnails: {pipeline.summary()}")
+        
+        ledger_summary = self.ledger.summary()
+        print(f"📒 Job ledger: {ledger_summary['done']} units done, {ledger_summary['failed']} failed "
+              f"({self.ledger.path.name})")
+        
         # Save metadata
         self.save_metadata()
         
@@ -362,6 +444,10 @@ class FiveYearExtractor:
             log_file = self.data_dir / 'extraction_log_5years.csv'
             log_df.to_csv(log_file, index=False)
             print(f"💾 Extraction log: {log_file}")
+        
+        # Save API / stage metrics
+        get_metrics().export(self.data_dir)
+        print(f"📈 Metrics: {self.data_dir / 'metrics.prom'}")
     
     def print_summary(self, elapsed_time, total_records):
         """Print extraction summary"""
@@ -370,9 +456,9 @@ class FiveYearExtractor:
         print("📊 5-YEAR EXTRACTION SUMMARY")
         print("=" * 70)
         
-        print(f"\n☁️  WEATHER DATA (30-min intervals):")
+        print(f"\n☁️  WEATHER DATA (hourly):")
         print(f"   ✅ Total records extracted: {total_records:,}")
-        print(f"   ⏱️  Time resolution: 30 minutes")
+        print(f"   ⏱️  Time resolution: 1 hour stored, 30-min views via load_weather()")
         print(f"   📊 Parameters: Temp, Humidity, Wind, Precip, Solar Radiation")
         
         # Calculate success rate from log
@@ -400,6 +486,7 @@ class FiveYearExtractor:
         print(f"   Total time: {elapsed_time:.1f} seconds ({elapsed_time/60:.1f} minutes)")
         if total_records > 0:
             print(f"   Records per second: {total_records/elapsed_time:.1f}")
+        get_metrics().print_summary()
         
         print("=" * 70)
         
@@ -410,9 +497,9 @@ class FiveYearExtractor:
         
         print("\n✅ Extraction complete!")
         print(f"\n💡 TIP: Each location has separate yearly files:")
-        print(f"   Example: {self.data_dir}/Dhaka_2019_30min.csv")
-        print(f"            {self.data_dir}/Dhaka_2020_30min.csv")
-        print(f"   You can combine them or analyze separately")
+        print(f"   Example: {self.data_dir}/Dhaka_2019_hourly.csv")
+        print(f"            {self.data_dir}/Dhaka_2020_hourly.csv")
+        print(f"   Load 30-min data with load_weather('Dhaka', 2019, freq='30min')")
 
 
 def main():
@@ -433,13 +520,13 @@ def main():
     
     print(f"\n📍 Locations: {', '.join(locations.keys())}")
     print(f"📅 Years: {', '.join(map(str, years))}")
-    print(f"⏱️  30-minute intervals: 48 per day")
-    print(f"📊 Expected weather records: {len(locations)} × {len(years)} years × 365 days × 48 = {len(locations) * len(years) * 365 * 48:,}")
+    print(f"⏱️  Hourly records: 24 per day (30-min views built on load)")
+    print(f"📊 Expected weather records: {len(locations)} × {len(years)} years × 365 days × 24 = {len(locations) * len(years) * 365 * 24:,}")
     print(f"🛰️  Satellite images: {len(locations) * len(years) * 4} (quarterly samples)")
     
     print("\n⚠️  NOTE: This will take some time! Large dataset.")
     print("   Estimated time: 20-30 minutes")
-    print("   Files will be saved as: Location_Year_30min.csv")
+    print("   Files will be saved as: Location_Year_hourly.csv")
     
     input("\nPress Enter to start extraction...")
     
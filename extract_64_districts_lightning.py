@@ -5,11 +5,19 @@ Focused on lightning detection parameters
 """
 
 from nasa_power_api import NASAPowerAPI
+from async_power_api import fetch_all
+from extract_lightning_data import LightningDataExtractor
+from power_grid import grid_cell
+from job_ledger import JobLedger
 import pandas as pd
 from datetime import datetime, timedelta
+from pathlib import Path
 import time
 import os
 
+# Per-district output of each run, kept so an interrupted run can resume
+DISTRICT_PARTS_DIR = Path(__file__).parent / 'district_parts'
+
 # All 64 districts of Bangladesh with coordinates
 BANGLADESH_DISTRICTS = {
     # Dhaka Division
@@ -92,9 +100,18 @@ BANGLADESH_DISTRICTS = {
 }
 
 
-def extract_lightning_data():
+def extract_lightning_data(max_concurrency=8, regional=True, sampling='nearest'):
     """
     Extract weather data for all 64 districts with parameters important for lightning detection
+    
+    Args:
+        max_concurrency: Maximum number of NASA POWER requests in flight at once
+        regional: Fetch the Bangladesh bounding box once (one request per parameter)
+                  and sample districts from it, instead of one request per district
+        sampling: 'nearest' grid cell or 'bilinear' interpolation (regional mode)
+    
+    Each district is written to district_parts/ and recorded in the job ledger
+    as soon as it is extracted; a restarted run only fetches districts not yet done.
     """
     
     print("=" * 80)
@@ -147,19 +164,66 @@ def extract_lightning_data():
     
     start_time = time.time()
     
+    # Districts finished by an earlier (interrupted) run are loaded from disk
+    ledger = JobLedger()
+    period = f"{start_str}-{end_str}"
+    parts_dir = DISTRICT_PARTS_DIR / period
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    pending = {district for district in BANGLADESH_DISTRICTS
+               if not ledger.is_done('power_daily', district, period)}
+    if len(pending) < len(BANGLADESH_DISTRICTS):
+        print(f"⏭️  Resuming: {len(BANGLADESH_DISTRICTS) - len(pending)} districts already extracted")
+    
+    responses = {}
+    if regional and pending:
+        # One request per parameter for the whole country; districts are sampled locally
+        cube = api.get_regional_data(LightningDataExtractor.REGION_BOUNDS, start_str, end_str,
+                                     parameters=lightning_parameters)
+        if cube is not None:
+            responses = {
+                district: cube.point_response(coords['lat'], coords['lon'], method=sampling)
+                for district, coords in BANGLADESH_DISTRICTS.items()
+                if district in pending
+            }
+    
+    # Point mode (or regional fallback): fetch districts concurrently,
+    # one request per POWER grid cell shared by every district inside it
+    requests = [
+        {
+            'kind': 'daily',
+            'district': district,
+            'latitude': coords['lat'],
+            'longitude': coords['lon'],
+            'start_date': start_str,
+            'end_date': end_str,
+            'parameters': lightning_parameters,
+        }
+        for district, coords in BANGLADESH_DISTRICTS.items()
+        if district in pending and district not in responses
+    ]
+    if requests:
+        cells = {grid_cell(r['latitude'], r['longitude'], lightning_parameters) for r in requests}
+        print(f"🧩 {len(requests)} districts fall in {len(cells)} POWER grid cells")
+        responses.update(
+            (request['district'], data)
+            for request, data in fetch_all(requests, max_concurrency=max_concurrency)
+        )
+    
     for idx, (district, coords) in enumerate(BANGLADESH_DISTRICTS.items(), 1):
         print(f"\n[{idx}/{len(BANGLADESH_DISTRICTS)}] 📍 {district} ({coords['division']} Division)")
         print(f"    Coordinates: {coords['lat']:.4f}°N, {coords['lon']:.4f}°E")
         
+        if district not in pending:
+            entry = ledger.get('power_daily', district, period)
+            all_data.append(pd.read_csv(entry['output'], index_col=0, parse_dates=True))
+            success_count += 1
+            print(f"    ⏭️  Already extracted: {entry['records']} records")
+            continue
+        
+        ledger.start('power_daily', district, period)
+        
         try:
-            # Fetch data
-            data = api.get_daily_data(
-                latitude=coords['lat'],
-                longitude=coords['lon'],
-                start_date=start_str,
-                end_date=end_str,
-                parameters=lightning_parameters
-            )
+            data = responses.get(district)
             
             if data:
                 # Convert to DataFrame
@@ -171,24 +235,29 @@ def extract_lightning_data():
                     df['Division'] = coords['division']
                     df['Latitude'] = coords['lat']
                     df['Longitude'] = coords['lon']
+                    df['Grid_Cell'] = grid_cell(coords['lat'], coords['lon'], lightning_parameters)
+                    
+                    # Flush the district now so a crash later in the run keeps it
+                    part_file = parts_dir / f"{district}.csv"
+                    df.to_csv(part_file)
+                    ledger.done('power_daily', district, period, output=part_file, records=len(df))
                     
                     all_data.append(df)
                     success_count += 1
                     print(f"    ✓ Success! {len(df)} records retrieved")
                 else:
                     failed_districts.append(district)
+                    ledger.failed('power_daily', district, period, 'Failed to convert data')
                     print(f"    ✗ Failed to convert data")
             else:
                 failed_districts.append(district)
+                ledger.failed('power_daily', district, period, 'No data received')
                 print(f"    ✗ No data received")
                 
         except Exception as e:
             failed_districts.append(district)
+            ledger.failed('power_daily', district, period, e)
             print(f"    ✗ Error: {e}")
-        
-        # Be respectful to API - add delay
-        if idx < len(BANGLADESH_DISTRICTS):
-            time.sleep(1)  # 1 second delay between requests
     
     end_time = time.time()
     elapsed_time = end_time - start_time
@@ -211,9 +280,9 @@ def extract_lightning_data():
         combined_df.rename(columns={'index': 'Date'}, inplace=True)
         
         # Reorder columns
-        cols = ['Date', 'District', 'Division', 'Latitude', 'Longitude'] + \
+        cols = ['Date', 'District', 'Division', 'Latitude', 'Longitude', 'Grid_Cell'] + \
                [col for col in combined_df.columns if col not in 
-                ['Date', 'District', 'Division', 'Latitude', 'Longitude']]
+                ['Date', 'District', 'Division', 'Latitude', 'Longitude', 'Grid_Cell']]
         combined_df = combined_df[cols]
         
         print(f"\n✅ Combined Dataset Shape: {combined_df.shape}")
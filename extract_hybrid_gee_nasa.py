@@ -7,7 +7,6 @@ This combines the reliability of GEE with the free weather data from NASA POWER.
 """
 
 import ee
-import requests
 import pandas as pd
 import time
 from pathlib import Path
@@ -17,6 +16,14 @@ import sys
 # Import our existing NASA POWER API wrapper
 try:
     from nasa_power_api import NASAPowerAPI
+    from ee_helpers import (CHIP_BANDS, CHIP_SIZE, SEARCH_WINDOW_DAYS, composite_chips,
+                            composite_image, find_best_scenes, landsat_chip,
+                            prefetch_best_scenes, save_thumbnail, scene_targets)
+    from chip_store import ChipStore
+    from thumbnail_cache import ThumbnailCache
+    from thumbnail_pipeline import ThumbnailPipeline
+    from record_builder import RecordBuilder
+    from progress_log import get_progress_log
 except ImportError:
     print("❌ Error: nasa_power_api.py not found in current directory")
     print("💡 Make sure nasa_power_api.py is in the same folder")
@@ -47,17 +54,35 @@ class HybridDataExtractor:
         self.nasa_api = NASAPowerAPI()
         print("✅ NASA POWER API initialized")
         
+        # Levelled, buffered progress output (EXTRACTION_LOG_LEVEL=debug for per-date detail)
+        self.log = get_progress_log()
+        
         # Create directories
         self.base_dir = Path(__file__).parent
         self.image_dir = self.base_dir / 'satellite_images_gee'
+        self.chip_dir = self.base_dir / 'satellite_chips_gee'
         self.data_dir = self.base_dir / 'weather_data'
         self.image_dir.mkdir(exist_ok=True)
         self.data_dir.mkdir(exist_ok=True)
         
+        # Scene-keyed thumbnail cache (neighbouring dates often share a scene)
+        self.thumbnail_cache = ThumbnailCache()
+        
+        # Concurrent thumbnail downloads per extraction run
+        self.download_workers = 4
+        
+        # Raw band arrays (opened on the first 'chips' extraction)
+        self.chip_store = None
+        # Composite chips, one store per method (keyed by center date, so kept
+        # apart from scene chips keyed by acquisition date)
+        self.composite_stores = {}
+        
         self.results = []
-        self.weather_data = []
+        # Daily weather rows accumulate column-wise (see record_builder.py)
+        self.weather_data = RecordBuilder()
     
-    def get_landsat8_image(self, lat, lon, date, location_name, cloud_cover_max=50):
+    def get_landsat8_image(self, lat, lon, date, location_name, cloud_cover_max=50, scene=None,
+                           pipeline=None):
         """
         Get Landsat 8 image from Google Earth Engine
         
@@ -67,31 +92,23 @@ class HybridDataExtractor:
             date: Date string 'YYYY-MM-DD'
             location_name: Name of location
             cloud_cover_max: Maximum cloud cover percentage (default 50%)
+            scene: Prefetched scene from ee_helpers.find_best_scenes (optional)
+            pipeline: ThumbnailPipeline to download in the background (optional);
+                the returned dict is 'pending' and is filled in once the
+                download finishes
         
         Returns:
             dict: Result with status and image info
         """
         
         try:
-            # Parse date
-            target_date = datetime.strptime(date, '%Y-%m-%d')
-            
-            # Create date range (±8 days for Landsat 8's 16-day cycle)
-            start_date = (target_date - timedelta(days=8)).strftime('%Y-%m-%d')
-            end_date = (target_date + timedelta(days=8)).strftime('%Y-%m-%d')
-            
-            # Define point of interest
-            point = ee.Geometry.Point([lon, lat])
+            # Best-scene metadata: prefetched in one batched query, or looked up here
+            if scene is None:
+                scene = find_best_scenes(
+                    [(location_name, lat, lon, date)], cloud_cover_max=cloud_cover_max
+                )[(location_name, date)]
             
-            # Get Landsat 8 Collection 2, Level 2 (surface reflectance)
-            collection = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2') \
-                .filterBounds(point) \
-                .filterDate(start_date, end_date) \
-                .filter(ee.Filter.lt('CLOUD_COVER', cloud_cover_max)) \
-                .sort('CLOUD_COVER')
-            
-            # Get image count
-            count = collection.size().getInfo()
+            count = scene['images_found']
             
             if count == 0:
                 return {
@@ -102,71 +119,127 @@ class HybridDataExtractor:
                     'images_found': 0
                 }
             
-            # Get the best image (lowest cloud cover)
-            image = collection.first()
-            
-            # Get image metadata
-            image_date = ee.Date(image.get('system:time_start')).format('YYYY-MM-dd').getInfo()
-            cloud_cover = image.get('CLOUD_COVER').getInfo()
-            scene_id = image.get('LANDSAT_SCENE_ID').getInfo()
-            
-            # Scale factors for Landsat 8 Collection 2
-            def apply_scale_factors(img):
-                optical_bands = img.select('SR_B.').multiply(0.0000275).add(-0.2)
-                return img.addBands(optical_bands, None, True)
+            # Best image (lowest cloud cover)
+            image_date = scene['image_date']
+            cloud_cover = scene['cloud_cover']
+            scene_id = scene['scene_id']
             
-            scaled_image = apply_scale_factors(image)
+            filename = f"{location_name}_{image_date}.png"
+            filepath = self.image_dir / filename
             
-            # Create RGB composite (Red, Green, Blue)
-            rgb = scaled_image.select(['SR_B4', 'SR_B3', 'SR_B2'])
+            def finish(status_code):
+                if status_code == 200:
+                    file_size = filepath.stat().st_size / 1024  # KB
+                    
+                    self.log.debug("   ✅ {location}: {image_date} ({cloud_cover:.1f}% clouds, {file_size:.1f} KB)",
+                                   location=location_name, image_date=image_date,
+                                   cloud_cover=cloud_cover, file_size=file_size)
+                    
+                    return {
+                        'status': 'success',
+                        'filename': filename,
+                        'file_size_kb': file_size,
+                        'date': date,
+                        'actual_image_date': image_date,
+                        'location': location_name,
+                        'cloud_cover': cloud_cover,
+                        'scene_id': scene_id,
+                        'images_found': count
+                    }
+                else:
+                    self.log.warning("   ❌ {location} {date}: thumbnail HTTP {status}",
+                                     location=location_name, date=date, status=status_code)
+                    return {
+                        'status': 'error',
+                        'error': f'HTTP {status_code}',
+                        'date': date,
+                        'location': location_name
+                    }
             
-            # Define region (15km x 15km around point, matching NASA Earth API)
-            region = point.buffer(7500).bounds()
+            if pipeline is None:
+                # Served from the scene thumbnail cache when this scene was already fetched
+                return finish(save_thumbnail(scene, filepath, self.thumbnail_cache, location_name, date))
             
-            # Get download URL
-            url = rgb.getThumbURL({
-                'region': region.getInfo(),
-                'dimensions': 512,
-                'format': 'png',
-                'min': 0,
-                'max': 0.3
-            })
-            
-            # Download image
-            response = requests.get(url, timeout=60)
-            
-            if response.status_code == 200:
-                # Save image
-                filename = f"{location_name}_{image_date}.png"
-                filepath = self.image_dir / filename
-                
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
-                
-                file_size = filepath.stat().st_size / 1024  # KB
-                
-                print(f"   ✅ {location_name}: {image_date} ({cloud_cover:.1f}% clouds, {file_size:.1f} KB)")
+            # Queued: the download overlaps with the next Earth Engine query
+            result = {'status': 'pending', 'date': date, 'location': location_name}
+            pipeline.submit(scene, filepath, location_name, date,
+                            on_done=lambda status_code: result.update(finish(status_code)))
+            self.log.debug("   ⏳ {location}: {image_date} queued",
+                           location=location_name, image_date=image_date)
+            return result
                 
+        except Exception as e:
+            self.log.error("   ❌ {location} {date}: {error}", location=location_name, date=date, error=e)
+            return {
+                'status': 'error',
+                'error': str(e),
+                'date': date,
+                'location': location_name
+            }
+    
+    def get_landsat8_chip(self, lat, lon, date, location_name, cloud_cover_max=50, scene=None):
+        """
+        Get Landsat 8 surface reflectance + temperature bands as a NumPy chip
+        
+        The chip is stored in self.chip_store instead of being saved as a PNG
+        (see chip_store.py); a scene date already in the store is not fetched again.
+        
+        Args:
+            lat: Latitude
+            lon: Longitude
+            date: Date string 'YYYY-MM-DD'
+            location_name: Name of location
+            cloud_cover_max: Maximum cloud cover percentage
+            scene: Prefetched scene from ee_helpers.find_best_scenes (optional)
+        
+        Returns:
+            dict: Result with status and chip info
+        """
+        
+        try:
+            if scene is None:
+                scene = find_best_scenes(
+                    [(location_name, lat, lon, date)], cloud_cover_max=cloud_cover_max
+                )[(location_name, date)]
+            
+            if scene['images_found'] == 0:
                 return {
-                    'status': 'success',
-                    'filename': filename,
-                    'file_size_kb': file_size,
+                    'status': 'no_data',
+                    'error': f'No cloud-free images found within ±8 days of {date}',
                     'date': date,
-                    'actual_image_date': image_date,
                     'location': location_name,
-                    'cloud_cover': cloud_cover,
-                    'scene_id': scene_id,
-                    'images_found': count
-                }
-            else:
-                return {
-                    'status': 'error',
-                    'error': f'HTTP {response.status_code}',
-                    'date': date,
-                    'location': location_name
+                    'images_found': 0
                 }
+            
+            image_date = scene['image_date']
+            cloud_cover = scene['cloud_cover']
+            
+            entry = self.chip_store.entry(location_name, image_date)
+            if entry is None:
+                chip = landsat_chip(scene, bands=self.chip_store.bands, size=self.chip_store.chip_size)
+                entry = self.chip_store.put(location_name, scene, chip, date=date)
+            
+            chip_size = len(self.chip_store.bands) * self.chip_store.chip_size ** 2 * 2 / 1024  # KB
+            self.log.debug("   ✅ {location}: {image_date} ({cloud_cover:.1f}% clouds, {bands} bands)",
+                           location=location_name, image_date=image_date, cloud_cover=cloud_cover,
+                           bands=len(self.chip_store.bands))
+            
+            return {
+                'status': 'success',
+                'filename': f"chunk-{entry['chunk']:05d}.npy",
+                'chip_slot': entry['slot'],
+                'file_size_kb': chip_size,
+                'date': date,
+                'actual_image_date': image_date,
+                'location': location_name,
+                'cloud_cover': cloud_cover,
+                'scene_id': scene['scene_id'],
+                'images_found': scene['images_found']
+            }
                 
         except Exception as e:
+            self.log.error("   ❌ {location} {date}: Error - {error}", location=location_name,
+                           date=date, error=str(e)[:80])
             return {
                 'status': 'error',
                 'error': str(e),
@@ -174,6 +247,98 @@ class HybridDataExtractor:
                 'location': location_name
             }
     
+    def composite_store(self, method='median'):
+        """ChipStore for composite chips of one method (satellite_chips_gee/composite_<method>)"""
+        if method not in self.composite_stores:
+            self.composite_stores[method] = ChipStore(self.chip_dir / f'composite_{method}',
+                                                      bands=CHIP_BANDS, chip_size=CHIP_SIZE)
+        return self.composite_stores[method]
+    
+    def get_composite_chips(self, locations, date, cloud_cover_max=50, method='median'):
+        """
+        Chips for every location from one server-side composite around a date
+        
+        A single cloud-masked composite of all scenes within ±8 days covers
+        every location, instead of one collection search per location.
+        
+        Args:
+            locations: Dict of location names and coordinates
+            date: Date string 'YYYY-MM-DD' (center of the window)
+            cloud_cover_max: Maximum scene cloud cover percentage
+            method: 'median' or 'best_pixel'
+        
+        Returns:
+            dict: (location_name, date) -> result with status and chip info
+        """
+        
+        center = datetime.strptime(date, '%Y-%m-%d')
+        start = (center - timedelta(days=SEARCH_WINDOW_DAYS)).strftime('%Y-%m-%d')
+        end = (center + timedelta(days=SEARCH_WINDOW_DAYS + 1)).strftime('%Y-%m-%d')
+        composite_id = f"composite:{method}:{start}/{end}"
+        
+        store = self.composite_store(method)
+        
+        self.log.debug("🧩 Composite {date} ({method}, {start} to {end}) for {count} locations...",
+                       date=date, method=method, start=start, end=end, count=len(locations))
+        
+        try:
+            pending = {name: coords for name, coords in locations.items()
+                       if not store.contains(name, date)}
+            chips = {}
+            if pending:
+                image = composite_image(pending, start, end, method=method,
+                                        cloud_cover_max=cloud_cover_max, bands=store.bands)
+                chips = composite_chips(image, pending, bands=store.bands,
+                                        size=store.chip_size)
+        except Exception as e:
+            self.log.error("   ❌ Composite {date} error - {error}", date=date, error=str(e)[:80])
+            return {
+                (location_name, date): {
+                    'status': 'error',
+                    'error': str(e),
+                    'date': date,
+                    'location': location_name
+                }
+                for location_name in locations
+            }
+        
+        results = {}
+        for location_name in locations:
+            # The composite is stored under its center date in the method's own store
+            scene = {'image_date': date, 'image_id': composite_id}
+            if location_name in chips:
+                chip = chips[location_name]
+                entry = store.put(location_name, scene, chip, date=date)
+                clear = float((chip[0] > 0).mean() * 100)
+            else:
+                entry = store.entry(location_name, date)
+                clear = float((store.get(location_name, date)[0] > 0).mean() * 100) if entry else 0.0
+            
+            if clear == 0:
+                results[(location_name, date)] = {
+                    'status': 'no_data',
+                    'error': f'No clear pixels within ±8 days of {date}',
+                    'date': date,
+                    'location': location_name
+                }
+                continue
+            
+            results[(location_name, date)] = {
+                'status': 'success',
+                'filename': f"{store.path.name}/chunk-{entry['chunk']:05d}.npy",
+                'chip_slot': entry['slot'],
+                'file_size_kb': len(store.bands) * store.chip_size ** 2 * 2 / 1024,
+                'date': date,
+                'actual_image_date': composite_id,
+                'location': location_name,
+                'cloud_cover': 100 - clear,
+            }
+        
+        successful = sum(1 for result in results.values() if result['status'] == 'success')
+        self.log.debug("   ✅ {successful}/{count} locations with clear pixels",
+                       successful=successful, count=len(locations))
+        return results
+    
     def get_weather_data(self, lat, lon, date, location_name):
         """
         Get weather data from NASA POWER API
@@ -225,17 +390,20 @@ class HybridDataExtractor:
                     'Solar_Radiation_Longwave_W/m2': params.get('ALLSKY_SFC_LW_DWN', {}).get(date_formatted),
                 }
                 
-                print(f"   ✅ {location_name}: Weather data retrieved")
+                self.log.debug("   ✅ {location} {date}: Weather data retrieved",
+                               location=location_name, date=date)
                 return weather_record
             else:
-                print(f"   ❌ {location_name}: No weather data available")
+                self.log.warning("   ❌ {location} {date}: No weather data available",
+                                 location=location_name, date=date)
                 return None
                 
         except Exception as e:
-            print(f"   ❌ {location_name}: Weather error - {e}")
+            self.log.error("   ❌ {location} {date}: Weather error - {error}",
+                           location=location_name, date=date, error=e)
             return None
     
-    def extract_hybrid_data(self, locations, dates, cloud_cover_max=50):
+    def extract_hybrid_data(self, locations, dates, cloud_cover_max=50, satellite_mode='thumbnail'):
         """
         Extract both satellite imagery and weather data
         
@@ -243,6 +411,9 @@ class HybridDataExtractor:
             locations: Dict of location names and coordinates {'Name': {'lat': x, 'lon': y}}
             dates: List of date strings ['YYYY-MM-DD', ...]
             cloud_cover_max: Maximum cloud cover for satellite images (default 50%)
+            satellite_mode: 'thumbnail' (RGB PNGs), 'chips' (raw band arrays
+                in a memory-mappable ChipStore) or 'composite' (chips cut from one
+                cloud-masked median composite per date covering all locations)
         """
         
         total_samples = len(locations) * len(dates)
@@ -256,45 +427,86 @@ class HybridDataExtractor:
         print(f"📅 Dates: {len(dates)}")
         print(f"📊 Total samples: {total_samples}")
         print(f"☁️  Max cloud cover: {cloud_cover_max}%")
+        print(f"🖼️  Satellite output: {satellite_mode}")
         print("=" * 70)
         print()
         
         start_time = time.time()
         
+        if satellite_mode == 'chips' and self.chip_store is None:
+            self.chip_store = ChipStore(self.chip_dir, bands=CHIP_BANDS, chip_size=CHIP_SIZE)
+        
+        if satellite_mode == 'composite':
+            # One server-side composite per date for all locations
+            scenes = {}
+            composites = {}
+            with self.log.progress(len(dates), 'Composites', unit='dates') as progress:
+                for date in dates:
+                    results = self.get_composite_chips(locations, date, cloud_cover_max)
+                    composites.update(results)
+                    progress.update(chips=sum(1 for result in results.values()
+                                              if result['status'] == 'success'))
+        else:
+            # Best scene for every (location, date) in one batched Earth Engine query
+            scenes = prefetch_best_scenes(scene_targets(locations, dates), cloud_cover_max)
+        print()
+        
+        # Thumbnails download on worker threads while the loop continues
+        pipeline = ThumbnailPipeline(self.thumbnail_cache, max_workers=self.download_workers)
+        
         for idx, (location_name, coords) in enumerate(locations.items(), 1):
             print(f"[{idx}/{len(locations)}] 📍 {location_name} ({coords['lat']:.4f}°N, {coords['lon']:.4f}°E)")
             print("-" * 70)
             
-            for date in dates:
-                # Get satellite image
-                print(f"🛰️  Satellite: {date}...", end=" ")
-                image_result = self.get_landsat8_image(
-                    lat=coords['lat'],
-                    lon=coords['lon'],
-                    date=date,
-                    location_name=location_name,
-                    cloud_cover_max=cloud_cover_max
-                )
-                self.results.append(image_result)
-                
-                # Get weather data
-                print(f"☁️  Weather: {date}...", end=" ")
-                weather_data = self.get_weather_data(
-                    lat=coords['lat'],
-                    lon=coords['lon'],
-                    date=date,
-                    location_name=location_name
-                )
-                if weather_data:
-                    self.weather_data.append(weather_data)
-                
-                print()
-                
-                # Respectful delay
-                time.sleep(2)
+            with self.log.progress(len(dates), location_name, unit='dates') as progress:
+                for date in dates:
+                    # Get satellite image
+                    if satellite_mode == 'composite':
+                        image_result = composites[(location_name, date)]
+                        self.log.debug("   🛰️  {location} {date}: composite chip ({status})",
+                                       location=location_name, date=date, status=image_result['status'])
+                    elif satellite_mode == 'chips':
+                        image_result = self.get_landsat8_chip(
+                            lat=coords['lat'],
+                            lon=coords['lon'],
+                            date=date,
+                            location_name=location_name,
+                            cloud_cover_max=cloud_cover_max,
+                            scene=scenes.get((location_name, date))
+                        )
+                    else:
+                        image_result = self.get_landsat8_image(
+                            lat=coords['lat'],
+                            lon=coords['lon'],
+                            date=date,
+                            location_name=location_name,
+                            cloud_cover_max=cloud_cover_max,
+                            scene=scenes.get((location_name, date)),
+                            pipeline=pipeline
+                        )
+                    self.results.append(image_result)
+                    
+                    # Get weather data
+                    weather_data = self.get_weather_data(
+                        lat=coords['lat'],
+                        lon=coords['lon'],
+                        date=date,
+                        location_name=location_name
+                    )
+                    if weather_data:
+                        self.weather_data.append(weather_data)
+                    
+                    progress.update(satellite=int(image_result['status'] in ('success', 'pending')),
+                                    weather=int(bool(weather_data)))
             
             print()
         
+        # Wait for queued thumbnail downloads before saving metadata
+        print("⏳ Finishing thumbnail downloads...")
+        pipeline.close()
+        print(f"   ✅ Thumbnails: {pipeline.summary()}")
+        print()
+        
         # Save results
         self.save_results()
         
@@ -312,7 +524,7 @@ class HybridDataExtractor:
         print(f"\n💾 Satellite metadata saved: {satellite_file}")
         
         # Save weather data
-        weather_df = pd.DataFrame(self.weather_data)
+        weather_df = self.weather_data.to_pandas()
         weather_file = self.data_dir / 'weather_data_hybrid.csv'
         weather_df.to_csv(weather_file, index=False)
         print(f"💾 Weather data saved: {weather_file}")
@@ -321,7 +533,7 @@ class HybridDataExtractor:
         """Print extraction summary"""
         
         satellite_df = pd.DataFrame(self.results)
-        weather_df = pd.DataFrame(self.weather_data)
+        weather_df = self.weather_data.to_pandas()
         
         # Satellite summary
         total_sat = len(satellite_df)
@@ -363,6 +575,12 @@ class HybridDataExtractor:
         
         print("\n📂 OUTPUT FILES:")
         print(f"   🛰️  {self.image_dir} - Satellite images")
+        if self.chip_store is not None:
+            print(f"   🧮 {self.chip_dir} - Satellite band chips ({len(self.chip_store)} chips, "
+                  f"{self.chip_store.size_mb():.1f} MB)")
+        for store in self.composite_stores.values():
+            print(f"   🧩 {store.path} - Composite band chips ({len(store)} chips, "
+                  f"{store.size_mb():.1f} MB)")
         print(f"   📊 {self.data_dir}/satellite_images_gee_metadata.csv")
         print(f"   📊 {self.data_dir}/weather_data_hybrid.csv")
         
@@ -403,6 +621,20 @@ def main():
     
     print(f"\n✅ Using max cloud cover: {cloud_cover_max}%")
     
+    # Ask for satellite output format
+    print(f"\n🖼️  Satellite output:")
+    print("   • thumbnail = 512px RGB PNGs (for viewing)")
+    print("   • chips     = raw SR_B1-SR_B7 + ST_B10 arrays (for ML training)")
+    print("   • composite = chips from one cloud-masked composite per date (many locations)")
+    
+    mode_input = input("\nSatellite output [thumbnail]: ").strip().lower()
+    if mode_input.startswith('chip'):
+        satellite_mode = 'chips'
+    elif mode_input.startswith('comp'):
+        satellite_mode = 'composite'
+    else:
+        satellite_mode = 'thumbnail'
+    
     input("\nPress ENTER to start extraction...")
     
     # Create extractor and run
@@ -410,7 +642,8 @@ def main():
     extractor.extract_hybrid_data(
         locations=locations,
         dates=dates,
-        cloud_cover_max=cloud_cover_max
+        cloud_cover_max=cloud_cover_max,
+        satellite_mode=satellite_mode
     )
     
     print("\n🎉 All done! Your hybrid dataset is ready for analysis.")
@@ -20,9 +20,18 @@ from datetime import datetime, timedelta
 from pathlib import Path
 import time
 import json
+import calendar
 
 try:
     from nasa_power_api import NASAPowerAPI
+    from async_power_api import fetch_all
+    from power_grid import grid_cell
+    from dataset_store import DatasetStore, LIGHTNING_DATASET_DTYPES
+    from lightning_climatology import load_climatology
+    from lightning_labels import LABEL_COLUMNS, label_lightning, label_partitions, resume_seed
+    from job_ledger import JobLedger
+    from metrics import get_metrics
+    from progress_log import get_progress_log
 except ImportError:
     print("❌ Error: nasa_power_api.py not found")
     import sys
@@ -34,16 +43,40 @@ class HybridLightningDatasetExtractor:
     Extract complete lightning prediction dataset:
     - Weather features from NASA POWER
     - Lightning occurrence from LIS/OTD climatology
-    - Combined in single CSV per year
+    - Stored once, partitioned by location and year (see dataset_store.py)
     """
     
-    def __init__(self):
-        """Initialize extractor"""
+    # POWER parameter -> feature column
+    WEATHER_COLUMNS = {
+        'T2M': 'Temperature_C',
+        'RH2M': 'Humidity_%',
+        'WS2M': 'Wind_Speed_m/s',
+        'PRECTOTCORR': 'Precipitation_mm',
+        'PS': 'Pressure_kPa',
+    }
+    
+    def __init__(self, max_concurrency=8, seed=None):
+        """
+        Initialize extractor
+        
+        Parameters:
+        -----------
+        max_concurrency : int
+            Parallel POWER requests during prefetch
+        seed : int
+            Seed for the synthetic lightning labels (default: the seed saved
+            with finished partitions in the job ledger, else a fresh one)
+        """
+        
+        self.max_concurrency = max_concurrency
         
         # Initialize NASA POWER API
         self.nasa_api = NASAPowerAPI()
         print("✅ NASA POWER API initialized")
         
+        # Levelled, buffered progress output (EXTRACTION_LOG_LEVEL=debug for per-month detail)
+        self.log = get_progress_log()
+        
         # Create output directory
         self.base_dir = Path(__file__).parent
         self.output_dir = self.base_dir / 'lightning_prediction_dataset'
@@ -51,45 +84,92 @@ class HybridLightningDatasetExtractor:
         
         print(f"✅ Output directory: {self.output_dir}")
         
+        # Single typed copy of the dataset; combined/per-location views read from it
+        self.store = DatasetStore(self.output_dir / 'store', dtypes=LIGHTNING_DATASET_DTYPES)
+        print(f"✅ Dataset store: {self.store.root} ({self.store.file_format})")
+        
+        # Finished (location, year) partitions survive crashes; a restarted run skips them
+        self.ledger = JobLedger()
+        
+        # A resumed run keeps the seed its finished partitions were labeled with
+        self.seed = resume_seed(self.ledger, 'lightning_dataset', seed)
+        
         # Bangladesh locations
         self.locations = {
             'Dhaka': {'lat': 23.8103, 'lon': 90.4125},
             'Chittagong': {'lat': 22.3569, 'lon': 91.7832}
         }
         
-        # Lightning climatology (monthly flash rates for Bangladesh)
-        # Based on NASA LIS/OTD data: flashes/km²/month
-        self.monthly_flash_rates = {
-            1: 1.5,   # January (dry season)
-            2: 2.0,   # February
-            3: 4.0,   # March (pre-monsoon)
-            4: 8.0,   # April
-            5: 12.0,  # May (peak)
-            6: 10.0,  # June (monsoon)
-            7: 8.0,   # July
-            8: 7.0,   # August
-            9: 6.0,   # September
-            10: 4.0,  # October
-            11: 2.0,  # November
-            12: 1.5   # December
-        }
+        # Lightning climatology (gridded LIS/OTD flash rates, memory-mapped;
+        # Bangladesh monthly averages if the gridded files are not installed)
+        self.climatology = load_climatology()
+        source = 'gridded LIS/OTD' if self.climatology.is_gridded else 'Bangladesh monthly averages'
+        print(f"✅ Lightning climatology: {source}")
+        
+        print(f"🎲 Label seed: {self.seed}")
+        
+        self.extracted_partitions = []
+    
+    @staticmethod
+    def month_date_range(year, month):
+        """Return POWER (start_date, end_date) strings covering one month"""
+        last_day = calendar.monthrange(year, month)[1]
+        return f"{year}{month:02d}01", f"{year}{month:02d}{last_day}"
+    
+    @staticmethod
+    def get_end_month(year):
+        """Last month to extract for a year (2025 is extracted up to November)"""
+        if year == 2025:
+            today = datetime.now()
+            if today.year == 2025:
+                return min(today.month, 11)  # Up to current month or November
+            return 11  # Full year available now
+        return 12
+    
+    def prefetch_weather(self, start_year, end_year, units=None):
+        """
+        Download every location/month concurrently into the response cache
+        
+        The per-month extraction loop then reads from the cache instead of
+        waiting on one HTTP round-trip at a time.
         
-        self.all_data = []
+        Parameters:
+        -----------
+        start_year, end_year : int
+            Years to prefetch
+        units : list of (location, year)
+            Only prefetch these partitions (default: all)
+        """
+        requests = []
+        for year in range(start_year, end_year + 1):
+            for location_name, coords in self.locations.items():
+                if units is not None and (location_name, year) not in units:
+                    continue
+                for month in range(1, self.get_end_month(year) + 1):
+                    start_date, end_date = self.month_date_range(year, month)
+                    requests.append({
+                        'kind': 'hourly',
+                        'latitude': coords['lat'],
+                        'longitude': coords['lon'],
+                        'start_date': start_date,
+                        'end_date': end_date,
+                    })
+        
+        print(f"\n🚀 Prefetching {len(requests)} location-months "
+              f"({self.max_concurrency} concurrent requests)...")
+        results = fetch_all(requests, max_concurrency=self.max_concurrency)
+        fetched = sum(1 for _, data in results if data)
+        print(f"   ✅ Prefetched {fetched}/{len(requests)} location-months")
     
     def get_weather_features_monthly(self, lat, lon, year, month, location_name):
         """
         Extract weather features for entire month (more efficient)
-        Returns features for ML training
+        Returns features for ML training as a DataFrame (None if no data)
         """
         
         try:
             # Get first and last day of month
-            import calendar
-            start_date = f"{year}{month:02d}01"
-            last_day = calendar.monthrange(year, month)[1]
-            end_date = f"{year}{month:02d}{last_day}"
-            
-            print(f"      Fetching month {month:02d}...", end=' ')
+            start_date, end_date = self.month_date_range(year, month)
             
             data = self.nasa_api.get_hourly_data(
                 latitude=lat,
@@ -98,191 +178,143 @@ class HybridLightningDatasetExtractor:
                 end_date=end_date
             )
             
-            if data and 'properties' in data and 'parameter' in data['properties']:
-                params = data['properties']['parameter']
-                feature_records = []
-                
-                # Process each day in the month
-                for day in range(1, last_day + 1):
-                    date = f"{year}-{month:02d}-{day:02d}"
-                    
-                    for hour in range(24):
-                        hour_key = f"{year}{month:02d}{day:02d}{hour:02d}"
-                        
-                        # Extract weather parameters
-                        temp = params.get('T2M', {}).get(hour_key)
-                        rh = params.get('RH2M', {}).get(hour_key)
-                        ws = params.get('WS2M', {}).get(hour_key)
-                        precip = params.get('PRECTOTCORR', {}).get(hour_key)
-                        pressure = params.get('PS', {}).get(hour_key)
-                        
-                        if temp is not None:
-                            # Create 30-min intervals
-                            for minute in [0, 30]:
-                                time_str = f"{hour:02d}:{minute:02d}"
-                                
-                                feature_records.append({
-                                    'DateTime': f"{date} {time_str}",
-                                    'Date': date,
-                                    'Time': time_str,
-                                    'Location': location_name,
-                                    'Latitude': lat,
-                                    'Longitude': lon,
-                                    
-                                    # Weather Features (X)
-                                    'Temperature_C': temp,
-                                    'Humidity_%': rh,
-                                    'Wind_Speed_m/s': ws,
-                                    'Precipitation_mm': precip if precip is not None else 0,
-                                    'Pressure_kPa': pressure,
-                                    
-                                    # Time Features (X)
-                                    'Month': month,
-                                    'Hour': hour,
-                                    'Minute': minute,
-                                })
-                
-                print(f"✅ {len(feature_records)} records")
-                return feature_records
+            month_df = self.month_features(self.nasa_api, data, location_name, lat, lon, month)
+            
+            if month_df is not None:
+                self.log.debug("      Month {month:02d}: ✅ {records} records", month=month,
+                               records=len(month_df))
+                return month_df
             else:
-                print("❌ No data")
-                return []
+                self.log.warning("      ❌ {location} month {month:02d}: No data",
+                                 location=location_name, month=month)
+                return None
                     
         except Exception as e:
-            print(f"❌ Error: {str(e)[:50]}")
-            return []
+            self.log.error("      ❌ {location} month {month:02d}: {error}",
+                           location=location_name, month=month, error=str(e)[:50])
+            return None
     
-    def calculate_lightning_occurrence(self, weather_records):
+    @classmethod
+    def month_features(cls, nasa_api, data, location_name, lat, lon, month, resample='30min'):
+        """
+        Weather and time features for one month of an hourly POWER response
+        
+        Parameters:
+        -----------
+        nasa_api : NASAPowerAPI
+            Client used to convert the response
+        data : dict
+            Response from get_hourly_data
+        resample : str or None
+            Row frequency ('30min', '15min', or None for hourly)
+        
+        Returns:
+        --------
+        pd.DataFrame : Feature rows, or None if the response has no data
+        """
+        
+        # Sub-hourly rows interpolated between hours (not duplicated) so
+        # consecutive rows carry distinct weather values
+        month_df = nasa_api.hourly_location_frame(
+            data, location_name, lat, lon, cls.WEATHER_COLUMNS, resample=resample, method='physical'
+        ) if data else None
+        
+        if month_df is None or not len(month_df):
+            return None
+        
+        # Weather Features (X): missing precipitation counts as none
+        month_df['Precipitation_mm'] = month_df['Precipitation_mm'].fillna(0)
+        
+        month_df['Grid_Cell'] = grid_cell(lat, lon, list(cls.WEATHER_COLUMNS))
+        
+        # Time Features (X)
+        month_df['Month'] = month
+        month_df['Hour'] = month_df.index.hour
+        month_df['Minute'] = month_df.index.minute
+        
+        front = ['DateTime', 'Date', 'Time']
+        month_df = month_df[front + [col for col in month_df.columns if col not in front]]
+        
+        return month_df.reset_index(drop=True)
+    
+    def calculate_lightning_occurrence(self, weather_df):
         """
         Calculate lightning occurrence for each weather record
-        Uses climatology + weather conditions
+        Uses climatology + weather conditions (vectorized, see lightning_labels.py)
+        Each (location, year, month) draws from its own stream of self.seed
+        
+        Parameters:
+        -----------
+        weather_df : pd.DataFrame
+            Weather features in time order (list of record dicts also accepted)
+        
+        Returns:
+        --------
+        pd.DataFrame : Lightning label columns aligned with weather_df
         """
         
-        lightning_labels = []
+        if not isinstance(weather_df, pd.DataFrame):
+            weather_df = pd.DataFrame(weather_df)
         
-        for i, record in enumerate(weather_records):
-            month = record['Month']
-            hour = record['Hour']
-            
-            # Base rate from climatology
-            base_rate = self.monthly_flash_rates.get(month, 5.0)
-            
-            # Time of day adjustment (lightning peaks in afternoon)
-            if 0 <= hour < 6:
-                time_factor = 0.2   # Night (low)
-            elif 6 <= hour < 12:
-                time_factor = 0.5   # Morning (moderate)
-            elif 12 <= hour < 18:
-                time_factor = 1.5   # Afternoon (peak)
-            else:
-                time_factor = 1.0   # Evening (high)
-            
-            # Weather condition adjustments
-            weather_factor = 1.0
-            
-            # High humidity increases lightning
-            if record['Humidity_%'] and record['Humidity_%'] > 70:
-                weather_factor *= 1.3
+        return label_lightning(weather_df, seed=self.seed, climatology=self.climatology)
+    
+    @staticmethod
+    def add_derived_features(df):
+        """
+        Add derived features for ML
+        """
+        
+        with get_metrics().stage('features') as stage:
+            # Season (Bangladesh specific)
+            def get_season(month):
+                if month in [12, 1, 2]:
+                    return 'Winter'
+                elif month in [3, 4, 5]:
+                    return 'Pre-Monsoon'
+                elif month in [6, 7, 8, 9]:
+                    return 'Monsoon'
+                else:  # 10, 11
+                    return 'Post-Monsoon'
             
-            # Precipitation strongly indicates lightning
-            if record['Precipitation_mm'] and record['Precipitation_mm'] > 0:
-                weather_factor *= 1.8
+            df['Season'] = df['Month'].apply(get_season)
             
-            # Strong winds increase probability
-            if record['Wind_Speed_m/s'] and record['Wind_Speed_m/s'] > 5:
-                weather_factor *= 1.2
+            # Time of day category
+            def get_time_category(hour):
+                if 0 <= hour < 6:
+                    return 'Night'
+                elif 6 <= hour < 12:
+                    return 'Morning'
+                elif 12 <= hour < 18:
+                    return 'Afternoon'
+                else:
+                    return 'Evening'
             
-            # Temperature in storm range
-            if record['Temperature_C'] and 25 <= record['Temperature_C'] <= 35:
-                weather_factor *= 1.1
+            df['Time_Category'] = df['Hour'].apply(get_time_category)
             
-            # Pressure changes (if not first record)
-            if i > 0 and record['Pressure_kPa'] and weather_records[i-1]['Pressure_kPa']:
-                pressure_change = abs(record['Pressure_kPa'] - weather_records[i-1]['Pressure_kPa'])
-                if pressure_change > 0.5:
-                    weather_factor *= 1.3
+            # Cyclical time features (sin/cos for periodicity)
+            df['Month_Sin'] = np.sin(2 * np.pi * df['Month'] / 12)
+            df['Month_Cos'] = np.cos(2 * np.pi * df['Month'] / 12)
+            df['Hour_Sin'] = np.sin(2 * np.pi * df['Hour'] / 24)
+            df['Hour_Cos'] = np.cos(2 * np.pi * df['Hour'] / 24)
             
-            # Calculate expected flashes
-            area_km2 = 100
-            days_in_month = 30
-            intervals_per_day = 48
+            # Temperature deviation from daily mean (if multiple records)
+            if len(df) > 1:
+                df['Temp_Deviation'] = df.groupby('Date')['Temperature_C'].transform(
+                    lambda x: x - x.mean() if len(x) > 1 else 0
+                )
+            else:
+                df['Temp_Deviation'] = 0
             
-            expected_flashes = (base_rate * area_km2 * time_factor * weather_factor) / (days_in_month * intervals_per_day)
+            # Precipitation binary flag
+            df['Has_Precipitation'] = (df['Precipitation_mm'] > 0).astype(int)
             
-            # Simulate actual flashes (Poisson distribution)
-            actual_flashes = np.random.poisson(expected_flashes)
+            # High humidity flag
+            df['High_Humidity'] = (df['Humidity_%'] > 70).astype(int)
             
-            # Lightning labels
-            lightning_occurred = 1 if actual_flashes > 0 else 0
-            flash_density = actual_flashes / area_km2
-            lightning_probability = min(expected_flashes / 2, 1.0)
+            # Strong wind flag
+            df['Strong_Wind'] = (df['Wind_Speed_m/s'] > 5).astype(int)
             
-            lightning_labels.append({
-                'Lightning_Occurred': lightning_occurred,
-                'Lightning_Probability': round(lightning_probability, 4),
-                'Flash_Count': actual_flashes,
-                'Flash_Density_per_km2': round(flash_density, 6),
-                'Expected_Flashes': round(expected_flashes, 4),
-                'Base_Flash_Rate': base_rate,
-                'Time_Factor': time_factor,
-                'Weather_Factor': round(weather_factor, 2)
-            })
-        
-        return lightning_labels
-    
-    def add_derived_features(self, df):
-        """
-        Add derived features for ML
-        """
-        
-        # Season (Bangladesh specific)
-        def get_season(month):
-            if month in [12, 1, 2]:
-                return 'Winter'
-            elif month in [3, 4, 5]:
-                return 'Pre-Monsoon'
-            elif month in [6, 7, 8, 9]:
-                return 'Monsoon'
-            else:  # 10, 11
-                return 'Post-Monsoon'
-        
-        df['Season'] = df['Month'].apply(get_season)
-        
-        # Time of day category
-        def get_time_category(hour):
-            if 0 <= hour < 6:
-                return 'Night'
-            elif 6 <= hour < 12:
-                return 'Morning'
-            elif 12 <= hour < 18:
-                return 'Afternoon'
-            else:
-                return 'Evening'
-        
-        df['Time_Category'] = df['Hour'].apply(get_time_category)
-        
-        # Cyclical time features (sin/cos for periodicity)
-        df['Month_Sin'] = np.sin(2 * np.pi * df['Month'] / 12)
-        df['Month_Cos'] = np.cos(2 * np.pi * df['Month'] / 12)
-        df['Hour_Sin'] = np.sin(2 * np.pi * df['Hour'] / 24)
-        df['Hour_Cos'] = np.cos(2 * np.pi * df['Hour'] / 24)
-        
-        # Temperature deviation from daily mean (if multiple records)
-        if len(df) > 1:
-            df['Temp_Deviation'] = df.groupby('Date')['Temperature_C'].transform(
-                lambda x: x - x.mean() if len(x) > 1 else 0
-            )
-        else:
-            df['Temp_Deviation'] = 0
-        
-        # Precipitation binary flag
-        df['Has_Precipitation'] = (df['Precipitation_mm'] > 0).astype(int)
-        
-        # High humidity flag
-        df['High_Humidity'] = (df['Humidity_%'] > 70).astype(int)
-        
-        # Strong wind flag
-        df['Strong_Wind'] = (df['Wind_Speed_m/s'] > 5).astype(int)
+            stage.rows = len(df)
         
         return df
     
@@ -292,59 +324,46 @@ class HybridLightningDatasetExtractor:
         """
         
         # Determine date range
-        if year == 2025:
-            # Extract up to yesterday
-            today = datetime.now()
-            if today.year == 2025:
-                end_month = min(today.month, 11)  # Up to current month or November
-            else:
-                end_month = 11  # Full year available now
-        else:
-            end_month = 12
+        end_month = self.get_end_month(year)
         
         print(f"\n   📅 Extracting {location_name} {year}: Months 1-{end_month}")
         
-        year_data = []
+        monthly_frames = []
         
         # Extract month by month (much more efficient!)
-        for month in range(1, end_month + 1):
-            # Get weather features for entire month
-            max_retries = 3
-            retry_count = 0
-            weather_records = None
-            
-            while retry_count < max_retries and not weather_records:
-                weather_records = self.get_weather_features_monthly(
+        with self.log.progress(end_month, f"{location_name} {year}", unit='months') as progress:
+            for month in range(1, end_month + 1):
+                # Get weather features for entire month
+                # (transient HTTP errors are retried with backoff by the rate limiter)
+                month_df = self.get_weather_features_monthly(
                     lat, lon, year, month, location_name
                 )
-                if not weather_records:
-                    retry_count += 1
-                    if retry_count < max_retries:
-                        print(f"      ⚠️  Retry {retry_count}/{max_retries}...", end=' ')
-                        time.sleep(5)
-            
-            if not weather_records:
-                print(f"      ❌ Skipped month {month} after {max_retries} attempts")
-                continue
-            
-            # Calculate lightning labels for all records
-            lightning_labels = self.calculate_lightning_occurrence(weather_records)
-            
-            # Combine features + labels
-            for weather, lightning in zip(weather_records, lightning_labels):
-                combined_record = {**weather, **lightning}
-                year_data.append(combined_record)
-            
-            # Small delay between months
-            time.sleep(2)
+                
+                if month_df is None:
+                    progress.update(skipped=1)
+                    continue
+                
+                monthly_frames.append(month_df)
+                progress.update(records=len(month_df))
+        
+        if not monthly_frames:
+            return None
         
-        print(f"   ✅ Completed {end_month} months - {len(year_data):,} records")
+        # Calculate lightning labels for the whole year at once and combine features + labels
+        weather_df = pd.concat(monthly_frames, ignore_index=True)
+        lightning_labels = self.calculate_lightning_occurrence(weather_df)
+        year_df = pd.concat([weather_df, lightning_labels], axis=1)
         
-        return year_data
+        print(f"   ✅ Completed {end_month} months - {len(year_df):,} records")
+        
+        return year_df
     
     def extract_all_years(self, start_year=2020, end_year=2025):
         """
         Extract dataset for all years (2020-2025)
+        
+        Each (location, year) partition is written to the store and recorded
+        in the job ledger as it finishes; a restarted run skips finished ones.
         """
         
         print("\n" + "=" * 80)
@@ -354,11 +373,22 @@ class HybridLightningDatasetExtractor:
         print("   Features (X): Weather parameters from NASA POWER")
         print("   Target (Y): Lightning occurrence from LIS/OTD climatology")
         print("   Resolution: 30-minute intervals")
-        print("   Output: One CSV per year per location")
+        print("   Output: Dataset store partitioned by location/year")
         print("=" * 80)
         
         start_time = time.time()
         
+        # Partitions finished by an earlier (interrupted) run are skipped
+        pending = set(self.ledger.pending('lightning_dataset', [
+            (location_name, year)
+            for year in range(start_year, end_year + 1)
+            for location_name in self.locations
+        ]))
+        
+        # Fan out all HTTP requests up front; the loop below is served from cache
+        if pending:
+            self.prefetch_weather(start_year, end_year, units=pending)
+        
         for year in range(start_year, end_year + 1):
             print(f"\n{'='*80}")
             print(f"📅 YEAR {year}")
@@ -367,18 +397,27 @@ class HybridLightningDatasetExtractor:
             for location_name, coords in self.locations.items():
                 print(f"\n📍 {location_name} ({coords['lat']:.4f}°N, {coords['lon']:.4f}°E)")
                 
+                if (location_name, year) not in pending:
+                    entry = self.ledger.get('lightning_dataset', location_name, year)
+                    print(f"   ⏭️  Already extracted ({entry['records'] or 0:,} records)")
+                    self.extracted_partitions.append((location_name, year))
+                    continue
+                
                 # Extract year data
-                year_data = self.extract_year_data(
-                    year, location_name, coords['lat'], coords['lon']
-                )
+                self.ledger.start('lightning_dataset', location_name, year)
+                try:
+                    df = self.extract_year_data(
+                        year, location_name, coords['lat'], coords['lon']
+                    )
+                except Exception as e:
+                    self.ledger.failed('lightning_dataset', location_name, year, e)
+                    raise
                 
-                if not year_data:
+                if df is None:
                     print(f"   ❌ No data for {location_name} {year}")
+                    self.ledger.failed('lightning_dataset', location_name, year, 'No data')
                     continue
                 
-                # Convert to DataFrame
-                df = pd.DataFrame(year_data)
-                
                 # Add derived features
                 print(f"      🔧 Adding derived features...")
                 df = self.add_derived_features(df)
@@ -392,47 +431,121 @@ class HybridLightningDatasetExtractor:
                 print(f"         Lightning intervals: {df['Lightning_Occurred'].sum():,} ({lightning_pct:.1f}%)")
                 print(f"         Total flashes: {total_flashes:,}")
                 
-                # Save to CSV
-                filename = f"{location_name.lower()}_{year}_lightning_dataset.csv"
-                filepath = self.output_dir / filename
-                df.to_csv(filepath, index=False)
-                print(f"      ✅ Saved: {filename}")
+                # Save one copy to the partitioned store
+                df['Year'] = year
+                paths = self.store.write(df)
+                for path in paths:
+                    print(f"      ✅ Saved: {path.relative_to(self.output_dir)}")
+                
+                # Months that failed (e.g. quota reached) are retried on the next run
+                months = df['Month'].nunique()
+                if months < self.get_end_month(year):
+                    self.ledger.failed('lightning_dataset', location_name, year,
+                                       f"Partial year: {months}/{self.get_end_month(year)} months")
+                else:
+                    self.ledger.done('lightning_dataset', location_name, year,
+                                     output=paths[0], records=len(df), result={'seed': self.seed})
                 
-                # Add to all_data for combined file
-                self.all_data.append(df)
+                self.extracted_partitions.append((location_name, year))
         
-        # Create combined dataset (all years, all locations)
+        # Report the combined / per-location views (read lazily from the store)
         self.create_combined_dataset()
         
         elapsed = time.time() - start_time
         self.print_summary(elapsed)
+        self.export_metrics()
+    
+    def export_metrics(self):
+        """Print stage / API timings and write metrics.prom and metrics.json"""
+        
+        metrics = get_metrics()
+        print()
+        metrics.print_summary()
+        for path in metrics.export(self.output_dir):
+            print(f"📈 Metrics: {path}")
     
-    def create_combined_dataset(self):
+    def relabel_dataset(self, seed=None, max_workers=None):
         """
-        Create combined dataset with all years and locations
+        Regenerate lightning labels for every stored partition
+        
+        Weather features are read back from the store and partitions are
+        labeled in parallel worker processes; the result is the same for any
+        number of workers.
+        
+        Parameters:
+        -----------
+        seed : int
+            New label seed (default: self.seed)
+        max_workers : int
+            Worker processes (default: CPU count)
+        
+        Returns:
+        --------
+        int : Partitions relabeled
         """
         
-        if not self.all_data:
-            return
+        if seed is not None:
+            self.seed = seed
+        
+        partitions = self.store.partitions()
+        if partitions.empty:
+            print("❌ No stored partitions to relabel")
+            return 0
+        
+        print(f"\n🎲 Relabeling {len(partitions)} partitions (seed {self.seed})...")
+        
+        frames = []
+        for part in partitions.itertuples():
+            df = self.store.read(location=part.Location, year=int(part.Year))
+            frames.append(df.drop(columns=[c for c in LABEL_COLUMNS if c in df.columns]))
+        
+        labels = label_partitions(frames, None, self.seed, max_workers=max_workers,
+                                  climatology=self.climatology)
+        
+        for part, df, df_labels in zip(partitions.itertuples(), frames, labels):
+            self.store.write(pd.concat([df, df_labels], axis=1))
+            
+            # Finished partitions now carry the new seed
+            entry = self.ledger.get('lightning_dataset', part.Location, int(part.Year))
+            if entry is not None and entry['status'] == 'done':
+                self.ledger.done('lightning_dataset', part.Location, int(part.Year),
+                                 output=entry['output'], records=entry['records'],
+                                 result={'seed': self.seed})
+        
+        print(f"   ✅ Relabeled {len(frames)} partitions")
+        return len(frames)
+    
+    def create_combined_dataset(self, columns=None):
+        """
+        Combined dataset with all years and locations
+        
+        A lazy read of the partitioned store - nothing is written again.
+        Use self.store.read(location=...) for a single location.
+        
+        Parameters:
+        -----------
+        columns : list
+            Columns to load (default: all)
+        
+        Returns:
+        --------
+        pd.DataFrame : All stored rows
+        """
+        
+        partitions = self.store.partitions()
+        if partitions.empty:
+            return None
         
         print(f"\n{'='*80}")
-        print("📦 Creating combined dataset...")
+        print("📦 Combined dataset (view of the partitioned store)")
         print(f"{'='*80}")
         
-        combined_df = pd.concat(self.all_data, ignore_index=True)
-        
-        # Save complete combined dataset
-        combined_file = self.output_dir / 'combined_all_years_all_locations.csv'
-        combined_df.to_csv(combined_file, index=False)
-        print(f"   ✅ Combined dataset: {combined_file}")
-        print(f"      Total records: {len(combined_df):,}")
+        for location, location_parts in partitions.groupby('Location'):
+            years = ', '.join(str(year) for year in sorted(location_parts['Year']))
+            print(f"   ✅ {location}: {years} ({location_parts['Size_MB'].sum():.1f} MB)")
+        print(f"   💾 Store size: {partitions['Size_MB'].sum():.1f} MB")
         
-        # Save by location (all years)
-        for location in combined_df['Location'].unique():
-            location_df = combined_df[combined_df['Location'] == location]
-            location_file = self.output_dir / f'{location.lower()}_all_years.csv'
-            location_df.to_csv(location_file, index=False)
-            print(f"   ✅ {location} (all years): {location_file.name} ({len(location_df):,} records)")
+        return self.store.read(columns=columns)
     
     def print_summary(self, elapsed_time):
         """
@@ -443,17 +556,21 @@ class HybridLightningDatasetExtractor:
         print("📊 EXTRACTION SUMMARY")
         print("=" * 80)
         
-        if not self.all_data:
+        if not self.extracted_partitions:
             print("❌ No data extracted")
             return
         
-        combined_df = pd.concat(self.all_data, ignore_index=True)
+        combined_df = self.store.read(
+            columns=['Location', 'Year', 'Date', 'DateTime', 'Lightning_Occurred', 'Flash_Count',
+                     'Temperature_C', 'Humidity_%', 'Wind_Speed_m/s', 'Precipitation_mm']
+        )
         
         print(f"\n✅ TOTAL DATASET:")
         print(f"   Records: {len(combined_df):,}")
         print(f"   Locations: {combined_df['Location'].nunique()}")
-        print(f"   Date range: {combined_df['Date'].min()} to {combined_df['Date'].max()}")
-        print(f"   Years: {sorted(combined_df['Date'].str[:4].unique())}")
+        dates = combined_df['Date'].astype(str)
+        print(f"   Date range: {dates.min()} to {dates.max()}")
+        print(f"   Years: {sorted(combined_df['Year'].unique().tolist())}")
         
         print("\n⚡ LIGHTNING STATISTICS:")
         total_with_lightning = combined_df['Lightning_Occurred'].sum()
@@ -475,7 +592,6 @@ class HybridLightningDatasetExtractor:
             print(f"      Flashes: {loc_df['Flash_Count'].sum():,}")
         
         print("\n📅 BY YEAR:")
-        combined_df['Year'] = combined_df['Date'].str[:4]
         yearly_stats = combined_df.groupby('Year').agg({
             'DateTime': 'count',
             'Lightning_Occurred': 'sum',
@@ -492,10 +608,8 @@ class HybridLightningDatasetExtractor:
         
         print("\n📂 OUTPUT FILES:")
         print("=" * 80)
-        output_files = sorted(self.output_dir.glob('*.csv'))
-        for file in output_files:
-            size = file.stat().st_size / (1024 * 1024)  # MB
-            print(f"   {file.name} ({size:.1f} MB)")
+        for part in self.store.partitions().itertuples():
+            print(f"   {part.File.relative_to(self.output_dir)} ({part.Size_MB:.1f} MB)")
         
         print("\n💡 DATASET STRUCTURE:")
         print("=" * 80)
@@ -514,7 +628,7 @@ class HybridLightningDatasetExtractor:
         
         print("\n✅ Dataset ready for machine learning!")
         print("   Next steps:")
-        print("   1. Load CSV files into your ML framework")
+        print("   1. Load with DatasetStore(...).read(columns=[...]) into your ML framework")
         print("   2. Use Lightning_Occurred as target for classification")
         print("   3. Train models: Random Forest, XGBoost, Neural Networks")
         print("   4. Evaluate using accuracy, precision, recall, F1-score")
@@ -535,7 +649,7 @@ def main():
     print("   • Chittagong (22.3569°N, 91.7832°E)")
     
     print("\n📊 Expected Output:")
-    print("   • 12 CSV files (2 locations × 6 years)")
+    print("   • 12 dataset partitions (2 locations × 6 years)")
     print("   • ~17,520 records per location per full year")
     print("   • ~190,000+ total records")
     
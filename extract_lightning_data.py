@@ -14,19 +14,39 @@ Alternative: NASA LIS/OTD Lightning Climatology for historical data
 import requests
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 import time
 import json
 
+from lightning_climatology import load_climatology
+from lightning_labels import (AREA_KM2, DAYS_PER_MONTH, INTERVALS_PER_DAY,
+                              draw_flashes, new_seed, partition_rng)
+
 
 class LightningDataExtractor:
     """
     Extract lightning strike data for Bangladesh using NASA/NOAA data sources
     """
     
-    def __init__(self):
-        """Initialize lightning data extractor"""
+    # Bangladesh region bounds
+    REGION_BOUNDS = {
+        'min_lat': 20.5,  # Southern Bangladesh
+        'max_lat': 26.5,  # Northern Bangladesh
+        'min_lon': 88.0,  # Western Bangladesh
+        'max_lon': 93.0   # Eastern Bangladesh
+    }
+    
+    def __init__(self, seed=None):
+        """
+        Initialize lightning data extractor
+        
+        Parameters:
+        -----------
+        seed : int
+            Seed for the simulated flashes (default: a fresh one, printed so
+            the data can be regenerated)
+        """
         
         self.base_dir = Path(__file__).parent
         self.output_dir = self.base_dir / 'lightning_data'
@@ -39,18 +59,29 @@ class LightningDataExtractor:
         }
         
         # Bangladesh region bounds
-        self.region_bounds = {
-            'min_lat': 20.5,  # Southern Bangladesh
-            'max_lat': 26.5,  # Northern Bangladesh
-            'min_lon': 88.0,  # Western Bangladesh
-            'max_lon': 93.0   # Eastern Bangladesh
-        }
+        self.region_bounds = dict(self.REGION_BOUNDS)
+        
+        # LIS/OTD flash-rate climatology (memory-mapped, shared per process)
+        self.climatology = load_climatology()
+        
+        # One random stream per (location, year, month), derived from the seed
+        self.seed = seed if seed is not None else new_seed()
+        self.rng_streams = {}
         
         print("✅ Lightning Data Extractor initialized")
         print(f"📂 Output directory: {self.output_dir}")
+        print(f"🎲 Seed: {self.seed}")
         
         self.lightning_data = []
     
+    def partition_rng(self, location_name, year, month):
+        """Random Generator for one (location, year, month) partition"""
+        
+        key = (location_name, year, month)
+        if key not in self.rng_streams:
+            self.rng_streams[key] = partition_rng(self.seed, location_name, year, month)
+        return self.rng_streams[key]
+    
     def get_lis_otd_climatology(self, location_name, lat, lon):
         """
         Get NASA LIS/OTD Lightning Climatology Data
@@ -58,37 +89,19 @@ class LightningDataExtractor:
         This provides historical lightning flash rate density
         Resolution: 0.5° × 0.5° grid
         Source: https://ghrc.nsstc.nasa.gov/lightning/
+        
+        Returns:
+        --------
+        dict : Month -> flash rate (flashes/km²/month) at (lat, lon)
         """
         
         print(f"\n📊 Fetching NASA LIS/OTD climatology for {location_name}...")
         
         try:
-            # NASA Global Hydrology Resource Center (GHRC) API
-            # LIS/OTD provides monthly/annual lightning climatology
-            
-            # Note: For actual data access, you need to:
-            # 1. Register at https://ghrc.nsstc.nasa.gov/
-            # 2. Use their data access portal
-            # 3. Download gridded NetCDF files
-            
-            # For now, we'll use approximate flash rate density based on published data
-            # Bangladesh has high lightning activity: ~20-40 flashes/km²/year
-            
-            # Approximate monthly flash rates for Bangladesh (flashes/km²/month)
-            monthly_flash_rates = {
-                1: 1.5,   # January (dry season, low activity)
-                2: 2.0,   # February
-                3: 4.0,   # March (pre-monsoon increase)
-                4: 8.0,   # April (pre-monsoon peak)
-                5: 12.0,  # May (peak)
-                6: 10.0,  # June (monsoon)
-                7: 8.0,   # July
-                8: 7.0,   # August
-                9: 6.0,   # September
-                10: 4.0,  # October
-                11: 2.0,  # November
-                12: 1.5   # December
-            }
+            # Gridded 0.5° LIS/OTD monthly climatology (see lightning_climatology.py);
+            # falls back to approximate Bangladesh rates (~20-40 flashes/km²/year)
+            # when the gridded files have not been installed
+            monthly_flash_rates = self.climatology.monthly_table(lat, lon)
             
             return monthly_flash_rates
             
@@ -96,10 +109,14 @@ class LightningDataExtractor:
             print(f"   ⚠️  Error: {e}")
             return None
     
-    def estimate_lightning_for_interval(self, date, time_str, location_name, monthly_rate):
+    def estimate_lightning_for_interval(self, date, time_str, location_name, monthly_rate=None,
+                                        lat=None, lon=None):
         """
         Estimate lightning occurrence for 30-min interval
         Based on climatological data and time of day patterns
+        
+        Uses the same climatology lookups as estimate_lightning_batch;
+        lat/lon default to the coordinates of a known location.
         """
         
         # Parse date and time
@@ -107,39 +124,30 @@ class LightningDataExtractor:
         month = dt.month
         hour = dt.hour
         
+        if lat is None or lon is None:
+            lat, lon = self.locations[location_name]['lat'], self.locations[location_name]['lon']
+        
         # Get monthly flash rate (flashes/km²/month)
-        base_rate = monthly_rate.get(month, 5.0)
+        if monthly_rate and month in monthly_rate:
+            base_rate = float(monthly_rate[month])
+        else:
+            base_rate = float(self.climatology.monthly_rates(lat, lon, month))
         
         # Adjust for time of day (lightning peaks in afternoon/evening)
-        time_of_day_factors = {
-            range(0, 6): 0.2,    # Night (low)
-            range(6, 12): 0.5,   # Morning (moderate)
-            range(12, 18): 1.5,  # Afternoon (peak)
-            range(18, 24): 1.0   # Evening (high)
-        }
-        
-        time_factor = 1.0
-        for hour_range, factor in time_of_day_factors.items():
-            if hour in hour_range:
-                time_factor = factor
-                break
+        time_factor = float(self.climatology.diurnal_factors(lat, lon, hour))
         
         # Calculate expected flashes for 30-min interval
         # Assume coverage area of 100 km² around location
-        area_km2 = 100
-        days_in_month = 30
-        intervals_per_day = 48
-        
-        expected_flashes = (base_rate * area_km2 * time_factor) / (days_in_month * intervals_per_day)
+        expected_flashes = (base_rate * AREA_KM2 * time_factor) / (DAYS_PER_MONTH * INTERVALS_PER_DAY)
         
         # Add random variation (Poisson distribution)
-        actual_flashes = np.random.poisson(expected_flashes)
+        actual_flashes = int(self.partition_rng(location_name, dt.year, month).poisson(expected_flashes))
         
         # Binary occurrence (1 if any lightning, 0 if none)
         lightning_occurred = 1 if actual_flashes > 0 else 0
         
         # Flash density (flashes per km² per 30-min)
-        flash_density = actual_flashes / area_km2
+        flash_density = actual_flashes / AREA_KM2
         
         return {
             'DateTime': f"{date} {time_str}",
@@ -157,6 +165,69 @@ class LightningDataExtractor:
             'Lightning_Probability': min(expected_flashes / 2, 1.0)  # Normalized probability
         }
     
+    def estimate_lightning_batch(self, dates, locations):
+        """
+        Estimate lightning occurrence for every 30-min interval of many days and locations
+        
+        Vectorized equivalent of estimate_lightning_for_interval: rates and
+        time-of-day factors are array lookups and flash counts are drawn per
+        (location, year, month) from the extractor's seeded streams.
+        
+        Parameters:
+        -----------
+        dates : list of str or pd.DatetimeIndex
+            Days to cover ('YYYY-MM-DD')
+        locations : dict
+            Location name -> {'lat': float, 'lon': float}
+        
+        Returns:
+        --------
+        pd.DataFrame : One row per location and 30-min interval
+        """
+        
+        days = pd.DatetimeIndex(pd.to_datetime(dates)).normalize()
+        offsets = pd.timedelta_range(start='0min', periods=INTERVALS_PER_DAY, freq='30min')
+        times = pd.DatetimeIndex((days.to_numpy()[:, None] + offsets.to_numpy()[None, :]).ravel())
+        
+        months = times.month.to_numpy()
+        hours = times.hour.to_numpy()
+        date_strings = times.strftime('%Y-%m-%d')
+        time_strings = times.strftime('%H:%M')
+        
+        frames = []
+        for location_name, coords in locations.items():
+            # Flashes/km²/month and time-of-day factor for every interval
+            base_rate = self.climatology.monthly_rates(coords['lat'], coords['lon'], months)
+            time_factor = self.climatology.diurnal_factors(coords['lat'], coords['lon'], hours)
+            expected = (base_rate * AREA_KM2 * time_factor) / (DAYS_PER_MONTH * INTERVALS_PER_DAY)
+            
+            frames.append(pd.DataFrame({
+                'DateTime': date_strings + ' ' + time_strings,
+                'Date': date_strings,
+                'Time': time_strings,
+                'Location': location_name,
+                'Month': months,
+                'Hour': hours,
+                'Monthly_Flash_Rate_km2': base_rate,
+                'Time_Of_Day_Factor': time_factor,
+                'Expected_Flashes': np.round(expected, 4),
+                'Lightning_Probability': np.minimum(expected / 2, 1.0),
+                'Latitude': coords['lat'],
+                'Longitude': coords['lon'],
+            }))
+            
+            # Poisson variation, one random stream per (location, year, month)
+            flashes = draw_flashes(expected, frames[-1], self.seed)
+            frames[-1]['Actual_Flash_Count'] = flashes
+            frames[-1]['Flash_Density_per_km2'] = np.round(flashes / AREA_KM2, 6)
+            frames[-1]['Lightning_Occurred'] = (flashes > 0).astype(int)
+        
+        columns = ['DateTime', 'Date', 'Time', 'Location', 'Month', 'Hour',
+                   'Monthly_Flash_Rate_km2', 'Time_Of_Day_Factor', 'Expected_Flashes',
+                   'Actual_Flash_Count', 'Flash_Density_per_km2', 'Lightning_Occurred',
+                   'Lightning_Probability', 'Latitude', 'Longitude']
+        return pd.concat(frames, ignore_index=True)[columns]
+    
     def get_goes16_glm_data(self, date, location_name, lat, lon):
         """
         Access GOES-16 GLM lightning data
@@ -193,8 +264,7 @@ class LightningDataExtractor:
         print("   Coverage: Bangladesh region")
         print("=" * 80)
         
-        start = datetime.strptime(start_date, '%Y-%m-%d')
-        dates = [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(num_days)]
+        dates = pd.date_range(start_date, periods=num_days, freq='D').strftime('%Y-%m-%d')
         
         print(f"\n📍 Locations: {', '.join(locations.keys())}")
         print(f"📅 Date range: {dates[0]} to {dates[-1]} ({num_days} days)")
@@ -205,42 +275,13 @@ class LightningDataExtractor:
         
         start_time = time.time()
         
-        for idx, (location_name, coords) in enumerate(locations.items(), 1):
-            print(f"\n{'='*80}")
-            print(f"[{idx}/{len(locations)}] 📍 {location_name} ({coords['lat']:.4f}°N, {coords['lon']:.4f}°E)")
-            print(f"{'='*80}\n")
-            
-            # Get monthly climatology for this location
-            monthly_rates = self.get_lis_otd_climatology(
-                location_name, coords['lat'], coords['lon']
-            )
-            
-            if not monthly_rates:
-                print(f"   ❌ Could not get climatology data for {location_name}")
-                continue
-            
-            print(f"   ✅ Lightning climatology loaded")
-            
-            for date_idx, date in enumerate(dates, 1):
-                if date_idx % 5 == 0 or date_idx == 1:
-                    print(f"📅 Processing day {date_idx}/{num_days}: {date}")
-                
-                # Generate 30-minute intervals for this day
-                for hour in range(24):
-                    for minute in [0, 30]:
-                        time_str = f"{hour:02d}:{minute:02d}"
-                        
-                        lightning_record = self.estimate_lightning_for_interval(
-                            date, time_str, location_name, monthly_rates
-                        )
-                        
-                        lightning_record['Latitude'] = coords['lat']
-                        lightning_record['Longitude'] = coords['lon']
-                        
-                        self.lightning_data.append(lightning_record)
-            
-            print(f"   ✅ Completed {len(dates)} days for {location_name}")
-            print(f"   📊 Generated {len(dates) * 48:,} lightning records")
+        # All days × 48 intervals for every location in one batch
+        df = self.estimate_lightning_batch(dates, locations)
+        self.lightning_data.append(df)
+        
+        for location_name, location_df in df.groupby('Location', sort=False):
+            print(f"   ✅ {location_name}: {location_df['Date'].nunique()} days, "
+                  f"{len(location_df):,} lightning records")
         
         elapsed = time.time() - start_time
         
@@ -256,7 +297,7 @@ class LightningDataExtractor:
         print("\n💾 Saving lightning data...")
         
         if self.lightning_data:
-            df = pd.DataFrame(self.lightning_data)
+            df = pd.concat(self.lightning_data, ignore_index=True)
             
             # Save complete dataset
             output_file = self.output_dir / 'lightning_data_30min.csv'
@@ -288,7 +329,7 @@ class LightningDataExtractor:
             print("❌ No data extracted")
             return
         
-        df = pd.DataFrame(self.lightning_data)
+        df = pd.concat(self.lightning_data, ignore_index=True)
         
         print(f"\n✅ TOTAL RECORDS: {len(df):,}")
         print(f"   Locations: {df['Location'].nunique()}")
@@ -23,6 +23,10 @@ import matplotlib.pyplot as plt
 
 try:
     from nasa_power_api import NASAPowerAPI
+    from ee_helpers import find_best_scenes, prefetch_best_scenes, save_thumbnail, scene_targets
+    from thumbnail_cache import ThumbnailCache
+    from record_builder import RecordBuilder
+    from progress_log import get_progress_log
 except ImportError:
     print("❌ Error: nasa_power_api.py not found")
     import sys
@@ -50,6 +54,9 @@ class LightningMultiModalExtractor:
         self.nasa_api = NASAPowerAPI()
         print("✅ NASA POWER API initialized")
         
+        # Levelled, buffered progress output (EXTRACTION_LOG_LEVEL=debug for per-day detail)
+        self.log = get_progress_log()
+        
         # NASA FIRMS API for lightning detection
         # You can get a free API key from: https://firms.modaps.eosdis.nasa.gov/api/
         self.firms_api_key = None  # User should add their key here
@@ -70,9 +77,13 @@ class LightningMultiModalExtractor:
         
         print("✅ Directory structure created")
         
-        self.weather_data = []
+        # Tabular rows accumulate column-wise (see record_builder.py)
+        self.weather_data = RecordBuilder()
+        # Scene-keyed thumbnail cache (neighbouring dates often share a scene)
+        self.thumbnail_cache = ThumbnailCache()
+        
         self.satellite_metadata = []
-        self.lightning_events = []
+        self.lightning_events = RecordBuilder()
     
     def get_weather_data(self, lat, lon, date, location_name):
         """Get weather parameters for 30-min intervals"""
@@ -88,92 +99,50 @@ class LightningMultiModalExtractor:
             )
             
             if data and 'properties' in data and 'parameter' in data['properties']:
-                params = data['properties']['parameter']
-                weather_records = []
-                
-                for hour in range(24):
-                    hour_key = f"{date_formatted}{hour:02d}"
-                    
-                    temp = params.get('T2M', {}).get(hour_key)
-                    rh = params.get('RH2M', {}).get(hour_key)
-                    ws = params.get('WS2M', {}).get(hour_key)
-                    precip = params.get('PRECTOTCORR', {}).get(hour_key)
-                    pressure = params.get('PS', {}).get(hour_key)
-                    
-                    if temp is not None:
-                        # Create 30-min intervals
-                        for minute in [0, 30]:
-                            time_str = f"{hour:02d}:{minute:02d}"
-                            weather_records.append({
-                                'Date': date,
-                                'Time': time_str,
-                                'DateTime': f"{date} {time_str}",
-                                'Location': location_name,
-                                'Latitude': lat,
-                                'Longitude': lon,
-                                'Temperature_C': temp,
-                                'Humidity_%': rh,
-                                'Wind_Speed_m/s': ws,
-                                'Precipitation_mm': precip,
-                                'Pressure_kPa': pressure,
-                            })
-                
-                return weather_records
+                # Hourly values expanded to 30-min intervals
+                weather_df = self.nasa_api.hourly_location_frame(
+                    data, location_name, lat, lon,
+                    {
+                        'T2M': 'Temperature_C',
+                        'RH2M': 'Humidity_%',
+                        'WS2M': 'Wind_Speed_m/s',
+                        'PRECTOTCORR': 'Precipitation_mm',
+                        'PS': 'Pressure_kPa',
+                    }
+                )
+                if weather_df is not None and len(weather_df):
+                    return weather_df
                     
         except Exception as e:
-            print(f"   ❌ Weather error: {e}")
-            return []
+            self.log.error("   ❌ Weather error {location} {date}: {error}",
+                           location=location_name, date=date, error=e)
+            return None
     
-    def get_satellite_image(self, lat, lon, date, location_name):
+    def get_satellite_image(self, lat, lon, date, location_name, scene=None):
         """Get satellite image for the date"""
         
         try:
-            target_date = datetime.strptime(date, '%Y-%m-%d')
-            start_date = (target_date - timedelta(days=8)).strftime('%Y-%m-%d')
-            end_date = (target_date + timedelta(days=8)).strftime('%Y-%m-%d')
-            
-            point = ee.Geometry.Point([lon, lat])
+            # Best-scene metadata: prefetched in one batched query, or looked up here
+            if scene is None:
+                scene = find_best_scenes(
+                    [(location_name, lat, lon, date)], cloud_cover_max=70
+                )[(location_name, date)]
             
-            collection = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2') \
-                .filterBounds(point) \
-                .filterDate(start_date, end_date) \
-                .filter(ee.Filter.lt('CLOUD_COVER', 70)) \
-                .sort('CLOUD_COVER')
-            
-            count = collection.size().getInfo()
+            count = scene['images_found']
             
             if count == 0:
                 return None
             
-            image = collection.first()
-            image_date = ee.Date(image.get('system:time_start')).format('YYYY-MM-dd').getInfo()
-            cloud_cover = image.get('CLOUD_COVER').getInfo()
-            
-            def apply_scale_factors(img):
-                optical_bands = img.select('SR_B.').multiply(0.0000275).add(-0.2)
-                return img.addBands(optical_bands, None, True)
+            image_date = scene['image_date']
+            cloud_cover = scene['cloud_cover']
             
-            scaled_image = apply_scale_factors(image)
-            rgb = scaled_image.select(['SR_B4', 'SR_B3', 'SR_B2'])
-            region = point.buffer(7500).bounds()
+            filename = f"{location_name}_{date}_satellite.png"
+            filepath = self.satellite_dir / filename
             
-            url = rgb.getThumbURL({
-                'region': region.getInfo(),
-                'dimensions': 512,
-                'format': 'png',
-                'min': 0,
-                'max': 0.3
-            })
+            # Served from the scene thumbnail cache when this scene was already fetched
+            status_code = save_thumbnail(scene, filepath, self.thumbnail_cache, location_name, date)
             
-            response = requests.get(url, timeout=60)
-            
-            if response.status_code == 200:
-                filename = f"{location_name}_{date}_satellite.png"
-                filepath = self.satellite_dir / filename
-                
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
-                
+            if status_code == 200:
                 return {
                     'date': date,
                     'actual_date': image_date,
@@ -183,10 +152,11 @@ class LightningMultiModalExtractor:
                 }
             
         except Exception as e:
-            print(f"   ❌ Satellite error: {e}")
+            self.log.error("   ❌ Satellite error {location} {date}: {error}",
+                           location=location_name, date=date, error=e)
             return None
     
-    def detect_lightning_from_weather(self, weather_records):
+    def detect_lightning_from_weather(self, weather_df):
         """
         Detect lightning-probable conditions from weather data
         
@@ -196,9 +166,14 @@ class LightningMultiModalExtractor:
         3. Specific temperature range (25-35°C for Bangladesh)
         4. Pressure drops (rapid changes)
         5. Strong winds (>5 m/s)
+        
+        Returns:
+        --------
+        pd.DataFrame : One row of indicators per weather interval
         """
         
-        lightning_indicators = []
+        weather_records = weather_df.to_dict('records')
+        lightning_indicators = RecordBuilder()
         
         for i, record in enumerate(weather_records):
             score = 0
@@ -256,7 +231,7 @@ class LightningMultiModalExtractor:
                 'Pressure': record['Pressure_kPa']
             })
         
-        return lightning_indicators
+        return lightning_indicators.to_pandas()
     
     def get_firms_lightning_data(self, lat, lon, date, location_name):
         """
@@ -291,7 +266,8 @@ class LightningMultiModalExtractor:
                 }
             
         except Exception as e:
-            print(f"   ⚠️  FIRMS API: {e}")
+            self.log.warning("   ⚠️  FIRMS API {location} {date}: {error}",
+                             location=location_name, date=date, error=e)
             return None
     
     def create_lightning_visualization(self, weather_df, lightning_df, date, location_name):
@@ -396,7 +372,8 @@ class LightningMultiModalExtractor:
             }
             
         except Exception as e:
-            print(f"   ❌ Visualization error: {e}")
+            self.log.error("   ❌ Visualization error {location} {date}: {error}",
+                           location=location_name, date=date, error=e)
             return None
     
     def extract_multimodal_lightning_dataset(self, locations, start_date, num_days=30):
@@ -425,68 +402,75 @@ class LightningMultiModalExtractor:
         
         start_time = time.time()
         
+        # Best scene for every (location, date) in one batched Earth Engine query
+        scenes = prefetch_best_scenes(scene_targets(locations, dates), cloud_cover_max=70)
+        
         for idx, (location_name, coords) in enumerate(locations.items(), 1):
             print(f"\n{'='*80}")
             print(f"[{idx}/{len(locations)}] 📍 {location_name}")
             print(f"{'='*80}\n")
             
-            for date_idx, date in enumerate(dates, 1):
-                print(f"📅 Day {date_idx}/{num_days}: {date}")
-                print("-" * 70)
-                
-                # 1. Weather data
-                print("☁️  Extracting weather data (30-min intervals)...")
-                weather_records = self.get_weather_data(
-                    coords['lat'], coords['lon'], date, location_name
-                )
-                
-                if weather_records:
-                    self.weather_data.extend(weather_records)
-                    print(f"   ✅ Weather: {len(weather_records)} records")
-                else:
-                    print(f"   ❌ Weather: Failed")
-                    continue
-                
-                # 2. Lightning detection from weather
-                print("⚡ Detecting lightning conditions...")
-                lightning_indicators = self.detect_lightning_from_weather(weather_records)
-                
-                if lightning_indicators:
-                    self.lightning_events.extend(lightning_indicators)
-                    high_prob = sum(1 for l in lightning_indicators if l['Lightning_Probability'] == 'High')
-                    print(f"   ✅ Lightning: {high_prob}/48 high-probability intervals")
-                else:
-                    print(f"   ❌ Lightning: Failed")
-                
-                # 3. Satellite image (once per day)
-                print("🛰️  Extracting satellite image...")
-                satellite_result = self.get_satellite_image(
-                    coords['lat'], coords['lon'], date, location_name
-                )
-                
-                if satellite_result:
-                    self.satellite_metadata.append(satellite_result)
-                    print(f"   ✅ Satellite: {satellite_result['actual_date']} ({satellite_result['cloud_cover']:.1f}% clouds)")
-                else:
-                    print(f"   ⚠️  Satellite: No clear images")
-                
-                # 4. Create visualization
-                if len(self.weather_data) > 0 and len(self.lightning_events) > 0:
-                    print("📊 Creating visualization...")
-                    weather_df = pd.DataFrame(self.weather_data)
-                    lightning_df = pd.DataFrame(self.lightning_events)
+            with self.log.progress(len(dates), location_name, unit='days') as progress:
+                for date_idx, date in enumerate(dates, 1):
+                    self.log.debug("📅 Day {date_idx}/{num_days}: {date}",
+                                   date_idx=date_idx, num_days=num_days, date=date)
                     
-                    viz_result = self.create_lightning_visualization(
-                        weather_df, lightning_df, date, location_name
+                    # 1. Weather data
+                    weather_df = self.get_weather_data(
+                        coords['lat'], coords['lon'], date, location_name
                     )
                     
-                    if viz_result:
-                        print(f"   ✅ Visualization: Created")
+                    if weather_df is not None:
+                        self.weather_data.extend(weather_df)
+                        self.log.debug("   ✅ Weather: {records} records", records=len(weather_df))
                     else:
-                        print(f"   ⚠️  Visualization: Skipped")
-                
-                print()
-                time.sleep(1)  # Reduced delay
+                        self.log.warning("   ❌ Weather {location} {date}: Failed",
+                                         location=location_name, date=date)
+                        progress.update(errors=1)
+                        continue
+                    
+                    # 2. Lightning detection from weather
+                    lightning_df = self.detect_lightning_from_weather(weather_df)
+                    
+                    high_prob = 0
+                    if len(lightning_df):
+                        self.lightning_events.extend(lightning_df)
+                        high_prob = int((lightning_df['Lightning_Probability'] == 'High').sum())
+                        self.log.debug("   ✅ Lightning: {high_prob}/48 high-probability intervals",
+                                       high_prob=high_prob)
+                    else:
+                        self.log.warning("   ❌ Lightning {location} {date}: Failed",
+                                         location=location_name, date=date)
+                    
+                    # 3. Satellite image (once per day)
+                    satellite_result = self.get_satellite_image(
+                        coords['lat'], coords['lon'], date, location_name,
+                        scene=scenes.get((location_name, date))
+                    )
+                    
+                    if satellite_result:
+                        self.satellite_metadata.append(satellite_result)
+                        self.log.debug("   ✅ Satellite: {image_date} ({cloud_cover:.1f}% clouds)",
+                                       image_date=satellite_result['actual_date'],
+                                       cloud_cover=satellite_result['cloud_cover'])
+                    else:
+                        self.log.debug("   ⚠️  Satellite {location} {date}: No clear images",
+                                       location=location_name, date=date)
+                    
+                    # 4. Create visualization (from this day's rows only)
+                    if len(lightning_df) > 0:
+                        viz_result = self.create_lightning_visualization(
+                            weather_df, lightning_df, date, location_name
+                        )
+                        
+                        if viz_result:
+                            self.log.debug("   ✅ Visualization: Created")
+                        else:
+                            self.log.debug("   ⚠️  Visualization {location} {date}: Skipped",
+                                           location=location_name, date=date)
+                    
+                    progress.update(weather=len(weather_df), satellite=int(bool(satellite_result)),
+                                    high_prob=high_prob)
         
         # Save all data
         self.save_all_data()
@@ -501,15 +485,15 @@ class LightningMultiModalExtractor:
         print("\n💾 Saving multi-modal dataset...")
         
         # Weather data
-        if self.weather_data:
-            weather_df = pd.DataFrame(self.weather_data)
+        if len(self.weather_data):
+            weather_df = self.weather_data.to_pandas()
             weather_file = self.weather_dir / 'weather_data.csv'
             weather_df.to_csv(weather_file, index=False)
             print(f"   ✅ Weather: {weather_file}")
         
         # Lightning labels
-        if self.lightning_events:
-            lightning_df = pd.DataFrame(self.lightning_events)
+        if len(self.lightning_events):
+            lightning_df = self.lightning_events.to_pandas()
             lightning_file = self.lightning_dir / 'lightning_labels.csv'
             lightning_df.to_csv(lightning_file, index=False)
             print(f"   ✅ Lightning: {lightning_file}")
@@ -534,8 +518,8 @@ class LightningMultiModalExtractor:
         
         print("\n✅ LIGHTNING DETECTION:")
         print(f"   Total intervals: {len(self.lightning_events):,}")
-        if self.lightning_events:
-            lightning_df = pd.DataFrame(self.lightning_events)
+        if len(self.lightning_events):
+            lightning_df = self.lightning_events.to_pandas()
             high = len(lightning_df[lightning_df['Lightning_Probability'] == 'High'])
             medium = len(lightning_df[lightning_df['Lightning_Probability'] == 'Medium'])
             low = len(lightning_df[lightning_df['Lightning_Probability'] == 'Low'])
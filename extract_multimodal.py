@@ -10,7 +10,6 @@ Data Modalities:
 """
 
 import ee
-import requests
 import pandas as pd
 import numpy as np
 import time
@@ -23,6 +22,11 @@ import io
 
 try:
     from nasa_power_api import NASAPowerAPI
+    from ee_helpers import find_best_scenes, prefetch_best_scenes, save_thumbnail, scene_targets
+    from thumbnail_cache import ThumbnailCache
+    from thumbnail_pipeline import ThumbnailPipeline
+    from record_builder import RecordBuilder
+    from progress_log import get_progress_log
 except ImportError:
     print("❌ Error: nasa_power_api.py not found")
     import sys
@@ -54,6 +58,9 @@ class MultiModalExtractor:
         self.nasa_api = NASAPowerAPI()
         print("✅ NASA POWER API initialized")
         
+        # Levelled, buffered progress output (EXTRACTION_LOG_LEVEL=debug for per-day detail)
+        self.log = get_progress_log()
+        
         # Create directory structure
         self.base_dir = Path(__file__).parent
         self.output_dir = self.base_dir / 'multimodal_dataset'
@@ -69,10 +76,16 @@ class MultiModalExtractor:
         
         print("✅ Multi-modal directory structure created")
         
-        self.weather_data = []
+        # Tabular rows accumulate column-wise (see record_builder.py)
+        self.weather_data = RecordBuilder()
+        # Scene-keyed thumbnail cache (neighbouring dates often share a scene)
+        self.thumbnail_cache = ThumbnailCache()
+        # Concurrent thumbnail downloads per extraction run
+        self.download_workers = 4
+        
         self.satellite_metadata = []
         self.heatmap_metadata = []
-        self.lightning_data = []
+        self.lightning_data = RecordBuilder()
     
     def get_weather_data(self, lat, lon, date, location_name):
         """
@@ -91,107 +104,83 @@ class MultiModalExtractor:
             )
             
             if data and 'properties' in data and 'parameter' in data['properties']:
-                params = data['properties']['parameter']
-                weather_records = []
-                
-                for hour in range(24):
-                    hour_key = f"{date_formatted}{hour:02d}"
-                    
-                    temp = params.get('T2M', {}).get(hour_key)
-                    rh = params.get('RH2M', {}).get(hour_key)
-                    ws = params.get('WS2M', {}).get(hour_key)
-                    precip = params.get('PRECTOTCORR', {}).get(hour_key)
-                    solar = params.get('ALLSKY_SFC_SW_DWN', {}).get(hour_key)
-                    
-                    if temp is not None:
-                        # Create 30-min intervals
-                        for minute in [0, 30]:
-                            time_str = f"{hour:02d}:{minute:02d}"
-                            weather_records.append({
-                                'Date': date,
-                                'Time': time_str,
-                                'DateTime': f"{date} {time_str}",
-                                'Location': location_name,
-                                'Latitude': lat,
-                                'Longitude': lon,
-                                'Temperature_C': temp,
-                                'Humidity_%': rh,
-                                'Wind_Speed_m/s': ws,
-                                'Precipitation_mm': precip,
-                                'Solar_Radiation_kWh/m2': solar,
-                            })
-                
-                if weather_records:
-                    return weather_records
+                # Hourly values expanded to 30-min intervals
+                weather_df = self.nasa_api.hourly_location_frame(
+                    data, location_name, lat, lon,
+                    {
+                        'T2M': 'Temperature_C',
+                        'RH2M': 'Humidity_%',
+                        'WS2M': 'Wind_Speed_m/s',
+                        'PRECTOTCORR': 'Precipitation_mm',
+                        'ALLSKY_SFC_SW_DWN': 'Solar_Radiation_kWh/m2',
+                    }
+                )
+                if weather_df is not None and len(weather_df):
+                    return weather_df
                     
         except Exception as e:
-            print(f"   ❌ Weather data error: {e}")
-            return []
+            self.log.error("   ❌ Weather data error {location} {date}: {error}",
+                           location=location_name, date=date, error=e)
+            return None
     
-    def get_satellite_image(self, lat, lon, date, location_name):
+    def get_satellite_image(self, lat, lon, date, location_name, scene=None, pipeline=None):
         """
         Modality 2: Get satellite optical image
         Returns RGB image showing cloud formations
+        
+        With a ThumbnailPipeline the metadata is returned right away and the
+        image is downloaded in the background; 'filename' is reset to None
+        if that download fails.
         """
         
         try:
-            target_date = datetime.strptime(date, '%Y-%m-%d')
-            start_date = (target_date - timedelta(days=8)).strftime('%Y-%m-%d')
-            end_date = (target_date + timedelta(days=8)).strftime('%Y-%m-%d')
+            # Best-scene metadata: prefetched in one batched query, or looked up here
+            if scene is None:
+                scene = find_best_scenes(
+                    [(location_name, lat, lon, date)], cloud_cover_max=70
+                )[(location_name, date)]
             
-            point = ee.Geometry.Point([lon, lat])
-            
-            collection = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2') \
-                .filterBounds(point) \
-                .filterDate(start_date, end_date) \
-                .filter(ee.Filter.lt('CLOUD_COVER', 70)) \
-                .sort('CLOUD_COVER')
-            
-            count = collection.size().getInfo()
+            count = scene['images_found']
             
             if count == 0:
                 return None
             
-            image = collection.first()
-            image_date = ee.Date(image.get('system:time_start')).format('YYYY-MM-dd').getInfo()
-            cloud_cover = image.get('CLOUD_COVER').getInfo()
+            image_date = scene['image_date']
+            cloud_cover = scene['cloud_cover']
             
-            def apply_scale_factors(img):
-                optical_bands = img.select('SR_B.').multiply(0.0000275).add(-0.2)
-                return img.addBands(optical_bands, None, True)
+            filename = f"{location_name}_{date}_satellite.png"
+            filepath = self.satellite_dir / filename
             
-            scaled_image = apply_scale_factors(image)
-            rgb = scaled_image.select(['SR_B4', 'SR_B3', 'SR_B2'])
-            region = point.buffer(7500).bounds()
+            result = {
+                'date': date,
+                'actual_date': image_date,
+                'location': location_name,
+                'filename': filename,
+                'cloud_cover': cloud_cover,
+                'modality': 'satellite_optical'
+            }
             
-            url = rgb.getThumbURL({
-                'region': region.getInfo(),
-                'dimensions': 512,
-                'format': 'png',
-                'min': 0,
-                'max': 0.3
-            })
+            if pipeline is None:
+                # Served from the scene thumbnail cache when this scene was already fetched
+                status_code = save_thumbnail(scene, filepath, self.thumbnail_cache, location_name, date)
+                
+                if status_code == 200:
+                    return result
+                return None
             
-            response = requests.get(url, timeout=60)
+            def finish(status_code):
+                if status_code != 200:
+                    result['filename'] = None
+                    self.log.warning("   ⚠️  Satellite download failed: {location} {date} (HTTP {status})",
+                                     location=location_name, date=date, status=status_code)
             
-            if response.status_code == 200:
-                filename = f"{location_name}_{date}_satellite.png"
-                filepath = self.satellite_dir / filename
-                
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
-                
-                return {
-                    'date': date,
-                    'actual_date': image_date,
-                    'location': location_name,
-                    'filename': filename,
-                    'cloud_cover': cloud_cover,
-                    'modality': 'satellite_optical'
-                }
+            # Queued: the download overlaps with the next day's weather and heatmaps
+            pipeline.submit(scene, filepath, location_name, date, on_done=finish)
+            return result
             
         except Exception as e:
-            print(f"   ❌ Satellite error: {e}")
+            self.log.error("   ❌ Satellite error {location} {date}: {error}",
+                           location=location_name, date=date, error=e)
             return None
     
     def create_weather_heatmaps(self, weather_df, date, location_name):
@@ -279,7 +268,8 @@ class MultiModalExtractor:
             }
             
         except Exception as e:
-            print(f"   ❌ Heatmap error: {e}")
+            self.log.error("   ❌ Heatmap error {location} {date}: {error}",
+                           location=location_name, date=date, error=e)
             return None
     
     def check_lightning_conditions(self, weather_df, date):
@@ -301,7 +291,7 @@ class MultiModalExtractor:
                 return None
             
             # Calculate lightning probability for each 30-min interval
-            lightning_labels = []
+            lightning_labels = RecordBuilder()
             
             for idx, row in day_data.iterrows():
                 score = 0
@@ -344,10 +334,10 @@ class MultiModalExtractor:
                     'Temperature': row['Temperature_C']
                 })
             
-            return lightning_labels
+            return lightning_labels.to_pandas()
             
         except Exception as e:
-            print(f"   ❌ Lightning detection error: {e}")
+            self.log.error("   ❌ Lightning detection error {date}: {error}", date=date, error=e)
             return None
     
     def extract_multimodal_dataset(self, locations, start_date, num_days=20):
@@ -378,66 +368,85 @@ class MultiModalExtractor:
         
         start_time = time.time()
         
+        # Best scene for every (location, date) in one batched Earth Engine query
+        scenes = prefetch_best_scenes(scene_targets(locations, dates), cloud_cover_max=70)
+        
+        # Satellite images download on worker threads while the loop continues
+        pipeline = ThumbnailPipeline(self.thumbnail_cache, max_workers=self.download_workers)
+        
         for idx, (location_name, coords) in enumerate(locations.items(), 1):
             print(f"\n{'='*80}")
             print(f"[{idx}/{len(locations)}] 📍 {location_name}")
             print(f"{'='*80}\n")
             
-            for date_idx, date in enumerate(dates, 1):
-                print(f"📅 Day {date_idx}/{num_days}: {date}")
-                print("-" * 70)
-                
-                # Modality 1: Weather tabular data
-                print("📊 Modality 1: Extracting weather data...")
-                weather_records = self.get_weather_data(
-                    coords['lat'], coords['lon'], date, location_name
-                )
-                
-                if weather_records:
-                    self.weather_data.extend(weather_records)
-                    print(f"   ✅ Weather: {len(weather_records)} records")
-                else:
-                    print(f"   ❌ Weather: Failed")
-                    continue
-                
-                # Modality 2: Satellite image
-                print("🛰️  Modality 2: Extracting satellite image...")
-                satellite_result = self.get_satellite_image(
-                    coords['lat'], coords['lon'], date, location_name
-                )
-                
-                if satellite_result:
-                    self.satellite_metadata.append(satellite_result)
-                    print(f"   ✅ Satellite: {satellite_result['actual_date']} ({satellite_result['cloud_cover']:.1f}% clouds)")
-                else:
-                    print(f"   ⚠️  Satellite: No clear images")
-                
-                # Modality 3: Weather heatmaps
-                print("🎨 Modality 3: Creating weather heatmaps...")
-                weather_df = pd.DataFrame(self.weather_data)
-                heatmap_result = self.create_weather_heatmaps(
-                    weather_df, date, location_name
-                )
-                
-                if heatmap_result:
-                    self.heatmap_metadata.append(heatmap_result)
-                    print(f"   ✅ Heatmap: Created")
-                else:
-                    print(f"   ❌ Heatmap: Failed")
-                
-                # Modality 4: Lightning labels
-                print("⚡ Modality 4: Detecting lightning conditions...")
-                lightning_labels = self.check_lightning_conditions(weather_df, date)
-                
-                if lightning_labels:
-                    self.lightning_data.extend(lightning_labels)
-                    high_prob = sum(1 for l in lightning_labels if l['Lightning_Likelihood'] == 'High')
-                    print(f"   ✅ Lightning: {high_prob}/48 high-probability intervals")
-                else:
-                    print(f"   ❌ Lightning: Failed")
-                
-                print()
-                time.sleep(2)
+            with self.log.progress(len(dates), location_name, unit='days') as progress:
+                for date_idx, date in enumerate(dates, 1):
+                    self.log.debug("📅 Day {date_idx}/{num_days}: {date}",
+                                   date_idx=date_idx, num_days=num_days, date=date)
+                    
+                    # Modality 1: Weather tabular data
+                    weather_df = self.get_weather_data(
+                        coords['lat'], coords['lon'], date, location_name
+                    )
+                    
+                    if weather_df is not None:
+                        self.weather_data.extend(weather_df)
+                        self.log.debug("   ✅ Weather: {records} records", records=len(weather_df))
+                    else:
+                        self.log.warning("   ❌ Weather {location} {date}: Failed",
+                                         location=location_name, date=date)
+                        progress.update(errors=1)
+                        continue
+                    
+                    # Modality 2: Satellite image
+                    satellite_result = self.get_satellite_image(
+                        coords['lat'], coords['lon'], date, location_name,
+                        scene=scenes.get((location_name, date)),
+                        pipeline=pipeline
+                    )
+                    
+                    if satellite_result:
+                        self.satellite_metadata.append(satellite_result)
+                        self.log.debug("   ✅ Satellite: {image_date} ({cloud_cover:.1f}% clouds)",
+                                       image_date=satellite_result['actual_date'],
+                                       cloud_cover=satellite_result['cloud_cover'])
+                    else:
+                        self.log.debug("   ⚠️  Satellite {location} {date}: No clear images",
+                                       location=location_name, date=date)
+                    
+                    # Modality 3: Weather heatmaps
+                    heatmap_result = self.create_weather_heatmaps(
+                        weather_df, date, location_name
+                    )
+                    
+                    if heatmap_result:
+                        self.heatmap_metadata.append(heatmap_result)
+                        self.log.debug("   ✅ Heatmap: Created")
+                    else:
+                        self.log.warning("   ❌ Heatmap {location} {date}: Failed",
+                                         location=location_name, date=date)
+                    
+                    # Modality 4: Lightning labels
+                    lightning_labels = self.check_lightning_conditions(weather_df, date)
+                    
+                    high_prob = 0
+                    if lightning_labels is not None and len(lightning_labels):
+                        self.lightning_data.extend(lightning_labels)
+                        high_prob = int((lightning_labels['Lightning_Likelihood'] == 'High').sum())
+                        self.log.debug("   ✅ Lightning: {high_prob}/48 high-probability intervals",
+                                       high_prob=high_prob)
+                    else:
+                        self.log.warning("   ❌ Lightning {location} {date}: Failed",
+                                         location=location_name, date=date)
+                    
+                    progress.update(weather=len(weather_df), satellite=int(bool(satellite_result)),
+                                    high_prob=high_prob)
+        
+        # Wait for queued satellite downloads, dropping images that failed
+        print("⏳ Finishing satellite image downloads...")
+        pipeline.close()
+        print(f"   ✅ Satellite images: {pipeline.summary()}")
+        self.satellite_metadata = [result for result in self.satellite_metadata if result['filename']]
         
         # Save all modalities
         self.save_all_modalities()
@@ -453,7 +462,7 @@ class MultiModalExtractor:
         
         # Modality 1: Weather data (CSV)
         if self.weather_data:
-            weather_df = pd.DataFrame(self.weather_data)
+            weather_df = self.weather_data.to_pandas()
             weather_file = self.weather_dir / 'weather_data.csv'
             weather_df.to_csv(weather_file, index=False)
             print(f"   ✅ Modality 1: {weather_file}")
@@ -474,7 +483,7 @@ class MultiModalExtractor:
         
         # Modality 4: Lightning labels (CSV)
         if self.lightning_data:
-            lightning_df = pd.DataFrame(self.lightning_data)
+            lightning_df = self.lightning_data.to_pandas()
             lightning_file = self.lightning_dir / 'lightning_labels.csv'
             lightning_df.to_csv(lightning_file, index=False)
             print(f"   ✅ Modality 4: {lightning_file}")
@@ -504,7 +513,7 @@ class MultiModalExtractor:
         print("\n✅ MODALITY 4: Lightning Labels")
         print(f"   Labels: {len(self.lightning_data)}")
         if self.lightning_data:
-            lightning_df = pd.DataFrame(self.lightning_data)
+            lightning_df = self.lightning_data.to_pandas()
             high_prob = len(lightning_df[lightning_df['Lightning_Likelihood'] == 'High'])
             print(f"   High probability: {high_prob} intervals")
             print(f"   Format: CSV (binary + probability)")
@@ -4,13 +4,14 @@ Extracts only precipitation radar images from OpenWeatherMap
 No weather data, no satellite images - just radar!
 """
 
-import requests
 import pandas as pd
 import time
 from pathlib import Path
 from datetime import datetime, timedelta
 import math
 
+from rate_limiter import get_rate_limiter
+
 
 class SimpleRadarExtractor:
     """
@@ -18,6 +19,9 @@ class SimpleRadarExtractor:
     Uses OpenWeatherMap precipitation layer
     """
     
+    WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+    TILE_URL = "https://tile.openweathermap.org/map"
+    
     def __init__(self, api_key):
         """Initialize with API key"""
         self.api_key = api_key
@@ -26,6 +30,7 @@ class SimpleRadarExtractor:
         
         self.results = []
         self.api_calls = 0
+        self.rate_limiter = get_rate_limiter()
         
         print(f"✅ Radar extractor initialized")
         print(f"📁 Output directory: {self.radar_dir}")
@@ -58,7 +63,7 @@ class SimpleRadarExtractor:
             # For historical, we'll get current weather data which includes:
             # - Precipitation, clouds, wind, pressure, humidity
             
-            url = "https://api.openweathermap.org/data/2.5/weather"
+            url = self.WEATHER_URL
             params = {
                 'lat': lat,
                 'lon': lon,
@@ -66,7 +71,8 @@ class SimpleRadarExtractor:
                 'units': 'metric'
             }
             
-            response = requests.get(url, params=params, timeout=30)
+            response = self.rate_limiter.request('openweather', url, params=params, timeout=30,
+                                                 endpoint='weather')
             self.api_calls += 1
             
             if response.status_code == 200:
@@ -129,9 +135,9 @@ class SimpleRadarExtractor:
             x, y = self.lat_lon_to_tile(lat, lon, zoom)
             layer = 'precipitation_new'
             
-            url = f"https://tile.openweathermap.org/map/{layer}/{zoom}/{x}/{y}.png?appid={self.api_key}"
+            url = f"{self.TILE_URL}/{layer}/{zoom}/{x}/{y}.png?appid={self.api_key}"
             
-            response = requests.get(url, timeout=30)
+            response = self.rate_limiter.request('openweather', url, timeout=30, endpoint='tile')
             self.api_calls += 1
             
             if response.status_code == 200 and len(response.content) > 500:  # Ensure it's not empty
@@ -242,8 +248,8 @@ class SimpleRadarExtractor:
             
             print(f"   📞 API calls: {self.api_calls}")
             
-            # Stop if approaching limit
-            if self.api_calls >= 950:
+            # Stop when today's OpenWeatherMap quota is used up (tracked across runs)
+            if self.rate_limiter.remaining('openweather') == 0:
                 print(f"\n⚠️  Approaching API limit, stopping...")
                 break
             
@@ -301,7 +307,8 @@ class SimpleRadarExtractor:
         
         print(f"\n📞 API USAGE:")
         print(f"   Total calls: {self.api_calls}")
-        print(f"   Remaining today: {1000 - self.api_calls}/1000")
+        quota = self.rate_limiter.limits['openweather']['daily_quota']
+        print(f"   Remaining today: {self.rate_limiter.remaining('openweather')}/{quota}")
         
         print(f"\n⏱️  PERFORMANCE:")
         print(f"   Total time: {elapsed_time:.1f} seconds ({elapsed_time/60:.1f} minutes)")
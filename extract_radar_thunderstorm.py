@@ -5,7 +5,6 @@ Combined with NASA POWER weather data and Google Earth Engine satellite imagery
 """
 
 import ee
-import requests
 import pandas as pd
 import time
 from pathlib import Path
@@ -15,6 +14,11 @@ import json
 
 try:
     from nasa_power_api import NASAPowerAPI
+    from rate_limiter import get_rate_limiter
+    from ee_helpers import find_best_scenes, prefetch_best_scenes, save_thumbnail, scene_targets
+    from thumbnail_cache import ThumbnailCache
+    from progress_log import get_progress_log
+    from record_builder import RecordBuilder
 except ImportError:
     print("❌ Error: nasa_power_api.py not found")
     sys.exit(1)
@@ -47,6 +51,9 @@ class RadarThunderstormExtractor:
         print("✅ NASA POWER API initialized")
         print("✅ OpenWeatherMap API key configured")
         
+        # Levelled, buffered progress output (EXTRACTION_LOG_LEVEL=debug for per-date detail)
+        self.log = get_progress_log()
+        
         # Create directories
         self.base_dir = Path(__file__).parent
         self.satellite_dir = self.base_dir / 'satellite_images_multimodal'
@@ -57,11 +64,18 @@ class RadarThunderstormExtractor:
         self.radar_dir.mkdir(exist_ok=True)
         self.data_dir.mkdir(exist_ok=True)
         
+        # Scene-keyed thumbnail cache (neighbouring dates often share a scene)
+        self.thumbnail_cache = ThumbnailCache()
+        
         self.satellite_results = []
         self.radar_results = []
-        self.weather_data = []
+        # Weather rows accumulate column-wise (see record_builder.py)
+        self.weather_data = RecordBuilder()
         self.thunderstorm_alerts = []
         
+        # Shared rate limiter (persists the OpenWeatherMap daily quota across runs)
+        self.rate_limiter = get_rate_limiter()
+        
         # API call counters
         self.api_calls = {
             'openweather_radar': 0,
@@ -85,7 +99,8 @@ class RadarThunderstormExtractor:
                 'exclude': 'minutely,hourly,daily'  # Only get alerts
             }
             
-            response = requests.get(url, params=params, timeout=30)
+            response = self.rate_limiter.request('openweather', url, params=params, timeout=30,
+                                                 endpoint='onecall')
             self.api_calls['openweather_alerts'] += 1
             
             if response.status_code == 200:
@@ -111,20 +126,20 @@ class RadarThunderstormExtractor:
                         # Check if it's thunderstorm related
                         event_lower = alert_info['event'].lower()
                         if any(keyword in event_lower for keyword in ['thunder', 'lightning', 'storm', 'severe']):
-                            print(f"   ⚡ THUNDERSTORM ALERT: {alert_info['event']}")
+                            self.log.warning("   ⚡ THUNDERSTORM ALERT: {event}", event=alert_info['event'])
                         else:
-                            print(f"   ⚠️  Weather alert: {alert_info['event']}")
+                            self.log.warning("   ⚠️  Weather alert: {event}", event=alert_info['event'])
                     
                     return True
                 else:
-                    print(f"   ✅ No active weather alerts")
+                    self.log.info("   ✅ No active weather alerts")
                     return False
             else:
-                print(f"   ⚠️  Weather alerts API: HTTP {response.status_code}")
+                self.log.warning("   ⚠️  Weather alerts API: HTTP {status}", status=response.status_code)
                 return False
                 
         except Exception as e:
-            print(f"   ❌ Error getting weather alerts: {e}")
+            self.log.error("   ❌ Error getting weather alerts: {error}", error=e)
             return False
     
     def get_precipitation_radar(self, lat, lon, date, time_str, location_name):
@@ -148,7 +163,7 @@ class RadarThunderstormExtractor:
             
             url = f"https://tile.openweathermap.org/map/{layer}/{zoom}/{x}/{y}.png?appid={self.openweather_key}"
             
-            response = requests.get(url, timeout=30)
+            response = self.rate_limiter.request('openweather', url, timeout=30, endpoint='tile')
             self.api_calls['openweather_radar'] += 1
             
             if response.status_code == 200 and len(response.content) > 0:
@@ -204,7 +219,8 @@ class RadarThunderstormExtractor:
                 'units': 'metric'
             }
             
-            response = requests.get(url, params=params, timeout=30)
+            response = self.rate_limiter.request('openweather', url, params=params, timeout=30,
+                                                 endpoint='weather')
             self.api_calls['openweather_alerts'] += 1
             
             if response.status_code == 200:
@@ -231,7 +247,8 @@ class RadarThunderstormExtractor:
                 
                 # Check for thunderstorm
                 if 'Thunderstorm' in weather_info['weather_main']:
-                    print(f"   ⚡ THUNDERSTORM DETECTED: {weather_info['weather_description']}")
+                    self.log.warning("   ⚡ THUNDERSTORM DETECTED: {description}",
+                                     description=weather_info['weather_description'])
                     weather_info['thunderstorm_active'] = True
                 else:
                     weather_info['thunderstorm_active'] = False
@@ -241,12 +258,14 @@ class RadarThunderstormExtractor:
                 return None
                 
         except Exception as e:
-            print(f"   ❌ Error getting current weather: {e}")
+            self.log.error("   ❌ Error getting current weather: {error}", error=e)
             return None
     
     def get_hourly_weather_data(self, lat, lon, date, location_name):
         """
         Get hourly weather data from NASA POWER API for the specified date
+        
+        Returns a DataFrame of 30-minute rows (None if no data)
         """
         
         try:
@@ -262,60 +281,35 @@ class RadarThunderstormExtractor:
             self.api_calls['nasa_power'] += 1
             
             if data and 'properties' in data and 'parameter' in data['properties']:
-                params = data['properties']['parameter']
-                weather_records = []
-                
-                for hour in range(24):
-                    hour_key = f"{date_formatted}{hour:02d}"
-                    
-                    temp = params.get('T2M', {}).get(hour_key)
-                    rh = params.get('RH2M', {}).get(hour_key)
-                    ws = params.get('WS2M', {}).get(hour_key)
-                    precip = params.get('PRECTOTCORR', {}).get(hour_key)
-                    solar = params.get('ALLSKY_SFC_SW_DWN', {}).get(hour_key)
-                    
-                    if temp is not None:
-                        # Create records for :00 and :30
-                        for minute in [0, 30]:
-                            time_str = f"{hour:02d}:{minute:02d}"
-                            weather_records.append({
-                                'Date': date,
-                                'Time': time_str,
-                                'DateTime': f"{date} {time_str}",
-                                'Location': location_name,
-                                'Latitude': lat,
-                                'Longitude': lon,
-                                'Temperature_2m_C': temp,
-                                'Relative_Humidity_%': rh,
-                                'Wind_Speed_2m_m/s': ws,
-                                'Precipitation_mm': precip,
-                                'Solar_Radiation_kWh/m2': solar,
-                            })
-                
-                if weather_records:
-                    return weather_records
+                # Hourly values expanded to :00 and :30 records
+                weather_df = self.nasa_api.hourly_location_frame(
+                    data, location_name, lat, lon,
+                    {
+                        'T2M': 'Temperature_2m_C',
+                        'RH2M': 'Relative_Humidity_%',
+                        'WS2M': 'Wind_Speed_2m_m/s',
+                        'PRECTOTCORR': 'Precipitation_mm',
+                        'ALLSKY_SFC_SW_DWN': 'Solar_Radiation_kWh/m2',
+                    }
+                )
+                if weather_df is not None and len(weather_df):
+                    return weather_df
                     
         except Exception as e:
-            print(f"   ❌ NASA POWER API error: {e}")
-            return []
+            self.log.error("   ❌ NASA POWER API error: {error}", error=e)
+            return None
     
-    def get_landsat8_image(self, lat, lon, date, location_name, cloud_cover_max=70):
+    def get_landsat8_image(self, lat, lon, date, location_name, cloud_cover_max=70, scene=None):
         """Get Landsat 8 satellite image from Google Earth Engine"""
         
         try:
-            target_date = datetime.strptime(date, '%Y-%m-%d')
-            start_date = (target_date - timedelta(days=8)).strftime('%Y-%m-%d')
-            end_date = (target_date + timedelta(days=8)).strftime('%Y-%m-%d')
-            
-            point = ee.Geometry.Point([lon, lat])
-            
-            collection = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2') \
-                .filterBounds(point) \
-                .filterDate(start_date, end_date) \
-                .filter(ee.Filter.lt('CLOUD_COVER', cloud_cover_max)) \
-                .sort('CLOUD_COVER')
+            # Best-scene metadata: prefetched in one batched query, or looked up here
+            if scene is None:
+                scene = find_best_scenes(
+                    [(location_name, lat, lon, date)], cloud_cover_max=cloud_cover_max
+                )[(location_name, date)]
             
-            count = collection.size().getInfo()
+            count = scene['images_found']
             self.api_calls['google_earth'] += 1
             
             if count == 0:
@@ -326,35 +320,16 @@ class RadarThunderstormExtractor:
                     'location': location_name,
                 }
             
-            image = collection.first()
-            image_date = ee.Date(image.get('system:time_start')).format('YYYY-MM-dd').getInfo()
-            cloud_cover = image.get('CLOUD_COVER').getInfo()
+            image_date = scene['image_date']
+            cloud_cover = scene['cloud_cover']
             
-            def apply_scale_factors(img):
-                optical_bands = img.select('SR_B.').multiply(0.0000275).add(-0.2)
-                return img.addBands(optical_bands, None, True)
+            filename = f"{location_name}_{image_date}_satellite.png"
+            filepath = self.satellite_dir / filename
             
-            scaled_image = apply_scale_factors(image)
-            rgb = scaled_image.select(['SR_B4', 'SR_B3', 'SR_B2'])
-            region = point.buffer(7500).bounds()
+            # Served from the scene thumbnail cache when this scene was already fetched
+            status_code = save_thumbnail(scene, filepath, self.thumbnail_cache, location_name, date)
             
-            url = rgb.getThumbURL({
-                'region': region.getInfo(),
-                'dimensions': 512,
-                'format': 'png',
-                'min': 0,
-                'max': 0.3
-            })
-            
-            response = requests.get(url, timeout=60)
-            
-            if response.status_code == 200:
-                filename = f"{location_name}_{image_date}_satellite.png"
-                filepath = self.satellite_dir / filename
-                
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
-                
+            if status_code == 200:
                 file_size = filepath.stat().st_size / 1024
                 
                 return {
@@ -369,7 +344,7 @@ class RadarThunderstormExtractor:
             else:
                 return {
                     'status': 'error',
-                    'error': f'HTTP {response.status_code}',
+                    'error': f'HTTP {status_code}',
                     'date': date,
                     'location': location_name
                 }
@@ -419,6 +394,9 @@ class RadarThunderstormExtractor:
         
         start_time = time.time()
         
+        # Best scene for every (location, date) in one batched Earth Engine query
+        scenes = prefetch_best_scenes(scene_targets(locations, dates), cloud_cover_max=70)
+        
         for idx, (location_name, coords) in enumerate(locations.items(), 1):
             print(f"\n{'='*80}")
             print(f"[{idx}/{len(locations)}] 📍 {location_name} ({coords['lat']:.4f}°N, {coords['lon']:.4f}°E)")
@@ -430,82 +408,83 @@ class RadarThunderstormExtractor:
                 self.get_current_weather_alerts(coords['lat'], coords['lon'], location_name)
                 print()
             
-            for date_idx, date in enumerate(dates, 1):
-                print(f"📅 Date {date_idx}/{num_days}: {date}")
-                print("-" * 70)
-                
-                # Get satellite image (once per day)
-                print("🛰️  Extracting satellite image...")
-                satellite_result = self.get_landsat8_image(
-                    lat=coords['lat'],
-                    lon=coords['lon'],
-                    date=date,
-                    location_name=location_name,
-                    cloud_cover_max=70
-                )
-                self.satellite_results.append(satellite_result)
-                
-                if satellite_result['status'] == 'success':
-                    print(f"   ✅ Satellite: {satellite_result['actual_image_date']} ({satellite_result['cloud_cover']:.1f}% clouds)")
-                else:
-                    print(f"   ❌ Satellite: {satellite_result.get('error', 'Failed')}")
-                
-                # Get weather data for the day
-                print("☁️  Extracting weather data (30-min intervals)...")
-                weather_records = self.get_hourly_weather_data(
-                    lat=coords['lat'],
-                    lon=coords['lon'],
-                    date=date,
-                    location_name=location_name
-                )
-                
-                if weather_records:
-                    self.weather_data.extend(weather_records)
-                    print(f"   ✅ Weather: {len(weather_records)} records")
-                else:
-                    print(f"   ❌ Weather: No data")
-                
-                # Get radar images (sample every 2 hours to save API calls)
-                # This gives us 12 radar images per day instead of 48
-                print("🌧️  Extracting radar images (every 2 hours)...")
-                radar_count = 0
-                for hour in range(0, 24, 2):  # Every 2 hours
-                    time_str = f"{hour:02d}:00"
-                    radar_result = self.get_precipitation_radar(
+            with self.log.progress(len(dates), location_name, unit='days') as progress:
+                for date_idx, date in enumerate(dates, 1):
+                    self.log.debug("📅 Date {date_idx}/{num_days}: {date}",
+                                   date_idx=date_idx, num_days=num_days, date=date)
+                    
+                    # Get satellite image (once per day)
+                    satellite_result = self.get_landsat8_image(
+                        lat=coords['lat'],
+                        lon=coords['lon'],
+                        date=date,
+                        location_name=location_name,
+                        cloud_cover_max=70,
+                        scene=scenes.get((location_name, date))
+                    )
+                    self.satellite_results.append(satellite_result)
+                    
+                    if satellite_result['status'] == 'success':
+                        self.log.debug("   ✅ Satellite: {image_date} ({cloud_cover:.1f}% clouds)",
+                                       image_date=satellite_result['actual_image_date'],
+                                       cloud_cover=satellite_result['cloud_cover'])
+                    else:
+                        self.log.warning("   ❌ Satellite {location} {date}: {error}", location=location_name,
+                                         date=date, error=satellite_result.get('error', 'Failed'))
+                    
+                    # Get weather data for the day (30-min intervals)
+                    weather_df = self.get_hourly_weather_data(
                         lat=coords['lat'],
                         lon=coords['lon'],
                         date=date,
-                        time_str=time_str,
                         location_name=location_name
                     )
-                    self.radar_results.append(radar_result)
                     
-                    if radar_result['status'] == 'success':
-                        radar_count += 1
+                    weather_records = len(weather_df) if weather_df is not None else 0
+                    if weather_records:
+                        self.weather_data.extend(weather_df)
+                        self.log.debug("   ✅ Weather: {records} records", records=weather_records)
+                    else:
+                        self.log.warning("   ❌ Weather {location} {date}: No data",
+                                         location=location_name, date=date)
                     
-                    time.sleep(0.5)  # Small delay between API calls
-                
-                print(f"   ✅ Radar: {radar_count}/12 images")
-                
-                # Check API call limits
-                total_calls = sum(self.api_calls.values())
-                print(f"\n📊 API Calls: {total_calls} total")
-                print(f"   - OpenWeather Radar: {self.api_calls['openweather_radar']}")
-                print(f"   - OpenWeather Alerts: {self.api_calls['openweather_alerts']}")
-                print(f"   - NASA POWER: {self.api_calls['nasa_power']}")
-                print(f"   - Google Earth: {self.api_calls['google_earth']}")
-                
-                # Stop if approaching free tier limit
-                if self.api_calls['openweather_radar'] + self.api_calls['openweather_alerts'] >= 950:
-                    print(f"\n⚠️  Approaching OpenWeatherMap free tier limit (1,000/day)")
-                    print(f"   Stopping extraction to avoid exceeding quota.")
-                    self.save_results()
-                    elapsed = time.time() - start_time
-                    self.print_summary(elapsed)
-                    return
-                
-                print()
-                time.sleep(2)  # Delay between dates
+                    # Get radar images (sample every 2 hours to save API calls)
+                    # This gives us 12 radar images per day instead of 48
+                    radar_count = 0
+                    for hour in range(0, 24, 2):  # Every 2 hours
+                        time_str = f"{hour:02d}:00"
+                        radar_result = self.get_precipitation_radar(
+                            lat=coords['lat'],
+                            lon=coords['lon'],
+                            date=date,
+                            time_str=time_str,
+                            location_name=location_name
+                        )
+                        self.radar_results.append(radar_result)
+                        
+                        if radar_result['status'] == 'success':
+                            radar_count += 1
+                        else:
+                            self.log.warning("   ❌ Radar {location} {date} {time}: {error}",
+                                             location=location_name, date=date, time=time_str,
+                                             error=radar_result.get('error', 'Failed'))
+                    
+                    self.log.debug("   ✅ Radar: {radar_count}/12 images", radar_count=radar_count)
+                    self.log.debug("📊 API Calls: {total} total ({calls})",
+                                   total=sum(self.api_calls.values()), calls=self.api_calls)
+                    progress.update(weather=weather_records, radar=radar_count,
+                                    satellite=int(satellite_result['status'] == 'success'))
+                    
+                    # Stop once today's OpenWeatherMap quota is used up (tracked across runs)
+                    if self.rate_limiter.remaining('openweather') == 0:
+                        self.log.warning("\n⚠️  Reached OpenWeatherMap daily quota ({quota} calls)\n"
+                                         "   Stopping extraction to avoid exceeding quota.",
+                                         quota=self.rate_limiter.limits['openweather']['daily_quota'])
+                        progress.close()
+                        self.save_results()
+                        elapsed = time.time() - start_time
+                        self.print_summary(elapsed)
+                        return
         
         # Save all results
         self.save_results()
@@ -535,7 +514,7 @@ class RadarThunderstormExtractor:
         
         # Save weather data
         if self.weather_data:
-            weather_df = pd.DataFrame(self.weather_data)
+            weather_df = self.weather_data.to_pandas()
             weather_file = self.data_dir / 'weather_data_30min.csv'
             weather_df.to_csv(weather_file, index=False)
             print(f"   ✅ Weather data: {weather_file}")
@@ -556,7 +535,7 @@ class RadarThunderstormExtractor:
         
         # Weather data
         if self.weather_data:
-            weather_df = pd.DataFrame(self.weather_data)
+            weather_df = self.weather_data.to_pandas()
             print(f"\n☁️  WEATHER DATA (30-min intervals):")
             print(f"   ✅ Total records: {len(weather_df):,}")
             print(f"   📅 Dates covered: {weather_df['Date'].nunique()}")
@@ -603,9 +582,9 @@ class RadarThunderstormExtractor:
         print(f"   - NASA POWER: {self.api_calls['nasa_power']}")
         print(f"   - Google Earth Engine: {self.api_calls['google_earth']}")
         
-        openweather_total = self.api_calls['openweather_radar'] + self.api_calls['openweather_alerts']
-        remaining = 1000 - openweather_total
-        print(f"   📊 OpenWeather remaining today: {remaining}/1000")
+        remaining = self.rate_limiter.remaining('openweather')
+        quota = self.rate_limiter.limits['openweather']['daily_quota']
+        print(f"   📊 OpenWeather remaining today: {remaining}/{quota}")
         
         print(f"\n⏱️  PERFORMANCE:")
         print(f"   Total time: {elapsed_time:.1f} seconds ({elapsed_time/60:.1f} minutes)")
@@ -649,7 +628,7 @@ def main():
     print(f"\n🔑 API Key configured: {API_KEY[:8]}...{API_KEY[-4:]}")
     
     print("\n🚀 Starting extraction...")
-    print("⚠️  Note: Will automatically stop at ~950 API calls to stay within free tier\n")
+    print("⚠️  Note: Will automatically stop at the OpenWeatherMap daily quota (950 calls)\n")
     
     # Create extractor and run
     extractor = RadarThunderstormExtractor(openweather_api_key=API_KEY)
@@ -3,11 +3,10 @@ Extract Satellite Images + Weather Data for Lightning Detection
 Downloads satellite images and weather data for the same time/location
 """
 
-import requests
 import pandas as pd
 from datetime import datetime, timedelta
 from nasa_power_api import NASAPowerAPI
-import time
+from rate_limiter import get_rate_limiter
 import os
 from pathlib import Path
 import json
@@ -58,7 +57,7 @@ class SatelliteWeatherExtractor:
         }
         
         try:
-            response = requests.get(url, params=params, timeout=30)
+            response = get_rate_limiter().request('nasa_earth_demo', url, params=params, timeout=30)
             
             if response.status_code == 200:
                 # Save image
@@ -157,10 +156,6 @@ class SatelliteWeatherExtractor:
                     
             except Exception as e:
                 print(f"    ✗ Error: {e}")
-            
-            # Respectful delay
-            if idx < len(locations):
-                time.sleep(1)
         
         # Combine weather data
         if all_weather_data:
@@ -226,9 +221,6 @@ class SatelliteWeatherExtractor:
                         print(f"✓ Downloaded")
                     else:
                         print(f"✗ {result.get('error', 'Failed')}")
-                    
-                    # Delay to respect rate limits (DEMO_KEY = 30/hour = 1 per 2 seconds)
-                    time.sleep(2)
             
             print(f"\n✅ Downloaded {downloaded}/{total_images} satellite images")
         
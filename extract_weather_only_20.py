@@ -6,7 +6,6 @@ Since GEE requires manual authentication, use this for weather data extraction
 from nasa_power_api import NASAPowerAPI
 import pandas as pd
 from pathlib import Path
-import time
 
 def extract_weather_only_20_samples():
     """Extract 20 weather samples without satellite images"""
@@ -80,8 +79,6 @@ def extract_weather_only_20_samples():
                     
             except Exception as e:
                 print(f"   ❌ {date}: Error - {e}")
-            
-            time.sleep(1)  # Be respectful to API
         
         print()
     
@@ -0,0 +1,241 @@
+"""
+Extraction Job Ledger
+Durable record of finished work units, so interrupted runs resume
+
+Long extractions are split into units - one (source, location, period),
+e.g. ('power_hourly', 'Dhaka', '2021') or ('landsat_thumbnail', 'Dhaka',
+'2021-07-15'). Each unit's output is flushed to disk when it finishes and
+recorded here (SQLite, .job_ledger.sqlite). A restarted run skips every
+unit marked done, so a crash or an exhausted daily quota only costs the
+unit that was in progress:
+
+    ledger = JobLedger()
+    if not ledger.is_done('power_hourly', 'Dhaka', '2021'):
+        ledger.start('power_hourly', 'Dhaka', '2021')
+        ...                                   # fetch + write the CSV
+        ledger.done('power_hourly', 'Dhaka', '2021', output=csv_path, records=len(df))
+
+A unit with no entry is pending; recorded units are running, done or
+failed. A unit left 'running' by a crashed run is simply retried.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+
+STATUSES = ('running', 'done', 'failed')
+
+
+class JobLedger:
+    """
+    SQLite-backed ledger of extraction units and where their output lives
+    """
+
+    def __init__(self, path=None):
+        """
+        Open (or create) the ledger
+
+        Parameters:
+        -----------
+        path : str or Path
+            SQLite file (default: .job_ledger.sqlite next to this file)
+        """
+        if path is None:
+            path = Path(__file__).parent / '.job_ledger.sqlite'
+
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+        # Download callbacks record units from worker threads
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS units (
+                source     TEXT NOT NULL,
+                location   TEXT NOT NULL,
+                period     TEXT NOT NULL,
+                status     TEXT NOT NULL,
+                output     TEXT,
+                records    INTEGER,
+                result     TEXT,
+                error      TEXT,
+                attempts   INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (source, location, period)
+            )
+        """)
+        self._conn.commit()
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def _update(self, source, location, period, status, **fields):
+        """Insert or update one unit (each call is its own transaction)"""
+        fields['status'] = status
+        fields['updated_at'] = time.time()
+        columns = ', '.join(fields)
+        placeholders = ', '.join('?' for _ in fields)
+        updates = ', '.join(f"{name} = excluded.{name}" for name in fields)
+
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO units (source, location, period, {columns}) "
+                f"VALUES (?, ?, ?, {placeholders}) "
+                f"ON CONFLICT (source, location, period) DO UPDATE SET {updates}",
+                (source, str(location), str(period), *fields.values()))
+            self._conn.commit()
+
+    def get(self, source, location, period):
+        """
+        One unit's ledger entry
+
+        Returns:
+        --------
+        dict : status, output, records, result (decoded), error, attempts -
+               or None if the unit was never recorded
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, output, records, result, error, attempts FROM units "
+                "WHERE source = ? AND location = ? AND period = ?",
+                (source, str(location), str(period))).fetchone()
+        if row is None:
+            return None
+
+        status, output, records, result, error, attempts = row
+        return {
+            'status': status,
+            'output': output,
+            'records': records,
+            'result': json.loads(result) if result else None,
+            'error': error,
+            'attempts': attempts,
+        }
+
+    def is_done(self, source, location, period):
+        """True if the unit finished and its output (if any) still exists"""
+        entry = self.get(source, location, period)
+        if entry is None or entry['status'] != 'done':
+            return False
+        return entry['output'] is None or Path(entry['output']).exists()
+
+    def start(self, source, location, period):
+        """Mark a unit as running (counts an attempt)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts FROM units WHERE source = ? AND location = ? AND period = ?",
+                (source, str(location), str(period))).fetchone()
+        attempts = (row[0] if row else 0) + 1
+        self._update(source, location, period, 'running', attempts=attempts, error=None)
+
+    def done(self, source, location, period, output=None, records=None, result=None):
+        """
+        Mark a unit as done
+
+        Parameters:
+        -----------
+        output : str or Path
+            File (or directory) holding the unit's output
+        records : int
+            Rows written, for summaries on resume
+        result : dict
+            JSON-serializable metadata to restore on resume (e.g. an image result)
+        """
+        self._update(source, location, period, 'done',
+                     output=str(output) if output is not None else None,
+                     records=int(records) if records is not None else None,
+                     result=json.dumps(result, default=str) if result is not None else None,
+                     error=None)
+
+    def saved_seed(self, source):
+        """
+        Label seed recorded with a source's finished units
+
+        Returns:
+        --------
+        int : Seed stored in the most recent done unit's result['seed'],
+              or None if no done unit recorded one
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT result FROM units WHERE source = ? AND status = 'done' "
+                "AND result IS NOT NULL ORDER BY updated_at DESC", (source,)).fetchall()
+        for (result,) in rows:
+            seed = json.loads(result).get('seed')
+            if seed is not None:
+                return seed
+        return None
+
+    def failed(self, source, location, period, error):
+        """Mark a unit as failed (it is retried on the next run)"""
+        self._update(source, location, period, 'failed', error=str(error)[:500])
+
+    def pending(self, source, units):
+        """
+        Units of a source that still need to run
+
+        Parameters:
+        -----------
+        units : iterable of (location, period)
+
+        Returns:
+        --------
+        list of (location, period) : Units not done, in the given order
+        """
+        return [(location, period) for location, period in units
+                if not self.is_done(source, location, period)]
+
+    def summary(self, source=None):
+        """
+        Unit counts per status
+
+        Returns:
+        --------
+        dict : status -> count (all statuses present, zero if unused)
+        """
+        query = "SELECT status, COUNT(*) FROM units"
+        params = ()
+        if source is not None:
+            query += " WHERE source = ?"
+            params = (source,)
+        query += " GROUP BY status"
+
+        with self._lock:
+            counts = dict(self._conn.execute(query, params).fetchall())
+        return {status: counts.get(status, 0) for status in STATUSES}
+
+    def units(self, source=None):
+        """
+        Every recorded unit
+
+        Returns:
+        --------
+        pd.DataFrame : One row per unit
+        """
+        query = ("SELECT source, location, period, status, output, records, error, "
+                 "attempts, updated_at FROM units")
+        params = ()
+        if source is not None:
+            query += " WHERE source = ?"
+            params = (source,)
+
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY source, location, period", params).fetchall()
+        return pd.DataFrame(rows, columns=['source', 'location', 'period', 'status', 'output',
+                                           'records', 'error', 'attempts', 'updated_at'])
+
+    def reset(self, source=None):
+        """Forget recorded units (all, or one source) so they run again"""
+        with self._lock:
+            if source is None:
+                self._conn.execute("DELETE FROM units")
+            else:
+                self._conn.execute("DELETE FROM units WHERE source = ?", (source,))
+            self._conn.commit()
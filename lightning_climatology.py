@@ -0,0 +1,327 @@
+"""
+LIS/OTD Lightning Climatology
+Gridded flash-rate lookups from memory-mapped NumPy arrays
+
+The NASA LIS/OTD gridded climatologies (https://ghrc.nsstc.nasa.gov/lightning/)
+are converted once from NetCDF into .npy arrays:
+
+    lightning_data/climatology/monthly.npy   (12, lat, lon)  flashes/km²/month
+    lightning_data/climatology/diurnal.npy   (24, lat, lon)  relative factor (mean 1)
+    lightning_data/climatology/grid.json     grid origin and spacing of each array
+
+    build_climatology('LISOTD_HRMC_V2.3.2015.nc', 'LISOTD_LRDC_V2.3.2015.nc')
+
+The arrays are opened with mmap_mode='r', so a lookup only touches the grid
+cells it needs and worker processes share the OS page cache instead of each
+loading its own copy. Queries are vectorized with bilinear interpolation:
+
+    climatology = load_climatology()
+    rates = climatology.rates(lats, lons, months, hours)
+
+Without the files, lookups fall back to the Bangladesh monthly averages in
+MONTHLY_FLASH_RATES and the fixed time-of-day factors in HOURLY_TIME_FACTORS.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from netCDF4 import Dataset
+    NETCDF_AVAILABLE = True
+except ImportError:
+    NETCDF_AVAILABLE = False
+
+
+CLIMATOLOGY_DIR = Path(__file__).parent / 'lightning_data' / 'climatology'
+
+# Approximate monthly flash rates for Bangladesh (flashes/km²/month),
+# based on published LIS/OTD data: ~20-40 flashes/km²/year
+MONTHLY_FLASH_RATES = {
+    1: 1.5,   # January (dry season, low activity)
+    2: 2.0,   # February
+    3: 4.0,   # March (pre-monsoon increase)
+    4: 8.0,   # April (pre-monsoon peak)
+    5: 12.0,  # May (peak)
+    6: 10.0,  # June (monsoon)
+    7: 8.0,   # July
+    8: 7.0,   # August
+    9: 6.0,   # September
+    10: 4.0,  # October
+    11: 2.0,  # November
+    12: 1.5   # December
+}
+
+# Hour of day -> time factor (lightning peaks in the afternoon)
+HOURLY_TIME_FACTORS = np.array(
+    [0.2] * 6 +   # 00-06 Night (low)
+    [0.5] * 6 +   # 06-12 Morning (moderate)
+    [1.5] * 6 +   # 12-18 Afternoon (peak)
+    [1.0] * 6     # 18-24 Evening (high)
+)
+
+# Days per month used to convert the product's daily rates to monthly rates
+DAYS_PER_MONTH = 30
+
+
+class GriddedField:
+    """
+    Stack of regular lat/lon grids (one per month or hour) with bilinear lookup
+    """
+
+    def __init__(self, values, lat0, lon0, step):
+        """
+        Parameters:
+        -----------
+        values : np.ndarray
+            Array shaped (layers, lat, lon); may be a memmap
+        lat0, lon0 : float
+            Center of the first grid cell
+        step : float
+            Grid spacing in degrees
+        """
+        self.values = values
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.step = step
+
+        n_lon = values.shape[2]
+        self.wraps = abs(n_lon * step - 360.0) < 1e-6
+
+    def _axis(self, coords, origin, size, wrap):
+        """Lower cell index, upper cell index and weight of the upper cell"""
+        position = (np.asarray(coords, dtype=float) - origin) / self.step
+        if wrap:
+            position = np.mod(position, size)
+            lower = np.floor(position).astype(int)
+            return lower, (lower + 1) % size, position - lower
+
+        position = np.clip(position, 0, size - 1)
+        lower = np.minimum(np.floor(position).astype(int), max(size - 2, 0))
+        upper = np.minimum(lower + 1, size - 1)
+        return lower, upper, position - lower
+
+    def interpolate(self, lats, lons, layers):
+        """
+        Bilinear interpolation at each (lat, lon) in the given layer
+
+        Parameters:
+        -----------
+        lats, lons : array-like
+            Coordinates in decimal degrees
+        layers : array-like
+            Zero-based layer index per point (month - 1 or hour)
+
+        Returns:
+        --------
+        np.ndarray : Interpolated values
+        """
+        _, n_lat, n_lon = self.values.shape
+        layers = np.asarray(layers, dtype=int)
+
+        i0, i1, wi = self._axis(lats, self.lat0, n_lat, wrap=False)
+        j0, j1, wj = self._axis(lons, self.lon0, n_lon, wrap=self.wraps)
+
+        return ((1 - wi) * (1 - wj) * self.values[layers, i0, j0] +
+                (1 - wi) * wj * self.values[layers, i0, j1] +
+                wi * (1 - wj) * self.values[layers, i1, j0] +
+                wi * wj * self.values[layers, i1, j1])
+
+
+class LightningClimatology:
+    """
+    Vectorized LIS/OTD flash-rate lookups, with the Bangladesh averages as fallback
+    """
+
+    def __init__(self, path=None):
+        """
+        Open the climatology arrays (memory-mapped) if they exist
+
+        Parameters:
+        -----------
+        path : str or Path
+            Directory with monthly.npy, diurnal.npy and grid.json
+            (default: lightning_data/climatology)
+        """
+        self.path = Path(path) if path is not None else CLIMATOLOGY_DIR
+        self.monthly = None
+        self.diurnal = None
+
+        grid_file = self.path / 'grid.json'
+        if not grid_file.exists():
+            return
+
+        with open(grid_file, 'r') as f:
+            grids = json.load(f)
+
+        for name in ('monthly', 'diurnal'):
+            array_file = self.path / f"{name}.npy"
+            if name in grids and array_file.exists():
+                values = np.load(array_file, mmap_mode='r')
+                setattr(self, name, GriddedField(values, **grids[name]))
+
+    def __getstate__(self):
+        # Worker processes re-open the memmaps instead of receiving a copy
+        return {'path': str(self.path)}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    @property
+    def is_gridded(self):
+        """True if monthly rates come from the gridded product"""
+        return self.monthly is not None
+
+    def monthly_rates(self, lats, lons, months):
+        """
+        Monthly flash rate (flashes/km²/month) at each point
+
+        Parameters:
+        -----------
+        lats, lons : array-like
+            Coordinates in decimal degrees
+        months : array-like
+            Month numbers (1-12)
+
+        Returns:
+        --------
+        np.ndarray : Flash rate per point
+        """
+        months = np.asarray(months, dtype=int)
+        if self.monthly is not None:
+            lats, lons, months = np.broadcast_arrays(lats, lons, months)
+            return self.monthly.interpolate(lats, lons, months - 1)
+
+        table = np.array([MONTHLY_FLASH_RATES[month] for month in range(1, 13)])
+        return table[months - 1]
+
+    def diurnal_factors(self, lats, lons, hours):
+        """
+        Time-of-day factor at each point (hours in local solar time)
+
+        Returns:
+        --------
+        np.ndarray : Multiplier per point
+        """
+        hours = np.asarray(hours, dtype=int) % 24
+        if self.diurnal is not None:
+            lats, lons, hours = np.broadcast_arrays(lats, lons, hours)
+            return self.diurnal.interpolate(lats, lons, hours)
+
+        return HOURLY_TIME_FACTORS[hours]
+
+    def rates(self, lats, lons, months, hours=None):
+        """
+        Flash rate at each point, scaled by the time-of-day factor if hours are given
+
+        Parameters:
+        -----------
+        lats, lons : array-like
+            Coordinates in decimal degrees
+        months : array-like
+            Month numbers (1-12)
+        hours : array-like
+            Hours of day (0-23), optional
+
+        Returns:
+        --------
+        np.ndarray : Flashes/km²/month (times the diurnal factor)
+        """
+        rates = self.monthly_rates(lats, lons, months)
+        if hours is not None:
+            rates = rates * self.diurnal_factors(lats, lons, hours)
+        return rates
+
+    def monthly_table(self, lat, lon):
+        """
+        Monthly flash rates at one location as a dict (month -> flashes/km²/month)
+        """
+        months = np.arange(1, 13)
+        rates = self.monthly_rates(np.full(12, lat), np.full(12, lon), months)
+        return {int(month): float(rate) for month, rate in zip(months, rates)}
+
+
+_CLIMATOLOGIES = {}
+
+
+def load_climatology(path=None):
+    """Shared LightningClimatology for a directory (opened once per process)"""
+    key = str(Path(path) if path is not None else CLIMATOLOGY_DIR)
+    if key not in _CLIMATOLOGIES:
+        _CLIMATOLOGIES[key] = LightningClimatology(key)
+    return _CLIMATOLOGIES[key]
+
+
+def _read_grid(nc_file, variable):
+    """Read a NetCDF variable as (layers, lat, lon) with ascending coordinates"""
+    with Dataset(nc_file) as nc:
+        var = nc.variables[variable]
+        dims = [dim.lower() for dim in var.dimensions]
+        lat_axis = next(i for i, dim in enumerate(dims) if 'lat' in dim)
+        lon_axis = next(i for i, dim in enumerate(dims) if 'lon' in dim)
+        layer_axis = next(i for i in range(3) if i not in (lat_axis, lon_axis))
+
+        values = np.ma.filled(var[:].astype(np.float32), np.nan)
+        values = np.transpose(values, (layer_axis, lat_axis, lon_axis))
+
+        lats = np.asarray(nc.variables[var.dimensions[lat_axis]][:], dtype=float)
+        lons = np.asarray(nc.variables[var.dimensions[lon_axis]][:], dtype=float)
+
+    if lats[0] > lats[-1]:
+        values, lats = values[:, ::-1, :], lats[::-1]
+    if lons[0] > lons[-1]:
+        values, lons = values[:, :, ::-1], lons[::-1]
+
+    grid = {'lat0': float(lats[0]), 'lon0': float(lons[0]),
+            'step': float(lats[1] - lats[0])}
+    return np.nan_to_num(values, nan=0.0), grid
+
+
+def build_climatology(monthly_file, diurnal_file=None, path=None,
+                      monthly_variable='HRMC_COM_FR', diurnal_variable='LRDC_COM_FR'):
+    """
+    Convert LIS/OTD NetCDF climatologies to memory-mappable .npy arrays
+
+    Parameters:
+    -----------
+    monthly_file : str or Path
+        0.5° High Resolution Monthly Climatology (HRMC) NetCDF file
+    diurnal_file : str or Path
+        Low Resolution Diurnal Climatology (LRDC) NetCDF file, optional
+    path : str or Path
+        Output directory (default: lightning_data/climatology)
+    monthly_variable, diurnal_variable : str
+        Flash-rate variables (flashes/km²/day) in each file
+
+    Returns:
+    --------
+    LightningClimatology : The converted climatology
+    """
+    if not NETCDF_AVAILABLE:
+        raise ImportError("Reading LIS/OTD NetCDF files requires netCDF4: pip install netCDF4")
+
+    path = Path(path) if path is not None else CLIMATOLOGY_DIR
+    path.mkdir(parents=True, exist_ok=True)
+    grids = {}
+
+    print(f"📥 Converting {monthly_file}...")
+    monthly, grids['monthly'] = _read_grid(monthly_file, monthly_variable)
+    np.save(path / 'monthly.npy', monthly * DAYS_PER_MONTH)
+    print(f"   ✅ monthly.npy {monthly.shape}")
+
+    if diurnal_file is not None:
+        print(f"📥 Converting {diurnal_file}...")
+        diurnal, grids['diurnal'] = _read_grid(diurnal_file, diurnal_variable)
+
+        # Hourly rates -> multiplier relative to the cell's daily mean
+        mean = diurnal.mean(axis=0, keepdims=True)
+        factors = np.divide(diurnal, mean, out=np.ones_like(diurnal), where=mean > 0)
+        np.save(path / 'diurnal.npy', factors.astype(np.float32))
+        print(f"   ✅ diurnal.npy {factors.shape}")
+
+    with open(path / 'grid.json', 'w') as f:
+        json.dump(grids, f, indent=2)
+
+    _CLIMATOLOGIES.pop(str(path), None)
+    return load_climatology(path)
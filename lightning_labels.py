@@ -0,0 +1,301 @@
+"""
+Lightning Label Generation
+Vectorized synthetic lightning labels from climatology + weather conditions
+
+Every factor is computed as an array operation over a whole DataFrame and
+flash counts come from a single Poisson draw, so labeling a multi-year,
+multi-location dataset takes milliseconds instead of a Python loop per row.
+
+With a seed, each (location, year, month) partition draws from its own
+numpy Generator derived from that seed, so labels are reproducible and
+identical whether partitions are labeled in one process or many:
+
+    seed = new_seed()                       # record this to regenerate labels
+    labels = label_lightning(df, rates, seed=seed)
+    labels_list = label_partitions(frames, rates, seed=seed, max_workers=4)
+"""
+
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from lightning_climatology import DAYS_PER_MONTH, HOURLY_TIME_FACTORS
+from metrics import get_metrics
+
+
+# Label model constants
+AREA_KM2 = 100
+INTERVALS_PER_DAY = 48
+DEFAULT_FLASH_RATE = 5.0
+
+LABEL_COLUMNS = [
+    'Lightning_Occurred',
+    'Lightning_Probability',
+    'Flash_Count',
+    'Flash_Density_per_km2',
+    'Expected_Flashes',
+    'Base_Flash_Rate',
+    'Time_Factor',
+    'Weather_Factor',
+]
+
+
+def new_seed():
+    """Fresh random seed (an int) to record alongside generated labels"""
+    return np.random.SeedSequence().entropy
+
+
+def resume_seed(ledger, source, seed=None):
+    """
+    Label seed for a ledger-backed job
+
+    A job that already finished units keeps the seed saved with them, so a
+    resumed run labels every partition from the same seed.
+
+    Parameters:
+    -----------
+    ledger : JobLedger
+        Ledger holding the job's units (saved as result={'seed': ...})
+    source : str
+        Ledger source of the job
+    seed : int
+        Requested seed (default: the saved one, or a fresh one)
+
+    Returns:
+    --------
+    int : Seed to label with
+
+    Raises:
+    -------
+    ValueError : if `seed` differs from the seed of finished units
+    """
+    saved = ledger.saved_seed(source)
+    if saved is None:
+        return seed if seed is not None else new_seed()
+    if seed is not None and seed != saved:
+        raise ValueError(f"'{source}' was labeled with seed {saved}; relabel the dataset or "
+                         f"reset the ledger source to use seed {seed}")
+    return saved
+
+
+def partition_rng(seed, location, year, month):
+    """
+    Independent random Generator for one (location, year, month) partition
+
+    The stream depends only on the seed and the partition key, never on
+    which process draws from it or in what order partitions are labeled.
+    """
+    spawn_key = (zlib.crc32(str(location).encode('utf-8')), int(year), int(month))
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=spawn_key))
+
+
+def _partition_years(df):
+    """Year of every row, from a 'Year' column or the Date/DateTime string"""
+    if 'Year' in df.columns:
+        return df['Year'].astype(int).to_numpy()
+    source = 'Date' if 'Date' in df.columns else 'DateTime'
+    return df[source].astype(str).str[:4].astype(int).to_numpy()
+
+
+def time_factors(hours):
+    """Time-of-day factor for an array of hours (0-23)"""
+    return HOURLY_TIME_FACTORS[np.asarray(hours, dtype=int) % 24]
+
+
+def weather_factors(df, group_column='Location'):
+    """
+    Weather condition multiplier for every row
+
+    - Humidity > 70%          × 1.3
+    - Any precipitation       × 1.8
+    - Wind > 5 m/s            × 1.2
+    - Temperature 25-35 °C    × 1.1
+    - |Δ pressure| > 0.5 kPa  × 1.3 (vs. the previous row of the same location)
+
+    Missing values never trigger a factor.
+    """
+    factor = np.ones(len(df))
+
+    factor *= np.where(df['Humidity_%'].to_numpy(dtype=float) > 70, 1.3, 1.0)
+    factor *= np.where(df['Precipitation_mm'].to_numpy(dtype=float) > 0, 1.8, 1.0)
+    factor *= np.where(df['Wind_Speed_m/s'].to_numpy(dtype=float) > 5, 1.2, 1.0)
+
+    temperature = df['Temperature_C'].to_numpy(dtype=float)
+    factor *= np.where((temperature >= 25) & (temperature <= 35), 1.1, 1.0)
+
+    pressure = df['Pressure_kPa'].astype(float)
+    if group_column in df:
+        pressure_change = pressure.groupby(df[group_column], sort=False).diff()
+    else:
+        pressure_change = pressure.diff()
+    factor *= np.where(pressure_change.abs().to_numpy() > 0.5, 1.3, 1.0)
+
+    return factor
+
+
+def expected_flashes(df, monthly_flash_rates=None, group_column='Location', climatology=None):
+    """
+    Expected flashes per interval and the factors behind it
+
+    Base rates and time factors come from the gridded climatology at each
+    row's Latitude/Longitude when one is given, otherwise from the monthly
+    dict and the fixed time-of-day factors.
+
+    Returns:
+    --------
+    tuple : (expected, base_rate, time_factor, weather_factor) arrays
+    """
+    if climatology is not None:
+        lats = df['Latitude'].to_numpy(dtype=float)
+        lons = df['Longitude'].to_numpy(dtype=float)
+        base_rate = climatology.monthly_rates(lats, lons, df['Month'].to_numpy())
+        time_factor = climatology.diurnal_factors(lats, lons, df['Hour'].to_numpy())
+    else:
+        base_rate = (df['Month'].map(monthly_flash_rates)
+                     .fillna(DEFAULT_FLASH_RATE).to_numpy(dtype=float))
+        time_factor = time_factors(df['Hour'].to_numpy())
+    weather_factor = weather_factors(df, group_column=group_column)
+
+    expected = (base_rate * AREA_KM2 * time_factor * weather_factor) / \
+        (DAYS_PER_MONTH * INTERVALS_PER_DAY)
+    return expected, base_rate, time_factor, weather_factor
+
+
+def draw_flashes(expected, df, seed, group_column='Location'):
+    """
+    Poisson flash counts drawn per (location, year, month) partition
+
+    Parameters:
+    -----------
+    expected : np.ndarray
+        Expected flashes for every row of df
+    df : pd.DataFrame
+        Rows with Month and Year (or Date/DateTime) columns
+    seed : int
+        Seed shared by all partitions
+    group_column : str
+        Column identifying the location
+
+    Returns:
+    --------
+    np.ndarray : Flash count per row
+    """
+    if group_column in df.columns:
+        locations = df[group_column].astype(str).to_numpy()
+    else:
+        locations = np.full(len(df), '')
+
+    keys = pd.DataFrame({
+        'location': locations,
+        'year': _partition_years(df),
+        'month': df['Month'].astype(int).to_numpy(),
+    })
+
+    flashes = np.zeros(len(df), dtype=np.int64)
+    for (location, year, month), positions in keys.groupby(
+            ['location', 'year', 'month'], sort=False).indices.items():
+        rng = partition_rng(seed, location, year, month)
+        flashes[positions] = rng.poisson(expected[positions])
+
+    return flashes
+
+
+def label_lightning(df, monthly_flash_rates=None, rng=None, seed=None, group_column='Location',
+                    climatology=None):
+    """
+    Generate lightning labels for every row of a weather DataFrame
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Rows with Month, Hour, Temperature_C, Humidity_%, Wind_Speed_m/s,
+        Precipitation_mm and Pressure_kPa, in time order per location
+    monthly_flash_rates : dict
+        Month -> climatological flash rate (flashes/km²/month)
+    rng : np.random.Generator
+        Random source for the Poisson draw (default: numpy's global state)
+    seed : int
+        Draw each (location, year, month) partition from its own stream
+        (see partition_rng); takes precedence over rng
+    group_column : str
+        Column separating independent time series for the pressure change
+    climatology : LightningClimatology
+        Gridded rates looked up at each row's Latitude/Longitude
+        (used instead of monthly_flash_rates)
+
+    Returns:
+    --------
+    pd.DataFrame : LABEL_COLUMNS, aligned with df's index
+    """
+    with get_metrics().stage('label') as stage:
+        expected, base_rate, time_factor, weather_factor = expected_flashes(
+            df, monthly_flash_rates, group_column=group_column, climatology=climatology
+        )
+
+        if seed is not None:
+            flashes = draw_flashes(expected, df, seed, group_column=group_column)
+        else:
+            poisson = rng.poisson if rng is not None else np.random.poisson
+            flashes = poisson(expected)
+
+        labels = pd.DataFrame({
+            'Lightning_Occurred': (flashes > 0).astype(int),
+            'Lightning_Probability': np.round(np.minimum(expected / 2, 1.0), 4),
+            'Flash_Count': flashes,
+            'Flash_Density_per_km2': np.round(flashes / AREA_KM2, 6),
+            'Expected_Flashes': np.round(expected, 4),
+            'Base_Flash_Rate': base_rate,
+            'Time_Factor': time_factor,
+            'Weather_Factor': np.round(weather_factor, 2),
+        }, index=df.index)
+        stage.rows = len(labels)
+
+    return labels
+
+
+def _label_partition(task):
+    df, monthly_flash_rates, seed, group_column, climatology = task
+    return label_lightning(df, monthly_flash_rates, seed=seed, group_column=group_column,
+                           climatology=climatology)
+
+
+def label_partitions(frames, monthly_flash_rates, seed, max_workers=None,
+                     group_column='Location', climatology=None):
+    """
+    Label several DataFrames concurrently in a process pool
+
+    Results are identical for any max_workers, since every partition draws
+    from its own seeded stream.
+
+    Parameters:
+    -----------
+    frames : list of pd.DataFrame
+        Weather frames (e.g. one per location-year)
+    monthly_flash_rates : dict
+        Month -> climatological flash rate (flashes/km²/month)
+    seed : int
+        Seed shared by all partitions
+    max_workers : int
+        Worker processes (default: CPU count; 1 labels in this process)
+    climatology : LightningClimatology
+        Gridded rates (workers re-open its memory-mapped arrays)
+
+    Returns:
+    --------
+    list of pd.DataFrame : Labels for each frame, in input order
+    """
+    tasks = [(frame, monthly_flash_rates, seed, group_column, climatology)
+             for frame in frames]
+
+    if max_workers == 1 or len(tasks) <= 1:
+        return [_label_partition(task) for task in tasks]
+
+    # Worker processes have their own metrics; time the pool as one stage call
+    with get_metrics().stage('label') as stage:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            labels = list(executor.map(_label_partition, tasks))
+        stage.rows = sum(len(frame) for frame in labels)
+
+    return labels
@@ -0,0 +1,436 @@
+"""
+Extraction Metrics
+Counters, latency histograms and stage timings shared by every extractor
+
+API calls are recorded by the shared RateLimiter (every HTTP attempt and
+every Earth Engine call goes through it), so NASA POWER, Earth Engine and
+OpenWeather latency, bytes, retries and outcomes need no extra code in the
+extractors. Hot pipeline steps are wrapped in stages, which record time
+spent and rows produced:
+
+    metrics = get_metrics()
+    with metrics.stage('label') as stage:
+        labels = label_lightning(df)
+        stage.rows = len(labels)
+
+    metrics.inc('extraction_cache_requests_total', cache='power', result='hit')
+    metrics.export(output_dir)      # metrics.prom (Prometheus text) + metrics.json
+
+Stages: 'parse' (POWER JSON -> rows), 'label' (lightning labels),
+'features' (derived features), 'write' (CSV / Parquet output).
+
+Any stage can be profiled. Set EXTRACTION_PROFILE=cprofile (or
+pyinstrument, if installed), optionally limited to some stages with
+EXTRACTION_PROFILE=cprofile:parse,label. One profile per stage is
+accumulated over all its calls and written by export() to profiles/. Only
+one stage is profiled at a time (the first to start); stages running
+concurrently on other threads are timed but not profiled.
+
+Metrics are per process: work done in worker processes is not included.
+"""
+
+import contextlib
+import cProfile
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+    PYINSTRUMENT_AVAILABLE = True
+except ImportError:
+    PYINSTRUMENT_AVAILABLE = False
+
+
+# Histogram bucket upper bounds (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_HELP = {
+    'extraction_http_request_seconds': 'API call latency per attempt',
+    'extraction_http_requests_total': 'API call attempts by outcome (ok, throttled, error, failed)',
+    'extraction_http_bytes_total': 'Payload bytes received from successful API calls',
+    'extraction_http_retries_total': 'API call attempts that repeated an earlier failed attempt',
+    'extraction_http_backoff_seconds_total': 'Time slept backing off before retries',
+    'extraction_cache_requests_total': 'Cache lookups by cache and result (hit, miss)',
+    'extraction_stage_seconds': 'Time spent per call of a pipeline stage',
+    'extraction_stage_rows_total': 'Rows produced by a pipeline stage',
+    'extraction_task_seconds': 'Orchestrator task duration by task kind, including worker processes',
+}
+
+PROFILERS = ('cprofile', 'pyinstrument')
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + (extra or [])
+    if not pairs:
+        return ''
+    escaped = [(name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for name, value in pairs]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class StageRecord:
+    """Handle yielded by Metrics.stage(); set `rows` to what the stage produced"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and histograms with Prometheus / JSON export
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, profile=None):
+        """
+        Initialize the registry
+
+        Parameters:
+        -----------
+        buckets : tuple of float
+            Histogram bucket upper bounds
+        profile : str
+            Profiling setting, e.g. 'cprofile' or 'pyinstrument:parse,label'
+            (default: the EXTRACTION_PROFILE environment variable)
+        """
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}     # name -> label key -> value
+        self._histograms = {}   # name -> label key -> {'counts', 'sum', 'count'}
+        self.started_at = time.time()
+
+        self.profiler = None
+        self.profile_stages = None
+        self._profiles = {}
+        self._profiling = threading.Lock()
+
+        setting = profile if profile is not None else os.environ.get('EXTRACTION_PROFILE')
+        if setting:
+            profiler, _, stages = setting.partition(':')
+            self.enable_profiling(profiler, stages.split(',') if stages else None)
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def inc(self, name, value=1, **labels):
+        """Add to a counter"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Record one value in a histogram"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['counts'][i] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """Observe the duration of a block in a histogram"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Time a pipeline stage and count the rows it produced
+
+        Yields:
+        -------
+        StageRecord : set `.rows` before the block ends
+        """
+        record = StageRecord(name)
+        profiler = self._start_profile(name)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            if profiler is not None:
+                self._stop_profile(profiler)
+            self.observe('extraction_stage_seconds', seconds, stage=name)
+            if record.rows:
+                self.inc('extraction_stage_rows_total', record.rows, stage=name)
+
+    def reset(self):
+        """Forget every recorded value"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._profiles.clear()
+            self.started_at = time.time()
+
+    # ------------------------------------------------------------------
+    # Profiling
+    # ------------------------------------------------------------------
+
+    def enable_profiling(self, profiler='cprofile', stages=None):
+        """
+        Profile pipeline stages
+
+        Parameters:
+        -----------
+        profiler : str
+            'cprofile' or 'pyinstrument'
+        stages : list of str
+            Stages to profile (default: all)
+        """
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler '{profiler}' (use {PROFILERS})")
+        if profiler == 'pyinstrument' and not PYINSTRUMENT_AVAILABLE:
+            print("⚠️  pyinstrument not installed (pip install pyinstrument), using cProfile")
+            profiler = 'cprofile'
+
+        self.profiler = profiler
+        self.profile_stages = set(stages) if stages else None
+
+    def _start_profile(self, name):
+        if self.profiler is None or (self.profile_stages is not None and name not in self.profile_stages):
+            return None
+        # Python allows one active profiler: skip if another stage holds it
+        if not self._profiling.acquire(blocking=False):
+            return None
+
+        with self._lock:
+            profiler = self._profiles.get(name)
+            if profiler is None:
+                profiler = self._profiles[name] = (cProfile.Profile() if self.profiler == 'cprofile'
+                                                   else PyinstrumentProfiler())
+        try:
+            if self.profiler == 'cprofile':
+                profiler.enable()
+            else:
+                profiler.start()
+        except (ValueError, RuntimeError):
+            # Another profiling tool is already active
+            self._profiling.release()
+            return None
+        return profiler
+
+    def _stop_profile(self, profiler):
+        try:
+            if self.profiler == 'cprofile':
+                profiler.disable()
+            else:
+                profiler.stop()
+        finally:
+            self._profiling.release()
+
+    def dump_profiles(self, directory):
+        """
+        Write accumulated stage profiles (.prof for cProfile, .html for pyinstrument)
+
+        Returns:
+        --------
+        list of Path : Files written
+        """
+        with self._lock:
+            profiles = dict(self._profiles)
+        if not profiles:
+            return []
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        written = []
+        for name, profiler in profiles.items():
+            if isinstance(profiler, cProfile.Profile):
+                path = directory / f"{name}.prof"
+                profiler.dump_stats(path)
+            else:
+                path = directory / f"{name}.html"
+                with open(path, 'w') as f:
+                    f.write(profiler.output_html())
+            written.append(path)
+        return written
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def _copy(self):
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {key: {'counts': list(h['counts']), 'sum': h['sum'], 'count': h['count']}
+                                 for key, h in series.items()}
+                          for name, series in self._histograms.items()}
+        return counters, histograms
+
+    def quantile(self, histogram, q):
+        """Approximate quantile of a histogram (upper bound of the bucket it falls in)"""
+        if not histogram['count']:
+            return None
+        target = q * histogram['count']
+        seen = 0
+        for bound, count in zip(self.buckets, histogram['counts']):
+            seen += count
+            if seen >= target:
+                return bound
+        return math.inf
+
+    def stages(self):
+        """
+        Per-stage totals
+
+        Returns:
+        --------
+        dict : stage -> calls, seconds, rows, rows_per_s
+        """
+        counters, histograms = self._copy()
+        rows = {dict(key)['stage']: value
+                for key, value in counters.get('extraction_stage_rows_total', {}).items()}
+
+        summary = {}
+        for key, histogram in histograms.get('extraction_stage_seconds', {}).items():
+            name = dict(key)['stage']
+            summary[name] = {
+                'calls': histogram['count'],
+                'seconds': round(histogram['sum'], 4),
+                'rows': rows.get(name, 0),
+                'rows_per_s': round(rows.get(name, 0) / histogram['sum'], 1) if histogram['sum'] else None,
+            }
+        return summary
+
+    def snapshot(self):
+        """
+        All metrics as a JSON-serializable dict
+
+        Returns:
+        --------
+        dict : counters and histograms (list of {labels, ...} per metric),
+               per-stage totals and the collection window
+        """
+        counters, histograms = self._copy()
+        return {
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'captured_at': datetime.now().isoformat(timespec='seconds'),
+            'counters': {
+                name: [dict(labels=dict(key), value=value) for key, value in series.items()]
+                for name, series in counters.items()
+            },
+            'histograms': {
+                name: [dict(labels=dict(key), buckets=dict(zip(map(str, self.buckets), h['counts'])),
+                            sum=round(h['sum'], 6), count=h['count'],
+                            p50=self.quantile(h, 0.5), p95=self.quantile(h, 0.95))
+                       for key, h in series.items()]
+                for name, series in histograms.items()
+            },
+            'stages': self.stages(),
+        }
+
+    def to_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        counters, histograms = self._copy()
+        lines = []
+
+        for name in sorted(counters):
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+
+        for name in sorted(histograms):
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, h in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, h['counts']):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', repr(bound))])} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {h['count']}")
+                lines.append(f"{name}_sum{_format_labels(key)} {h['sum']:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {h['count']}")
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Write metrics to a file: JSON for .json, Prometheus text otherwise"""
+        path = Path(path)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            if path.suffix == '.json':
+                json.dump(self.snapshot(), f, indent=2, default=str)
+            else:
+                f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+        return path
+
+    def export(self, directory):
+        """
+        Write metrics.prom, metrics.json and any stage profiles to a directory
+
+        Returns:
+        --------
+        list of Path : Files written
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        written = [self.write(directory / 'metrics.prom'), self.write(directory / 'metrics.json')]
+        return written + self.dump_profiles(directory / 'profiles')
+
+    def print_summary(self):
+        """Print time and throughput per stage and API endpoint"""
+        counters, histograms = self._copy()
+
+        stages = self.stages()
+        if stages:
+            print("⏱️  Stages:")
+            for name, stage in sorted(stages.items(), key=lambda item: -item[1]['seconds']):
+                rate = f", {stage['rows_per_s']:,.0f} rows/s" if stage['rows_per_s'] else ''
+                print(f"   {name:<10} {stage['seconds']:9.2f}s  {stage['calls']:>6} calls{rate}")
+
+        requests = histograms.get('extraction_http_request_seconds', {})
+        if requests:
+            sizes = counters.get('extraction_http_bytes_total', {})
+            print("🌐 API calls:")
+            for key, h in sorted(requests.items()):
+                labels = dict(key)
+                p95 = self.quantile(h, 0.95)
+                print(f"   {labels['service']} {labels['endpoint']:<16} {h['count']:>6} calls, "
+                      f"{h['sum']:8.1f}s total, p95 ≤ {p95}s, "
+                      f"{sizes.get(key, 0) / (1024 * 1024):.1f} MB")
+
+        caches = counters.get('extraction_cache_requests_total', {})
+        if caches:
+            results = {}
+            for key, value in caches.items():
+                labels = dict(key)
+                results.setdefault(labels['cache'], {})[labels['result']] = value
+            for cache, counts in sorted(results.items()):
+                total = sum(counts.values())
+                print(f"💾 {cache} cache: {counts.get('hit', 0)}/{total} hits")
+
+
+_shared_metrics = None
+_shared_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide Metrics registry shared by all extractors"""
+    global _shared_metrics
+    with _shared_lock:
+        if _shared_metrics is None:
+            _shared_metrics = Metrics()
+        return _shared_metrics
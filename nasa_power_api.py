@@ -4,10 +4,18 @@ Extract weather and climate parameters for Bangladesh (2015-present)
 """
 
 import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 import json
-import time
+
+from metrics import get_metrics
+from power_cache import PowerResponseCache
+from power_grid import grid_cell
+from power_regional import RegionalCube, tile_bbox
+from power_resample import resample_hourly_frame
+from progress_log import get_progress_log
+from rate_limiter import get_rate_limiter
 
 
 class NASAPowerAPI:
@@ -30,6 +38,15 @@ class NASAPowerAPI:
         'wind_direction': 'WD2M',          # Wind Direction at 2m (Degrees)
     }
     
+    # Default parameter codes for point requests
+    DAILY_PARAMETERS = [
+        'T2M', 'T2M_MAX', 'T2M_MIN', 'RH2M', 
+        'PRECTOTCORR', 'WS2M', 'PS', 'ALLSKY_SFC_SW_DWN'
+    ]
+    HOURLY_PARAMETERS = [
+        'T2M', 'RH2M', 'WS2M', 'PRECTOTCORR', 'ALLSKY_SFC_SW_DWN'
+    ]
+    
     # Bangladesh coordinates (approximate center)
     # You can customize these for specific locations
     BANGLADESH_LOCATIONS = {
@@ -40,9 +57,88 @@ class NASAPowerAPI:
         'Khulna': {'lat': 22.8456, 'lon': 89.5403},
     }
     
-    def __init__(self):
-        """Initialize the NASA POWER API client"""
+    def __init__(self, use_cache=True, cache_dir=None):
+        """
+        Initialize the NASA POWER API client
+        
+        Parameters:
+        -----------
+        use_cache : bool
+            Serve repeated requests from the on-disk response cache (default: True)
+        cache_dir : str or Path
+            Cache directory (default: .power_cache next to this file)
+        """
         self.session = requests.Session()
+        self.cache = PowerResponseCache(cache_dir) if use_cache else None
+        self.rate_limiter = get_rate_limiter()
+        self.log = get_progress_log()
+    
+    def _fetch(self, endpoint, params, timeout=30):
+        """
+        GET a POWER endpoint, going through the response cache
+        
+        Parameters:
+        -----------
+        endpoint : str
+            Endpoint path below BASE_URL (e.g., 'daily/point')
+        params : dict
+            Query parameters
+        
+        Returns:
+        --------
+        tuple : (API response dict, True if served from cache)
+        """
+        cache_params = self.cache_params(endpoint, params)
+        
+        if self.cache is not None:
+            data = self.cache.get(endpoint, cache_params)
+            result = 'miss' if data is None else 'hit'
+            get_metrics().inc('extraction_cache_requests_total', cache='power', result=result)
+            if data is not None:
+                return data, True
+        
+        response = self.rate_limiter.request(
+            'nasa_power', f"{self.BASE_URL}/{endpoint}",
+            session=self.session, params=params, timeout=timeout, endpoint=endpoint
+        )
+        response.raise_for_status()
+        data = response.json()
+        
+        # Only cache real data, not error payloads
+        if self.cache is not None and ('properties' in data or 'features' in data):
+            self.cache.put(endpoint, cache_params, data)
+        
+        return data, False
+    
+    @staticmethod
+    def point_params(latitude, longitude, start_date, end_date, parameters, community='ag'):
+        """Query parameters for a daily/point or hourly/point request"""
+        return {
+            'parameters': ','.join(parameters),
+            'community': community,
+            'start': start_date,
+            'end': end_date,
+            'latitude': latitude,
+            'longitude': longitude,
+            'format': 'json'
+        }
+    
+    @staticmethod
+    def cache_params(endpoint, params):
+        """
+        Parameters a response is cached (and replayed) under
+        
+        Points in the same POWER grid cell get identical data, so point
+        requests are keyed on the cell and any location inside it is a hit.
+        """
+        if not endpoint.endswith('/point'):
+            return params
+        
+        cache_params = {name: value for name, value in params.items()
+                        if name not in ('latitude', 'longitude')}
+        cache_params['grid_cell'] = grid_cell(float(params['latitude']), float(params['longitude']),
+                                              params['parameters'].split(','))
+        return cache_params
     
     def get_daily_data(self, latitude, longitude, start_date, end_date, 
                       parameters=None, community='ag'):
@@ -70,41 +166,20 @@ class NASAPowerAPI:
         """
         if parameters is None:
             # Default parameters for comprehensive weather data
-            parameters = [
-                'T2M', 'T2M_MAX', 'T2M_MIN', 'RH2M', 
-                'PRECTOTCORR', 'WS2M', 'PS', 'ALLSKY_SFC_SW_DWN'
-            ]
+            parameters = self.DAILY_PARAMETERS
         
-        # Join parameters with comma
-        params_str = ','.join(parameters)
-        
-        # Build the API URL - Correct format with /point endpoint
-        url = f"{self.BASE_URL}/daily/point"
-        
-        # API parameters
-        params = {
-            'parameters': params_str,
-            'community': community,
-            'start': start_date,
-            'end': end_date,
-            'latitude': latitude,
-            'longitude': longitude,
-            'format': 'json'
-        }
+        params = self.point_params(latitude, longitude, start_date, end_date, parameters, community)
         
         try:
-            print(f"Fetching data for coordinates ({latitude}, {longitude})...")
-            print(f"Date range: {start_date} to {end_date}")
-            
-            response = self.session.get(url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
-            print(f"✓ Data retrieved successfully!")
+            # Correct format with /point endpoint
+            data, cached = self._fetch('daily/point', params)
+            self.log.debug("✓ Daily data ({latitude}, {longitude}) {start_date}-{end_date} {source}",
+                           latitude=latitude, longitude=longitude, start_date=start_date,
+                           end_date=end_date, source='from cache' if cached else 'retrieved')
             return data
             
         except requests.exceptions.RequestException as e:
-            print(f"✗ Error fetching data: {e}")
+            self.log.error("✗ Error fetching data: {error}", error=e)
             return None
     
     def get_hourly_data(self, latitude, longitude, start_date, end_date, 
@@ -116,34 +191,85 @@ class NASAPowerAPI:
         """
         if parameters is None:
             # Hourly available parameters
-            parameters = [
-                'T2M', 'RH2M', 'WS2M', 'PRECTOTCORR', 'ALLSKY_SFC_SW_DWN'
-            ]
+            parameters = self.HOURLY_PARAMETERS
         
-        params_str = ','.join(parameters)
-        url = f"{self.BASE_URL}/hourly/point"
-        
-        params = {
-            'parameters': params_str,
-            'community': community,
-            'start': start_date,
-            'end': end_date,
-            'latitude': latitude,
-            'longitude': longitude,
-            'format': 'json'
-        }
+        params = self.point_params(latitude, longitude, start_date, end_date, parameters, community)
         
         try:
-            print(f"Fetching hourly data for coordinates ({latitude}, {longitude})...")
-            response = self.session.get(url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
-            print(f"✓ Hourly data retrieved successfully!")
+            data, cached = self._fetch('hourly/point', params)
+            self.log.debug("✓ Hourly data ({latitude}, {longitude}) {start_date}-{end_date} {source}",
+                           latitude=latitude, longitude=longitude, start_date=start_date,
+                           end_date=end_date, source='from cache' if cached else 'retrieved')
             return data
             
         except requests.exceptions.RequestException as e:
-            print(f"✗ Error fetching hourly data: {e}")
+            self.log.error("✗ Error fetching hourly data: {error}", error=e)
+            return None
+    
+    def get_regional_data(self, bbox, start_date, end_date, parameters=None,
+                          community='ag'):
+        """
+        Fetch daily data for every grid cell in a bounding box
+        
+        Uses the regional endpoint: one request per parameter per tile (boxes
+        larger than 10° are split into tiles), instead of one request per point.
+        
+        Parameters:
+        -----------
+        bbox : dict
+            {'min_lat', 'max_lat', 'min_lon', 'max_lon'} in decimal degrees
+            (e.g., LightningDataExtractor.region_bounds)
+        start_date : str
+            Start date in format 'YYYYMMDD'
+        end_date : str
+            End date in format 'YYYYMMDD'
+        parameters : list
+            List of parameter codes (default: same as get_daily_data)
+        community : str
+            Data community: 'ag', 're' or 'sb'
+        
+        Returns:
+        --------
+        RegionalCube : Gridded data that points can be sampled from, or None on error
+        """
+        if parameters is None:
+            parameters = self.DAILY_PARAMETERS
+        
+        tiles = tile_bbox(bbox)
+        self.log.debug("Fetching regional data ({parameters} parameters × {tiles} tiles)...",
+                       parameters=len(parameters), tiles=len(tiles))
+        
+        try:
+            responses = []
+            cached_count = 0
+            with self.log.progress(len(tiles) * len(parameters), 'Regional data',
+                                   unit='requests') as progress:
+                for tile in tiles:
+                    for parameter in parameters:
+                        params = {
+                            'parameters': parameter,
+                            'community': community,
+                            'latitude-min': round(tile['min_lat'], 4),
+                            'latitude-max': round(tile['max_lat'], 4),
+                            'longitude-min': round(tile['min_lon'], 4),
+                            'longitude-max': round(tile['max_lon'], 4),
+                            'start': start_date,
+                            'end': end_date,
+                            'format': 'json'
+                        }
+                        data, cached = self._fetch('daily/regional', params, timeout=120)
+                        responses.append(data)
+                        cached_count += cached
+                        progress.update(cached=int(cached))
+            
+            cube = RegionalCube.from_responses(responses)
+            self.log.info("✓ Regional data retrieved: {lats}×{lons} cells, {days} days "
+                          "({cached}/{requests} from cache)", lats=len(cube.lats), lons=len(cube.lons),
+                          days=len(cube.times), cached=cached_count, requests=len(responses))
+            return cube
+            
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            self.log.error("✗ Error fetching regional data: {error}", error=e)
             return None
     
     def convert_to_dataframe(self, api_response):
@@ -195,6 +321,173 @@ class NASAPowerAPI:
             print(f"✗ Error converting to DataFrame: {e}")
             return None
     
+    def convert_hourly_to_dataframe(self, api_response, resample='30min', method='repeat'):
+        """
+        Convert an hourly NASA POWER API response to a pandas DataFrame
+        
+        Builds the frame directly from the parameter dicts as NumPy arrays with a
+        single datetime parse, so a year of hourly data converts in milliseconds.
+        
+        Parameters:
+        -----------
+        api_response : dict
+            Response from get_hourly_data
+        resample : str or None
+            Sub-hourly output frequency (e.g., '30min', '15min').
+            None or '1h' keeps the native hourly rows.
+        method : str
+            How sub-hourly values are derived:
+            'repeat' copies each hourly value to every sub-interval of its hour;
+            'physical' interpolates per variable type (see power_resample.py)
+        
+        Returns:
+        --------
+        pd.DataFrame : One column per POWER parameter code, indexed by 'DateTime'.
+                       POWER fill values (-999) are converted to NaN.
+        """
+        if not api_response or 'properties' not in api_response:
+            print("Invalid API response")
+            return None
+        
+        try:
+            parameters = api_response['properties']['parameter']
+            fill_value = api_response.get('header', {}).get('fill_value', -999)
+            
+            keys = None
+            columns = {}
+            for code, series in parameters.items():
+                if keys is None:
+                    keys = list(series)
+                
+                if list(series) == keys:
+                    values = np.array(list(series.values()), dtype=float)
+                else:
+                    # Parameter keyed in a different order: align on the timestamps
+                    values = pd.Series(series, dtype=float).reindex(keys).to_numpy()
+                
+                values[values == fill_value] = np.nan
+                columns[code] = values
+            
+            if keys is None:
+                return pd.DataFrame(index=pd.DatetimeIndex([], name='DateTime'))
+            
+            index = pd.to_datetime(keys, format='%Y%m%d%H')
+            
+            steps = 1
+            if resample:
+                steps = pd.Timedelta('1h') // pd.Timedelta(resample)
+                if steps < 1 or pd.Timedelta('1h') % pd.Timedelta(resample):
+                    raise ValueError(f"resample must evenly divide one hour, got {resample!r}")
+            
+            if steps > 1 and method == 'physical':
+                hourly = pd.DataFrame(columns, index=index)
+                longitude, latitude = api_response.get('geometry', {}).get('coordinates', [None, None])[:2]
+                time_standard = api_response.get('header', {}).get('time_standard', 'LST')
+                df = resample_hourly_frame(hourly, freq=resample, latitude=latitude,
+                                           longitude=longitude, time_standard=time_standard)
+                df.index.name = 'DateTime'
+                return df
+            
+            if steps > 1:
+                # Repeat each hourly row once per sub-interval
+                repeat_idx = np.repeat(np.arange(len(index)), steps)
+                offsets = np.tile(np.arange(steps) * pd.Timedelta(resample), len(index))
+                index = index[repeat_idx] + pd.TimedeltaIndex(offsets)
+                columns = {code: values[repeat_idx] for code, values in columns.items()}
+            
+            df = pd.DataFrame(columns, index=index)
+            df.index.name = 'DateTime'
+            return df
+            
+        except Exception as e:
+            print(f"✗ Error converting hourly data to DataFrame: {e}")
+            return None
+    
+    @staticmethod
+    def format_datetime_columns(index):
+        """
+        Build 'Date', 'Time' and 'DateTime' string columns for a DatetimeIndex
+        
+        Only the distinct days are formatted; times come from a lookup table.
+        
+        Returns:
+        --------
+        dict : {'Date': array, 'Time': array, 'DateTime': array} of strings
+        """
+        days = index.normalize()
+        day_codes, unique_days = pd.factorize(days)
+        date_str = np.asarray(unique_days.strftime('%Y-%m-%d'), dtype=object)[day_codes]
+        
+        time_table = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(1440)], dtype=object)
+        time_str = time_table[index.hour * 60 + index.minute]
+        
+        return {
+            'Date': date_str,
+            'Time': time_str,
+            'DateTime': date_str + ' ' + time_str,
+        }
+    
+    def hourly_location_frame(self, api_response, location_name, latitude, longitude,
+                              column_names, resample='30min', method='repeat'):
+        """
+        Convert an hourly response into per-location weather rows
+        
+        Parameters:
+        -----------
+        api_response : dict
+            Response from get_hourly_data
+        location_name : str
+            Value for the 'Location' column
+        latitude, longitude : float
+            Values for the 'Latitude'/'Longitude' columns
+        column_names : dict
+            POWER parameter code -> output column name (missing codes become NaN)
+        resample : str or None
+            Sub-hourly frequency, see convert_hourly_to_dataframe
+        method : str
+            'repeat' or 'physical', see convert_hourly_to_dataframe
+        
+        Returns:
+        --------
+        pd.DataFrame : Date, Time, DateTime, Location, Latitude, Longitude
+                       followed by the renamed parameter columns, indexed by timestamp
+        """
+        with get_metrics().stage('parse') as stage:
+            df = self.convert_hourly_to_dataframe(api_response, resample=resample, method=method)
+            if df is None:
+                return None
+            
+            frame = pd.DataFrame(self.format_datetime_columns(df.index),
+                                 index=df.index.rename(None))
+            frame['Location'] = location_name
+            frame['Latitude'] = latitude
+            frame['Longitude'] = longitude
+            
+            for code, name in column_names.items():
+                frame[name] = df[code].to_numpy() if code in df else np.nan
+            
+            stage.rows = len(frame)
+        
+        return frame
+    
+    @staticmethod
+    def resample_hourly(df, freq='30min', latitude=None, longitude=None,
+                        methods=None, time_standard='LST'):
+        """
+        Build a sub-hourly view of stored hourly data
+        
+        Temperature, humidity, pressure and wind are interpolated linearly,
+        precipitation is split so each hour's total is conserved, and solar
+        radiation follows the sun's elevation within the hour.
+        See power_resample.resample_hourly_frame for parameters.
+        
+        Returns:
+        --------
+        pd.DataFrame : Resampled data indexed by timestamp
+        """
+        return resample_hourly_frame(df, freq=freq, latitude=latitude, longitude=longitude,
+                                     methods=methods, time_standard=time_standard)
+    
     def save_to_csv(self, df, filename):
         """Save DataFrame to CSV file"""
         try:
@@ -284,9 +577,6 @@ def example_multiple_locations():
             if df is not None:
                 all_data[city] = df
                 api.save_to_csv(df, f'{city.lower()}_weather_2024.csv')
-        
-        # Be respectful to the API - add a small delay between requests
-        time.sleep(1)
     
     return all_data
 
@@ -0,0 +1,637 @@
+"""
+Extraction Orchestrator
+One declarative job spec -> a task graph run on the right executors
+
+    job = {
+        'name': 'monsoon_2023',
+        'locations': {'Dhaka': {'lat': 23.8103, 'lon': 90.4125}, ...},
+        'start_date': '2023-06-01',
+        'end_date': '2023-09-30',
+        'modalities': ['weather', 'lightning', 'satellite'],
+        'resolution': '30min',
+    }
+    ExtractionOrchestrator(job).run()
+
+or with the spec in a JSON file:
+
+    python orchestrator.py job.json
+
+For every location the graph is
+
+    weather:<loc>:<YYYY-MM>   async HTTP (NASA POWER)
+      -> expand:<loc>:<YYYY-MM>   process pool (resampling, features)
+        -> label:<loc>:<YYYY>   process pool (lightning labels, derived features)
+    scenes   one batched Earth Engine query for all targets
+      -> satellite:<loc>:<YYYY>   thread pool (thumbnails or band chips)
+    label + satellite -> join:<loc>:<YYYY> -> write:<loc>:<YYYY>   thread pool
+
+A task starts as soon as its inputs are ready, so locations, months and
+modalities progress side by side instead of in nested loops. Each written
+(location, year) partition goes to a DatasetStore and the job ledger; a
+rerun of the same job skips partitions already written. API and stage
+metrics are written to metrics.prom / metrics.json next to the store.
+"""
+
+import asyncio
+import functools
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from async_power_api import AsyncNASAPowerAPI
+from dataset_store import DatasetStore, LIGHTNING_DATASET_DTYPES
+from extract_hybrid_lightning_dataset import HybridLightningDatasetExtractor
+from job_ledger import JobLedger
+from lightning_climatology import load_climatology
+from lightning_labels import label_lightning, resume_seed
+from metrics import get_metrics
+from nasa_power_api import NASAPowerAPI
+
+try:
+    import ee
+    from chip_store import ChipStore
+    from ee_helpers import CHIP_BANDS, CHIP_SIZE, landsat_chip, prefetch_best_scenes, save_thumbnail
+    from thumbnail_cache import ThumbnailCache
+    EE_AVAILABLE = True
+except ImportError:
+    EE_AVAILABLE = False
+
+
+MODALITIES = ('weather', 'lightning', 'satellite')
+
+DEFAULT_SPEC = {
+    'name': 'extraction',
+    'modalities': ['weather', 'lightning'],
+    'resolution': '30min',          # '1h', '30min', '15min', ...
+    'satellite_mode': 'thumbnail',  # or 'chips' (see chip_store.py)
+    'satellite_every_days': 8,      # one image target per location every N days
+    'cloud_cover_max': 50,
+    'seed': None,                   # lightning label seed (default: saved with the job, else fresh)
+    'output_dir': None,             # default: orchestrated/<name>
+    'ee_project': 'bangladesh-lightning-detection',
+}
+
+# Rows only take an image acquired at most this long before them (Landsat 8 revisit)
+IMAGE_MAX_AGE_DAYS = 16
+
+
+def normalize_spec(spec):
+    """
+    Fill in defaults and validate a job spec
+
+    Parameters:
+    -----------
+    spec : dict
+        Job spec; needs 'locations', 'start_date' and 'end_date'
+
+    Returns:
+    --------
+    dict : Complete spec
+
+    Raises:
+    -------
+    ValueError : if the spec is incomplete or inconsistent
+    """
+    spec = dict(DEFAULT_SPEC, **spec)
+
+    for key in ('locations', 'start_date', 'end_date'):
+        if not spec.get(key):
+            raise ValueError(f"Job spec needs '{key}'")
+
+    start = datetime.strptime(spec['start_date'], '%Y-%m-%d')
+    end = datetime.strptime(spec['end_date'], '%Y-%m-%d')
+    if end < start:
+        raise ValueError("Job spec 'end_date' is before 'start_date'")
+
+    unknown = set(spec['modalities']) - set(MODALITIES)
+    if unknown:
+        raise ValueError(f"Unknown modalities {sorted(unknown)} (use {MODALITIES})")
+    if 'weather' not in spec['modalities']:
+        # Partitions and ledger entries are weather location-years; imagery is joined to them
+        raise ValueError("Job spec needs the 'weather' modality ('lightning' and 'satellite' "
+                         "are added to weather rows)")
+    if spec['satellite_mode'] not in ('thumbnail', 'chips'):
+        raise ValueError(f"Unknown satellite_mode '{spec['satellite_mode']}'")
+
+    resolution = pd.Timedelta(spec['resolution'])
+    if resolution > pd.Timedelta('1h') or pd.Timedelta('1h') % resolution:
+        raise ValueError(f"resolution must evenly divide one hour, got {spec['resolution']!r}")
+
+    if spec['output_dir'] is None:
+        spec['output_dir'] = str(Path(__file__).parent / 'orchestrated' / spec['name'])
+    return spec
+
+
+def load_job_spec(path):
+    """Read and validate a JSON job spec"""
+    with open(path, 'r') as f:
+        return normalize_spec(json.load(f))
+
+
+def spec_months(spec):
+    """(year, month, start 'YYYYMMDD', end 'YYYYMMDD') for every month of a spec's date range"""
+    start = datetime.strptime(spec['start_date'], '%Y-%m-%d')
+    end = datetime.strptime(spec['end_date'], '%Y-%m-%d')
+
+    months = []
+    first = start
+    while first <= end:
+        next_month = (first.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last = min(end, next_month - timedelta(days=1))
+        months.append((first.year, first.month, first.strftime('%Y%m%d'), last.strftime('%Y%m%d')))
+        first = next_month
+    return months
+
+
+def spec_satellite_dates(spec):
+    """Image target dates of a spec: every satellite_every_days days in the date range"""
+    dates = pd.date_range(spec['start_date'], spec['end_date'],
+                          freq=f"{spec['satellite_every_days']}D")
+    return [date.strftime('%Y-%m-%d') for date in dates]
+
+
+class TaskGraph:
+    """
+    Named tasks with dependencies, each run on an executor:
+
+    - 'async'    coroutine function awaited on the event loop (HTTP)
+    - 'thread'   blocking function on the thread pool (Earth Engine, disk)
+    - 'process'  picklable function on the process pool (CPU-bound pandas/NumPy)
+
+    A task is called with its dependencies' results as positional arguments
+    (in dependency order) followed by its own keyword arguments. A task
+    whose dependency failed is not run and fails too.
+    """
+
+    EXECUTORS = ('async', 'thread', 'process')
+
+    def __init__(self):
+        self.tasks = {}
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def add(self, name, func, deps=(), executor='thread', **kwargs):
+        """
+        Add a task (dependencies must already be in the graph)
+
+        Returns:
+        --------
+        str : Task name, for use in later deps
+        """
+        if executor not in self.EXECUTORS:
+            raise ValueError(f"Unknown executor '{executor}' (use one of {self.EXECUTORS})")
+        missing = [dep for dep in deps if dep not in self.tasks]
+        if missing:
+            raise ValueError(f"Task '{name}' depends on unknown tasks {missing}")
+
+        self.tasks[name] = {'func': func, 'deps': list(deps), 'executor': executor,
+                            'kwargs': kwargs}
+        return name
+
+    def run(self, max_workers=None, threads=8, on_done=None):
+        """
+        Run every task, each as soon as its dependencies are done
+
+        Results of intermediate tasks are released once every dependent
+        task has started; only results of tasks nothing depends on are kept.
+
+        Parameters:
+        -----------
+        max_workers : int
+            Worker processes (default: CPU count)
+        threads : int
+            Worker threads for blocking tasks
+        on_done : callable
+            Called as on_done(name, error) after each task (error is None on success)
+
+        Returns:
+        --------
+        tuple : (results, errors) dicts keyed by task name
+        """
+        return asyncio.run(self._run(max_workers, threads, on_done))
+
+    async def _run(self, max_workers, threads, on_done):
+        loop = asyncio.get_running_loop()
+        results = {}
+        errors = {}
+        futures = {}
+
+        consumers = {name: 0 for name in self.tasks}
+        for task in self.tasks.values():
+            for dep in task['deps']:
+                consumers[dep] += 1
+
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='orchestrator') as thread_pool, \
+                ProcessPoolExecutor(max_workers=max_workers) as process_pool:
+
+            async def run_task(name, task):
+                for dep in task['deps']:
+                    await futures[dep]
+
+                failed = [dep for dep in task['deps'] if dep in errors]
+                if failed:
+                    errors[name] = RuntimeError(f"dependency failed: {failed[0]}")
+                else:
+                    inputs = [results[dep] for dep in task['deps']]
+                    call = functools.partial(task['func'], *inputs, **task['kwargs'])
+                    started = time.perf_counter()
+                    try:
+                        if task['executor'] == 'async':
+                            results[name] = await call()
+                        elif task['executor'] == 'thread':
+                            results[name] = await loop.run_in_executor(thread_pool, call)
+                        else:
+                            results[name] = await loop.run_in_executor(process_pool, call)
+                    except Exception as e:
+                        errors[name] = e
+                    get_metrics().observe('extraction_task_seconds', time.perf_counter() - started,
+                                          task=name.split(':', 1)[0], executor=task['executor'])
+
+                # Release inputs nothing else is waiting for
+                for dep in task['deps']:
+                    consumers[dep] -= 1
+                    if consumers[dep] == 0:
+                        results.pop(dep, None)
+
+                if on_done is not None:
+                    on_done(name, errors.get(name))
+
+            # Tasks were added after their dependencies, so every dep has a future
+            for name, task in self.tasks.items():
+                futures[name] = asyncio.ensure_future(run_task(name, task))
+            await asyncio.gather(*futures.values())
+
+        return results, errors
+
+
+# Process-pool workers (module-level so they pickle)
+
+_WORKER_API = None
+
+
+def _worker_api():
+    """NASAPowerAPI for response conversion in a worker process (created once)"""
+    global _WORKER_API
+    if _WORKER_API is None:
+        _WORKER_API = NASAPowerAPI(use_cache=False)
+    return _WORKER_API
+
+
+def expand_month(data, location_name, lat, lon, month, resolution):
+    """
+    Hourly POWER response -> feature rows at the job resolution
+
+    Raises:
+    -------
+    ValueError : if the month has no data (the client returns None on HTTP
+                 errors), so its location-year is not written incomplete
+    """
+    resample = None if pd.Timedelta(resolution) == pd.Timedelta('1h') else resolution
+    df = HybridLightningDatasetExtractor.month_features(
+        _worker_api(), data, location_name, lat, lon, month, resample=resample)
+    if df is None:
+        raise ValueError(f"No weather data for {location_name} month {month:02d}")
+    return df
+
+
+def label_year(*frames, seed=None, climatology=None, with_labels=True):
+    """Concatenate a location-year's months, add lightning labels and derived features"""
+    if not frames or any(frame is None for frame in frames):
+        raise ValueError("Location-year is missing months")
+
+    df = pd.concat(frames, ignore_index=True)
+    if with_labels:
+        df = pd.concat([df, label_lightning(df, seed=seed, climatology=climatology)], axis=1)
+    return HybridLightningDatasetExtractor.add_derived_features(df)
+
+
+def join_imagery(df, images):
+    """
+    Attach the latest satellite image acquired at or before each row
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        One location-year of rows, in time order
+    images : pd.DataFrame
+        Image rows from ExtractionOrchestrator.fetch_images
+
+    Returns:
+    --------
+    pd.DataFrame : df with Satellite_Image, Satellite_Date and Satellite_Cloud_Cover
+    """
+    if df is None:
+        return None
+
+    image_columns = ['Satellite_Image', 'Satellite_Date', 'Satellite_Cloud_Cover']
+    if images is None or images.empty:
+        return df.assign(**{column: None for column in image_columns})
+
+    images = images[image_columns].drop_duplicates('Satellite_Date')
+    images = images.assign(_time=pd.to_datetime(images['Satellite_Date'])).sort_values('_time')
+
+    # No look-ahead: a row never sees an image taken after it
+    joined = pd.merge_asof(df.assign(_time=pd.to_datetime(df['DateTime'])), images, on='_time',
+                           direction='backward',
+                           tolerance=pd.Timedelta(days=IMAGE_MAX_AGE_DAYS))
+    return joined.drop(columns='_time')
+
+
+class ExtractionOrchestrator:
+    """
+    Run a declarative extraction job (weather, lightning labels, satellite
+    imagery) as one task graph
+    """
+
+    def __init__(self, spec, max_concurrency=8, max_workers=None, threads=8):
+        """
+        Initialize the orchestrator
+
+        Parameters:
+        -----------
+        spec : dict
+            Job spec (see normalize_spec / DEFAULT_SPEC)
+        max_concurrency : int
+            NASA POWER requests in flight at once
+        max_workers : int
+            Worker processes for labeling and feature work (default: CPU count)
+        threads : int
+            Worker threads for Earth Engine and disk writes
+        """
+        self.spec = normalize_spec(spec)
+        self.max_concurrency = max_concurrency
+        self.max_workers = max_workers
+        self.threads = threads
+
+        self.modalities = set(self.spec['modalities'])
+
+        self.output_dir = Path(self.spec['output_dir'])
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        self.store = DatasetStore(self.output_dir / 'store', dtypes=LIGHTNING_DATASET_DTYPES)
+        self.ledger = JobLedger()
+        self.ledger_source = f"orchestrator:{self.spec['name']}"
+        # A resumed job keeps the seed its written partitions were labeled with
+        self.seed = resume_seed(self.ledger, self.ledger_source, self.spec['seed'])
+        self.climatology = load_climatology()
+
+        self.satellite_rows = []
+        self._rows_lock = threading.Lock()
+
+        if 'satellite' in self.modalities:
+            if not EE_AVAILABLE:
+                raise ImportError("The 'satellite' modality needs the Earth Engine API: "
+                                  "pip install earthengine-api")
+            ee.Initialize(project=self.spec['ee_project'])
+
+            self.image_dir = self.output_dir / 'satellite_images'
+            self.image_dir.mkdir(exist_ok=True)
+            self.thumbnail_cache = ThumbnailCache()
+            self.chip_store = None
+            if self.spec['satellite_mode'] == 'chips':
+                self.chip_store = ChipStore(self.output_dir / 'satellite_chips',
+                                            bands=CHIP_BANDS, chip_size=CHIP_SIZE)
+
+    def months(self):
+        """(year, month, start 'YYYYMMDD', end 'YYYYMMDD') for every month in the date range"""
+        return spec_months(self.spec)
+
+    def satellite_dates(self):
+        """Image target dates: every satellite_every_days days in the date range"""
+        return spec_satellite_dates(self.spec)
+
+    def fetch_scenes(self, targets):
+        """Best Landsat scene for every (location, date) target (one batched query)"""
+        return prefetch_best_scenes(targets, cloud_cover_max=self.spec['cloud_cover_max'])
+
+    def fetch_images(self, scenes, location_name, dates):
+        """
+        Save the images of one location-year (thread pool)
+
+        Returns:
+        --------
+        pd.DataFrame : One row per saved image (Location, Satellite_Target_Date,
+                       Satellite_Date, Satellite_Image, Satellite_Cloud_Cover)
+        """
+        rows = []
+        for date in dates:
+            scene = scenes.get((location_name, date))
+            if scene is None or scene['images_found'] == 0:
+                continue
+
+            if self.chip_store is not None:
+                entry = self.chip_store.entry(location_name, scene['image_date'])
+                if entry is None:
+                    chip = landsat_chip(scene, bands=self.chip_store.bands,
+                                        size=self.chip_store.chip_size)
+                    entry = self.chip_store.put(location_name, scene, chip, date=date)
+                image = f"satellite_chips/chunk-{entry['chunk']:05d}.npy#{entry['slot']}"
+            else:
+                filepath = self.image_dir / f"{location_name}_{scene['image_date']}.png"
+                if save_thumbnail(scene, filepath, self.thumbnail_cache, location_name, date) != 200:
+                    continue
+                image = str(filepath.relative_to(self.output_dir))
+
+            rows.append({
+                'Location': location_name,
+                'Satellite_Target_Date': date,
+                'Satellite_Date': scene['image_date'],
+                'Satellite_Image': image,
+                'Satellite_Cloud_Cover': scene['cloud_cover'],
+            })
+
+        with self._rows_lock:
+            self.satellite_rows.extend(rows)
+        return pd.DataFrame(rows)
+
+    def write_partition(self, df, location_name, year):
+        """Write one location-year to the store and mark it done in the ledger"""
+        if df is None or df.empty:
+            raise ValueError(f"No data for {location_name} {year}")
+
+        df['Year'] = year
+        paths = self.store.write(df)
+        self.ledger.done(self.ledger_source, location_name, year, output=paths[0], records=len(df),
+                         result={'seed': self.seed})
+        return {'location': location_name, 'year': year, 'records': len(df), 'path': paths[0]}
+
+    def build_graph(self, power):
+        """
+        Task graph for every (location, year) not yet written
+
+        Parameters:
+        -----------
+        power : AsyncNASAPowerAPI
+            Client for the weather fetch tasks
+
+        Returns:
+        --------
+        tuple : (TaskGraph, list of pending (location, year))
+        """
+        graph = TaskGraph()
+        locations = self.spec['locations']
+        months = self.months()
+        years = sorted({year for year, _, _, _ in months})
+
+        pending = self.ledger.pending(self.ledger_source, [
+            (location_name, year) for location_name in locations for year in years
+        ])
+        if not pending:
+            return graph, pending
+
+        sat_dates = {}
+        if 'satellite' in self.modalities:
+            for date in self.satellite_dates():
+                sat_dates.setdefault(int(date[:4]), []).append(date)
+
+            targets = [
+                (location_name, locations[location_name]['lat'], locations[location_name]['lon'], date)
+                for location_name, year in pending
+                for date in sat_dates.get(year, [])
+            ]
+            graph.add('scenes', self.fetch_scenes, executor='thread', targets=targets)
+
+        for location_name, year in pending:
+            coords = locations[location_name]
+
+            expanded = []
+            for month_year, month, start, end in months:
+                if month_year != year:
+                    continue
+                key = f"{location_name}:{year}-{month:02d}"
+                graph.add(f"weather:{key}", power.get_hourly_data, executor='async',
+                          latitude=coords['lat'], longitude=coords['lon'],
+                          start_date=start, end_date=end)
+                expanded.append(graph.add(
+                    f"expand:{key}", expand_month, deps=[f"weather:{key}"], executor='process',
+                    location_name=location_name, lat=coords['lat'], lon=coords['lon'],
+                    month=month, resolution=self.spec['resolution']))
+
+            rows = graph.add(
+                f"label:{location_name}:{year}", label_year, deps=expanded, executor='process',
+                seed=self.seed, climatology=self.climatology,
+                with_labels='lightning' in self.modalities)
+
+            if 'satellite' in self.modalities:
+                images = graph.add(
+                    f"satellite:{location_name}:{year}", self.fetch_images, deps=['scenes'],
+                    executor='thread', location_name=location_name, dates=sat_dates.get(year, []))
+                rows = graph.add(f"join:{location_name}:{year}", join_imagery, deps=[rows, images],
+                                 executor='thread')
+
+            graph.add(f"write:{location_name}:{year}", self.write_partition, deps=[rows],
+                      executor='thread', location_name=location_name, year=year)
+
+        return graph, pending
+
+    def run(self):
+        """
+        Run the job
+
+        Returns:
+        --------
+        dict : Partitions written, failed and skipped, and elapsed seconds
+        """
+        spec = self.spec
+        print("=" * 80)
+        print(f"🧭 EXTRACTION JOB: {spec['name']}")
+        print("=" * 80)
+        print(f"📍 Locations: {len(spec['locations'])}")
+        print(f"📅 Date range: {spec['start_date']} to {spec['end_date']} ({spec['resolution']})")
+        print(f"🧩 Modalities: {', '.join(m for m in MODALITIES if m in self.modalities)}")
+        print(f"🎲 Label seed: {self.seed}")
+        print(f"📂 Output: {self.output_dir}")
+
+        start_time = time.time()
+        failed = []
+
+        def on_done(name, error):
+            kind = name.split(':')[0]
+            if error is not None:
+                if kind == 'write':
+                    _, location_name, year = name.split(':')
+                    self.ledger.failed(self.ledger_source, location_name, year, error)
+                    failed.append((location_name, int(year)))
+                if 'dependency failed' not in str(error):
+                    print(f"   ❌ {name}: {str(error)[:80]}")
+            elif kind in ('write', 'satellite', 'scenes'):
+                print(f"   ✅ {name}")
+
+        power = AsyncNASAPowerAPI(max_concurrency=self.max_concurrency)
+        try:
+            graph, pending = self.build_graph(power)
+            total_units = len(spec['locations']) * len({year for year, _, _, _ in self.months()})
+            print(f"⏭️  Already written: {total_units - len(pending)} location-years")
+            print(f"🔗 Tasks: {len(graph)} for {len(pending)} location-years")
+            print("=" * 80)
+
+            if len(graph):
+                graph.run(max_workers=self.max_workers, threads=self.threads, on_done=on_done)
+        finally:
+            power.close()
+
+        if self.satellite_rows:
+            # Merge with images saved by earlier runs of the job (resumed location-years)
+            satellite_file = self.output_dir / 'satellite_images.csv'
+            satellite_df = pd.DataFrame(self.satellite_rows)
+            if satellite_file.exists():
+                satellite_df = pd.concat([pd.read_csv(satellite_file), satellite_df], ignore_index=True)
+                satellite_df = satellite_df.drop_duplicates(['Location', 'Satellite_Target_Date'],
+                                                            keep='last')
+            satellite_df.to_csv(satellite_file, index=False)
+            print(f"\n💾 Satellite metadata: {satellite_file} ({len(satellite_df)} images)")
+
+        elapsed = time.time() - start_time
+        written = len(pending) - len(failed)
+
+        print("\n" + "=" * 80)
+        print("📊 JOB SUMMARY")
+        print("=" * 80)
+        print(f"   ✅ Written: {written} location-years")
+        if failed:
+            print(f"   ❌ Failed: {', '.join(f'{name} {year}' for name, year in failed)} "
+                  f"(rerun the job to retry)")
+        if self.satellite_rows:
+            print(f"   🛰️  Satellite images: {len(self.satellite_rows)}")
+        print(f"   ⏱️  Time: {elapsed:.1f} seconds")
+
+        # Stage timings inside worker processes (parse, label, features) stay
+        # there; their tasks are timed here as extraction_task_seconds
+        metrics = get_metrics()
+        metrics.print_summary()
+        metrics.export(self.output_dir)
+        print(f"   📈 Metrics: {self.output_dir / 'metrics.prom'}")
+
+        return {'written': written, 'failed': failed,
+                'skipped': total_units - len(pending), 'elapsed': elapsed}
+
+
+def main():
+    """Run a job spec from a JSON file (or a small example job)"""
+    if len(sys.argv) > 1:
+        spec = load_job_spec(sys.argv[1])
+    else:
+        spec = {
+            'name': 'example_dhaka_chittagong',
+            'locations': {
+                'Dhaka': {'lat': 23.8103, 'lon': 90.4125},
+                'Chittagong': {'lat': 22.3569, 'lon': 91.7832},
+            },
+            'start_date': '2023-06-01',
+            'end_date': '2023-07-31',
+            'modalities': ['weather', 'lightning'],
+        }
+        print("💡 Usage: python orchestrator.py job.json (running an example job)\n")
+
+    ExtractionOrchestrator(spec).run()
+
+
+if __name__ == "__main__":
+    main()
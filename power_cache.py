@@ -0,0 +1,265 @@
+"""
+NASA POWER Response Cache
+Persistent on-disk cache for NASA POWER API responses
+
+Responses are content-addressed: the cache key is a hash of the endpoint and
+the request parameters (lat, lon, start, end, sorted parameter list,
+community), so the same request made by any extractor is served from disk.
+
+- Storage: one gzip-compressed JSON file per response
+- Eviction: least-recently-used files are removed once the cache exceeds its size cap
+- Expiry: only responses that cover recent dates (which POWER may still revise)
+  expire; historical data is kept until it is evicted
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+class PowerResponseCache:
+    """
+    Content-addressed, size-bounded on-disk cache for NASA POWER responses
+    """
+
+    def __init__(self, cache_dir=None, max_size_mb=2048, ttl_days=7,
+                 revision_window_days=90):
+        """
+        Initialize the cache
+
+        Parameters:
+        -----------
+        cache_dir : str or Path
+            Directory for cached responses (default: .power_cache next to this file)
+        max_size_mb : float
+            Size cap for the cache; least-recently-used entries are evicted above it
+        ttl_days : float
+            Lifetime of responses whose end date falls inside the revision window
+        revision_window_days : int
+            Responses ending less than this many days before they were fetched
+            are treated as provisional and expire after `ttl_days`
+        """
+        if cache_dir is None:
+            cache_dir = Path(__file__).parent / '.power_cache'
+
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_days * 86400
+        self.revision_window_days = revision_window_days
+
+        self._lock = threading.Lock()
+        self._total_size = None  # Computed lazily on first write
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(endpoint, params):
+        """
+        Build the content-addressed key for a request
+
+        Parameters:
+        -----------
+        endpoint : str
+            API endpoint path (e.g., 'hourly/point')
+        params : dict
+            Query parameters sent to POWER
+
+        Returns:
+        --------
+        str : Hex digest identifying the request
+        """
+        canonical = {}
+        for name, value in params.items():
+            if name == 'parameters':
+                codes = value.split(',') if isinstance(value, str) else list(value)
+                value = ','.join(sorted(code.strip() for code in codes))
+            elif isinstance(value, float):
+                value = f"{value:.4f}"
+            canonical[name] = str(value)
+
+        payload = json.dumps({'endpoint': endpoint, 'params': canonical}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path_for(self, key):
+        """Return the file path for a cache key"""
+        return self.cache_dir / key[:2] / f"{key}.json.gz"
+
+    def _expires_at(self, params, fetched_at):
+        """
+        Expiry timestamp for a response, or None if it never expires
+
+        Only data ending inside the revision window is provisional.
+        """
+        end = params.get('end')
+        if not end:
+            return fetched_at + self.ttl_seconds
+
+        try:
+            end_date = datetime.strptime(str(end)[:8], '%Y%m%d')
+        except ValueError:
+            return fetched_at + self.ttl_seconds
+
+        age_days = (datetime.fromtimestamp(fetched_at) - end_date).days
+        if age_days < self.revision_window_days:
+            return fetched_at + self.ttl_seconds
+        return None
+
+    def get(self, endpoint, params):
+        """
+        Look up a cached response
+
+        Returns:
+        --------
+        dict : Cached API response, or None on a miss or expired entry
+        """
+        key = self.make_key(endpoint, params)
+        path = self._path_for(key)
+
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        expires_at = entry.get('expires_at')
+        if expires_at is not None and time.time() > expires_at:
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        # Touch the file so eviction treats it as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return entry['data']
+
+    def contains(self, endpoint, params):
+        """True if a response for the request is on disk (expired or not)"""
+        return self._path_for(self.make_key(endpoint, params)).exists()
+
+    def peek(self, endpoint, params):
+        """
+        Cached response regardless of expiry, without touching the entry or
+        the hit/miss counters (used to replay recorded responses)
+
+        Returns:
+        --------
+        dict : Cached API response, or None if the request was never cached
+        """
+        path = self._path_for(self.make_key(endpoint, params))
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return json.load(f)['data']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, endpoint, params, data):
+        """Store a response in the cache"""
+        key = self.make_key(endpoint, params)
+        path = self._path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        fetched_at = time.time()
+        entry = {
+            'endpoint': endpoint,
+            'params': {name: str(value) for name, value in params.items()},
+            'fetched_at': fetched_at,
+            'expires_at': self._expires_at(params, fetched_at),
+            'data': data,
+        }
+
+        # Write to a temp file first so readers never see a partial entry
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+                json.dump(entry, f, separators=(',', ':'))
+
+            old_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+            new_size = path.stat().st_size
+        except OSError:
+            self._remove(tmp_path)
+            return
+
+        with self._lock:
+            if self._total_size is None:
+                self._total_size = self._scan_size()
+            else:
+                self._total_size += new_size - old_size
+
+            if self._total_size > self.max_size_bytes:
+                self._evict()
+
+    def _entries(self):
+        """List (path, size, last_used) for every cached response"""
+        entries = []
+        for path in self.cache_dir.glob('*/*.json.gz'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _scan_size(self):
+        """Total size of the cache on disk in bytes"""
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Remove least-recently-used entries until the cache fits its size cap"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+
+        # Evict down to 90% of the cap so we don't rescan on every write
+        target = self.max_size_bytes * 0.9
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            self._remove(path)
+            total -= size
+
+        self._total_size = total
+
+    @staticmethod
+    def _remove(path):
+        """Delete a file, ignoring races with other processes"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            for path, _, _ in self._entries():
+                self._remove(path)
+            self._total_size = 0
+
+    def stats(self):
+        """
+        Cache statistics
+
+        Returns:
+        --------
+        dict : Entry count, size on disk and hit/miss counters
+        """
+        entries = self._entries()
+        return {
+            'entries': len(entries),
+            'size_mb': sum(size for _, size, _ in entries) / (1024 * 1024),
+            'max_size_mb': self.max_size_bytes / (1024 * 1024),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -0,0 +1,107 @@
+"""
+NASA POWER Grid Cells
+Snap coordinates to POWER's source grids and deduplicate point requests
+
+POWER point data is the value of the grid cell containing the point:
+meteorology comes from MERRA-2 (0.5° lat × 0.625° lon) and solar parameters
+from a 1° × 1° grid. Locations inside the same cell(s) get identical data,
+so only one request per unique cell is needed:
+
+    groups = plan_point_requests(requests)
+    for representative, members in groups:
+        data = fetch(representative)          # one request per cell
+        for request in members:               # fan out to every location
+            ...
+"""
+
+import math
+
+
+# MERRA-2 meteorology grid (cell centers at multiples of the step)
+MERRA2_LAT_STEP = 0.5
+MERRA2_LON_STEP = 0.625
+
+# Solar (CERES/FLASHFlux) grid, cell centers at half degrees
+SOLAR_STEP = 1.0
+
+# Parameters served from the solar grid
+SOLAR_PREFIXES = ('ALLSKY_', 'CLRSKY_', 'TOA_', 'SZA')
+
+# Request fields that must match for two point requests to share a response
+REQUEST_FIELDS = ('kind', 'start_date', 'end_date', 'community')
+
+
+def uses_solar_grid(parameters):
+    """True if any parameter code comes from the 1° solar grid"""
+    return any(code.startswith(SOLAR_PREFIXES) for code in parameters or [])
+
+
+def merra2_cell(latitude, longitude):
+    """Center (lat, lon) of the MERRA-2 cell containing a point"""
+    lat = round(latitude / MERRA2_LAT_STEP) * MERRA2_LAT_STEP
+    lon = round(longitude / MERRA2_LON_STEP) * MERRA2_LON_STEP
+    return lat, lon
+
+
+def solar_cell(latitude, longitude):
+    """Center (lat, lon) of the 1° solar cell containing a point"""
+    lat = (math.floor(latitude / SOLAR_STEP) + 0.5) * SOLAR_STEP
+    lon = (math.floor(longitude / SOLAR_STEP) + 0.5) * SOLAR_STEP
+    return lat, lon
+
+
+def grid_cell(latitude, longitude, parameters=None):
+    """
+    Grid cell ID for a point
+
+    Parameters:
+    -----------
+    latitude, longitude : float
+        Point coordinates
+    parameters : list
+        Requested parameter codes; if any are solar parameters the ID also
+        includes the 1° solar cell
+
+    Returns:
+    --------
+    str : e.g. '24.00,90.625' or '24.00,90.625|23.50,90.50' with solar parameters
+    """
+    lat, lon = merra2_cell(latitude, longitude)
+    cell_id = f"{lat:.2f},{lon:.3f}"
+
+    if parameters is None or uses_solar_grid(parameters):
+        solar_lat, solar_lon = solar_cell(latitude, longitude)
+        cell_id += f"|{solar_lat:.2f},{solar_lon:.2f}"
+
+    return cell_id
+
+
+def plan_point_requests(requests):
+    """
+    Group point requests that resolve to the same grid cell(s)
+
+    Parameters:
+    -----------
+    requests : iterable of dict
+        Requests with 'latitude', 'longitude' and optionally 'kind',
+        'start_date', 'end_date', 'parameters', 'community'
+        (the format used by AsyncNASAPowerAPI.fetch_many)
+
+    Returns:
+    --------
+    list of tuple : (representative request, [member requests]) per unique
+                    cell; the representative uses the first member's coordinates
+    """
+    groups = {}
+    for request in requests:
+        parameters = request.get('parameters')
+        key = (
+            grid_cell(request['latitude'], request['longitude'], parameters),
+            tuple(sorted(parameters)) if parameters is not None else None,
+        ) + tuple(request.get(field) for field in REQUEST_FIELDS)
+
+        if key not in groups:
+            groups[key] = (request, [])
+        groups[key][1].append(request)
+
+    return list(groups.values())
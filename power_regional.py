@@ -0,0 +1,243 @@
+"""
+NASA POWER Regional Data
+In-memory lat/lon/time cube built from POWER's regional endpoint
+
+The regional endpoint returns every grid cell inside a bounding box in one
+response (one parameter per request, boxes between 2° and 10° on a side).
+Loading those responses into a RegionalCube lets any number of points be
+sampled locally, so adding districts or grid points costs no extra requests:
+
+    cube = api.get_regional_data(BANGLADESH_BOUNDS, '20240801', '20240831',
+                                 parameters=['T2M', 'PRECTOTCORR'])
+    df = cube.sample(23.8103, 90.4125, method='bilinear')
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+
+# Regional endpoint limits on the bounding box (degrees)
+MIN_REGION_SPAN = 2.0
+MAX_REGION_SPAN = 10.0
+
+
+def _split_span(low, high):
+    """Split [low, high] into the fewest pieces the regional endpoint accepts"""
+    span = high - low
+    if span < MIN_REGION_SPAN:
+        center = (low + high) / 2
+        return [(center - MIN_REGION_SPAN / 2, center + MIN_REGION_SPAN / 2)]
+
+    pieces = math.ceil(span / MAX_REGION_SPAN)
+    edges = np.linspace(low, high, pieces + 1)
+    return [(float(edges[i]), float(edges[i + 1])) for i in range(pieces)]
+
+
+def tile_bbox(bbox):
+    """
+    Split a bounding box into tiles accepted by the regional endpoint
+
+    Parameters:
+    -----------
+    bbox : dict
+        {'min_lat', 'max_lat', 'min_lon', 'max_lon'} in decimal degrees
+
+    Returns:
+    --------
+    list of dict : Tiles in the same format (boxes under 2° are widened)
+    """
+    return [
+        {'min_lat': lat_lo, 'max_lat': lat_hi, 'min_lon': lon_lo, 'max_lon': lon_hi}
+        for lat_lo, lat_hi in _split_span(bbox['min_lat'], bbox['max_lat'])
+        for lon_lo, lon_hi in _split_span(bbox['min_lon'], bbox['max_lon'])
+    ]
+
+
+class RegionalCube:
+    """
+    Gridded POWER data held as (time, lat, lon) arrays, one per parameter
+    """
+
+    def __init__(self, times, lats, lons, data, fill_value=-999):
+        """
+        Initialize the cube
+
+        Parameters:
+        -----------
+        times : pd.DatetimeIndex
+            Time axis
+        lats, lons : np.ndarray
+            Ascending grid-cell center coordinates
+        data : dict
+            Parameter code -> float array of shape (len(times), len(lats), len(lons)),
+            NaN where POWER had no data
+        fill_value : float
+            Value written for missing data in point_response()
+        """
+        self.times = times
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.data = data
+        self.fill_value = fill_value
+
+    @classmethod
+    def from_responses(cls, responses, time_format='%Y%m%d'):
+        """
+        Build a cube from regional (GeoJSON FeatureCollection) responses
+
+        Responses may cover different tiles and/or parameters; they are
+        merged onto one grid.
+
+        Parameters:
+        -----------
+        responses : iterable of dict
+            Responses from the regional endpoint
+        time_format : str
+            Format of the time keys ('%Y%m%d' for daily data)
+
+        Returns:
+        --------
+        RegionalCube
+        """
+        cells = []  # (lon, lat, code, keys, values)
+        fill_value = -999
+        for response in responses:
+            fill_value = response.get('header', {}).get('fill_value', fill_value)
+            for feature in response.get('features', []):
+                lon, lat = feature['geometry']['coordinates'][:2]
+                for code, series in feature['properties']['parameter'].items():
+                    cells.append((lon, lat, code, list(series), list(series.values())))
+
+        if not cells:
+            raise ValueError("No grid cells in regional response")
+
+        lons = np.unique(np.round([cell[0] for cell in cells], 4))
+        lats = np.unique(np.round([cell[1] for cell in cells], 4))
+        keys = sorted({key for cell in cells for key in cell[3]})
+        times = pd.to_datetime(keys, format=time_format)
+        key_pos = {key: i for i, key in enumerate(keys)}
+
+        data = {}
+        for lon, lat, code, cell_keys, values in cells:
+            if code not in data:
+                data[code] = np.full((len(times), len(lats), len(lons)), np.nan)
+
+            values = np.asarray(values, dtype=float)
+            values[values == fill_value] = np.nan
+
+            rows = [key_pos[key] for key in cell_keys]
+            i = np.searchsorted(lats, round(lat, 4))
+            j = np.searchsorted(lons, round(lon, 4))
+            data[code][rows, i, j] = values
+
+        return cls(times, lats, lons, data, fill_value=fill_value)
+
+    @property
+    def parameters(self):
+        """Parameter codes held in the cube"""
+        return list(self.data)
+
+    def _nearest_index(self, axis, value):
+        return int(np.abs(axis - value).argmin())
+
+    def _bracket(self, axis, value):
+        """Lower index and interpolation weight of `value` on `axis`"""
+        if len(axis) == 1:
+            return 0, 0.0
+        value = min(max(value, axis[0]), axis[-1])
+        lower = min(int(np.searchsorted(axis, value, side='right')) - 1, len(axis) - 2)
+        weight = (value - axis[lower]) / (axis[lower + 1] - axis[lower])
+        return lower, weight
+
+    def sample(self, latitude, longitude, method='nearest'):
+        """
+        Extract the time series at a point
+
+        Parameters:
+        -----------
+        latitude, longitude : float
+            Point to sample
+        method : str
+            'nearest' (grid cell containing the point) or 'bilinear'
+            (weighted by distance to the four surrounding cell centers)
+
+        Returns:
+        --------
+        pd.DataFrame : One column per parameter code, indexed by time
+        """
+        if method == 'nearest':
+            i = self._nearest_index(self.lats, latitude)
+            j = self._nearest_index(self.lons, longitude)
+            columns = {code: cube[:, i, j] for code, cube in self.data.items()}
+
+        elif method == 'bilinear':
+            i, wy = self._bracket(self.lats, latitude)
+            j, wx = self._bracket(self.lons, longitude)
+            i1 = min(i + 1, len(self.lats) - 1)
+            j1 = min(j + 1, len(self.lons) - 1)
+
+            weights = np.array([(1 - wy) * (1 - wx), (1 - wy) * wx, wy * (1 - wx), wy * wx])
+            columns = {}
+            for code, cube in self.data.items():
+                corners = np.stack([cube[:, i, j], cube[:, i, j1],
+                                    cube[:, i1, j], cube[:, i1, j1]], axis=1)
+
+                # Missing corners are dropped and the remaining weights renormalised
+                valid = ~np.isnan(corners)
+                w = np.where(valid, weights, 0.0)
+                total = w.sum(axis=1)
+                weighted = (np.where(valid, corners, 0.0) * w).sum(axis=1)
+                columns[code] = np.divide(weighted, total, out=np.full(len(total), np.nan),
+                                          where=total > 0)
+        else:
+            raise ValueError(f"Unknown sampling method {method!r}")
+
+        df = pd.DataFrame(columns, index=self.times)
+        df.index.name = 'Date'
+        return df
+
+    def sample_points(self, points, method='nearest'):
+        """
+        Sample many points at once
+
+        Parameters:
+        -----------
+        points : dict
+            Name -> {'lat': float, 'lon': float}
+        method : str
+            'nearest' or 'bilinear'
+
+        Returns:
+        --------
+        dict : Name -> DataFrame (see sample)
+        """
+        return {name: self.sample(coords['lat'], coords['lon'], method=method)
+                for name, coords in points.items()}
+
+    def point_response(self, latitude, longitude, method='nearest'):
+        """
+        Sample a point and package it like a point-endpoint response
+
+        Lets the result go through NASAPowerAPI.convert_to_dataframe unchanged.
+
+        Returns:
+        --------
+        dict : {'geometry', 'header', 'properties': {'parameter': ...}}
+        """
+        df = self.sample(latitude, longitude, method=method)
+        keys = df.index.strftime('%Y%m%d')
+
+        parameter = {}
+        for code in df.columns:
+            values = df[code].to_numpy()
+            values = np.where(np.isnan(values), self.fill_value, np.round(values, 2))
+            parameter[code] = dict(zip(keys, values.tolist()))
+
+        return {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [longitude, latitude]},
+            'header': {'fill_value': self.fill_value, 'sampling': method},
+            'properties': {'parameter': parameter},
+        }
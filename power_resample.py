@@ -0,0 +1,237 @@
+"""
+Sub-hourly Resampling for NASA POWER hourly data
+Produces 30-minute (or any sub-hourly) views from native hourly data
+
+Hourly data is stored once; finer resolutions are derived on demand with a
+method chosen per variable type:
+
+- linear : state variables (T2M, RH2M, PS, WS2M, ...) are interpolated
+           between consecutive hourly values
+- mass   : accumulated quantities (PRECTOTCORR) are split across the
+           sub-intervals so the sub-interval amounts add up to the hourly amount
+- solar  : irradiance (ALLSKY_SFC_SW_DWN) is distributed following the sun's
+           elevation within the hour, keeping the hourly mean unchanged
+- repeat : the hourly value is copied to every sub-interval
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Default method per POWER parameter code and per output column name
+RESAMPLE_METHODS = {
+    # Temperature / moisture / pressure / wind (state variables)
+    'T2M': 'linear',
+    'T2MDEW': 'linear',
+    'T2MWET': 'linear',
+    'RH2M': 'linear',
+    'QV2M': 'linear',
+    'PS': 'linear',
+    'WS2M': 'linear',
+    'WS10M': 'linear',
+    'Temperature_2m_C': 'linear',
+    'Temperature_C': 'linear',
+    'Relative_Humidity_%': 'linear',
+    'Humidity_%': 'linear',
+    'Surface_Pressure_kPa': 'linear',
+    'Pressure_kPa': 'linear',
+    'Wind_Speed_2m_m/s': 'linear',
+    'Wind_Speed_m/s': 'linear',
+
+    # Precipitation (accumulated per interval)
+    'PRECTOTCORR': 'mass',
+    'Precipitation_mm': 'mass',
+
+    # Shortwave irradiance
+    'ALLSKY_SFC_SW_DWN': 'solar',
+    'CLRSKY_SFC_SW_DWN': 'solar',
+    'Solar_Radiation_kWh/m2': 'solar',
+}
+
+# String columns that are rebuilt from the new timestamps
+DATETIME_COLUMNS = ('Date', 'Time', 'DateTime')
+
+
+def _sub_steps(freq):
+    """Number of sub-intervals per hour for a frequency string"""
+    hour = pd.Timedelta('1h')
+    step = pd.Timedelta(freq)
+    if step <= pd.Timedelta(0) or step > hour or hour % step:
+        raise ValueError(f"freq must evenly divide one hour, got {freq!r}")
+    return hour // step
+
+
+def _next_hour_values(values, index):
+    """
+    Value of the following hour for each row (own value at gaps/the end)
+    """
+    next_values = np.empty_like(values)
+    next_values[:-1] = values[1:]
+    next_values[-1] = values[-1]
+
+    # Only use the next row if it really is the next hour
+    contiguous = np.zeros(len(values), dtype=bool)
+    contiguous[:-1] = np.diff(index.to_numpy()) == np.timedelta64(1, 'h')
+    use_next = contiguous & ~np.isnan(next_values)
+    return np.where(use_next, next_values, values)
+
+
+def _linear(values, index, steps):
+    """Interpolate between each hour and the next"""
+    frac = np.arange(steps) / steps
+    v0 = values[:, None]
+    v1 = _next_hour_values(values, index)[:, None]
+    return (v0 + (v1 - v0) * frac).ravel()
+
+
+def _mass(values, index, steps):
+    """
+    Split each hourly amount across its sub-intervals
+
+    The split follows the linear ramp towards the next hour, then is
+    renormalised so the sub-interval amounts sum exactly to the hourly amount.
+    """
+    shape = np.clip(_linear(values, index, steps).reshape(-1, steps), 0, None)
+    totals = shape.sum(axis=1, keepdims=True)
+
+    weights = np.full(shape.shape, 1.0 / steps)
+    np.divide(shape, totals, out=weights, where=totals > 0)
+
+    return (weights * values[:, None]).ravel()
+
+
+def _cos_zenith(timestamps_hours, day_of_year, latitude, longitude, time_standard):
+    """Cosine of the solar zenith angle (clipped at 0 below the horizon)"""
+    solar_hour = timestamps_hours
+    if time_standard.upper() == 'UTC':
+        if longitude is None:
+            raise ValueError("longitude is required for UTC timestamps")
+        solar_hour = solar_hour + longitude / 15.0
+
+    declination = np.radians(23.45) * np.sin(np.radians(360.0 / 365.0 * (284 + day_of_year)))
+    hour_angle = np.radians(15.0 * (solar_hour - 12.0))
+    lat = np.radians(latitude)
+
+    cos_z = (np.sin(lat) * np.sin(declination) +
+             np.cos(lat) * np.cos(declination) * np.cos(hour_angle))
+    return np.clip(cos_z, 0, None)
+
+
+def _solar(values, index, steps, latitude, longitude, time_standard):
+    """
+    Distribute hourly irradiance within the hour by solar elevation
+
+    The mean over the sub-intervals equals the hourly value.
+    """
+    if latitude is None:
+        raise ValueError("latitude is required for the 'solar' resampling method")
+
+    # Midpoint of every sub-interval, in fractional hours of the day
+    offsets = (np.arange(steps) + 0.5) / steps
+    hours = (index.hour.to_numpy() + index.minute.to_numpy() / 60.0)[:, None] + offsets
+    day_of_year = index.dayofyear.to_numpy()[:, None]
+
+    shape = _cos_zenith(hours, day_of_year, latitude, longitude, time_standard)
+    totals = shape.sum(axis=1, keepdims=True)
+
+    # Twilight hours with irradiance but no sun above the horizon: split evenly
+    weights = np.full(shape.shape, 1.0)
+    np.divide(shape * steps, totals, out=weights, where=totals > 0)
+
+    return (weights * values[:, None]).ravel()
+
+
+def resample_hourly_frame(df, freq='30min', latitude=None, longitude=None,
+                          methods=None, time_standard='LST'):
+    """
+    Resample an hourly POWER DataFrame to a sub-hourly resolution
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Hourly data indexed by timestamp (e.g., from convert_hourly_to_dataframe
+        with resample=None). Columns may be POWER codes or output column names.
+    freq : str
+        Target frequency, must evenly divide one hour (e.g., '30min', '15min')
+    latitude, longitude : float
+        Location, needed for the 'solar' method. Taken from a 'Latitude' /
+        'Longitude' column when not given.
+    methods : dict
+        Column -> method overrides ('linear', 'mass', 'solar', 'repeat')
+    time_standard : str
+        'LST' (POWER default, local solar time) or 'UTC'
+
+    Returns:
+    --------
+    pd.DataFrame : Sub-hourly data with the same columns
+    """
+    steps = _sub_steps(freq)
+    index = pd.DatetimeIndex(df.index)
+
+    if steps == 1 or len(df) == 0:
+        return df.copy()
+
+    if latitude is None and 'Latitude' in df:
+        latitude = float(df['Latitude'].iloc[0])
+    if longitude is None and 'Longitude' in df:
+        longitude = float(df['Longitude'].iloc[0])
+
+    method_table = dict(RESAMPLE_METHODS)
+    method_table.update(methods or {})
+
+    repeat_idx = np.repeat(np.arange(len(df)), steps)
+    offsets = np.tile(np.arange(steps) * pd.Timedelta(freq), len(df))
+    new_index = index[repeat_idx] + pd.TimedeltaIndex(offsets)
+
+    # String timestamp columns are rebuilt for the new resolution
+    formatted = {}
+    if any(name in df.columns for name in DATETIME_COLUMNS):
+        from nasa_power_api import NASAPowerAPI
+        formatted = NASAPowerAPI.format_datetime_columns(new_index)
+
+    columns = {}
+    for name in df.columns:
+        if name in DATETIME_COLUMNS:
+            columns[name] = formatted[name]
+            continue
+
+        method = method_table.get(name, 'repeat')
+        column = df[name]
+
+        if method == 'repeat' or not pd.api.types.is_numeric_dtype(column):
+            columns[name] = column.to_numpy()[repeat_idx]
+            continue
+
+        values = column.to_numpy(dtype=float)
+        if method == 'linear':
+            columns[name] = _linear(values, index, steps)
+        elif method == 'mass':
+            columns[name] = _mass(values, index, steps)
+        elif method == 'solar':
+            columns[name] = _solar(values, index, steps, latitude, longitude, time_standard)
+        else:
+            raise ValueError(f"Unknown resampling method {method!r} for column {name!r}")
+
+    return pd.DataFrame(columns, index=new_index.rename(df.index.name))
+
+
+def load_resampled_csv(path, freq='30min', methods=None, time_standard='LST'):
+    """
+    Load a stored hourly CSV and return a sub-hourly view of it
+
+    Parameters:
+    -----------
+    path : str or Path
+        CSV with a 'DateTime' column (e.g., weather_data_5years/Dhaka_2020_hourly.csv)
+    freq : str
+        Target frequency ('30min', '15min', ...); '1h' returns the hourly data
+
+    Returns:
+    --------
+    pd.DataFrame : Resampled rows with a fresh RangeIndex
+    """
+    df = pd.read_csv(path)
+    df.index = pd.to_datetime(df['DateTime'])
+
+    view = resample_hourly_frame(df, freq=freq, methods=methods, time_standard=time_standard)
+    return view.reset_index(drop=True)
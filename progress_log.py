@@ -0,0 +1,326 @@
+"""
+Progress Log
+Levelled, buffered console output and progress bars for long extraction runs
+
+Hot loops report through one shared log instead of print(..., flush=True):
+
+    log = get_progress_log()
+    with log.progress(12, f"{location_name} {year}", unit='months') as bar:
+        for month in range(1, 13):
+            ...
+            log.debug("      Month {month:02d}: {records} records", month=month, records=len(df))
+            bar.update(records=len(df))
+    log.error("   ❌ Month {month:02d}: {error}", month=month, error=e)
+
+- Messages are templates formatted with their fields. Each warning or error
+  template is shown at most `max_repeats` times; further repeats are counted
+  and summarized when the log is closed, so a failing endpoint cannot flood
+  the output. Per-item detail goes to debug, hidden by default.
+- Progress bars redraw in place on a terminal (at most every `interval`
+  seconds) and print a line every 25% when output is redirected, so the
+  log stays the same size however many items a run has.
+- Output is flushed every few seconds and on warnings, not after every line.
+- Every record shown is also written to an optional JSON-lines file, with
+  its fields, for later analysis.
+
+Configured from the environment:
+    EXTRACTION_LOG_LEVEL   debug, info (default), warning or error
+    EXTRACTION_LOG_FILE    JSON-lines sink (default: none)
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        minutes, seconds = divmod(seconds, 60)
+        return f"{minutes}m{seconds:02d}s"
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}h{rest // 60:02d}m"
+
+
+class Progress:
+    """
+    Rate-limited progress bar created by ProgressLog.progress()
+    """
+
+    def __init__(self, log, total, description, unit='items'):
+        self.log = log
+        self.total = total
+        self.description = description
+        self.unit = unit
+        self.done = 0
+        self.totals = {}
+        self.started = time.monotonic()
+        self._last_draw = 0.0
+        self._next_step = 1 / log.steps
+        self._closed = False
+
+    def update(self, n=1, **counts):
+        """
+        Advance the bar
+
+        Parameters:
+        -----------
+        n : int
+            Items finished
+        **counts : Running totals to add to (e.g. records=len(df), errors=1)
+        """
+        with self.log._lock:
+            self.done += n
+            for name, value in counts.items():
+                self.totals[name] = self.totals.get(name, 0) + value
+
+            now = time.monotonic()
+            if self.log.interactive:
+                draw = now - self._last_draw >= self.log.interval
+            else:
+                draw = self.total and self.done < self.total and self.done / self.total >= self._next_step
+            if draw:
+                self._draw(now)
+
+    def _line(self, now):
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        line = f"{self.description}: {self.done}/{self.total or '?'} {self.unit}"
+        if self.total:
+            line += f" ({self.done / self.total:.0%})"
+        for name, value in self.totals.items():
+            line += f", {value:,} {name}"
+        line += f" [{_format_duration(elapsed)}"
+        if self.total and rate > 0 and self.done < self.total:
+            line += f", ~{_format_duration((self.total - self.done) / rate)} left"
+        return line + "]"
+
+    def _draw(self, now):
+        line = self._line(now)
+        self._last_draw = now
+        if self.log.interactive:
+            self.log._write(f"\r   ⏳ {line}\033[K", newline=False)
+            self.log._flush()
+        else:
+            steps = self.log.steps
+            self._next_step = (int(self.done / self.total * steps) + 1) / steps
+            self.log._write(f"   ⏳ {line}")
+        self.log._record('info', 'progress', line, dict(self.totals, done=self.done, total=self.total,
+                                                          description=self.description))
+
+    def close(self):
+        """Print the final state of the bar"""
+        with self.log._lock:
+            if self._closed:
+                return
+            self._closed = True
+            line = self._line(time.monotonic())
+            if self.log.interactive:
+                self.log._write(f"\r   ✅ {line}\033[K")
+            else:
+                self.log._write(f"   ✅ {line}")
+            self.log._record('info', 'progress_done', line, dict(self.totals, done=self.done,
+                                                                   total=self.total,
+                                                                   description=self.description))
+            self.log._flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class ProgressLog:
+    """
+    Levelled log with repeat suppression, progress bars and a JSON-lines sink
+    """
+
+    def __init__(self, level=None, jsonl_path=None, stream=None, interval=0.5, steps=4,
+                 flush_interval=5.0, max_repeats=5):
+        """
+        Initialize the log
+
+        Parameters:
+        -----------
+        level : str
+            Lowest level shown: 'debug', 'info', 'warning' or 'error'
+            (default: EXTRACTION_LOG_LEVEL or 'info')
+        jsonl_path : str or Path
+            JSON-lines file receiving every record shown
+            (default: EXTRACTION_LOG_FILE, or none)
+        stream : file
+            Console stream (default: sys.stdout)
+        interval : float
+            Minimum seconds between progress redraws on a terminal
+        steps : int
+            Progress lines per bar when output is not a terminal
+        flush_interval : float
+            Maximum seconds output stays buffered
+        max_repeats : int
+            Times one warning or error template is shown before it is only counted
+        """
+        level = (level or os.environ.get('EXTRACTION_LOG_LEVEL') or 'info').lower()
+        if level not in LEVELS:
+            raise ValueError(f"Unknown log level '{level}' (use {list(LEVELS)})")
+        self.level = level
+
+        self.stream = stream
+        self.interval = interval
+        self.steps = steps
+        self.flush_interval = flush_interval
+        self.max_repeats = max_repeats
+
+        jsonl_path = jsonl_path or os.environ.get('EXTRACTION_LOG_FILE')
+        self._jsonl = open(jsonl_path, 'a', buffering=1024 * 1024) if jsonl_path else None
+
+        self._lock = threading.RLock()
+        self._repeats = {}     # (level, template) -> [times seen, last message]
+        self._last_flush = time.monotonic()
+        self._open_line = False
+
+    @property
+    def interactive(self):
+        """Console is a terminal (progress redraws in place)"""
+        stream = self.stream or sys.stdout
+        return hasattr(stream, 'isatty') and stream.isatty()
+
+    def enabled(self, level):
+        """Whether messages at `level` are shown (skip building expensive ones)"""
+        return LEVELS[level] >= LEVELS[self.level]
+
+    def _write(self, text, newline=True):
+        stream = self.stream or sys.stdout
+        if self._open_line and not text.startswith('\r'):
+            # End a progress line redrawn in place before printing below it
+            stream.write('\n')
+        stream.write(text + ('\n' if newline else ''))
+        self._open_line = not newline
+
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self._flush()
+
+    def _flush(self):
+        (self.stream or sys.stdout).flush()
+        if self._jsonl is not None:
+            self._jsonl.flush()
+        self._last_flush = time.monotonic()
+
+    def _record(self, level, event, message, fields):
+        if self._jsonl is None:
+            return
+        record = {'time': datetime.now().isoformat(timespec='milliseconds'), 'level': level,
+                  'event': event, 'message': message.strip()}
+        record.update(fields)
+        self._jsonl.write(json.dumps(record, default=str) + '\n')
+
+    def log(self, level, template, event=None, **fields):
+        """
+        Show a message
+
+        Parameters:
+        -----------
+        level : str
+            'debug', 'info', 'warning' or 'error'
+        template : str
+            Message, formatted with str.format(**fields)
+        event : str
+            Event name for the JSON-lines record (default: the level)
+        **fields : Values for the template, also stored in the JSON-lines record
+        """
+        if not self.enabled(level):
+            return
+
+        with self._lock:
+            message = template.format(**fields) if fields else template
+
+            if LEVELS[level] >= LEVELS['warning']:
+                repeats = self._repeats.setdefault((level, template), [0, None])
+                repeats[0] += 1
+                repeats[1] = message
+                seen = repeats[0]
+                if seen > self.max_repeats:
+                    return
+                if seen == self.max_repeats:
+                    message += " (further repeats counted)"
+
+            self._write(message)
+            self._record(level, event or level, message, fields)
+            if LEVELS[level] >= LEVELS['warning']:
+                self._flush()
+
+    def debug(self, template, **fields):
+        self.log('debug', template, **fields)
+
+    def info(self, template, **fields):
+        self.log('info', template, **fields)
+
+    def warning(self, template, **fields):
+        self.log('warning', template, **fields)
+
+    def error(self, template, **fields):
+        self.log('error', template, **fields)
+
+    def progress(self, total, description, unit='items'):
+        """
+        Start a progress bar
+
+        Parameters:
+        -----------
+        total : int
+            Expected number of items (None if unknown)
+        description : str
+            Label shown before the counts
+        unit : str
+            Name of the items counted
+
+        Returns:
+        --------
+        Progress : call update() per item and close() (or use as a context manager)
+        """
+        return Progress(self, total, description, unit)
+
+    def suppressed(self):
+        """
+        Messages hidden by repeat suppression
+
+        Returns:
+        --------
+        dict : (level, template) -> (number of repeats not shown, last of them)
+        """
+        with self._lock:
+            return {key: (seen - self.max_repeats, last) for key, (seen, last) in self._repeats.items()
+                    if seen > self.max_repeats}
+
+    def close(self):
+        """Summarize suppressed messages and flush all output"""
+        with self._lock:
+            for (level, template), (hidden, last) in self.suppressed().items():
+                self._write(f"   ⚠️  {hidden:,} more like: {last.strip()}")
+                self._record(level, 'suppressed', last, {'count': hidden, 'template': template})
+            self._repeats.clear()
+            self._flush()
+
+
+_shared_log = None
+_shared_lock = threading.Lock()
+
+
+def get_progress_log():
+    """Return the process-wide ProgressLog shared by all extractors"""
+    global _shared_log
+    with _shared_lock:
+        if _shared_log is None:
+            _shared_log = ProgressLog()
+            atexit.register(_shared_log.close)
+        return _shared_log
@@ -4,15 +4,18 @@ Non-interactive version for automated extraction
 """
 
 import ee
-import requests
 import pandas as pd
 import time
 from pathlib import Path
-from datetime import datetime, timedelta
 import sys
 
 try:
     from nasa_power_api import NASAPowerAPI
+    from ee_helpers import find_best_scenes, prefetch_best_scenes, save_thumbnail, scene_targets
+    from thumbnail_cache import ThumbnailCache
+    from thumbnail_pipeline import ThumbnailPipeline
+    from power_resample import load_resampled_csv
+    from progress_log import get_progress_log
 except ImportError:
     print("❌ Error: nasa_power_api.py not found")
     sys.exit(1)
@@ -21,6 +24,15 @@ except ImportError:
 class FiveYearExtractor:
     """Extract 5 years of historical weather data"""
     
+    # POWER parameter -> output column (stored hourly, resampled on load)
+    WEATHER_COLUMNS = {
+        'T2M': 'Temperature_2m_C',
+        'RH2M': 'Relative_Humidity_%',
+        'WS2M': 'Wind_Speed_2m_m/s',
+        'PRECTOTCORR': 'Precipitation_mm',
+        'ALLSKY_SFC_SW_DWN': 'Solar_Radiation_kWh/m2',
+    }
+    
     def __init__(self):
         """Initialize the extractor"""
         
@@ -36,6 +48,9 @@ class FiveYearExtractor:
         self.nasa_api = NASAPowerAPI()
         print("✅ NASA POWER API initialized")
         
+        # Levelled, buffered progress output (EXTRACTION_LOG_LEVEL=debug for per-month detail)
+        self.log = get_progress_log()
+        
         # Create directories
         self.base_dir = Path(__file__).parent
         self.image_dir = self.base_dir / 'satellite_images_5years'
@@ -43,6 +58,12 @@ class FiveYearExtractor:
         self.image_dir.mkdir(exist_ok=True)
         self.data_dir.mkdir(exist_ok=True)
         
+        # Scene-keyed thumbnail cache (neighbouring dates often share a scene)
+        self.thumbnail_cache = ThumbnailCache()
+        
+        # Concurrent thumbnail downloads per extraction run
+        self.download_workers = 4
+        
         self.satellite_results = []
         self.extraction_log = []
     
@@ -50,90 +71,61 @@ class FiveYearExtractor:
         """Get hourly weather data for entire year"""
         
         try:
-            all_records = []
+            monthly_frames = []
             
-            for month in range(1, 13):
-                # Determine days in month
-                if month in [1, 3, 5, 7, 8, 10, 12]:
-                    days = 31
-                elif month in [4, 6, 9, 11]:
-                    days = 30
-                else:
-                    days = 29 if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0) else 28
-                
-                start_date = f"{year}{month:02d}01"
-                end_date = f"{year}{month:02d}{days}"
-                
-                print(f"      Month {month:02d}: {start_date} to {end_date}...", end=' ', flush=True)
-                
-                try:
-                    data = self.nasa_api.get_hourly_data(
-                        latitude=lat,
-                        longitude=lon,
-                        start_date=start_date,
-                        end_date=end_date
-                    )
+            with self.log.progress(12, f"{location_name} {year}", unit='months') as progress:
+                for month in range(1, 13):
+                    # Determine days in month
+                    if month in [1, 3, 5, 7, 8, 10, 12]:
+                        days = 31
+                    elif month in [4, 6, 9, 11]:
+                        days = 30
+                    else:
+                        days = 29 if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0) else 28
                     
-                    if data and 'properties' in data and 'parameter' in data['properties']:
-                        params = data['properties']['parameter']
+                    start_date = f"{year}{month:02d}01"
+                    end_date = f"{year}{month:02d}{days}"
+                    
+                    try:
+                        data = self.nasa_api.get_hourly_data(
+                            latitude=lat,
+                            longitude=lon,
+                            start_date=start_date,
+                            end_date=end_date
+                        )
                         
-                        # Process each day in the month
-                        for day in range(1, days + 1):
-                            date_str = f"{year}-{month:02d}-{day:02d}"
-                            date_formatted = f"{year}{month:02d}{day:02d}"
-                            
-                            # Process 24 hours
-                            for hour in range(24):
-                                hour_key = f"{date_formatted}{hour:02d}"
-                                
-                                # Get values
-                                temp = params.get('T2M', {}).get(hour_key)
-                                rh = params.get('RH2M', {}).get(hour_key)
-                                ws = params.get('WS2M', {}).get(hour_key)
-                                precip = params.get('PRECTOTCORR', {}).get(hour_key)
-                                solar = params.get('ALLSKY_SFC_SW_DWN', {}).get(hour_key)
-                                
-                                if temp is not None:
-                                    # Create records for :00 and :30
-                                    for minute in [0, 30]:
-                                        time_str = f"{hour:02d}:{minute:02d}"
-                                        all_records.append({
-                                            'Date': date_str,
-                                            'Time': time_str,
-                                            'DateTime': f"{date_str} {time_str}",
-                                            'Location': location_name,
-                                            'Latitude': lat,
-                                            'Longitude': lon,
-                                            'Temperature_2m_C': temp,
-                                            'Relative_Humidity_%': rh,
-                                            'Wind_Speed_2m_m/s': ws,
-                                            'Precipitation_mm': precip,
-                                            'Solar_Radiation_kWh/m2': solar,
-                                        })
+                        month_df = self.nasa_api.hourly_location_frame(
+                            data, location_name, lat, lon, self.WEATHER_COLUMNS, resample=None
+                        ) if data else None
                         
-                        print(f"✅ {len(all_records)} total", flush=True)
+                        if month_df is not None and len(month_df):
+                            monthly_frames.append(month_df)
+                            self.log.debug("      Month {month:02d}: {start} to {end} ✅ {records} records",
+                                           month=month, start=start_date, end=end_date,
+                                           records=len(month_df))
+                            progress.update(records=len(month_df))
+                            
+                        else:
+                            self.log.warning("      ❌ Month {month:02d}: No data", month=month)
+                            progress.update(errors=1)
                         
-                    else:
-                        print("❌ No data", flush=True)
-                    
-                    time.sleep(0.5)  # Short delay
-                    
-                except Exception as e:
-                    print(f"❌ Error: {e}", flush=True)
-                    self.extraction_log.append({
-                        'Location': location_name,
-                        'Year': year,
-                        'Month': month,
-                        'Status': 'Error',
-                        'Error': str(e)
-                    })
+                    except Exception as e:
+                        self.log.error("      ❌ Month {month:02d}: {error}", month=month, error=e)
+                        progress.update(errors=1)
+                        self.extraction_log.append({
+                            'Location': location_name,
+                            'Year': year,
+                            'Month': month,
+                            'Status': 'Error',
+                            'Error': str(e)
+                        })
             
-            if all_records:
-                df = pd.DataFrame(all_records)
+            if monthly_frames:
+                df = pd.concat(monthly_frames, ignore_index=True)
                 print(f"   ✅ {location_name} {year}: {len(df)} total records")
                 
                 # Save yearly file
-                yearly_file = self.data_dir / f"{location_name}_{year}_30min.csv"
+                yearly_file = self.data_dir / f"{location_name}_{year}_hourly.csv"
                 df.to_csv(yearly_file, index=False)
                 print(f"   💾 Saved: {yearly_file.name} ({yearly_file.stat().st_size / (1024*1024):.1f} MB)")
                 
@@ -168,23 +160,28 @@ class FiveYearExtractor:
             })
             return None
     
-    def get_landsat8_image(self, lat, lon, date, location_name, cloud_cover_max=50):
-        """Get Landsat 8 image from Google Earth Engine"""
+    def load_weather(self, location_name, year, freq='30min'):
+        """Load a stored hourly file resampled to `freq` (e.g., '30min')"""
+        yearly_file = self.data_dir / f"{location_name}_{year}_hourly.csv"
+        return load_resampled_csv(yearly_file, freq=freq)
+    
+    def get_landsat8_image(self, lat, lon, date, location_name, cloud_cover_max=50, scene=None,
+                           pipeline=None):
+        """
+        Get Landsat 8 image from Google Earth Engine
+        
+        With a ThumbnailPipeline the download runs in the background and the
+        returned 'pending' dict is filled in once it finishes.
+        """
         
         try:
-            target_date = datetime.strptime(date, '%Y-%m-%d')
-            start_date = (target_date - timedelta(days=8)).strftime('%Y-%m-%d')
-            end_date = (target_date + timedelta(days=8)).strftime('%Y-%m-%d')
-            
-            point = ee.Geometry.Point([lon, lat])
+            # Best-scene metadata: prefetched in one batched query, or looked up here
+            if scene is None:
+                scene = find_best_scenes(
+                    [(location_name, lat, lon, date)], cloud_cover_max=cloud_cover_max
+                )[(location_name, date)]
             
-            collection = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2') \
-                .filterBounds(point) \
-                .filterDate(start_date, end_date) \
-                .filter(ee.Filter.lt('CLOUD_COVER', cloud_cover_max)) \
-                .sort('CLOUD_COVER')
-            
-            count = collection.size().getInfo()
+            count = scene['images_found']
             
             if count == 0:
                 return {
@@ -194,56 +191,45 @@ class FiveYearExtractor:
                     'location': location_name,
                 }
             
-            image = collection.first()
-            image_date = ee.Date(image.get('system:time_start')).format('YYYY-MM-dd').getInfo()
-            cloud_cover = image.get('CLOUD_COVER').getInfo()
-            
-            # Scale and get RGB
-            def apply_scale_factors(img):
-                optical_bands = img.select('SR_B.').multiply(0.0000275).add(-0.2)
-                return img.addBands(optical_bands, None, True)
+            image_date = scene['image_date']
+            cloud_cover = scene['cloud_cover']
             
-            scaled_image = apply_scale_factors(image)
-            rgb = scaled_image.select(['SR_B4', 'SR_B3', 'SR_B2'])
-            region = point.buffer(7500).bounds()
+            filename = f"{location_name}_{image_date}.png"
+            filepath = self.image_dir / filename
             
-            url = rgb.getThumbURL({
-                'region': region.getInfo(),
-                'dimensions': 512,
-                'format': 'png',
-                'min': 0,
-                'max': 0.3
-            })
+            def finish(status_code):
+                if status_code == 200:
+                    file_size = filepath.stat().st_size / 1024
+                    
+                    self.log.debug("      ✅ {date}: Image saved ({cloud_cover:.1f}% clouds)",
+                                   date=date, cloud_cover=cloud_cover)
+                    
+                    return {
+                        'status': 'success',
+                        'filename': filename,
+                        'file_size_kb': file_size,
+                        'date': date,
+                        'actual_image_date': image_date,
+                        'location': location_name,
+                        'cloud_cover': cloud_cover,
+                    }
+                else:
+                    return {
+                        'status': 'error',
+                        'error': f'HTTP {status_code}',
+                        'date': date,
+                        'location': location_name
+                    }
             
-            response = requests.get(url, timeout=60)
+            if pipeline is None:
+                # Served from the scene thumbnail cache when this scene was already fetched
+                return finish(save_thumbnail(scene, filepath, self.thumbnail_cache, location_name, date))
             
-            if response.status_code == 200:
-                filename = f"{location_name}_{image_date}.png"
-                filepath = self.image_dir / filename
-                
-                with open(filepath, 'wb') as f:
-                    f.write(response.content)
-                
-                file_size = filepath.stat().st_size / 1024
-                
-                print(f"      ✅ {date}: Image saved ({cloud_cover:.1f}% clouds)")
-                
-                return {
-                    'status': 'success',
-                    'filename': filename,
-                    'file_size_kb': file_size,
-                    'date': date,
-                    'actual_image_date': image_date,
-                    'location': location_name,
-                    'cloud_cover': cloud_cover,
-                }
-            else:
-                return {
-                    'status': 'error',
-                    'error': f'HTTP {response.status_code}',
-                    'date': date,
-                    'location': location_name
-                }
+            # Queued: the download overlaps with the next year's weather request
+            result = {'status': 'pending', 'date': date, 'location': location_name}
+            pipeline.submit(scene, filepath, location_name, date,
+                            on_done=lambda status_code: result.update(finish(status_code)))
+            return result
                 
         except Exception as e:
             return {
@@ -269,6 +255,26 @@ class FiveYearExtractor:
         start_time = time.time()
         total_records = 0
         
+        # Sample satellite dates per year, with the best scene for every
+        # (location, date) selected in one batched Earth Engine query
+        sample_dates = {}
+        for year in years:
+            # Quarterly samples
+            sample_dates[year] = [
+                f"{year}-01-15",  # January (dry)
+                f"{year}-04-15",  # April
+                f"{year}-07-15",  # July (monsoon)
+                f"{year}-10-15",  # October
+            ][:sample_dates_per_year]
+        
+        scenes = prefetch_best_scenes(
+            scene_targets(locations, [date for dates in sample_dates.values() for date in dates]),
+            cloud_cover_max=70
+        )
+        
+        # Thumbnails download on worker threads while the loop continues
+        pipeline = ThumbnailPipeline(self.thumbnail_cache, max_workers=self.download_workers)
+        
         for idx, (location_name, coords) in enumerate(locations.items(), 1):
             print(f"\n{'='*70}")
             print(f"[{idx}/{len(locations)}] 📍 {location_name}")
@@ -288,28 +294,26 @@ class FiveYearExtractor:
                 if weather_df is not None:
                     total_records += len(weather_df)
                 
-                # Get quarterly satellite images
-                sample_dates = [
-                    f"{year}-01-15",  # January (dry)
-                    f"{year}-04-15",  # April
-                    f"{year}-07-15",  # July (monsoon)
-                    f"{year}-10-15",  # October
-                ][:sample_dates_per_year]
-                
                 print(f"\n   🛰️  Satellite (quarterly samples):")
-                for date in sample_dates:
+                for date in sample_dates[year]:
                     result = self.get_landsat8_image(
                         lat=coords['lat'],
                         lon=coords['lon'],
                         date=date,
                         location_name=location_name,
-                        cloud_cover_max=70
+                        cloud_cover_max=70,
+                        scene=scenes.get((location_name, date)),
+                        pipeline=pipeline
                     )
                     self.satellite_results.append(result)
-                    time.sleep(2)
                 
                 print()
         
+        # Wait for queued thumbnail downloads before saving metadata
+        print("⏳ Finishing thumbnail downloads...")
+        pipeline.close()
+        print(f"   ✅ Thumbnails: {pipeline.summary()}")
+        
         # Save metadata
         self.save_metadata()
         
@@ -0,0 +1,467 @@
+"""
+Shared Rate Limiter for all API clients
+Per-service token buckets, adaptive backoff and persistent daily quotas
+
+Every HTTP call to an external service (NASA POWER, NASA Earth imagery,
+OpenWeatherMap, Earth Engine thumbnails) should go through
+RateLimiter.request() instead of requests.get() + time.sleep():
+
+    limiter = get_rate_limiter()
+    response = limiter.request('openweather', url, params=params, timeout=30)
+
+- Token buckets let each service run as fast as its quota allows
+- 429/503 responses honor Retry-After, otherwise jittered exponential backoff
+- A 429 halves the service's request rate; successes slowly restore it
+- Daily request counts are persisted so quotas survive restarts
+- Latency, payload size and throttling per service endpoint are kept in
+  .api_history.json, for estimate_time.py to size jobs from real runs,
+  and in the shared metrics registry (metrics.py) for export
+"""
+
+import atexit
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+import requests
+
+from metrics import get_metrics
+
+
+# Per-service limits
+#   rate: sustained requests per second
+#   burst: bucket capacity (requests allowed back-to-back)
+#   daily_quota: requests per calendar day (None = unlimited)
+SERVICE_LIMITS = {
+    'nasa_power': {'rate': 2.0, 'burst': 5, 'daily_quota': None},
+    'nasa_earth': {'rate': 1000 / 3600, 'burst': 10, 'daily_quota': None},   # 1,000/hour with a personal key
+    'nasa_earth_demo': {'rate': 30 / 3600, 'burst': 5, 'daily_quota': 50},   # DEMO_KEY: 30/hour, 50/day
+    'openweather': {'rate': 1.0, 'burst': 10, 'daily_quota': 950},           # Free tier: 60/min, 1,000/day
+    'earth_engine': {'rate': 5.0, 'burst': 10, 'daily_quota': None},
+}
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Most recent latencies kept per service endpoint
+HISTORY_SAMPLES = 500
+
+
+class QuotaExceededError(Exception):
+    """Raised when a service's daily request quota has been used up"""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with an adjustable refill rate
+    """
+
+    def __init__(self, rate, capacity):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold back every caller for `seconds` (e.g., server sent Retry-After)"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def slow_down(self, factor=0.5, min_rate=0.01):
+        """Multiplicatively decrease the rate after throttling"""
+        with self._lock:
+            self.rate = max(min_rate, self.rate * factor)
+
+    def speed_up(self, step=0.05):
+        """Additively restore the rate after a successful request"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * step)
+
+
+class RateLimiter:
+    """
+    Rate limiter shared by every API client in the project
+    """
+
+    def __init__(self, limits=None, state_file=None, max_retries=5,
+                 backoff_base=1.0, backoff_cap=60.0, history_file=None):
+        """
+        Initialize the rate limiter
+
+        Parameters:
+        -----------
+        limits : dict
+            Per-service limits (default: SERVICE_LIMITS)
+        state_file : str or Path
+            JSON file holding daily quota usage (default: .rate_limit_state.json)
+        max_retries : int
+            Retries for throttled or failed requests
+        backoff_base : float
+            First backoff delay in seconds (doubles each retry)
+        backoff_cap : float
+            Maximum backoff delay in seconds
+        history_file : str or Path
+            JSON file holding per-endpoint call history
+            (default: .api_history.json next to the state file)
+        """
+        if state_file is None:
+            state_file = Path(__file__).parent / '.rate_limit_state.json'
+
+        self.limits = {name: dict(config) for name, config in (limits or SERVICE_LIMITS).items()}
+        self.state_file = Path(state_file)
+        self.history_file = Path(history_file) if history_file is not None else \
+            self.state_file.with_name('.api_history.json')
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._usage = self._load_usage()
+        self._history = self._load_json(self.history_file)
+        self._last_flush = 0.0
+
+        atexit.register(self.flush)
+
+    # ------------------------------------------------------------------
+    # Daily quota accounting
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _today():
+        return datetime.now().strftime('%Y-%m-%d')
+
+    @staticmethod
+    def _load_json(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _load_usage(self):
+        return self._load_json(self.state_file)
+
+    def flush(self):
+        """Persist daily quota usage and call history to disk"""
+        with self._lock:
+            files = [(self.state_file, json.dumps(self._usage, indent=2)),
+                     (self.history_file, json.dumps(self._history))]
+            self._last_flush = time.monotonic()
+
+        for path, data in files:
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            try:
+                with open(tmp_path, 'w') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError:
+                pass
+
+    def used_today(self, service):
+        """Number of requests made to a service today"""
+        with self._lock:
+            entry = self._usage.get(service, {})
+            return entry.get('count', 0) if entry.get('date') == self._today() else 0
+
+    def remaining(self, service):
+        """Requests left in today's quota (None if the service is unlimited)"""
+        quota = self.limits.get(service, {}).get('daily_quota')
+        if quota is None:
+            return None
+        return max(0, quota - self.used_today(service))
+
+    def _record(self, service):
+        today = self._today()
+        with self._lock:
+            entry = self._usage.get(service)
+            if not entry or entry.get('date') != today:
+                entry = {'date': today, 'count': 0}
+                self._usage[service] = entry
+            entry['count'] += 1
+            should_flush = time.monotonic() - self._last_flush > 1.0
+
+        if should_flush:
+            self.flush()
+
+    # ------------------------------------------------------------------
+    # Call history
+    # ------------------------------------------------------------------
+
+    def observe(self, service, endpoint, seconds, status=200, size=None, retry=False,
+                backoff=0.0):
+        """
+        Record one call to a service endpoint
+
+        request() records every attempt itself; clients that call a service
+        another way (e.g. Earth Engine getInfo) record their calls here.
+
+        Parameters:
+        -----------
+        service : str
+            Service name in the limits table
+        endpoint : str
+            Endpoint within the service (e.g., 'hourly/point')
+        seconds : float
+            Call latency
+        status : int
+            HTTP status, or None if the call failed to connect
+        size : int
+            Payload bytes, if known
+        retry : bool
+            The call repeated an earlier attempt
+        backoff : float
+            Seconds slept before the call because of an earlier failure
+        """
+        if status is None:
+            outcome = 'failed'
+        elif status == 429:
+            outcome = 'throttled'
+        elif status >= 400:
+            outcome = 'error'
+        else:
+            outcome = 'ok'
+
+        metrics = get_metrics()
+        metrics.observe('extraction_http_request_seconds', seconds, service=service, endpoint=endpoint)
+        metrics.inc('extraction_http_requests_total', service=service, endpoint=endpoint, outcome=outcome)
+        if size is not None:
+            metrics.inc('extraction_http_bytes_total', int(size), service=service, endpoint=endpoint)
+        if retry:
+            metrics.inc('extraction_http_retries_total', service=service, endpoint=endpoint)
+        if backoff:
+            metrics.inc('extraction_http_backoff_seconds_total', backoff, service=service, endpoint=endpoint)
+
+        with self._lock:
+            entry = self._history.setdefault(service, {}).setdefault(endpoint, {
+                'calls': 0, 'attempts': 0, 'ok': 0, 'throttled': 0, 'errors': 0,
+                'failed': 0, 'backoff_s': 0.0, 'bytes': 0, 'sized': 0, 'latency': [],
+            })
+            entry['attempts'] += 1
+            entry['calls'] += not retry
+            entry['backoff_s'] += backoff
+            entry[{'failed': 'failed', 'throttled': 'throttled', 'error': 'errors', 'ok': 'ok'}[outcome]] += 1
+            if size is not None:
+                entry['bytes'] += int(size)
+                entry['sized'] += 1
+
+            entry['latency'].append(round(seconds, 4))
+            del entry['latency'][:-HISTORY_SAMPLES]
+            entry['updated'] = self._today()
+
+    def history(self):
+        """Raw call history: service -> endpoint -> counters and recent latencies"""
+        with self._lock:
+            return json.loads(json.dumps(self._history))
+
+    def profile(self, service, endpoint=None):
+        """
+        Measured behaviour of a service endpoint
+
+        Parameters:
+        -----------
+        service : str
+            Service name
+        endpoint : str
+            Endpoint (default: every endpoint of the service combined)
+
+        Returns:
+        --------
+        dict : calls, attempts, latency_mean_s / latency_p50_s / latency_p95_s,
+               bytes_mean, retry_rate (extra attempts per call), throttle_rate
+               and error_rate (per attempt), backoff_per_call_s - or None if
+               nothing was recorded
+        """
+        with self._lock:
+            endpoints = self._history.get(service, {})
+            entries = [endpoints[endpoint]] if endpoint in endpoints else \
+                (list(endpoints.values()) if endpoint is None else [])
+            entries = json.loads(json.dumps(entries))
+
+        latencies = sorted(value for entry in entries for value in entry['latency'])
+        if not latencies:
+            return None
+
+        def total(name):
+            return sum(entry[name] for entry in entries)
+
+        def percentile(q):
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+        calls = max(1, total('calls'))
+        attempts = max(1, total('attempts'))
+        return {
+            'calls': total('calls'),
+            'attempts': total('attempts'),
+            'latency_mean_s': sum(latencies) / len(latencies),
+            'latency_p50_s': percentile(0.5),
+            'latency_p95_s': percentile(0.95),
+            'bytes_mean': total('bytes') / total('sized') if total('sized') else None,
+            'retry_rate': total('attempts') / calls - 1,
+            'throttle_rate': total('throttled') / attempts,
+            'error_rate': (total('errors') + total('failed')) / attempts,
+            'backoff_per_call_s': total('backoff_s') / calls,
+        }
+
+    # ------------------------------------------------------------------
+    # Throttling
+    # ------------------------------------------------------------------
+
+    def bucket(self, service):
+        """Token bucket for a service (created on first use)"""
+        with self._lock:
+            if service not in self._buckets:
+                config = self.limits.get(service, {'rate': 1.0, 'burst': 1})
+                self._buckets[service] = TokenBucket(config['rate'], config['burst'])
+            return self._buckets[service]
+
+    def acquire(self, service):
+        """
+        Wait for permission to make one request to a service
+
+        Raises:
+        -------
+        QuotaExceededError : if today's quota for the service is used up
+        """
+        if self.remaining(service) == 0:
+            raise QuotaExceededError(f"Daily quota for '{service}' reached "
+                                     f"({self.limits[service]['daily_quota']} requests)")
+        self.bucket(service).acquire()
+        self._record(service)
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff delay for a retry attempt (0-based)"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def parse_retry_after(value):
+        """Parse a Retry-After header (seconds or HTTP date) into seconds"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    def request(self, service, url, session=None, method='GET', endpoint='default', **kwargs):
+        """
+        Make a rate-limited HTTP request with retries
+
+        Parameters:
+        -----------
+        service : str
+            Service name in the limits table (e.g., 'nasa_power')
+        url : str
+            Request URL
+        session : requests.Session
+            Session to use (default: the requests module)
+        method : str
+            HTTP method
+        endpoint : str
+            Endpoint name the call is recorded under in the call history
+        **kwargs :
+            Passed to requests (params, timeout, stream, ...)
+
+        Returns:
+        --------
+        requests.Response : Final response (may still be an error status)
+
+        Raises:
+        -------
+        QuotaExceededError : if the daily quota is used up
+        requests.exceptions.RequestException : if every attempt failed to connect
+        """
+        http = session if session is not None else requests
+        bucket = self.bucket(service)
+        backoff = 0.0
+
+        for attempt in range(self.max_retries + 1):
+            self.acquire(service)
+
+            start = time.monotonic()
+            try:
+                response = http.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.observe(service, endpoint, time.monotonic() - start, status=None,
+                             retry=attempt > 0, backoff=backoff)
+                if attempt == self.max_retries:
+                    raise
+                backoff = self.backoff_delay(attempt)
+                time.sleep(backoff)
+                continue
+
+            # Streamed bodies are not read yet: fall back to Content-Length
+            if kwargs.get('stream'):
+                size = response.headers.get('Content-Length')
+            else:
+                size = len(response.content)
+            self.observe(service, endpoint, time.monotonic() - start, status=response.status_code,
+                         size=size if response.status_code < 400 else None,
+                         retry=attempt > 0, backoff=backoff)
+            backoff = 0.0
+
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                if response.status_code < 400:
+                    bucket.speed_up()
+                return response
+
+            # Throttled or server error: back off before retrying
+            if response.status_code == 429:
+                bucket.slow_down()
+
+            response.close()
+            delay = self.parse_retry_after(response.headers.get('Retry-After'))
+            if delay is None:
+                backoff = self.backoff_delay(attempt)
+                time.sleep(backoff)
+            else:
+                # Everyone using this service waits, not just this thread
+                bucket.pause(delay)
+                backoff = delay
+
+        return response
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide RateLimiter shared by all API clients"""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
@@ -0,0 +1,505 @@
+"""
+Columnar Record Builder
+Accumulate extracted rows as typed column arrays instead of lists of dicts
+
+A list of per-row dicts repeats every key and every Location / Date string
+in each row; for a multi-year 30-minute dataset that is millions of Python
+objects. RecordBuilder keeps one growable numpy array per column instead:
+
+- numeric columns are stored in their own dtype; datetime columns
+  (datetime64, pd.Timestamp or datetime values) as datetime64[ns]
+- date-time text in one fixed format (e.g. DateTime '2024-05-01 14:30') is
+  stored as datetime64[ns] and formatted back to the same text on output
+- other text and repeated values are dictionary-encoded (int32 codes plus
+  one copy of each distinct value); text that is mostly unique (file names,
+  ids) is kept as a plain object array, which has no dictionary to pay for
+- a column holding one value for every row (e.g. Location, Latitude and
+  Longitude for one site) stores just that value
+
+    records = RecordBuilder()
+    records.extend(weather_df)            # a DataFrame, dict of arrays or list of dicts
+    records.append({'DateTime': ..., 'Lightning_Score': 3})
+    df = records.to_pandas()              # numeric columns are views, not copies
+    table = records.to_arrow()            # needs pyarrow
+
+Missing values are NaN for numeric columns (integer columns become float
+when a value is missing) and null for encoded ones.
+"""
+
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+INITIAL_CAPACITY = 1024
+
+# Text formats stored as datetime64 (must round-trip exactly through strftime)
+TEXT_TIME_FORMATS = ('%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+
+# A first batch at least this long whose values are mostly unique is stored unencoded
+HIGH_CARDINALITY_MIN_ROWS = 16
+
+
+def _is_numeric(value):
+    return isinstance(value, (bool, int, float, np.number, np.bool_)) and not isinstance(value, np.datetime64)
+
+
+def _is_datetime(value):
+    return (isinstance(value, np.datetime64)
+            or (isinstance(value, datetime) and value.tzinfo is None))
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value) or value is pd.NaT
+
+
+def _parse_text_times(values, fmt):
+    """datetime64[ns] array for text in `fmt`; raises ValueError unless it round-trips exactly"""
+    values = np.asarray(values, dtype=object)
+    missing = np.array([_is_missing(value) for value in values], dtype=bool)
+    if not all(isinstance(value, str) for value in values[~missing]):
+        raise ValueError("not text")
+    parsed = pd.to_datetime(values, format=fmt)
+    text = parsed.strftime(fmt).to_numpy(dtype=object)
+    if (text[~missing] != values[~missing]).any():
+        raise ValueError(f"text does not round-trip through {fmt}")
+    return np.asarray(parsed, dtype='datetime64[ns]')
+
+
+def _text_time_format(values):
+    """First of TEXT_TIME_FORMATS every value of a text sample is written in, or None"""
+    for fmt in TEXT_TIME_FORMATS:
+        try:
+            _parse_text_times(values, fmt)
+        except (ValueError, TypeError):
+            continue
+        return fmt
+    return None
+
+
+class _NumericColumn:
+    """Growable array of one numpy dtype; stores one value while every row holds it"""
+
+    def __init__(self, dtype, capacity, fixed=False):
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self.fixed = fixed      # keep a requested dtype unless missing values force float
+        self.data = None        # None while the column is constant
+        self.constant = None
+
+    def _upcast(self, dtype):
+        if self.fixed and not (self.dtype.kind in 'biu' and np.dtype(dtype).kind == 'f'):
+            return
+        dtype = np.result_type(self.dtype, dtype)
+        if dtype != self.dtype:
+            self.dtype = dtype
+            if self.data is not None:
+                self.data = self.data.astype(dtype)
+
+    def _materialize(self, start):
+        if self.data is None:
+            self.data = np.empty(max(self.capacity, start), dtype=self.dtype)
+            if start:
+                self.data[:start] = self.constant
+
+    def _ensure(self, start, count):
+        if start + count > len(self.data):
+            grown = np.empty(max(len(self.data) * 2, start + count), dtype=self.dtype)
+            grown[:start] = self.data[:start]
+            self.data = grown
+
+    def _same(self, value):
+        return value == value and (self.constant is None or value == self.constant)
+
+    def coerce(self, values):
+        """Array of this column's kind (object input: None / NaN become NaN or NaT)"""
+        values = np.asarray(values)
+        if values.dtype.kind in 'biufmM':
+            return values
+        if self.dtype.kind == 'M':
+            return np.asarray(pd.to_datetime(values), dtype='datetime64[ns]')
+        return np.array([np.nan if _is_missing(value) else value for value in values])
+
+    def write(self, start, values):
+        values = self.coerce(values)
+        self._upcast(values.dtype)
+        if self.data is None:
+            if len(values) and self._same(values[0]) and (values == values[0]).all():
+                self.constant = values[0]
+                return
+            self._materialize(start)
+        self._ensure(start, len(values))
+        self.data[start:start + len(values)] = values
+
+    def write_one(self, start, value):
+        if self.dtype.kind in 'biu' and isinstance(value, (float, np.floating)):
+            self._upcast(np.float64)
+        if self.data is None:
+            if self._same(value):
+                self.constant = value
+                return
+            self._materialize(start)
+        self._ensure(start, 1)
+        self.data[start] = value
+
+    def write_missing(self, start, count):
+        if self.dtype.kind in 'biu':
+            self._upcast(np.float64)
+        self._materialize(start)
+        self._ensure(start, count)
+        self.data[start:start + count] = np.datetime64('NaT') if self.dtype.kind in 'mM' else np.nan
+
+    def view(self, length):
+        if self.data is None:
+            return np.full(length, self.constant, dtype=self.dtype)
+        return self.data[:length]
+
+    def nbytes(self, length):
+        return self.data[:length].nbytes if self.data is not None else self.dtype.itemsize
+
+
+class _TextTimeColumn(_NumericColumn):
+    """Date-time text in one format, stored as datetime64[ns] and returned as the same text"""
+
+    def __init__(self, fmt, capacity):
+        super().__init__('datetime64[ns]', capacity, fixed=True)
+        self.format = fmt
+
+    def coerce(self, values):
+        return _parse_text_times(values, self.format)
+
+    def write_one(self, start, value):
+        super().write_one(start, self.coerce([value])[0])
+
+    def text(self, length):
+        return pd.DatetimeIndex(super().view(length)).strftime(self.format).to_numpy(dtype=object)
+
+    def view(self, length):
+        return self.text(length)
+
+
+class _ObjectColumn:
+    """Plain object array for mostly-unique values (a dictionary would only add overhead)"""
+
+    def __init__(self, capacity):
+        self.data = np.empty(capacity, dtype=object)
+
+    def _ensure(self, start, count):
+        if start + count > len(self.data):
+            grown = np.empty(max(len(self.data) * 2, start + count), dtype=object)
+            grown[:start] = self.data[:start]
+            self.data = grown
+
+    def write(self, start, values):
+        values = np.asarray(values, dtype=object)
+        self._ensure(start, len(values))
+        self.data[start:start + len(values)] = values
+
+    def write_one(self, start, value):
+        self._ensure(start, 1)
+        self.data[start] = value
+
+    def write_missing(self, start, count):
+        self._ensure(start, count)
+        self.data[start:start + count] = None
+
+    def view(self, length):
+        return self.data[:length]
+
+    def nbytes(self, length):
+        values = self.data[:length]
+        return values.nbytes + sum(sys.getsizeof(value) for value in values if value is not None)
+
+
+class _EncodedColumn:
+    """Dictionary-encoded values; stores nothing per row while every row holds one value"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.values = []
+        self.index = {}
+        self.codes = None       # None while the column is constant
+
+    def _code(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def _materialize(self, start):
+        if self.codes is None:
+            self.codes = np.zeros(max(self.capacity, start), dtype=np.int32)
+
+    def _ensure(self, start, count):
+        if start + count > len(self.codes):
+            grown = np.empty(max(len(self.codes) * 2, start + count), dtype=np.int32)
+            grown[:start] = self.codes[:start]
+            self.codes = grown
+
+    def write(self, start, values):
+        if isinstance(values, pd.Categorical):
+            uniques, codes = values.categories, values.codes
+        else:
+            codes, uniques = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=True)
+
+        mapping = np.array([self._code(value) for value in uniques] + [-1], dtype=np.int32)
+        codes = mapping[codes]   # -1 (missing) picks the trailing -1
+
+        if self.codes is None:
+            if len(self.values) == 1 and len(codes) and (codes == 0).all():
+                return
+            self._materialize(start)
+        self._ensure(start, len(codes))
+        self.codes[start:start + len(codes)] = codes
+
+    def write_one(self, start, value):
+        if self.codes is None and self.values and self.values[0] == value:
+            return
+        self._materialize(start)
+        self._ensure(start, 1)
+        self.codes[start] = self._code(value)
+
+    def write_missing(self, start, count):
+        self._materialize(start)
+        self._ensure(start, count)
+        self.codes[start:start + count] = -1
+
+    def view(self, length):
+        codes = self.codes[:length] if self.codes is not None else np.zeros(length, dtype=np.int8)
+        return pd.Categorical.from_codes(codes, categories=pd.Index(self.values, dtype=object))
+
+    def decoded(self, length):
+        values = np.array(self.values + [None], dtype=object)
+        codes = self.codes[:length] if self.codes is not None else np.zeros(length, dtype=np.int32)
+        return values[codes]
+
+    def nbytes(self, length):
+        per_row = self.codes[:length].nbytes if self.codes is not None else 0
+        dictionary = (sys.getsizeof(self.values) + sys.getsizeof(self.index)
+                      + sum(sys.getsizeof(value) for value in self.values))
+        return per_row + dictionary
+
+
+class RecordBuilder:
+    """
+    Columnar accumulator for extracted rows
+    """
+
+    def __init__(self, dtypes=None, capacity=INITIAL_CAPACITY):
+        """
+        Initialize an empty builder
+
+        Parameters:
+        -----------
+        dtypes : dict
+            Column -> numpy dtype for numeric columns (e.g. {'Flash_Count': 'int16'});
+            other columns take the type of their first values
+        capacity : int
+            Rows allocated up front per column (arrays double as they fill)
+        """
+        self.dtypes = dict(dtypes or {})
+        self.capacity = capacity
+        self._columns = {}
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def columns(self):
+        """Column names in the order they first appeared"""
+        return list(self._columns)
+
+    def _column(self, name, sample):
+        column = self._columns.get(name)
+        if column is None:
+            dtype = self.dtypes.get(name)
+            fixed = dtype is not None
+            text_format = None
+            unique = False
+            if dtype is None and not isinstance(sample, pd.Categorical):
+                sample = np.asarray(sample)
+                if sample.dtype.kind in 'biufmM':
+                    dtype = sample.dtype
+                elif sample.dtype.kind in 'OU':
+                    present = [value for value in sample if not _is_missing(value)]
+                    if present and all(map(_is_numeric, present)):
+                        dtype = np.asarray(present).dtype
+                    elif present and all(map(_is_datetime, present)):
+                        dtype = 'datetime64[ns]'
+                    elif present and all(isinstance(value, str) for value in present):
+                        # Repeated text (e.g. Date in hourly rows) is cheaper encoded
+                        distinct = len(set(present))
+                        if distinct > len(present) // 2:
+                            text_format = _text_time_format(present)
+                            unique = len(present) >= HIGH_CARDINALITY_MIN_ROWS
+            if dtype is not None:
+                column = _NumericColumn(dtype, self.capacity, fixed)
+            elif text_format is not None:
+                column = _TextTimeColumn(text_format, self.capacity)
+            elif unique:
+                column = _ObjectColumn(self.capacity)
+            else:
+                column = _EncodedColumn(self.capacity)
+
+            if self._length:
+                column.write_missing(0, self._length)
+            self._columns[name] = column
+        return column
+
+    def _demote(self, name):
+        """Re-store a date-time text column as encoded text (a value broke its format)"""
+        encoded = _EncodedColumn(self.capacity)
+        if self._length:
+            encoded.write(0, self._columns[name].text(self._length))
+        self._columns[name] = encoded
+        return encoded
+
+    def extend(self, rows):
+        """
+        Append many rows
+
+        Parameters:
+        -----------
+        rows : pd.DataFrame, dict of column -> array, RecordBuilder or list of dicts
+        """
+        if isinstance(rows, RecordBuilder):
+            rows = rows.to_pandas()
+        elif isinstance(rows, (list, tuple)):
+            rows = pd.DataFrame(list(rows))
+
+        if isinstance(rows, pd.DataFrame):
+            count = len(rows)
+            arrays = {}
+            for name in rows.columns:
+                series = rows[name]
+                arrays[name] = (series.array if isinstance(series.dtype, pd.CategoricalDtype)
+                                else series.to_numpy())
+        else:
+            arrays = {name: values if isinstance(values, pd.Categorical) else np.asarray(values)
+                      for name, values in rows.items()}
+            count = len(next(iter(arrays.values()))) if arrays else 0
+
+        if count == 0:
+            return
+
+        start = self._length
+        for name, values in arrays.items():
+            if len(values) != count:
+                raise ValueError(f"Column '{name}' has {len(values)} values, expected {count}")
+            column = self._column(name, values)
+            try:
+                column.write(start, values)
+            except ValueError:
+                if not isinstance(column, _TextTimeColumn):
+                    raise
+                self._demote(name).write(start, values)
+
+        for name, column in self._columns.items():
+            if name not in arrays:
+                column.write_missing(start, count)
+
+        self._length += count
+
+    def append(self, row):
+        """
+        Append one row
+
+        Parameters:
+        -----------
+        row : dict
+            Column -> value; columns not given are missing for this row
+        """
+        start = self._length
+        for name, value in row.items():
+            column = self._columns.get(name)
+            if column is None:
+                if _is_missing(value):
+                    continue
+                column = self._column(name, [value])
+
+            if _is_missing(value):
+                column.write_missing(start, 1)
+            else:
+                try:
+                    column.write_one(start, value)
+                except ValueError:
+                    if not isinstance(column, _TextTimeColumn):
+                        raise
+                    self._demote(name).write_one(start, value)
+
+        for name, column in self._columns.items():
+            if name not in row:
+                column.write_missing(start, 1)
+
+        self._length += 1
+
+    def clear(self):
+        """Drop every row and column"""
+        self._columns = {}
+        self._length = 0
+
+    def nbytes(self):
+        """Approximate memory held by the stored rows"""
+        return sum(column.nbytes(self._length) for column in self._columns.values())
+
+    def to_pandas(self, categorical=True, copy=False):
+        """
+        Build a DataFrame
+
+        By default numeric columns share storage with the builder: later
+        appends do not change the frame, but editing the frame's values in
+        place (e.g. df.loc[0, 'Temperature_C'] = ...) also changes the
+        builder. Pass copy=True for a frame that can be edited freely.
+        Constant columns are expanded here.
+
+        Parameters:
+        -----------
+        categorical : bool
+            Return encoded columns as pandas categoricals (default) instead
+            of object columns
+        copy : bool
+            Copy numeric columns instead of sharing the builder's arrays
+
+        Returns:
+        --------
+        pd.DataFrame : One column per stored column, in order of appearance
+        """
+        data = {}
+        for name, column in self._columns.items():
+            if isinstance(column, _EncodedColumn) and not categorical:
+                data[name] = column.decoded(self._length)
+            else:
+                data[name] = column.view(self._length)
+        return pd.DataFrame(data, copy=copy)
+
+    def to_arrow(self):
+        """
+        Build a pyarrow Table (numeric columns without copying)
+
+        Returns:
+        --------
+        pa.Table : Encoded columns become dictionary arrays with int32 indices
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("to_arrow() requires pyarrow: pip install pyarrow")
+
+        arrays = {}
+        for name, column in self._columns.items():
+            if isinstance(column, (_NumericColumn, _ObjectColumn)):
+                arrays[name] = pa.array(column.view(self._length))
+            else:
+                codes = (column.codes[:self._length] if column.codes is not None
+                         else np.zeros(self._length, dtype=np.int32))
+                indices = pa.array(codes, mask=codes < 0)
+                arrays[name] = pa.DictionaryArray.from_arrays(indices, pa.array(column.values))
+        return pa.table(arrays)
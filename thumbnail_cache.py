@@ -0,0 +1,243 @@
+"""
+Satellite Thumbnail Cache
+Scene-level on-disk cache for Earth Engine thumbnails
+
+Neighbouring target dates often resolve to the same Landsat scene (the best
+image within ±8 days), so the same PNG would otherwise be requested and
+downloaded again. Thumbnails are keyed on everything that determines their
+pixels: scene ID, region, bands, dimensions and visualization parameters.
+
+- Storage: one PNG per thumbnail under .thumbnail_cache/<key[:2]>/<key>.png
+- Index: .thumbnail_cache/index.json with per-thumbnail metadata and the
+  thumbnail each requested (location, date) resolved to
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+
+class ThumbnailCache:
+    """
+    Scene-keyed thumbnail cache with a JSON index
+    """
+
+    def __init__(self, cache_dir=None):
+        """
+        Initialize the cache
+
+        Parameters:
+        -----------
+        cache_dir : str or Path
+            Directory for cached thumbnails (default: .thumbnail_cache next to this file)
+        """
+        if cache_dir is None:
+            cache_dir = Path(__file__).parent / '.thumbnail_cache'
+
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.cache_dir / 'index.json'
+
+        self._lock = threading.Lock()
+        self.index = self._load_index()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _load_index(self):
+        """Read the index, starting fresh if it is missing or unreadable"""
+        try:
+            with open(self.index_file, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+
+        index.setdefault('thumbnails', {})
+        index.setdefault('requests', {})
+        return index
+
+    def _save_index(self):
+        """Write the index atomically (caller holds the lock)"""
+        tmp_path = self.index_file.with_name(
+            f"{self.index_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp_path, self.index_file)
+
+    @staticmethod
+    def make_key(scene_id, region, bands, params):
+        """
+        Build the cache key for a thumbnail
+
+        Parameters:
+        -----------
+        scene_id : str
+            Scene (or image) identifier
+        region : dict
+            GeoJSON region of the thumbnail
+        bands : list
+            Bands rendered (e.g., ['SR_B4', 'SR_B3', 'SR_B2'])
+        params : dict
+            Dimensions, format and visualization parameters
+
+        Returns:
+        --------
+        str : Hex digest identifying the thumbnail
+        """
+        payload = json.dumps({
+            'scene_id': scene_id,
+            'region': region,
+            'bands': list(bands),
+            'params': {name: value for name, value in params.items() if name != 'region'},
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path_for(self, key):
+        """Return the file path for a cache key"""
+        return self.cache_dir / key[:2] / f"{key}.png"
+
+    def get(self, key):
+        """
+        Look up a cached thumbnail
+
+        Returns:
+        --------
+        Path : Cached PNG, or None on a miss
+        """
+        path = self._path_for(key)
+        if key in self.index['thumbnails'] and path.exists():
+            self.hits += 1
+            return path
+
+        self.misses += 1
+        return None
+
+    def put(self, key, content, scene=None):
+        """
+        Store a downloaded thumbnail
+
+        Parameters:
+        -----------
+        key : str
+            Cache key from make_key
+        content : bytes
+            PNG bytes
+        scene : dict
+            Scene metadata to record (scene_id, image_id, image_date, cloud_cover)
+
+        Returns:
+        --------
+        Path : Cached PNG
+        """
+        path = self._path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temp file first so readers never see a partial thumbnail
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        self._add_entry(key, path, scene)
+        return path
+
+    def put_file(self, key, filepath, scene=None):
+        """
+        Store a thumbnail that was already written to disk (copied into the cache)
+
+        Returns:
+        --------
+        Path : Cached PNG
+        """
+        path = self._path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        shutil.copyfile(filepath, tmp_path)
+        os.replace(tmp_path, path)
+
+        self._add_entry(key, path, scene)
+        return path
+
+    def _add_entry(self, key, path, scene):
+        """Index a cached thumbnail with its scene metadata"""
+        entry = {
+            'file': str(path.relative_to(self.cache_dir)),
+            'size_bytes': path.stat().st_size,
+            'fetched_at': time.time(),
+        }
+        for field in ('scene_id', 'image_id', 'image_date', 'cloud_cover'):
+            if scene and field in scene:
+                entry[field] = scene[field]
+
+        with self._lock:
+            self.index['thumbnails'][key] = entry
+            self._save_index()
+
+    def record(self, location_name, date, key, output_path=None):
+        """Record which cached thumbnail a requested (location, date) resolved to"""
+        with self._lock:
+            self.index['requests'][f"{location_name}|{date}"] = {
+                'key': key,
+                'scene_id': self.index['thumbnails'].get(key, {}).get('scene_id'),
+                'output': str(output_path) if output_path is not None else None,
+            }
+            self._save_index()
+
+    def lookup(self, location_name, date):
+        """
+        Cached thumbnail a requested (location, date) resolved to
+
+        Returns:
+        --------
+        Path : Cached PNG, or None if the request was never recorded
+        """
+        request = self.index['requests'].get(f"{location_name}|{date}")
+        if request is None:
+            return None
+        path = self._path_for(request['key'])
+        return path if path.exists() else None
+
+    def copy_to(self, key, filepath):
+        """
+        Materialize a cached thumbnail at an output path
+
+        The copy is skipped when the output already holds the same file.
+
+        Returns:
+        --------
+        bool : True if the thumbnail is cached (and now present at filepath)
+        """
+        path = self._path_for(key)
+        if not path.exists():
+            return False
+
+        filepath = Path(filepath)
+        if filepath.exists() and filepath.stat().st_size == path.stat().st_size:
+            return True
+
+        tmp_path = filepath.with_name(f"{filepath.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, filepath)
+        return True
+
+    def stats(self):
+        """
+        Cache statistics
+
+        Returns:
+        --------
+        dict : Thumbnail and request counts, size on disk and hit/miss counters
+        """
+        thumbnails = self.index['thumbnails'].values()
+        return {
+            'thumbnails': len(self.index['thumbnails']),
+            'requests': len(self.index['requests']),
+            'size_mb': sum(entry.get('size_bytes', 0) for entry in thumbnails) / (1024 * 1024),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -0,0 +1,227 @@
+"""
+Satellite Thumbnail Download Pipeline
+Producer/consumer downloads that overlap with Earth Engine queries
+
+The extractor loop is the producer: it selects scenes and asks Earth Engine
+for thumbnail URLs (one round-trip each). A bounded pool of HTTP workers
+consumes the URLs, streaming each PNG to disk through a temp-file rename.
+While a thumbnail downloads, the loop is already running the next Earth
+Engine query, so a run takes as long as its slowest stage rather than the
+sum of all of them.
+
+    pipeline = ThumbnailPipeline(cache=ThumbnailCache(), max_workers=4)
+    for ...:
+        pipeline.submit(scene, filepath, location_name, date, on_done=finish)
+    pipeline.close()          # waits for queued downloads
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ee_helpers import RGB_BANDS, THUMB_PARAMS, landsat_thumb_url
+from metrics import get_metrics
+from rate_limiter import get_rate_limiter
+
+
+class ThumbnailPipeline:
+    """
+    Bounded thread pool of thumbnail downloaders fed by the Earth Engine loop
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, cache=None, max_workers=4, max_pending=None):
+        """
+        Initialize the pipeline
+
+        Parameters:
+        -----------
+        cache : ThumbnailCache
+            Scene-keyed cache; hits complete immediately without a download
+        max_workers : int
+            Concurrent HTTP downloads
+        max_pending : int
+            Queued downloads before submit() blocks the producer
+            (default: 2 × max_workers)
+        """
+        self.cache = cache
+        self.max_workers = max_workers
+        self.rate_limiter = get_rate_limiter()
+
+        # One connection per worker, shared by all downloads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='thumbnails')
+        self._slots = threading.BoundedSemaphore(max_pending or 2 * max_workers)
+        self._futures = []
+        self._in_flight = {}  # cache key -> download future
+        self._lock = threading.Lock()
+
+        self.stats = {'cached': 0, 'downloaded': 0, 'failed': 0, 'bytes': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def submit(self, scene, filepath, location_name=None, date=None, on_done=None, url=None,
+               **params):
+        """
+        Queue a scene's thumbnail for download (called from the producer thread)
+
+        Cache hits complete immediately. Otherwise the thumbnail URL is
+        requested here and the download runs on a worker thread; this call
+        only blocks when `max_pending` downloads are already queued.
+
+        Parameters:
+        -----------
+        scene : dict
+            Scene from ee_helpers.find_best_scenes
+        filepath : Path
+            Output PNG
+        location_name, date : str
+            Requested target, recorded in the cache index
+        on_done : callable
+            Called with the HTTP status (200 on success, None on a
+            connection error or any other failure) once the thumbnail is on disk or has failed
+        url : str
+            Thumbnail URL, if already known (skips the Earth Engine round-trip)
+        **params : Overrides for ee_helpers.THUMB_PARAMS
+
+        Returns:
+        --------
+        concurrent.futures.Future : Resolves to the HTTP status
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(scene.get('scene_id') or scene['image_id'], scene['region'],
+                                      RGB_BANDS, dict(THUMB_PARAMS, **params))
+
+        with self._lock:
+            in_flight = self._in_flight.get(key) if key is not None else None
+
+        if in_flight is not None:
+            # Same scene already downloading for another date: reuse it
+            future = Future()
+            in_flight.add_done_callback(
+                lambda f: self._resolve_reuse(future, f, key, filepath, location_name, date))
+        elif key is not None and self.cache.get(key) is not None and self.cache.copy_to(key, filepath):
+            self.cache.record(location_name, date, key, filepath)
+            self._count('cached')
+            get_metrics().inc('extraction_cache_requests_total', cache='thumbnail', result='hit')
+            future = Future()
+            future.set_result(200)
+        else:
+            if key is not None:
+                get_metrics().inc('extraction_cache_requests_total', cache='thumbnail', result='miss')
+
+            # Earth Engine round-trip on the producer side
+            if url is None:
+                url = landsat_thumb_url(scene, **params)
+
+            self._slots.acquire()
+            # Submit and register under the lock, so _forget cannot run first
+            with self._lock:
+                future = self._executor.submit(self._download, url, filepath, key, scene,
+                                               location_name, date)
+                if key is not None:
+                    self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._slots.release())
+            if key is not None:
+                future.add_done_callback(lambda _: self._forget(key))
+
+        if on_done is not None:
+            # A future that ended in an exception is reported as a failed download
+            future.add_done_callback(lambda f: on_done(None if f.exception() else f.result()))
+
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def _forget(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def _resolve_reuse(self, future, download, key, filepath, location_name, date):
+        """Complete a reuse future (errors must reach it, or close() would wait forever)"""
+        try:
+            future.set_result(self._reuse(download, key, filepath, location_name, date))
+        except Exception as e:
+            self._count('failed')
+            future.set_exception(e)
+
+    def _reuse(self, download, key, filepath, location_name, date):
+        """Copy a thumbnail downloaded for another date of the same scene"""
+        if download.result() != 200 or not self.cache.copy_to(key, filepath):
+            return download.result()
+        self.cache.record(location_name, date, key, filepath)
+        self._count('cached')
+        get_metrics().inc('extraction_cache_requests_total', cache='thumbnail', result='hit')
+        return 200
+
+    def _download(self, url, filepath, key, scene, location_name, date):
+        """Stream one thumbnail to disk (worker thread); returns the HTTP status"""
+        tmp_path = filepath.with_name(f"{filepath.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+        try:
+            response = self.rate_limiter.request('earth_engine', url, session=self.session,
+                                                endpoint='thumbnail', stream=True, timeout=60)
+            with response:
+                if response.status_code != 200:
+                    self._count('failed')
+                    return response.status_code
+
+                # Write to a temp file first so readers never see a partial image
+                size = 0
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                        f.write(chunk)
+                        size += len(chunk)
+                os.replace(tmp_path, filepath)
+        except Exception as e:
+            print(f"   ⚠️  Thumbnail download failed ({filepath.name}): {str(e)[:60]}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            self._count('failed')
+            return None
+
+        if self.cache is not None:
+            self.cache.put_file(key, filepath, scene)
+            self.cache.record(location_name, date, key, filepath)
+
+        self._count('downloaded')
+        self._count('bytes', size)
+        return 200
+
+    def wait(self):
+        """Block until every queued thumbnail is on disk or has failed"""
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures)
+
+    def close(self):
+        """Wait for queued downloads, then shut down workers and the session"""
+        self.wait()
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def summary(self):
+        """One-line download summary"""
+        return (f"{self.stats['downloaded']} downloaded "
+                f"({self.stats['bytes'] / (1024 * 1024):.1f} MB), "
+                f"{self.stats['cached']} from cache, {self.stats['failed']} failed")